@@ -0,0 +1,133 @@
+"""
+Invalidação dos caches em memória entre processos (tabela cache_invalidations,
+migration 015).
+
+tenant_directory e session_cache guardam dados por worker do gunicorn. Quem
+escreve publica a invalidação; os outros workers leem o log no MASTER:
+
+    cache_bus.subscribe("tenant", fn)   # fn(ref) descarta a entrada local
+    cache_bus.publish("tenant", 42)     # aplica aqui na hora e grava a linha
+    cache_bus.sync()                    # chamado a cada leitura dos caches
+
+sync() consulta o MASTER no máximo a cada CACHE_SYNC_SECONDS (uma thread
+por vez; as outras seguem com o cache como está), então uma escrita em um
+worker chega nos outros em ~CACHE_SYNC_SECONDS. A leitura é por janela de
+tempo (created_at >= última leitura - folga), lembrando os ids já aplicados:
+linha de uma transação que commitou depois de ids maiores não se perde.
+
+Sem a tabela (migration não aplicada) ou com o MASTER fora, avisa e os
+caches ficam só com o TTL de cada um.
+"""
+from __future__ import annotations
+
+import datetime
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from app.db import execute_sql, fetch_all, fetch_one
+
+CACHE_SYNC_SECONDS = float(os.getenv("CACHE_SYNC_SECONDS", "1"))
+# Folga da janela para INSERT que commita atrasado
+_SLACK = datetime.timedelta(seconds=5)
+_RETENTION_SECONDS = 3600
+_CLEANUP_SECONDS = 600
+
+
+class CacheBus:
+    def __init__(self, interval: float) -> None:
+        self.interval = interval
+        self._handlers: Dict[str, List[Callable[[str], None]]] = {}
+        self._sync_lock = threading.Lock()
+        self._next_sync = 0.0
+        self._next_cleanup = 0.0
+        # NOW(3) do MASTER na última leitura e ids já aplicados dentro da janela
+        self._since: Optional[datetime.datetime] = None
+        self._seen: Dict[int, datetime.datetime] = {}
+        self._warned = False
+        self.synced_at: Optional[float] = None
+        self.published = 0
+        self.applied = 0
+        self.errors = 0
+
+    def subscribe(self, kind: str, fn: Callable[[str], None]) -> None:
+        self._handlers.setdefault(kind, []).append(fn)
+
+    def _apply(self, kind: str, ref: str) -> None:
+        for fn in self._handlers.get(kind, ()):
+            fn(ref)
+
+    def _warn(self, e: Exception) -> None:
+        self.errors += 1
+        if not self._warned:
+            self._warned = True
+            print(f"⚠️  Cache bus indisponível ({type(e).__name__}: {e}); caches só com TTL", flush=True)
+
+    def publish(self, kind: str, ref: Any) -> None:
+        """Invalida aqui e avisa os outros processos (chamar depois do commit da escrita)."""
+        ref = str(ref)
+        self._apply(kind, ref)
+        try:
+            execute_sql(
+                "INSERT INTO cache_invalidations (kind, ref) VALUES (:kind, :ref)",
+                {"kind": kind, "ref": ref},
+            )
+            self.published += 1
+        except Exception as e:
+            self._warn(e)
+
+    def sync(self) -> None:
+        now = time.monotonic()
+        if now < self._next_sync or not self._sync_lock.acquire(blocking=False):
+            return
+        try:
+            if now < self._next_sync:
+                return
+            self._next_sync = now + self.interval
+            self._poll()
+            self.synced_at = time.monotonic()
+        except Exception as e:
+            self._warn(e)
+        finally:
+            self._sync_lock.release()
+
+    def _poll(self) -> None:
+        db_now = fetch_one("SELECT NOW(3) AS now", primary=True)["now"]
+        since = (self._since or db_now) - _SLACK
+        rows = fetch_all(
+            """
+            SELECT id, kind, ref, created_at FROM cache_invalidations
+            WHERE created_at >= :since ORDER BY id
+            """,
+            {"since": since},
+            primary=True,
+        )
+        for r in rows:
+            if r["id"] in self._seen:
+                continue
+            self._seen[r["id"]] = r["created_at"]
+            self._apply(r["kind"], r["ref"])
+            self.applied += 1
+        # Fora da próxima janela: não volta mais na consulta
+        self._since = db_now
+        for row_id in [i for i, at in self._seen.items() if at < db_now - _SLACK]:
+            del self._seen[row_id]
+
+        if time.monotonic() >= self._next_cleanup:
+            self._next_cleanup = time.monotonic() + _CLEANUP_SECONDS
+            execute_sql(
+                f"DELETE FROM cache_invalidations WHERE created_at < NOW() - INTERVAL {_RETENTION_SECONDS} SECOND"
+            )
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "syncSeconds": self.interval,
+            "lastSyncAgeSeconds": round(time.monotonic() - self.synced_at, 1) if self.synced_at else None,
+            "published": self.published,
+            "applied": self.applied,
+            "errors": self.errors,
+        }
+
+
+cache_bus = CacheBus(CACHE_SYNC_SECONDS)
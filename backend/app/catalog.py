@@ -0,0 +1,160 @@
+"""
+Catálogo de sistemas em memória (tabela systems do MASTER).
+
+A tabela é minúscula e muda só pelo CRUD do super admin, mas é lida em toda
+landing page (/api/systems), na listagem de tenants por sistema, no
+create-tenant e no auto-join do cadastro. O catálogo carrega tudo de uma vez
+e serve essas leituras da memória:
+
+    systems_catalog.active()        -> payload pronto de GET /api/systems
+    systems_catalog.by_slug(slug)   -> linha (dict) ou None
+    systems_catalog.by_id(id)       -> linha (dict) ou None
+
+Recarrega a cada SYSTEMS_CACHE_SECONDS; create/update/delete_system chamam
+invalidate(), que descarta o snapshot aqui e publica "system" no cache_bus:
+os outros workers do gunicorn descartam o deles em ~CACHE_SYNC_SECONDS. Um
+slug/id que não está no snapshot (sistema criado agora em outro worker)
+força um reload do primário, no máximo a cada _MISS_RELOAD_SECONDS. Se o
+reload falhar, continua servindo o snapshot anterior.
+"""
+from __future__ import annotations
+
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.cache_bus import cache_bus
+from app.db import fetch_rows, named_query
+from app.dto import SYSTEM_DTO
+
+SYSTEMS_CACHE_SECONDS = float(os.getenv("SYSTEMS_CACHE_SECONDS", "60"))
+# Depois de um reload com erro, espera isso antes de tentar de novo
+_RETRY_SECONDS = 5.0
+# Reload por slug/id ausente: no máximo um por este intervalo (slug inexistente não martela o MASTER)
+_MISS_RELOAD_SECONDS = 1.0
+
+ALL_SYSTEMS = named_query(
+    "systems.catalog",
+    """
+    SELECT id, slug, display_name, description, icon, color, base_route, is_active, display_order
+    FROM systems
+    ORDER BY display_order ASC, id ASC
+    """,
+)
+
+
+class _Snapshot:
+    __slots__ = ("by_id", "by_slug", "active", "loaded_at")
+
+    def __init__(self, columns: Tuple[str, ...], rows: List[Any]) -> None:
+        records = [dict(zip(columns, r)) for r in rows]
+        self.by_id: Dict[int, Dict[str, Any]] = {int(r["id"]): r for r in records}
+        self.by_slug: Dict[str, Dict[str, Any]] = {r["slug"]: r for r in records}
+        active = [r for r in rows if r[columns.index("is_active")]]
+        self.active: List[Dict[str, Any]] = SYSTEM_DTO.many(columns, active)
+        self.loaded_at = time.monotonic()
+
+
+class SystemsCatalog:
+    def __init__(self, ttl: float) -> None:
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._snapshot: Optional[_Snapshot] = None
+        self._generation = 0
+        self._retry_at = 0.0
+        self.loads = 0
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def _fresh(self, snap: Optional[_Snapshot], miss: bool) -> bool:
+        if snap is None:
+            return False
+        now = time.monotonic()
+        if now < self._retry_at:
+            return True
+        ttl = min(self.ttl, _MISS_RELOAD_SECONDS) if miss else self.ttl
+        return now - snap.loaded_at < ttl
+
+    def _get(self, miss: bool = False) -> _Snapshot:
+        """Snapshot atual; `miss` = a chave procurada não estava nele (reload mais cedo)."""
+        cache_bus.sync()
+        snap = self._snapshot
+        if self._fresh(snap, miss):
+            self.hits += 1
+            return snap
+
+        with self._lock:
+            # Outra thread pode ter recarregado enquanto esperávamos
+            snap = self._snapshot
+            now = time.monotonic()
+            if self._fresh(snap, miss):
+                self.hits += 1
+                return snap
+
+            generation = self._generation
+            try:
+                fresh = _Snapshot(*fetch_rows(ALL_SYSTEMS, primary=True))
+            except Exception as e:
+                self.errors += 1
+                if snap is None:
+                    raise
+                print(f"⚠️  Catálogo de sistemas: reload falhou ({e}); usando o anterior", flush=True)
+                self._retry_at = now + _RETRY_SECONDS
+                return snap
+
+            self.loads += 1
+            # invalidate() durante o load: usa o resultado, mas não guarda
+            if generation == self._generation:
+                self._snapshot = fresh
+            return fresh
+
+    def active(self) -> List[Dict[str, Any]]:
+        """Sistemas ativos já no formato de GET /api/systems (não alterar)."""
+        return self._get().active
+
+    def by_slug(self, slug: str) -> Optional[Dict[str, Any]]:
+        row = self._get().by_slug.get(slug)
+        if row is None:
+            self.misses += 1
+            row = self._get(miss=True).by_slug.get(slug)
+        return row
+
+    def by_id(self, system_id: Any) -> Optional[Dict[str, Any]]:
+        try:
+            key = int(system_id)
+        except (TypeError, ValueError):
+            return None
+        row = self._get().by_id.get(key)
+        if row is None:
+            self.misses += 1
+            row = self._get(miss=True).by_id.get(key)
+        return row
+
+    def invalidate(self) -> None:
+        """Descarta o snapshot aqui e nos outros processos (chamar depois do commit)."""
+        self._drop()
+        cache_bus.publish("system", "all")
+
+    def _drop(self) -> None:
+        # Sem lock: não espera um reload em andamento (a geração descarta o resultado dele)
+        self._generation += 1
+        self._snapshot = None
+        self._retry_at = 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        snap = self._snapshot
+        return {
+            "systems": len(snap.by_id) if snap else None,
+            "ageSeconds": round(time.monotonic() - snap.loaded_at, 1) if snap else None,
+            "ttlSeconds": self.ttl,
+            "loads": self.loads,
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+        }
+
+
+systems_catalog = SystemsCatalog(SYSTEMS_CACHE_SECONDS)
+cache_bus.subscribe("system", lambda ref: systems_catalog._drop())
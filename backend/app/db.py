@@ -1,15 +1,31 @@
 from __future__ import annotations
 
+import hashlib
+import itertools
 import logging
 import os
+import random
 import re
+import threading
 import time
+import weakref
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import TYPE_CHECKING, Any, Dict, FrozenSet, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
 
-from sqlalchemy import create_engine, text
-from sqlalchemy.engine import Engine
-from sqlalchemy.exc import OperationalError, SQLAlchemyError
+from flask import g, has_request_context, request
+from pymysql.constants import CLIENT
+from sqlalchemy import bindparam, create_engine, event, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import DBAPIError, DisconnectionError, OperationalError, SQLAlchemyError
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+if TYPE_CHECKING:
+    from app.dto import Dto
 
 logger = logging.getLogger(__name__)
 
@@ -29,6 +45,23 @@ if not MASTER_DATABASE_URL:
 
 ENV = os.getenv("ENV", "dev")
 
+# Tamanho máximo de cada lote em listas IN (...) expandidas
+IN_CHUNK_SIZE = int(os.getenv("IN_CHUNK_SIZE", "500"))
+# Linhas por statement no bulk_upsert (executemany multi-row do PyMySQL)
+BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", "500"))
+# Linhas por lote no fetch_iter (cursor server-side)
+FETCH_BATCH_SIZE = int(os.getenv("FETCH_BATCH_SIZE", "500"))
+
+# Métricas por query/rota e slow query log
+QUERY_METRICS_ENABLED = os.getenv("QUERY_METRICS", "1") != "0"
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+SLOW_QUERY_SAMPLE_RATE = float(os.getenv("SLOW_QUERY_SAMPLE_RATE", "1.0"))
+
+# Réplicas de leitura do MASTER (opcional, separadas por vírgula)
+MASTER_REPLICA_URLS = [
+    u.strip() for u in (os.getenv("MASTER_REPLICA_URLS") or "").split(",") if u.strip()
+]
+
 # Target (MySQL do Varzea onde os DBs dos tenants serão criados)
 TENANT_DB_HOST = os.getenv("TENANT_DB_HOST", "varzea-prime-db-1")
 TENANT_DB_PORT = int(os.getenv("TENANT_DB_PORT", "3306"))
@@ -38,11 +71,370 @@ TENANT_DB_PASS = os.getenv("TENANT_DB_PASS", "")
 if ENV != "dev" and not TENANT_DB_PASS:
     raise RuntimeError("TENANT_DB_PASS is required in non-dev environments.")
 
+# Aplicação de template em lotes multi-statement (0 = um statement por round trip)
+TEMPLATE_BATCH_MAX_BYTES = int(os.getenv("TEMPLATE_BATCH_MAX_BYTES", str(512 * 1024)))
+# Conexões simultâneas em apply_sql_template_parallel (limitado ao que o pool tiver livre)
+TEMPLATE_PARALLEL_CONNECTIONS = int(os.getenv("TEMPLATE_PARALLEL_CONNECTIONS", "4"))
+
+# Registry de engines dos tenants (um pool pequeno por DB, com limite global)
+TENANT_ENGINE_CACHE_SIZE = int(os.getenv("TENANT_ENGINE_CACHE_SIZE", "64"))
+TENANT_ENGINE_IDLE_SECONDS = int(os.getenv("TENANT_ENGINE_IDLE_SECONDS", "300"))
+
+
+# ============================================================
+# Pools (configuráveis por tipo de engine)
+# ============================================================
+# Conexões paradas há mais que isso levam um ping no checkout (0 = sempre,
+# como pool_pre_ping). Abaixo do limite o ping é pulado: se a conexão tiver
+# caído mesmo assim, leituras são repetidas uma vez em conexão nova.
+POOL_PING_IDLE_SECONDS = float(os.getenv("POOL_PING_IDLE_SECONDS", "30"))
+
+
+def _pool_options(prefix: str, pool_size: int, max_overflow: int) -> Dict[str, Any]:
+    """
+    Lê {prefix}_POOL_SIZE, {prefix}_MAX_OVERFLOW, {prefix}_POOL_RECYCLE e
+    {prefix}_POOL_TIMEOUT do ambiente (prefixos: MASTER, ADMIN, TENANT).
+    """
+    return {
+        "pool_size": int(os.getenv(f"{prefix}_POOL_SIZE", str(pool_size))),
+        "max_overflow": int(os.getenv(f"{prefix}_MAX_OVERFLOW", str(max_overflow))),
+        "pool_recycle": int(os.getenv(f"{prefix}_POOL_RECYCLE", "1800")),
+        "pool_timeout": float(os.getenv(f"{prefix}_POOL_TIMEOUT", "30")),
+    }
+
+
+# gunicorn roda gthread com 8 threads por worker: o pool do master acompanha isso
+MASTER_POOL_OPTIONS = _pool_options("MASTER", pool_size=8, max_overflow=8)
+REPLICA_POOL_OPTIONS = _pool_options("REPLICA", pool_size=8, max_overflow=8)
+ADMIN_POOL_OPTIONS = _pool_options("ADMIN", pool_size=2, max_overflow=2)
+TENANT_POOL_OPTIONS = _pool_options("TENANT", pool_size=2, max_overflow=3)
+
+
+class PoolStats:
+    """
+    Telemetria de pool por tipo de engine (por worker).
+    Contadores vêm dos eventos de pool; o tempo de espera é medido no checkout.
+
+    Também faz o liveness check no lugar do pool_pre_ping: só pinga conexões
+    ociosas há mais de POOL_PING_IDLE_SECONDS; se o ping falhar levanta
+    DisconnectionError e o pool troca a conexão por uma nova.
+    """
+
+    def __init__(self, label: str) -> None:
+        self.label = label
+        self._lock = threading.Lock()
+        self.connects = 0
+        self.checkouts = 0
+        self.checked_out = 0
+        self.peak_checked_out = 0
+        self.timeouts = 0
+        self.wait_count = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.pings = 0
+        self.pings_saved = 0
+        self.ping_failures = 0
+        self.retries = 0
+
+    def attach(self, eng: Engine) -> None:
+        event.listen(eng, "connect", self._on_connect)
+        event.listen(eng, "checkout", self._on_checkout)
+        event.listen(eng, "checkin", self._on_checkin)
+        _engine_stats[eng] = self
+
+    def record_wait(self, seconds: float) -> None:
+        with self._lock:
+            self.wait_count += 1
+            self.wait_total += seconds
+            if seconds > self.wait_max:
+                self.wait_max = seconds
+
+    def record_timeout(self) -> None:
+        with self._lock:
+            self.timeouts += 1
+
+    def record_retry(self) -> None:
+        with self._lock:
+            self.retries += 1
+
+    def snapshot(self, engines: List[Engine]) -> Dict[str, Any]:
+        size = checked_in = overflow = 0
+        for eng in engines:
+            pool = eng.pool
+            size += getattr(pool, "size", lambda: 0)()
+            checked_in += getattr(pool, "checkedin", lambda: 0)()
+            overflow += max(0, getattr(pool, "overflow", lambda: 0)())
+        with self._lock:
+            avg = (self.wait_total / self.wait_count) if self.wait_count else 0.0
+            return {
+                "engines": len(engines),
+                "poolSize": size,
+                "checkedIn": checked_in,
+                "checkedOut": self.checked_out,
+                "overflow": overflow,
+                "peakCheckedOut": self.peak_checked_out,
+                "connects": self.connects,
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "waitAvgMs": round(avg * 1000, 3),
+                "waitMaxMs": round(self.wait_max * 1000, 3),
+                "pings": self.pings,
+                "pingsSaved": self.pings_saved,
+                "pingFailures": self.ping_failures,
+                "readRetries": self.retries,
+            }
+
+    def _on_connect(self, dbapi_conn, conn_record) -> None:
+        conn_record.info["last_used"] = time.monotonic()
+        with self._lock:
+            self.connects += 1
+
+    def _on_checkout(self, dbapi_conn, conn_record, conn_proxy) -> None:
+        idle = time.monotonic() - conn_record.info.get("last_used", 0.0)
+        if idle > POOL_PING_IDLE_SECONDS:
+            try:
+                _ping(dbapi_conn)
+            except Exception as e:
+                with self._lock:
+                    self.ping_failures += 1
+                # O pool invalida esta conexão e tenta outra
+                raise DisconnectionError(f"ping falhou após {idle:.0f}s ociosa: {e}") from e
+            pinged = True
+        else:
+            pinged = False
+
+        with self._lock:
+            if pinged:
+                self.pings += 1
+            else:
+                self.pings_saved += 1
+            self.checkouts += 1
+            self.checked_out += 1
+            if self.checked_out > self.peak_checked_out:
+                self.peak_checked_out = self.checked_out
+
+    def _on_checkin(self, dbapi_conn, conn_record) -> None:
+        if conn_record is not None:
+            conn_record.info["last_used"] = time.monotonic()
+        with self._lock:
+            self.checked_out = max(0, self.checked_out - 1)
+
+
+def _ping(dbapi_conn) -> None:
+    ping = getattr(dbapi_conn, "ping", None)
+    if ping is not None:
+        ping(False)  # PyMySQL: sem reconnect implícito
+        return
+    cursor = dbapi_conn.cursor()
+    try:
+        cursor.execute("SELECT 1")
+        cursor.fetchall()
+    finally:
+        cursor.close()
+
+
+_engine_stats: "weakref.WeakKeyDictionary[Engine, PoolStats]" = weakref.WeakKeyDictionary()
+master_pool_stats = PoolStats("master")
+replica_pool_stats = PoolStats("replica")
+admin_pool_stats = PoolStats("admin")
+tenant_pool_stats = PoolStats("tenant")
+
+
+@contextmanager
+def checkout(eng: Engine, begin: bool = False) -> Iterator[Connection]:
+    """
+    Faz checkout de uma conexão medindo o tempo de espera no pool.
+    Com begin=True abre transação (commit ao sair, rollback em erro).
+    """
+    stats = _engine_stats.get(eng)
+    t0 = time.perf_counter()
+    try:
+        conn = eng.connect()
+    except PoolTimeoutError:
+        if stats is not None:
+            stats.record_timeout()
+        raise
+    if stats is not None:
+        stats.record_wait(time.perf_counter() - t0)
+
+    with conn:
+        if begin:
+            with conn.begin():
+                yield conn
+        else:
+            yield conn
+
+
+# ============================================================
+# Métricas por query (duração, linhas, rota do Flask)
+# ============================================================
+slow_query_logger = logging.getLogger("app.db.slow")
+
+_HIST_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+_MAX_QUERIES_PER_ROUTE = 200
+_UNKNOWN_ROWCOUNT = 2 ** 63
+
+_SQL_STRING_RE = re.compile(r"'(?:[^'\\]|\\.|'')*'")
+_SQL_NUMBER_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+_SQL_IN_LIST_RE = re.compile(r"\(\s*(?:\?|%s)(?:\s*,\s*(?:\?|%s))+\s*\)")
+_SQL_SPACE_RE = re.compile(r"\s+")
+
+
+def normalize_sql(sql: str) -> str:
+    """Remove literais e colapsa espaços (IN com N placeholders vira IN (?+))."""
+    s = _SQL_STRING_RE.sub("?", sql)
+    s = _SQL_NUMBER_RE.sub("?", s)
+    s = _SQL_IN_LIST_RE.sub("(?+)", s)
+    return _SQL_SPACE_RE.sub(" ", s).strip()
+
+
+class _Agg:
+    __slots__ = ("count", "total", "max", "rows", "buckets")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.rows = 0
+        self.buckets = [0] * (len(_HIST_BUCKETS_MS) + 1)
+
+    def add(self, ms: float, rows: int) -> None:
+        self.count += 1
+        self.total += ms
+        if ms > self.max:
+            self.max = ms
+        if rows > 0:
+            self.rows += rows
+        i = 0
+        for bound in _HIST_BUCKETS_MS:
+            if ms <= bound:
+                break
+            i += 1
+        self.buckets[i] += 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "totalMs": round(self.total, 3),
+            "avgMs": round(self.total / self.count, 3) if self.count else 0.0,
+            "maxMs": round(self.max, 3),
+            "rows": self.rows,
+        }
+
+
+class QueryMetrics:
+    """
+    Agrega duração/linhas de cada statement por rota (request.endpoint) e por
+    query (nome da NamedQuery ou SQL normalizado). Statements acima de
+    SLOW_QUERY_MS vão para o logger app.db.slow (amostrado).
+
+    O custo no caminho quente é um perf_counter + lookup em dict; a normalização
+    do SQL só acontece no snapshot e no slow log.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._routes: Dict[str, _Agg] = {}
+        self._queries: Dict[str, Dict[str, _Agg]] = {}
+        self.slow_count = 0
+
+    def attach(self, eng: Engine, label: str) -> None:
+        if not QUERY_METRICS_ENABLED:
+            return
+
+        @event.listens_for(eng, "before_cursor_execute")
+        def _before(conn, cursor, statement, parameters, context, executemany):
+            conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+        @event.listens_for(eng, "after_cursor_execute")
+        def _after(conn, cursor, statement, parameters, context, executemany):
+            starts = conn.info.get("query_start")
+            if not starts:
+                return
+            ms = (time.perf_counter() - starts.pop()) * 1000
+            name = context.execution_options.get("query_name") if context is not None else None
+            # SSCursor (stream_results) não sabe o total de linhas: reporta -1/2**64-1
+            rows = cursor.rowcount if 0 <= cursor.rowcount < _UNKNOWN_ROWCOUNT else 0
+            self.record(label, statement, name, ms, rows)
+
+    def record(self, label: str, statement: str, name: Optional[str], ms: float, rows: int) -> None:
+        endpoint = (request.endpoint or "-") if has_request_context() else "-"
+        key = name or statement
+        with self._lock:
+            route = self._routes.get(endpoint)
+            if route is None:
+                route = self._routes[endpoint] = _Agg()
+                self._queries[endpoint] = {}
+            route.add(ms, rows)
+            queries = self._queries[endpoint]
+            agg = queries.get(key)
+            if agg is None:
+                if len(queries) >= _MAX_QUERIES_PER_ROUTE:
+                    key = "(outras)"
+                    agg = queries.get(key)
+                if agg is None:
+                    agg = queries[key] = _Agg()
+            agg.add(ms, rows)
+            if ms >= SLOW_QUERY_MS:
+                self.slow_count += 1
+
+        if ms >= SLOW_QUERY_MS and random.random() < SLOW_QUERY_SAMPLE_RATE:
+            slow_query_logger.warning(
+                "slow query %.1fms rows=%s engine=%s endpoint=%s query=%s sql=%s",
+                ms, rows, label, endpoint, name or "-", normalize_sql(statement)[:1000],
+            )
+
+    def snapshot(self, top: int = 20) -> Dict[str, Any]:
+        with self._lock:
+            routes = {
+                endpoint: (agg.to_dict(), list(agg.buckets), dict(self._queries[endpoint]))
+                for endpoint, agg in self._routes.items()
+            }
+            slow_count = self.slow_count
+
+        out: Dict[str, Any] = {}
+        for endpoint, (summary, buckets, queries) in routes.items():
+            ranked = sorted(queries.items(), key=lambda kv: kv[1].total, reverse=True)[:top]
+            summary["histogramMs"] = {
+                **{f"le_{b}": n for b, n in zip(_HIST_BUCKETS_MS, buckets)},
+                "inf": buckets[-1],
+            }
+            summary["queries"] = [
+                {"query": k if k in QUERIES or k == "(outras)" else normalize_sql(k), **agg.to_dict()}
+                for k, agg in ranked
+            ]
+            out[endpoint] = summary
+        return {
+            "pid": os.getpid(),
+            "slowQueryMs": SLOW_QUERY_MS,
+            "slowQueries": slow_count,
+            "routes": out,
+        }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._routes.clear()
+            self._queries.clear()
+            self.slow_count = 0
+
+
+query_metrics = QueryMetrics()
+
+
+def _instrument(eng: Engine, stats: PoolStats) -> None:
+    stats.attach(eng)
+    query_metrics.attach(eng, stats.label)
+
+
 # ============================================================
 # Engines (cache simples)
 # ============================================================
 _master_engine: Optional[Engine] = None
+_replica_engines: List[Engine] = []
+_replica_lock = threading.Lock()
+_replica_next = 0
 _target_admin_engines: Dict[str, Engine] = {}
+_template_engines: Dict[str, Engine] = {}
 
 
 def get_master_engine() -> Engine:
@@ -53,12 +445,32 @@ def get_master_engine() -> Engine:
     if _master_engine is None:
         _master_engine = create_engine(
             MASTER_DATABASE_URL,
-            pool_pre_ping=True,
             future=True,
+            **MASTER_POOL_OPTIONS,
         )
+        _instrument(_master_engine, master_pool_stats)
     return _master_engine
 
 
+def get_replica_engine() -> Optional[Engine]:
+    """
+    Engine de uma réplica de leitura (round-robin entre MASTER_REPLICA_URLS).
+    Retorna None quando não há réplicas configuradas.
+    """
+    global _replica_next
+    if not MASTER_REPLICA_URLS:
+        return None
+    with _replica_lock:
+        if not _replica_engines:
+            for url in MASTER_REPLICA_URLS:
+                eng = create_engine(url, future=True, **REPLICA_POOL_OPTIONS)
+                _instrument(eng, replica_pool_stats)
+                _replica_engines.append(eng)
+        eng = _replica_engines[_replica_next % len(_replica_engines)]
+        _replica_next += 1
+    return eng
+
+
 def get_target_admin_engine(host: Optional[str] = None) -> Engine:
     """
     Engine para conectar no MySQL do Varzea SEM schema (apenas para CREATE/DROP DATABASE).
@@ -73,37 +485,534 @@ def get_target_admin_engine(host: Optional[str] = None) -> Engine:
     eng = create_engine(
         admin_url,
         isolation_level="AUTOCOMMIT",
-        pool_pre_ping=True,
         future=True,
+        **ADMIN_POOL_OPTIONS,
     )
+    _instrument(eng, admin_pool_stats)
     _target_admin_engines[h] = eng
     return eng
 
 
+def get_template_engine(host: Optional[str] = None) -> Engine:
+    """
+    Engine por host com CLIENT.MULTI_STATEMENTS, usada só para aplicar
+    templates_sql em lotes (apply_sql_template(..., database=...)).
+    Fica separada das engines de tenant para que nenhuma query de request
+    rode em conexão que aceita múltiplos statements.
+    """
+    h = (host or "").strip() or TENANT_DB_HOST
+    if h in _template_engines:
+        return _template_engines[h]
+
+    # client_flag via URL: o dialeto soma com os flags padrão (FOUND_ROWS)
+    url = (
+        f"mysql+pymysql://{TENANT_DB_USER}:{TENANT_DB_PASS}@{h}:{TENANT_DB_PORT}"
+        f"?client_flag={CLIENT.MULTI_STATEMENTS}"
+    )
+    eng = create_engine(
+        url,
+        isolation_level="AUTOCOMMIT",
+        future=True,
+        **ADMIN_POOL_OPTIONS,
+    )
+    _instrument(eng, admin_pool_stats)
+    _template_engines[h] = eng
+    return eng
+
+
+class TenantEngineRegistry:
+    """
+    Cache process-wide de engines dos DBs de tenant, chaveado por (host, database).
+
+    - LRU com tamanho máximo: o engine menos usado é descartado (dispose) ao estourar.
+    - Idle: engines sem uso há mais de `idle_seconds` são descartados no próximo acesso.
+    - Cada engine tem pool pequeno (TENANT_POOL_SIZE/TENANT_MAX_OVERFLOW), então
+      milhares de tenants não viram milhares de conexões abertas.
+    """
+
+    def __init__(self, max_size: int, idle_seconds: int) -> None:
+        self.max_size = max(1, max_size)
+        self.idle_seconds = max(0, idle_seconds)
+        self._engines: "OrderedDict[Tuple[str, str], Tuple[Engine, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, host: Optional[str], db_name: str) -> Engine:
+        key = ((host or "").strip() or TENANT_DB_HOST, db_name)
+        now = time.monotonic()
+        expired: List[Engine] = []
+
+        with self._lock:
+            expired.extend(self._pop_idle(now))
+
+            entry = self._engines.pop(key, None)
+            if entry is not None:
+                self.hits += 1
+                eng = entry[0]
+            else:
+                self.misses += 1
+                eng = create_engine(
+                    build_tenant_database_url(key[0], db_name),
+                    future=True,
+                    **TENANT_POOL_OPTIONS,
+                )
+                _instrument(eng, tenant_pool_stats)
+            self._engines[key] = (eng, now)
+
+            while len(self._engines) > self.max_size:
+                _, (old, _) = self._engines.popitem(last=False)
+                self.evictions += 1
+                expired.append(old)
+
+        # dispose fora do lock (fecha sockets)
+        for old in expired:
+            old.dispose()
+        return eng
+
+    def evict(self, host: Optional[str], db_name: str) -> None:
+        """Remove e descarta o engine de um tenant (ex.: após DROP DATABASE)."""
+        key = ((host or "").strip() or TENANT_DB_HOST, db_name)
+        with self._lock:
+            entry = self._engines.pop(key, None)
+            if entry is not None:
+                self.evictions += 1
+        if entry is not None:
+            entry[0].dispose()
+
+    def clear(self) -> None:
+        with self._lock:
+            engines = [eng for eng, _ in self._engines.values()]
+            self._engines.clear()
+        for eng in engines:
+            eng.dispose()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "size": len(self._engines),
+                "maxSize": self.max_size,
+                "idleSeconds": self.idle_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def engines(self) -> List[Engine]:
+        with self._lock:
+            return [eng for eng, _ in self._engines.values()]
+
+    def _pop_idle(self, now: float) -> List[Engine]:
+        # OrderedDict está em ordem de uso: os mais antigos ficam no início
+        out: List[Engine] = []
+        if not self.idle_seconds:
+            return out
+        while self._engines:
+            key, (eng, last_used) = next(iter(self._engines.items()))
+            if now - last_used < self.idle_seconds:
+                break
+            del self._engines[key]
+            self.evictions += 1
+            out.append(eng)
+        return out
+
+
+tenant_engines = TenantEngineRegistry(TENANT_ENGINE_CACHE_SIZE, TENANT_ENGINE_IDLE_SECONDS)
+
+
+def get_tenant_engine(target_host: Optional[str], db_name: str) -> Engine:
+    """
+    Engine (cacheado) para o DB de um tenant no MySQL do Varzea.
+    Não chame dispose() no engine retornado: o ciclo de vida é do registry.
+    """
+    return tenant_engines.get(target_host, db_name)
+
+
+# ============================================================
+# Named queries (statements pré-compilados)
+# ============================================================
+class NamedQuery:
+    """
+    Statement registrado com nome: o text() é montado uma vez só e o texto
+    fica estável (bom para o digest do performance_schema).
+    Parâmetros em `expanding` aceitam listas e viram IN (...) com bind params.
+    """
+
+    __slots__ = ("name", "sql", "expanding", "statement")
+
+    def __init__(self, name: str, sql: str, expanding: Sequence[str] = ()) -> None:
+        self.name = name
+        self.sql = sql
+        self.expanding = tuple(expanding)
+        stmt = text(sql)
+        if self.expanding:
+            stmt = stmt.bindparams(*(bindparam(p, expanding=True) for p in self.expanding))
+        self.statement = stmt.execution_options(query_name=name)
+
+    def __repr__(self) -> str:
+        return f"<NamedQuery {self.name}>"
+
+
+QUERIES: Dict[str, NamedQuery] = {}
+
+SqlLike = Union[str, NamedQuery]
+
+
+def named_query(name: str, sql: str, expanding: Sequence[str] = ()) -> NamedQuery:
+    """Registra (ou devolve o já registrado) um statement nomeado."""
+    existing = QUERIES.get(name)
+    if existing is not None:
+        if existing.sql != sql:
+            raise ValueError(f"Query '{name}' já registrada com outro SQL")
+        return existing
+    q = NamedQuery(name, sql, expanding)
+    QUERIES[name] = q
+    return q
+
+
+@lru_cache(maxsize=512)
+def _compile_text(sql: str):
+    return text(sql)
+
+
+def _statement(sql: SqlLike):
+    if isinstance(sql, NamedQuery):
+        return sql.statement
+    return _compile_text(sql)
+
+
+def iter_chunks(values: Iterable[Any], size: int = IN_CHUNK_SIZE) -> Iterator[List[Any]]:
+    """Quebra uma sequência em listas de no máximo `size` itens."""
+    chunk: List[Any] = []
+    for v in values:
+        chunk.append(v)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
 # ============================================================
 # SQL helpers (MASTER DB)
 # ============================================================
-def execute_sql(sql: str, params: Optional[Dict[str, Any]] = None) -> None:
-    eng = get_master_engine()
-    with eng.begin() as conn:
-        conn.execute(text(sql), params or {})
+# Leituras vão para a réplica por padrão. Depois de uma escrita no mesmo
+# request, as leituras seguintes ficam presas no primário (read-your-writes).
+# Dentro de unit_of_work() tudo roda na conexão presa pelo bloco.
+_uow_conn: ContextVar[Optional[Connection]] = ContextVar("db_unit_of_work", default=None)
+
+
+def mark_recent_write() -> None:
+    """Prende as próximas leituras deste request no primário."""
+    if has_request_context():
+        g._db_recent_write = True
+
+
+def _wrote_recently() -> bool:
+    return has_request_context() and bool(g.get("_db_recent_write", False))
+
+
+def _record_retry(eng: Engine, err: DBAPIError) -> None:
+    stats = _engine_stats.get(eng)
+    if stats is not None:
+        stats.record_retry()
+    logger.warning("Conexão caiu durante leitura, repetindo uma vez: %s", err.orig)
+
+
+def _run_read(eng: Engine, run):
+    """Roda uma leitura; se a conexão caiu no meio, repete uma vez em outra."""
+    try:
+        with checkout(eng) as conn:
+            return run(conn)
+    except DBAPIError as e:
+        if not e.connection_invalidated:
+            raise
+        _record_retry(eng, e)
+    with checkout(eng) as conn:
+        return run(conn)
+
+
+def _read(run, primary: bool):
+    conn = _uow_conn.get()
+    if conn is not None:
+        return run(conn)
+
+    replica = None if primary or _wrote_recently() else get_replica_engine()
+    if replica is not None:
+        try:
+            return _run_read(replica, run)
+        except OperationalError as e:
+            logger.warning("Réplica indisponível, lendo do primário: %s", e)
+
+    return _run_read(get_master_engine(), run)
+
 
+@contextmanager
+def unit_of_work() -> Iterator[Connection]:
+    """
+    Prende uma conexão e uma transação do MASTER para um bloco de chamadas:
+
+        with unit_of_work():
+            execute_sql(...)
+            user = fetch_one(...)   # enxerga o que foi escrito acima
+            execute_sql(...)
+
+    execute_sql/fetch_*/fetch_iter dentro do bloco usam a mesma conexão (um
+    checkout e um commit no fim; rollback se o bloco levantar exceção).
+    Blocos aninhados participam da transação de fora.
+
+    No MySQL um statement que falha não aborta a transação, então o padrão
+    `try: execute_sql(...) except: pass` continua valendo dentro do bloco.
+    """
+    conn = _uow_conn.get()
+    if conn is not None:
+        yield conn
+        return
+
+    mark_recent_write()
+    with checkout(get_master_engine(), begin=True) as conn:
+        token = _uow_conn.set(conn)
+        try:
+            yield conn
+        finally:
+            _uow_conn.reset(token)
+
+
+def execute_sql(sql: SqlLike, params: Optional[Dict[str, Any]] = None) -> int:
+    """Executa no MASTER (ou na unit_of_work ativa). Devolve o rowcount."""
+    conn = _uow_conn.get()
+    if conn is not None:
+        return conn.execute(_statement(sql), params or {}).rowcount
 
-def fetch_one(sql: str, params: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
     eng = get_master_engine()
-    with eng.connect() as conn:
-        res = conn.execute(text(sql), params or {})
-        row = res.mappings().first()
+    mark_recent_write()
+    with checkout(eng, begin=True) as conn:
+        return conn.execute(_statement(sql), params or {}).rowcount
+
+
+def fetch_one(
+    sql: SqlLike,
+    params: Optional[Dict[str, Any]] = None,
+    *,
+    primary: bool = False,
+) -> Optional[Dict[str, Any]]:
+    """Primeira linha como dict (réplica por padrão; primary=True força o primário)."""
+    def run(conn: Connection) -> Optional[Dict[str, Any]]:
+        row = conn.execute(_statement(sql), params or {}).mappings().first()
         return dict(row) if row else None
 
+    return _read(run, primary)
 
-def fetch_all(sql: str, params: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
-    eng = get_master_engine()
-    with eng.connect() as conn:
-        res = conn.execute(text(sql), params or {})
-        rows = res.mappings().all()
+
+def fetch_all(
+    sql: SqlLike,
+    params: Optional[Dict[str, Any]] = None,
+    *,
+    primary: bool = False,
+) -> List[Dict[str, Any]]:
+    """Todas as linhas como dicts (réplica por padrão; primary=True força o primário)."""
+    def run(conn: Connection) -> List[Dict[str, Any]]:
+        rows = conn.execute(_statement(sql), params or {}).mappings().all()
         return [dict(r) for r in rows]
 
+    return _read(run, primary)
+
+
+def fetch_rows(
+    sql: SqlLike,
+    params: Optional[Dict[str, Any]] = None,
+    *,
+    primary: bool = False,
+) -> Tuple[Tuple[str, ...], List[Sequence[Any]]]:
+    """
+    (colunas, linhas como tuplas) sem montar um dict por linha.
+    Para mapear direto para a saída: `dto.many(*fetch_rows(...))`.
+    """
+    def run(conn: Connection) -> Tuple[Tuple[str, ...], List[Sequence[Any]]]:
+        result = conn.execute(_statement(sql), params or {})
+        return tuple(result.keys()), result.all()
+
+    return _read(run, primary)
+
+
+def fetch_iter(
+    sql: SqlLike,
+    params: Optional[Dict[str, Any]] = None,
+    *,
+    batch_size: int = FETCH_BATCH_SIZE,
+    primary: bool = False,
+    dto: Optional["Dto"] = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Itera as linhas como dicts usando cursor server-side (SSCursor do PyMySQL):
+    o driver busca `batch_size` linhas por vez, então a memória fica limitada
+    ao lote e não ao tamanho do resultado.
+
+    Com `dto` (app.dto), cada tupla vira direto o dict de saída do DTO.
+
+    A conexão fica presa até o gerador terminar (ou ser fechado), então consuma
+    rápido e não faça outras queries na mesma conexão no meio da iteração.
+    O fallback réplica -> primário (e a repetição após queda de conexão) só
+    acontece antes da primeira linha.
+    Dentro de unit_of_work() usa a conexão do bloco (resultado bufferizado).
+    """
+    conn = _uow_conn.get()
+    if conn is not None:
+        result = conn.execute(_statement(sql), params or {})
+        build = dto.compile(tuple(result.keys())) if dto is not None else None
+        for row in result:
+            yield build(row) if build else dict(row._mapping)
+        return
+
+    replica = None if primary or _wrote_recently() else get_replica_engine()
+    engines = [replica, get_master_engine()] if replica is not None else [get_master_engine()]
+    retried = False
+    while engines:
+        eng = engines[0]
+        started = False
+        try:
+            with checkout(eng) as conn:
+                result = conn.execution_options(
+                    stream_results=True, max_row_buffer=batch_size,
+                ).execute(_statement(sql), params or {})
+                if dto is not None:
+                    build = dto.compile(tuple(result.keys()))
+                    batches = result.partitions(batch_size)
+                else:
+                    build = dict
+                    batches = result.mappings().partitions(batch_size)
+                for batch in batches:
+                    started = True
+                    for row in batch:
+                        yield build(row)
+            return
+        except OperationalError as e:
+            if started:
+                raise
+            if e.connection_invalidated and not retried:
+                retried = True
+                _record_retry(eng, e)
+                continue
+            if eng is not replica:
+                raise
+            logger.warning("Réplica indisponível, lendo do primário: %s", e)
+            engines.pop(0)
+
+
+def fetch_all_in(
+    query: NamedQuery,
+    param: str,
+    values: Iterable[Any],
+    params: Optional[Dict[str, Any]] = None,
+    *,
+    chunk_size: int = IN_CHUNK_SIZE,
+    primary: bool = False,
+) -> List[Dict[str, Any]]:
+    """
+    Executa `query` com o parâmetro expanding `param` em lotes de `chunk_size`
+    valores e concatena o resultado (ORDER BY vale dentro de cada lote).
+    """
+    if param not in query.expanding:
+        raise ValueError(f"'{param}' não é expanding em {query.name}")
+    out: List[Dict[str, Any]] = []
+    for chunk in iter_chunks(dict.fromkeys(values), chunk_size):
+        out.extend(fetch_all(query, {**(params or {}), param: chunk}, primary=primary))
+    return out
+
+
+_IDENTIFIER_RE = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+
+def _identifier(name: str) -> str:
+    if not _IDENTIFIER_RE.match(name or ""):
+        raise ValueError(f"Identificador SQL inválido: {name!r}")
+    return f"`{name}`"
+
+
+@lru_cache(maxsize=128)
+def _upsert_statement(table: str, columns: Tuple[str, ...], update: Tuple[Tuple[str, str], ...]):
+    cols = ", ".join(_identifier(c) for c in columns)
+    values = ", ".join(f":{c}" for c in columns)
+    if update:
+        assignments = ", ".join(f"{_identifier(c)} = {expr}" for c, expr in update)
+    else:
+        # Sem update: duplicata vira no-op (mantém a linha existente)
+        first = _identifier(columns[0])
+        assignments = f"{first} = {first}"
+    sql = (
+        f"INSERT INTO {_identifier(table)} ({cols}) VALUES ({values}) "
+        f"ON DUPLICATE KEY UPDATE {assignments}"
+    )
+    return text(sql).execution_options(query_name=f"bulk_upsert.{table}")
+
+
+def bulk_upsert(
+    table: str,
+    columns: Sequence[str],
+    rows: Iterable[Sequence[Any]],
+    update: Union[Sequence[str], Dict[str, str], None] = None,
+    *,
+    chunk_size: int = BULK_CHUNK_SIZE,
+) -> int:
+    """
+    INSERT ... ON DUPLICATE KEY UPDATE de várias linhas no MASTER.
+
+    `rows` são tuplas na ordem de `columns`. O statement vai como executemany,
+    que o PyMySQL reescreve em um único INSERT multi-row por lote de
+    `chunk_size` linhas (um round trip por lote em vez de um por linha).
+
+    `update`:
+      - None: duplicatas são ignoradas (linha existente fica como está);
+      - lista de colunas: `col = VALUES(col)`;
+      - dict coluna -> expressão SQL fixa (ex.: {"left_at": "NULL"}).
+        As expressões vêm do código, nunca do request.
+
+    Roda dentro do unit_of_work() ativo ou abre um para todos os lotes.
+    Retorna o total de linhas afetadas reportado pelo MySQL.
+    """
+    columns = tuple(columns)
+    if not columns:
+        raise ValueError("bulk_upsert precisa de pelo menos uma coluna")
+    if isinstance(update, dict):
+        update_items = tuple(update.items())
+    else:
+        update_items = tuple((c, f"VALUES({_identifier(c)})") for c in (update or ()))
+    stmt = _upsert_statement(table, columns, update_items)
+
+    affected = 0
+    chunks = iter_chunks((dict(zip(columns, r)) for r in rows), chunk_size)
+    first = next(chunks, None)
+    if first is None:
+        return 0
+    with unit_of_work() as conn:
+        for chunk in itertools.chain((first,), chunks):
+            result = conn.execute(stmt, chunk)
+            affected += max(result.rowcount, 0)
+    return affected
+
+
+def pool_stats() -> Dict[str, Any]:
+    """Snapshot da telemetria dos pools deste worker."""
+    return {
+        "pid": os.getpid(),
+        "pools": {
+            "master": master_pool_stats.snapshot([_master_engine] if _master_engine else []),
+            "replica": replica_pool_stats.snapshot(list(_replica_engines)),
+            "admin": admin_pool_stats.snapshot(
+                list(_target_admin_engines.values()) + list(_template_engines.values())
+            ),
+            "tenant": tenant_pool_stats.snapshot(tenant_engines.engines()),
+        },
+        "config": {
+            "master": MASTER_POOL_OPTIONS,
+            "replica": REPLICA_POOL_OPTIONS,
+            "admin": ADMIN_POOL_OPTIONS,
+            "tenant": TENANT_POOL_OPTIONS,
+        },
+        "tenantEngines": tenant_engines.stats(),
+    }
+
 
 def safe_db_error(err: Exception) -> str:
     """
@@ -126,7 +1035,7 @@ def init_db(retries: int = 5, sleep_seconds: int = 2) -> None:
     for attempt in range(1, retries + 1):
         try:
             eng = get_master_engine()
-            with eng.connect() as conn:
+            with checkout(eng) as conn:
                 conn.execute(text("SELECT 1"))
             return
         except OperationalError as e:
@@ -164,110 +1073,466 @@ def build_db_name_from_slug(slug: str) -> str:
 # SQL template apply (bem melhor que split(';'))
 # ============================================================
 
-def _split_sql_statements(sql_text: str) -> list[str]:
-    """
-    Split de script SQL por ';' ignorando comentários de linha iniciados com '--'
-    e protegendo contra ';' dentro de aspas simples/dobras.
-    """
-    # remove comentários "-- ..."
-    lines = []
-    for line in sql_text.splitlines():
-        if line.lstrip().startswith("--"):
-            continue
-        lines.append(line)
-    text_clean = "\n".join(lines).strip()
-    if not text_clean:
-        return []
-
-    stmts: list[str] = []
-    buf: list[str] = []
-    in_str = False
-    quote = None
-    prev = ""
-
-    for ch in text_clean:
-        if ch in ("'", '"'):
-            if not in_str:
-                in_str = True
-                quote = ch
-            elif quote == ch and prev != "\\":  # fecha string (escape simples)
-                in_str = False
-                quote = None
-
-        if ch == ";" and not in_str:
+# Tokenizer de uma passada: cada match consome um token inteiro (string,
+# identificador com crase, comentário, ';' ou um trecho sem nada disso).
+_SQL_TOKEN_RE = re.compile(
+    r"""
+      (?P<str>'(?:[^'\\]|\\.|'')*'|"(?:[^"\\]|\\.|"")*"|`(?:[^`]|``)*`)
+    | (?P<exe>/\*![\s\S]*?\*/)
+    | (?P<cmt>--(?=[ \t\r\n]|$)[^\n]*|\#[^\n]*|/\*[\s\S]*?\*/)
+    | (?P<semi>;)
+    | (?P<bad>['"`]|/\*)
+    | (?P<other>[^'"`;\#/\-]+|[\s\S])
+    """,
+    re.X,
+)
+# Verbo e objeto do statement; `/*!40101 SET ... */` (dump) conta como SET
+_SQL_HEAD_RE = re.compile(r"^\s*(?:/\*!\d*\s*)?(\w+)(?:\s+(\w+))?", re.I)
+_SQL_CREATE_TABLE_RE = re.compile(
+    r"^\s*create\s+(?:temporary\s+)?table\s+(?:if\s+not\s+exists\s+)?`?(\w+)`?", re.I
+)
+_SQL_FK_ALTER_RE = re.compile(r"\b(?:foreign\s+key|add\s+constraint)\b", re.I)
+_SQL_ALTER_TABLE_RE = re.compile(r"^\s*alter\s+table\s+`?(\w+)`?", re.I)
+_SQL_REFERENCES_RE = re.compile(r"\breferences\s+(?:`?\w+`?\.)?`?(\w+)`?", re.I)
+
+
+def _sql_head(statement: str) -> Tuple[str, str]:
+    """(verbo, objeto) em minúsculas; ("", "") se não começar por palavra."""
+    m = _SQL_HEAD_RE.match(statement)
+    if not m:
+        return "", ""
+    return m.group(1).lower(), (m.group(2) or "").lower()
+
+
+def _split_sql_statements(sql_text: str) -> List[str]:
+    """
+    Split de script SQL por ';' em uma passada.
+
+    Remove comentários `-- `, `#` e `/* */` (mantém `/*! ... */`, que o MySQL
+    executa), respeita ';' dentro de '...', "..." e `...` (com escape por
+    barra e por aspas dobradas). Aspas ou comentário sem fechamento levantam
+    ValueError.
+    """
+    stmts: List[str] = []
+    buf: List[str] = []
+    for m in _SQL_TOKEN_RE.finditer(sql_text):
+        kind = m.lastgroup
+        if kind == "semi":
             stmt = "".join(buf).strip()
-            buf = []
             if stmt:
                 stmts.append(stmt)
+            buf = []
+        elif kind == "cmt":
+            buf.append(" ")
+        elif kind == "bad":
+            line = sql_text.count("\n", 0, m.start()) + 1
+            raise ValueError(f"SQL com {m.group()!r} sem fechamento na linha {line}")
         else:
-            buf.append(ch)
-
-        prev = ch
-
+            buf.append(m.group())
     tail = "".join(buf).strip()
     if tail:
         stmts.append(tail)
-
     return stmts
 
 
-def apply_sql_template(conn, template_path: str) -> None:
-    sql_text = Path(template_path).read_text(encoding="utf-8")
-    statements = _split_sql_statements(sql_text)
+class TemplatePlan:
+    """
+    Template já parseado e classificado na ordem de execução:
+      prelude  -> SETs do começo (ex.: FOREIGN_KEY_CHECKS = 0)
+      creates  -> CREATE TABLE
+      others   -> INSERTs, CREATE INDEX, etc
+      fks      -> ALTER TABLE ... FOREIGN KEY / ADD CONSTRAINT
+      epilogue -> SETs do fim (ex.: FOREIGN_KEY_CHECKS = 1)
+    """
 
-    db = conn.exec_driver_sql("SELECT DATABASE()").scalar()
-    if not db:
-        raise RuntimeError("Nenhum database selecionado (DATABASE() retornou NULL).")
+    __slots__ = (
+        "path", "mtime_ns", "size", "sha256", "prelude", "creates", "others", "fks", "epilogue", "tables", "_ddl",
+    )
 
-    def norm(s: str) -> str:
-        return re.sub(r"\s+", " ", s.strip()).lower()
+    def __init__(self, path: Path, mtime_ns: int, size: int, sha256: str, statements: List[str]) -> None:
+        self.path = path
+        self.mtime_ns = mtime_ns
+        self.size = size
+        self.sha256 = sha256
 
-    create_tables: list[str] = []
-    alters_add_fk: list[str] = []
-    others: list[str] = []
+        # SETs antes do primeiro / depois do último statement "de verdade"
+        is_set = [_sql_head(st)[0] == "set" for st in statements]
+        start = 0
+        while start < len(statements) and is_set[start]:
+            start += 1
+        end = len(statements)
+        while end > start and is_set[end - 1]:
+            end -= 1
+        self.prelude: Tuple[str, ...] = tuple(statements[:start])
+        self.epilogue: Tuple[str, ...] = tuple(statements[end:])
 
-    for stmt in statements:
-        s = norm(stmt)
+        creates: List[str] = []
+        others: List[str] = []
+        fks: List[str] = []
+        tables: List[str] = []
+        for st in statements[start:end]:
+            verb, obj = _sql_head(st)
+            if verb == "alter" and obj == "table" and _SQL_FK_ALTER_RE.search(st):
+                fks.append(st)
+                continue
+            m = _SQL_CREATE_TABLE_RE.match(st)
+            if m:
+                creates.append(st)
+                tables.append(m.group(1))
+                continue
+            others.append(st)
+        self.creates: Tuple[str, ...] = tuple(creates)
+        self.others: Tuple[str, ...] = tuple(others)
+        self.fks: Tuple[str, ...] = tuple(fks)
+        self.tables: Tuple[str, ...] = tuple(tables)
+        self._ddl: Optional[DdlPlan] = None
 
-        # separa ALTER TABLE que adiciona constraint/foreign key
-        if s.startswith("alter table") and (" foreign key " in s or " add constraint " in s):
-            alters_add_fk.append(stmt)
-            continue
+    @property
+    def ddl(self) -> "DdlPlan":
+        """Plano de execução paralela (grafo de FKs), montado no primeiro uso."""
+        if self._ddl is None:
+            self._ddl = DdlPlan(self)
+        return self._ddl
 
-        # separa CREATE TABLE
-        if s.startswith("create table"):
-            create_tables.append(stmt)
-            continue
+    @property
+    def version(self) -> str:
+        """Versão curta do template (prefixo do sha256 do conteúdo)."""
+        return self.sha256[:12]
 
-        others.append(stmt)
+    def phases(self) -> List[Tuple[str, Tuple[str, ...]]]:
+        return [
+            ("SET", self.prelude),
+            ("CREATE TABLE", self.creates),
+            ("template", self.others),
+            ("FK/CONSTRAINT", self.fks),
+            ("SET", self.epilogue),
+        ]
 
-    # 1) CREATE TABLE primeiro
-    for i, stmt in enumerate(create_tables, start=1):
-        try:
-            conn.exec_driver_sql(stmt)
-        except Exception as e:
-            snippet = (stmt[:600] + "...") if len(stmt) > 600 else stmt
-            raise RuntimeError(f"Falha CREATE TABLE (db={db}) stmt#{i}:\n{snippet}") from e
 
-    # 2) restante (INSERTs, CREATE INDEX, etc)
-    for i, stmt in enumerate(others, start=1):
+def _dependency_levels(tables: Sequence[str], deps: Dict[str, FrozenSet[str]]) -> Tuple[Tuple[str, ...], ...]:
+    """
+    Ordem topológica em níveis: cada nível só depende dos anteriores, então
+    as tabelas de um mesmo nível podem ser criadas ao mesmo tempo. Ciclo de
+    FKs vai inteiro para o último nível (o template roda com FOREIGN_KEY_CHECKS = 0).
+    """
+    known = set(tables)
+    remaining = {t: {d for d in deps.get(t, ()) if d in known and d != t} for t in tables}
+    levels: List[Tuple[str, ...]] = []
+    while remaining:
+        ready = [t for t in tables if t in remaining and not remaining[t]]
+        if not ready:
+            ready = [t for t in tables if t in remaining]
+        levels.append(tuple(ready))
+        for t in ready:
+            remaining.pop(t)
+        for pending in remaining.values():
+            pending.difference_update(ready)
+    return tuple(levels)
+
+
+class DdlPlan:
+    """
+    CREATE TABLEs do template organizados para várias conexões:
+      deps    -> tabela -> tabelas que ela referencia (FKs inline, REFERENCES e ALTERs)
+      creates -> níveis de CREATE TABLE independentes entre si
+      alters  -> níveis dos ALTER TABLE ... FOREIGN KEY do template, na ordem do grafo
+    Cada item é (fase, nº na fase, statement), como em _chunk_items.
+    """
+
+    __slots__ = ("deps", "creates", "alters")
+
+    def __init__(self, plan: TemplatePlan) -> None:
+        deps: Dict[str, set] = {t: set() for t in plan.tables}
+        for table, stmt in zip(plan.tables, plan.creates):
+            deps[table].update(m.group(1) for m in _SQL_REFERENCES_RE.finditer(stmt))
+
+        alters: Dict[str, List[Tuple[str, int, str]]] = {}
+        for i, stmt in enumerate(plan.fks, start=1):
+            m = _SQL_ALTER_TABLE_RE.match(stmt)
+            table = m.group(1) if m else ""
+            deps.setdefault(table, set()).update(r.group(1) for r in _SQL_REFERENCES_RE.finditer(stmt))
+            alters.setdefault(table, []).append(("FK/CONSTRAINT", i, stmt))
+
+        self.deps: Dict[str, FrozenSet[str]] = {t: frozenset(d) for t, d in deps.items()}
+        created = set(plan.tables)
+        order = list(plan.tables) + [t for t in alters if t not in created]
+        levels = _dependency_levels(order, self.deps)
+
+        numbered = {t: i for i, t in enumerate(plan.tables, start=1)}
+        self.creates: Tuple[Tuple[Tuple[str, int, str], ...], ...] = tuple(
+            lvl
+            for lvl in (
+                tuple(("CREATE TABLE", numbered[t], plan.creates[numbered[t] - 1]) for t in level if t in created)
+                for level in levels
+            )
+            if lvl
+        )
+        self.alters: Tuple[Tuple[Tuple[str, int, str], ...], ...] = tuple(
+            lvl for lvl in (tuple(item for t in level for item in alters.get(t, ())) for level in levels) if lvl
+        )
+
+    def width(self) -> int:
+        """Maior nível de CREATE: acima disso, conexão extra não ajuda."""
+        return max((len(lvl) for lvl in self.creates), default=1)
+
+
+class TemplateStore:
+    """
+    Cache process-wide dos templates_sql/model_*.sql parseados.
+    Revalida por (mtime, tamanho) a cada get(); se mudou, compara o sha256 e
+    só re-parseia quando o conteúdo mudou de fato.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._plans: Dict[Path, TemplatePlan] = {}
+        self.parses = 0
+        self.hits = 0
+
+    def get(self, template_path: Union[str, Path]) -> TemplatePlan:
+        path = Path(template_path).resolve()
+        st = path.stat()
+        with self._lock:
+            plan = self._plans.get(path)
+            if plan is not None and plan.mtime_ns == st.st_mtime_ns and plan.size == st.st_size:
+                self.hits += 1
+                return plan
+
+        raw = path.read_bytes()
+        digest = hashlib.sha256(raw).hexdigest()
+        with self._lock:
+            plan = self._plans.get(path)
+            if plan is not None and plan.sha256 == digest:
+                plan.mtime_ns, plan.size = st.st_mtime_ns, st.st_size
+                self.hits += 1
+                return plan
+            plan = TemplatePlan(path, st.st_mtime_ns, st.st_size, digest, _split_sql_statements(raw.decode("utf-8")))
+            self._plans[path] = plan
+            self.parses += 1
+            return plan
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "parses": self.parses,
+                "hits": self.hits,
+                "templates": {
+                    p.name: {"version": plan.version, "tables": len(plan.tables)}
+                    for p, plan in self._plans.items()
+                },
+            }
+
+
+sql_templates = TemplateStore()
+
+
+def _chunk_items(
+    items: Iterable[Tuple[str, int, str]], max_bytes: int
+) -> Iterator[List[Tuple[str, int, str]]]:
+    """
+    Agrupa itens (fase, nº na fase, statement) em lotes de até `max_bytes`
+    (bytes em UTF-8, como vão no pacote; seeds com acento ocupam mais que
+    len()); fase + número servem para atribuir o erro ao statement certo.
+    """
+    batch: List[Tuple[str, int, str]] = []
+    size = 0
+    for item in items:
+        n = len(item[2].encode("utf-8"))
+        if batch and size + n > max_bytes:
+            yield batch
+            batch, size = [], 0
+        batch.append(item)
+        size += n + 2
+    if batch:
+        yield batch
+
+
+def _template_error(label: str, i: int, stmt: str, db: str) -> RuntimeError:
+    snippet = (stmt[:600] + "...") if len(stmt) > 600 else stmt
+    return RuntimeError(f"Falha {label} (db={db}) stmt#{i}:\n{snippet}")
+
+
+class BatchStatementError(RuntimeError):
+    """Falha em um lote multi-statement; `index` aponta o statement que quebrou."""
+
+    def __init__(self, index: int, stmt: str) -> None:
+        super().__init__(f"statement #{index + 1} do lote falhou")
+        self.index = index
+        self.stmt = stmt
+
+
+def execute_multi(cursor, statements: Sequence[str]) -> None:
+    """
+    Executa `statements` em um round trip (cursor DBAPI de conexão com
+    MULTI_STATEMENTS). O n-ésimo result set corresponde ao n-ésimo statement,
+    então contar nextset() diz qual deles falhou.
+    """
+    done = 0
+    try:
+        cursor.execute(";\n".join(statements))
+        done = 1
+        while cursor.nextset():
+            done += 1
+    except Exception as e:
+        i = min(done, len(statements) - 1)
+        raise BatchStatementError(i, statements[i]) from e
+
+
+def _supports_multi_statements(conn: Connection) -> bool:
+    dbapi_conn = conn.connection.dbapi_connection
+    return bool(getattr(dbapi_conn, "client_flag", 0) & CLIENT.MULTI_STATEMENTS)
+
+
+def apply_sql_template(
+    conn: Connection,
+    template_path: Union[str, Path],
+    database: Optional[str] = None,
+) -> TemplatePlan:
+    """
+    Aplica o template no database da conexão (ou em `database`, via USE).
+
+    Em conexão com MULTI_STATEMENTS (get_template_engine) os statements vão
+    em lotes de até TEMPLATE_BATCH_MAX_BYTES: um round trip por lote. O erro
+    continua apontando o statement exato (fase + número), contando quantos
+    result sets do lote já tinham voltado. Sem MULTI_STATEMENTS, executa um
+    statement por vez.
+    """
+    plan = sql_templates.get(template_path)
+
+    if database is not None:
+        if not re.match(r"^[a-z0-9_]+$", database):
+            raise ValueError("database_name inválido")
+        conn.exec_driver_sql(f"USE `{database}`")
+
+    db = conn.exec_driver_sql("SELECT DATABASE()").scalar()
+    if not db:
+        raise RuntimeError("Nenhum database selecionado (DATABASE() retornou NULL).")
+
+    # SET inicial -> CREATE TABLE -> restante (INSERTs, CREATE INDEX, etc) -> FKs -> SET final
+    _run_items(
+        conn,
+        [(label, i, stmt) for label, statements in plan.phases() for i, stmt in enumerate(statements, start=1)],
+        db,
+    )
+
+    users_exists = conn.exec_driver_sql("SHOW TABLES LIKE 'users'").fetchone()
+    if not users_exists:
+        raise RuntimeError(f"Template aplicado mas 'users' não existe no db={db}.")
+    return plan
+
+
+def _run_items(conn: Connection, items: Sequence[Tuple[str, int, str]], db: str) -> None:
+    """Executa itens (fase, nº, statement) em uma conexão, em lote se der."""
+    if not items:
+        return
+    if TEMPLATE_BATCH_MAX_BYTES > 0 and _supports_multi_statements(conn):
+        label = _engine_stats[conn.engine].label if conn.engine in _engine_stats else "-"
+        cursor = conn.connection.dbapi_connection.cursor()
+        try:
+            for batch in _chunk_items(items, TEMPLATE_BATCH_MAX_BYTES):
+                t0 = time.perf_counter()
+                try:
+                    execute_multi(cursor, [stmt for _, _, stmt in batch])
+                except BatchStatementError as e:
+                    raise _template_error(*batch[e.index], db) from e.__cause__
+                if QUERY_METRICS_ENABLED:
+                    query_metrics.record(
+                        label, "", "tenant_template.batch", (time.perf_counter() - t0) * 1000, len(batch)
+                    )
+        finally:
+            cursor.close()
+        return
+    for label, i, stmt in items:
         try:
             conn.exec_driver_sql(stmt)
         except Exception as e:
-            snippet = (stmt[:600] + "...") if len(stmt) > 600 else stmt
-            raise RuntimeError(f"Falha template (db={db}) stmt#{i}:\n{snippet}") from e
+            raise _template_error(label, i, stmt, db) from e
+
+
+_spare_checkout_lock = threading.Lock()
+
 
-    # 3) por último, FKs
-    for i, stmt in enumerate(alters_add_fk, start=1):
+def _pool_has_room(eng: Engine) -> bool:
+    """True se o pool ainda tem conexão livre (ou sem limite)."""
+    pool = eng.pool
+    checkedout = getattr(pool, "checkedout", None)
+    if checkedout is None or getattr(pool, "_max_overflow", 0) < 0:
+        return True
+    return checkedout() < pool.size() + getattr(pool, "_max_overflow", 0)
+
+
+def apply_sql_template_parallel(
+    eng: Engine,
+    template_path: Union[str, Path],
+    database: str,
+    connections: int = TEMPLATE_PARALLEL_CONNECTIONS,
+) -> TemplatePlan:
+    """
+    Aplica o template em `database` usando até `connections` conexões de `eng`:
+
+      1. SETs iniciais em todas as conexões
+      2. CREATE TABLE de cada nível do DdlPlan repartidos entre as conexões
+      3. restante do template (INSERTs etc.) em uma conexão, na ordem do arquivo
+      4. ALTER TABLE ... FOREIGN KEY do template, nível a nível, repartidos entre as conexões
+      5. SETs finais em todas
+
+    Só a primeira conexão espera pelo pool; as extras só são pegas se houver
+    folga (jobs concorrentes no mesmo host não se travam esperando conexão).
+    Com uma conexão só, é o apply_sql_template de sempre.
+    """
+    if not re.match(r"^[a-z0-9_]+$", database):
+        raise ValueError("database_name inválido")
+    plan = sql_templates.get(template_path)
+    ddl = plan.ddl
+    wanted = max(1, min(connections, ddl.width()))
+
+    with ExitStack() as stack:
+        conns = [stack.enter_context(checkout(eng))]
+        with _spare_checkout_lock:
+            while len(conns) < wanted and _pool_has_room(eng):
+                conns.append(stack.enter_context(checkout(eng)))
+        if len(conns) == 1:
+            try:
+                return apply_sql_template(conns[0], template_path, database=database)
+            except Exception:
+                # Mesmo motivo do caminho paralelo: sessão pode estar com FOREIGN_KEY_CHECKS = 0
+                conns[0].invalidate()
+                raise
+
+        prelude = [("SET", i, st) for i, st in enumerate(plan.prelude, start=1)]
+        epilogue = [("SET", i, st) for i, st in enumerate(plan.epilogue, start=1)]
+        ok = False
         try:
-            conn.exec_driver_sql(stmt)
-        except Exception as e:
-            snippet = (stmt[:600] + "...") if len(stmt) > 600 else stmt
-            raise RuntimeError(f"Falha FK/CONSTRAINT (db={db}) stmt#{i}:\n{snippet}") from e
+            for conn in conns:
+                conn.exec_driver_sql(f"USE `{database}`")
+                _run_items(conn, prelude, database)
+
+            with ThreadPoolExecutor(max_workers=len(conns), thread_name_prefix="ddl") as pool:
+                def run_level(level: Sequence[Tuple[str, int, str]]) -> None:
+                    groups = [list(level[k::len(conns)]) for k in range(len(conns))]
+                    futures = [pool.submit(_run_items, c, grp, database) for c, grp in zip(conns, groups) if grp]
+                    for f in futures:
+                        f.result()
+
+                for level in ddl.creates:
+                    run_level(level)
+                _run_items(conns[0], [("template", i, st) for i, st in enumerate(plan.others, start=1)], database)
+                for level in ddl.alters:
+                    run_level(level)
+
+            for conn in conns:
+                _run_items(conn, epilogue, database)
+            ok = True
+        finally:
+            if not ok:
+                # Sessão pode ter ficado com FOREIGN_KEY_CHECKS = 0: não volta pro pool
+                for conn in conns:
+                    conn.invalidate()
+
+        if not conns[0].exec_driver_sql("SHOW TABLES LIKE 'users'").fetchone():
+            raise RuntimeError(f"Template aplicado mas 'users' não existe no db={database}.")
+    return plan
 
-    users_exists = conn.exec_driver_sql("SHOW TABLES LIKE 'users'").fetchone()
-    if not users_exists:
-        raise RuntimeError(f"Template aplicado mas 'users' não existe no db={db}.")
 
 # ============================================================
 # Tenant DB operations (no MySQL do Varzea)
@@ -278,7 +1543,7 @@ def create_physical_database(target_host: Optional[str], db_name: str) -> None:
     """
     host = (target_host or "").strip() or TENANT_DB_HOST
     eng = get_target_admin_engine(host)
-    with eng.connect() as conn:
+    with checkout(eng) as conn:
         conn.execute(
             text(
                 f"CREATE DATABASE IF NOT EXISTS `{db_name}` "
@@ -292,8 +1557,9 @@ def drop_physical_database(target_host: Optional[str], db_name: str) -> None:
     Remove o database físico no MySQL do Varzea.
     """
     host = (target_host or "").strip() or TENANT_DB_HOST
+    tenant_engines.evict(host, db_name)
     eng = get_target_admin_engine(host)
-    with eng.connect() as conn:
+    with checkout(eng) as conn:
         conn.execute(text(f"DROP DATABASE IF EXISTS `{db_name}`"))
 
 
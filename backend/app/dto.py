@@ -0,0 +1,285 @@
+"""
+DTOs compilados por projeção de colunas.
+
+Cada DTO é declarado uma vez como lista de campos (chave de saída, coluna,
+regra). Na primeira vez que aparece um conjunto de colunas, o DTO gera uma
+função Python específica para ele, com índices (ou chaves) resolvidos e
+defaults de colunas ausentes já embutidos:
+
+    def build(r):
+        return {'id': r[0], 'name': r[1], 'isActive': bool(r[17]), ...}
+
+Assim cada linha vira o dict de saída direto, sem dict(row) intermediário e
+sem .get()/isoformat() genéricos por campo. As regras reproduzem exatamente
+os helpers antigos (_user_to_dto & cia):
+
+    Field(k, col)          row[col]            (coluna obrigatória)
+    Opt(k, col, default)   row.get(col, default)
+    Or(k, col, default)    row.get(col) or default   (default pode ser Col(...))
+    Bool(k, col, default)  bool(row.get(col, default))
+    Int(k, col)            int(row[col])
+    Iso(k, col)            row[col].isoformat() if row.get(col) else None
+    Const(k, value)        valor literal (listas/dicts são novos a cada linha)
+"""
+from __future__ import annotations
+
+import ast
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Sequence, Tuple
+
+Builder = Callable[[Any], Dict[str, Any]]
+
+
+class Col:
+    """Referência a outra coluna (usada como default em Or)."""
+
+    __slots__ = ("name",)
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+
+
+class _Field:
+    __slots__ = ("key", "col", "default")
+
+    def __init__(self, key: str, col: str = "", default: Any = None) -> None:
+        self.key = key
+        self.col = col
+        self.default = default
+
+    def expr(self, ref: Callable[[str], str], cols: frozenset) -> str:
+        raise NotImplementedError
+
+
+def _literal(value: Any) -> str:
+    src = repr(value)
+    try:
+        same = ast.literal_eval(src) == value
+    except (ValueError, SyntaxError):
+        same = False
+    if not same:
+        raise ValueError(f"Default não literal no DTO: {value!r}")
+    return src
+
+
+class Field(_Field):
+    __slots__ = ()
+
+    def expr(self, ref, cols):
+        if self.col not in cols:
+            raise KeyError(self.col)
+        return ref(self.col)
+
+
+class Opt(_Field):
+    __slots__ = ()
+
+    def expr(self, ref, cols):
+        return ref(self.col) if self.col in cols else _literal(self.default)
+
+
+class Or(_Field):
+    __slots__ = ()
+
+    def expr(self, ref, cols):
+        d = self.default
+        if isinstance(d, Col):
+            fallback = Field(self.key, d.name).expr(ref, cols)
+        else:
+            fallback = _literal(d)
+        if self.col not in cols:
+            return fallback
+        return f"({ref(self.col)} or {fallback})"
+
+
+class Bool(_Field):
+    __slots__ = ()
+
+    def expr(self, ref, cols):
+        if self.col not in cols:
+            return _literal(bool(self.default))
+        return f"bool({ref(self.col)})"
+
+
+class Int(_Field):
+    __slots__ = ()
+
+    def expr(self, ref, cols):
+        return f"int({Field(self.key, self.col).expr(ref, cols)})"
+
+
+class Iso(_Field):
+    __slots__ = ()
+
+    def expr(self, ref, cols):
+        if self.col not in cols:
+            return "None"
+        v = ref(self.col)
+        return f"({v}.isoformat() if {v} else None)"
+
+
+class Const(_Field):
+    __slots__ = ()
+
+    def __init__(self, key: str, value: Any) -> None:
+        super().__init__(key, "", value)
+
+    def expr(self, ref, cols):
+        return _literal(self.default)
+
+
+class Dto:
+    """
+    Conjunto de campos + cache de builders por projeção de colunas.
+
+    - dto(row_dict)             -> dict   (linhas de fetch_one/fetch_all)
+    - dto.compile(columns)      -> função que recebe tuplas/Rows por índice
+    - dto.many(columns, rows)   -> lista  (para db.fetch_rows)
+    """
+
+    __slots__ = ("name", "fields", "_by_index", "_by_key", "_lock")
+
+    def __init__(self, name: str, fields: Sequence[_Field]) -> None:
+        self.name = name
+        self.fields: Tuple[_Field, ...] = tuple(fields)
+        self._by_index: Dict[Tuple[str, ...], Builder] = {}
+        self._by_key: Dict[Tuple[str, ...], Builder] = {}
+        self._lock = threading.Lock()
+
+    def extend(self, name: str, fields: Sequence[_Field]) -> "Dto":
+        """Novo DTO com os campos deste + `fields` (mesma chave sobrescreve)."""
+        extra = {f.key for f in fields}
+        return Dto(name, [f for f in self.fields if f.key not in extra] + list(fields))
+
+    def _generate(self, columns: Tuple[str, ...], by_index: bool) -> Builder:
+        cols = frozenset(columns)
+        if by_index:
+            # Coluna repetida: a última vence, como em dict(zip(keys, row))
+            index = {c: i for i, c in enumerate(columns)}
+            ref = lambda c: f"r[{index[c]}]"
+        else:
+            ref = lambda c: f"r[{c!r}]"
+        items = ",\n        ".join(f"{f.key!r}: {f.expr(ref, cols)}" for f in self.fields)
+        src = f"def build(r):\n    return {{\n        {items},\n    }}\n"
+        ns: Dict[str, Any] = {}
+        exec(compile(src, f"<dto {self.name}>", "exec"), ns)
+        return ns["build"]
+
+    def compile(self, columns: Sequence[str]) -> Builder:
+        key = tuple(columns)
+        fn = self._by_index.get(key)
+        if fn is None:
+            with self._lock:
+                fn = self._by_index.get(key)
+                if fn is None:
+                    fn = self._by_index[key] = self._generate(key, by_index=True)
+        return fn
+
+    def __call__(self, row: Mapping[str, Any]) -> Dict[str, Any]:
+        key = tuple(row)
+        fn = self._by_key.get(key)
+        if fn is None:
+            with self._lock:
+                fn = self._by_key.get(key)
+                if fn is None:
+                    fn = self._by_key[key] = self._generate(key, by_index=False)
+        return fn(row)
+
+    def many(self, columns: Sequence[str], rows: Iterable[Sequence[Any]]) -> List[Dict[str, Any]]:
+        build = self.compile(columns)
+        return [build(r) for r in rows]
+
+
+# ------------------------------------------------------------
+# Usuários
+# ------------------------------------------------------------
+_USER_BASE = [
+    Field("id", "id"),
+    Field("name", "name"),
+    Opt("nickname", "nickname"),
+    Field("email", "email"),
+    Opt("phone", "phone"),
+    Opt("cpf", "cpf"),
+    Opt("cnpj", "cnpj"),
+]
+
+_USER_ADDRESS = [
+    Opt("avatarUrl", "avatar_url"),
+    Opt("bio", "bio"),
+    Opt("cep", "cep"),
+    Opt("logradouro", "logradouro"),
+    Opt("numero", "numero"),
+    Opt("bairro", "bairro"),
+    Opt("complemento", "complemento"),
+    Opt("city", "city"),
+    Opt("state", "state"),
+    Opt("timezone", "timezone"),
+    Bool("isActive", "is_active", True),
+    Iso("createdAt", "created_at"),
+]
+
+# /api/users/* (inter-service)
+USER_PROFILE_DTO = Dto("user_profile", _USER_BASE + _USER_ADDRESS)
+
+# /api/auth/* (usuário logado)
+USER_DTO = Dto("user", _USER_BASE + _USER_ADDRESS + [
+    Iso("lastLoginAt", "last_login_at"),
+    Iso("onboardingCompletedAt", "onboarding_completed_at"),
+    Iso("emailVerifiedAt", "email_verified_at"),
+])
+
+# /api/admin/users (formato do frontend admin, snake_case)
+USER_ADMIN_ITEM_DTO = Dto("user_admin_item", _USER_BASE + [
+    Opt("city", "city"),
+    Opt("state", "state"),
+    Opt("timezone", "timezone"),
+    Opt("avatar_url", "avatar_url"),
+    Bool("is_active", "is_active", True),
+    Bool("is_blocked", "is_blocked", False),
+    Iso("last_login_at", "last_login_at"),
+    Iso("created_at", "created_at"),
+    Const("tenants", []),
+])
+
+# ------------------------------------------------------------
+# Tenants / systems
+# ------------------------------------------------------------
+TENANT_DTO = Dto("tenant", [
+    Field("id", "id"),
+    Field("slug", "slug"),
+    Or("displayName", "display_name", Col("slug")),
+    Opt("logoUrl", "logo_url"),
+    Or("primaryColor", "primary_color", "#ef4444"),
+    Opt("welcomeMessage", "welcome_message"),
+    Bool("allowRegistration", "allow_registration", True),
+    Opt("memberCount", "member_count", 0),
+])
+
+TENANT_SYSTEM_DTO = Dto("tenant_system", [
+    Field("slug", "system_slug"),
+    Opt("displayName", "system_name"),
+    Opt("icon", "system_icon"),
+    Opt("color", "system_color"),
+])
+
+# Listagem pública de tenants de um sistema (/api/systems/<slug>/tenants)
+TENANT_PUBLIC_DTO = Dto("tenant_public", [
+    Int("id", "id"),
+    Field("slug", "slug"),
+    Or("displayName", "display_name", ""),
+    Opt("logoUrl", "logo_url"),
+    Or("primaryColor", "primary_color", "#ef4444"),
+    Opt("welcomeMessage", "welcome_message"),
+    Bool("maintenanceMode", "maintenance_mode", False),
+])
+
+SYSTEM_DTO = Dto("system", [
+    Int("id", "id"),
+    Field("slug", "slug"),
+    Or("displayName", "display_name", ""),
+    Or("description", "description", ""),
+    Or("icon", "icon", "trophy"),
+    Or("color", "color", "#ef4444"),
+    Or("baseUrl", "base_route", "/"),
+    Bool("isActive", "is_active", True),
+])
@@ -0,0 +1,414 @@
+"""
+Jobs em background no MASTER (tabela provisioning_jobs, migration 011).
+
+O request só grava o job (enqueue_job) e responde 202; threads de worker em
+cada processo do gunicorn pegam jobs pendentes e executam o handler do
+`kind`. O claim é um UPDATE condicional (rowcount == 1), então dois workers
+nunca pegam o mesmo job.
+
+Cada etapa do handler roda via ctx.step(nome, fn): a duração e o resultado
+ficam em `steps` assim que a etapa termina. Se o processo morrer no meio, o
+lease (locked_until) expira, outro worker pega o job e as etapas já
+concluídas são puladas (devolvem o resultado gravado). Por isso cada etapa
+precisa ser idempotente por conta própria.
+
+Se o handler levantar exceção, roda o `compensate` do kind (rollback
+compensatório) e o job vira failed.
+
+Jobs enfileirados com `host` (servidor MySQL de tenant em que fazem DDL)
+respeitam um limite global: o claim pula hosts que já têm
+PROVISION_HOST_CONCURRENCY jobs rodando (lease válido), contando todos os
+workers de todos os processos, e pega o próximo job de outro host.
+
+Todo UPDATE do job em execução é cercado por `locked_by` (token do claim):
+se o lease expirou e outro worker retomou o job, o próximo step/heartbeat
+levanta JobLeaseLost e este worker abandona o job sem compensar nem
+finalizar (quem decide agora é o dono do lease).
+"""
+from __future__ import annotations
+
+import datetime
+import json
+import os
+import secrets
+import socket
+import threading
+import time
+import traceback
+from typing import Any, Callable, Dict, List, Optional
+
+from app.db import ADMIN_POOL_OPTIONS, execute_sql, fetch_all, fetch_one, unit_of_work
+
+ENV = os.getenv("ENV", "dev")
+
+# Threads de worker por processo; 0 desliga (jobs ficam pendentes). O limite
+# por host é global (JOBS_HOST_CONCURRENCY), então mais threads só servem
+# para tocar hosts diferentes em paralelo
+JOBS_WORKER_THREADS = int(os.getenv("JOBS_WORKER_THREADS", "8"))
+JOBS_POLL_SECONDS = float(os.getenv("JOBS_POLL_SECONDS", "2"))
+# Sem atualização por este tempo, o job é considerado órfão e é retomado
+JOBS_LEASE_SECONDS = int(os.getenv("JOBS_LEASE_SECONDS", "600"))
+JOBS_MAX_ATTEMPTS = int(os.getenv("JOBS_MAX_ATTEMPTS", "3"))
+# Jobs rodando ao mesmo tempo por host de tenant, somando todos os workers.
+# Default = capacidade do pool de admin de um host (get_target_admin_engine)
+JOBS_HOST_CONCURRENCY = max(
+    1,
+    int(
+        os.getenv(
+            "PROVISION_HOST_CONCURRENCY",
+            str(ADMIN_POOL_OPTIONS["pool_size"] + ADMIN_POOL_OPTIONS["max_overflow"]),
+        )
+    ),
+)
+
+_WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+_CLAIMABLE = "(status = 'pending' OR (status = 'running' AND locked_until < NOW()))"
+# Hosts no limite (jobs com lease válido); lease vencido não conta
+_BUSY_HOSTS = """
+    SELECT r.host FROM provisioning_jobs r
+    WHERE r.host IS NOT NULL AND r.status = 'running' AND r.locked_until >= NOW()
+    GROUP BY r.host HAVING COUNT(*) >= :limit
+"""
+
+
+class JobLeaseLost(RuntimeError):
+    """O lease do job expirou e outro worker o retomou."""
+
+
+def _fenced(sql: str, params: Dict[str, Any]) -> None:
+    """UPDATE com `AND locked_by = :worker`; nenhuma linha = lease perdido."""
+    if execute_sql(sql, params) == 0:
+        raise JobLeaseLost(f"Job #{params['id']}: lease perdido para outro worker")
+
+
+class JobContext:
+    """Estado de um job em execução; `step` grava progresso no MASTER."""
+
+    __slots__ = ("id", "kind", "payload", "steps", "attempt", "tenant_id", "worker")
+
+    def __init__(self, row: Dict[str, Any]) -> None:
+        self.id: int = row["id"]
+        self.kind: str = row["kind"]
+        # Token do claim (locked_by) que cerca os UPDATEs deste worker
+        self.worker: Optional[str] = row.get("locked_by")
+        self.tenant_id: Optional[int] = row.get("tenant_id")
+        self.payload: Dict[str, Any] = _json(row.get("payload")) or {}
+        self.steps: List[Dict[str, Any]] = _json(row.get("steps")) or []
+        self.attempt: int = int(row.get("attempts") or 1)
+
+    @property
+    def resumed(self) -> bool:
+        """True quando outro worker já tinha começado este job."""
+        return self.attempt > 1
+
+    def done(self, name: str) -> Optional[Dict[str, Any]]:
+        for st in self.steps:
+            if st["name"] == name:
+                return st
+        return None
+
+    def heartbeat(self, progress: Optional[Dict[str, Any]] = None) -> None:
+        """Renova o lease em etapas longas; `progress` vai para `result` (parcial)."""
+        _fenced(
+            f"""
+            UPDATE provisioning_jobs
+            SET locked_until = NOW() + INTERVAL {JOBS_LEASE_SECONDS} SECOND,
+                result = COALESCE(:progress, result)
+            WHERE id = :id AND locked_by = :worker
+            """,
+            {"id": self.id, "worker": self.worker, "progress": json.dumps(progress) if progress is not None else None},
+        )
+
+    def step(self, name: str, fn: Callable[[], Any]) -> Any:
+        """Executa a etapa (ou devolve o resultado gravado, se já concluída)."""
+        prev = self.done(name)
+        if prev is not None:
+            return prev.get("result")
+
+        _fenced(
+            f"""
+            UPDATE provisioning_jobs
+            SET current_step = :step, locked_until = NOW() + INTERVAL {JOBS_LEASE_SECONDS} SECOND
+            WHERE id = :id AND locked_by = :worker
+            """,
+            {"id": self.id, "worker": self.worker, "step": name},
+        )
+        t0 = time.perf_counter()
+        result = fn()
+        self.steps.append({
+            "name": name,
+            "ms": round((time.perf_counter() - t0) * 1000, 1),
+            "result": result,
+            "finishedAt": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        })
+        _fenced(
+            f"""
+            UPDATE provisioning_jobs
+            SET steps = :steps, locked_until = NOW() + INTERVAL {JOBS_LEASE_SECONDS} SECOND
+            WHERE id = :id AND locked_by = :worker
+            """,
+            {"id": self.id, "worker": self.worker, "steps": json.dumps(self.steps)},
+        )
+        return result
+
+
+class _Handler:
+    __slots__ = ("run", "compensate")
+
+    def __init__(self, run: Callable[[JobContext], Any], compensate: Optional[Callable[[JobContext], None]]) -> None:
+        self.run = run
+        self.compensate = compensate
+
+
+_handlers: Dict[str, _Handler] = {}
+_wake = threading.Event()
+_stop = threading.Event()
+_threads: List[threading.Thread] = []
+_threads_lock = threading.Lock()
+
+
+def register_job(
+    kind: str,
+    run: Callable[[JobContext], Any],
+    compensate: Optional[Callable[[JobContext], None]] = None,
+) -> None:
+    """Registra o handler de um kind. `run` devolve o `result` do job."""
+    _handlers[kind] = _Handler(run, compensate)
+
+
+def _json(value: Any) -> Any:
+    if value is None or isinstance(value, (dict, list)):
+        return value
+    return json.loads(value)
+
+
+def enqueue_job(
+    kind: str,
+    payload: Dict[str, Any],
+    tenant_id: Optional[int] = None,
+    batch_id: Optional[str] = None,
+    host: Optional[str] = None,
+) -> int:
+    """
+    Grava um job pendente e devolve o id. Dentro de unit_of_work o job só
+    fica visível para os workers no commit (junto com o resto da transação).
+    `host`: servidor de tenant em que o job trabalha (entra no limite por host).
+    """
+    if kind not in _handlers:
+        raise ValueError(f"Job desconhecido: {kind}")
+    with unit_of_work():
+        execute_sql(
+            """
+            INSERT INTO provisioning_jobs (kind, status, tenant_id, batch_id, host, payload)
+            VALUES (:kind, 'pending', :tenant_id, :batch_id, :host, :payload)
+            """,
+            {
+                "kind": kind,
+                "tenant_id": tenant_id,
+                "batch_id": batch_id,
+                "host": host,
+                "payload": json.dumps(payload),
+            },
+        )
+        job_id = fetch_one("SELECT LAST_INSERT_ID() AS id")["id"]
+    _wake.set()
+    return int(job_id)
+
+
+def _iso(value: Any) -> Optional[str]:
+    return value.isoformat() if value else None
+
+
+def job_to_dto(row: Dict[str, Any]) -> Dict[str, Any]:
+    steps = _json(row.get("steps")) or []
+    error = row.get("error")
+    if error and ENV != "dev":
+        error = f"Falha na etapa {row.get('current_step') or '-'}"
+    return {
+        "id": row["id"],
+        "kind": row["kind"],
+        "status": row["status"],
+        "tenantId": row.get("tenant_id"),
+        "batchId": row.get("batch_id"),
+        "currentStep": row.get("current_step"),
+        "attempts": row.get("attempts") or 0,
+        "steps": [{"name": s["name"], "ms": s.get("ms"), "finishedAt": s.get("finishedAt")} for s in steps],
+        "totalMs": round(sum(s.get("ms") or 0 for s in steps), 1),
+        "result": _json(row.get("result")),
+        "error": error,
+        "createdAt": _iso(row.get("created_at")),
+        "startedAt": _iso(row.get("started_at")),
+        "finishedAt": _iso(row.get("finished_at")),
+    }
+
+
+def get_job(job_id: int) -> Optional[Dict[str, Any]]:
+    row = fetch_one("SELECT * FROM provisioning_jobs WHERE id = :id", {"id": job_id}, primary=True)
+    return job_to_dto(row) if row else None
+
+
+def get_batch(batch_id: str) -> Optional[Dict[str, Any]]:
+    """Jobs de um lote, contagem por status e tempo total (criação -> último fim)."""
+    rows = fetch_all(
+        "SELECT * FROM provisioning_jobs WHERE batch_id = :batch_id ORDER BY id",
+        {"batch_id": batch_id},
+        primary=True,
+    )
+    if not rows:
+        return None
+
+    counts: Dict[str, int] = {}
+    for r in rows:
+        counts[r["status"]] = counts.get(r["status"], 0) + 1
+    done = all(r["status"] in ("succeeded", "failed") for r in rows)
+    wall_ms = None
+    if done:
+        started = min(r["created_at"] for r in rows if r.get("created_at"))
+        finished = max(r["finished_at"] for r in rows if r.get("finished_at"))
+        wall_ms = round((finished - started).total_seconds() * 1000, 1)
+    return {
+        "batchId": batch_id,
+        "total": len(rows),
+        "counts": counts,
+        "done": done,
+        "wallMs": wall_ms,
+        "jobs": [job_to_dto(r) for r in rows],
+    }
+
+
+def _claim_next() -> Optional[Dict[str, Any]]:
+    # Jobs de hosts no limite ficam para depois; os de outros hosts passam na frente
+    candidates = fetch_all(
+        f"""
+        SELECT id, host FROM provisioning_jobs
+        WHERE {_CLAIMABLE} AND (host IS NULL OR host NOT IN ({_BUSY_HOSTS}))
+        ORDER BY id LIMIT 5
+        """,
+        {"limit": JOBS_HOST_CONCURRENCY},
+        primary=True,
+    )
+    for c in candidates:
+        # Token por claim: um reclaim no mesmo processo também invalida o anterior
+        worker = f"{_WORKER_ID}:{secrets.token_hex(4)}"
+        # Reconta no próprio UPDATE (a tabela derivada é materializada, o
+        # MySQL aceita): outro worker pode ter pego um job do host no meio
+        claimed = execute_sql(
+            f"""
+            UPDATE provisioning_jobs
+            SET status = 'running', locked_by = :worker,
+                locked_until = NOW() + INTERVAL {JOBS_LEASE_SECONDS} SECOND,
+                attempts = attempts + 1, started_at = COALESCE(started_at, NOW())
+            WHERE id = :id AND {_CLAIMABLE}
+              AND (host IS NULL OR (
+                  SELECT busy.n FROM (
+                      SELECT COUNT(*) AS n FROM provisioning_jobs
+                      WHERE host = :host AND status = 'running' AND locked_until >= NOW()
+                  ) busy
+              ) < :limit)
+            """,
+            {"id": c["id"], "worker": worker, "host": c.get("host"), "limit": JOBS_HOST_CONCURRENCY},
+        )
+        if claimed == 1:
+            return fetch_one("SELECT * FROM provisioning_jobs WHERE id = :id", {"id": c["id"]}, primary=True)
+    return None
+
+
+def _finish(job_id: int, worker: Optional[str], status: str, result: Any = None, error: Optional[str] = None) -> None:
+    _fenced(
+        """
+        UPDATE provisioning_jobs
+        SET status = :status, result = :result, error = :error,
+            locked_by = NULL, locked_until = NULL, finished_at = NOW()
+        WHERE id = :id AND locked_by = :worker
+        """,
+        {
+            "id": job_id,
+            "worker": worker,
+            "status": status,
+            "result": json.dumps(result) if result is not None else None,
+            "error": error,
+        },
+    )
+
+
+def run_job(row: Dict[str, Any]) -> None:
+    """Executa um job já claimado por este worker."""
+    try:
+        ctx = JobContext(row)
+    except Exception as e:
+        # payload/steps ilegíveis: retomar não adianta
+        _finish(row["id"], row.get("locked_by"), "failed", error=f"Job ilegível: {e}"[:4000])
+        return
+    handler = _handlers.get(ctx.kind)
+    if handler is None:
+        _finish(ctx.id, ctx.worker, "failed", error=f"Job desconhecido: {ctx.kind}")
+        return
+
+    try:
+        if ctx.attempt > JOBS_MAX_ATTEMPTS:
+            raise RuntimeError(f"Job abandonado após {JOBS_MAX_ATTEMPTS} tentativas")
+        if ctx.resumed:
+            print(f"--> Job #{ctx.id} ({ctx.kind}) retomado; etapas concluídas: {[s['name'] for s in ctx.steps]}", flush=True)
+        result = handler.run(ctx)
+        _finish(ctx.id, ctx.worker, "succeeded", result=result)
+        print(f"--> Job #{ctx.id} ({ctx.kind}) concluído", flush=True)
+    except JobLeaseLost as e:
+        # Outro worker retomou: compensar aqui desfaria o trabalho dele
+        print(f"⚠️  {e}; abandonado por {ctx.worker}", flush=True)
+    except Exception as e:
+        if ENV == "dev":
+            traceback.print_exc()
+        print(f"!! Job #{ctx.id} ({ctx.kind}) falhou: {e}", flush=True)
+        if handler.compensate is not None:
+            try:
+                handler.compensate(ctx)
+            except Exception as comp_err:
+                print(f"!! Job #{ctx.id}: rollback compensatório falhou: {comp_err}", flush=True)
+        try:
+            _finish(ctx.id, ctx.worker, "failed", error=str(e)[:4000])
+        except JobLeaseLost as lost:
+            print(f"⚠️  {lost}; falha de {ctx.worker} não gravada", flush=True)
+
+
+def _worker_loop() -> None:
+    backoff = JOBS_POLL_SECONDS
+    while not _stop.is_set():
+        try:
+            row = _claim_next()
+            backoff = JOBS_POLL_SECONDS
+        except Exception as e:
+            # Ex.: migration 011 não aplicada / MASTER fora; sem spam no log
+            if backoff == JOBS_POLL_SECONDS:
+                print(f"⚠️  Jobs: falha ao buscar jobs pendentes: {e}", flush=True)
+            row = None
+            backoff = min(backoff * 2, 60.0)
+        if row is not None:
+            try:
+                run_job(row)
+            except Exception as e:
+                # Ex.: MASTER caiu no _finish; o lease expira e outro worker retoma
+                print(f"🚨 Jobs: erro no worker com o job #{row.get('id')}: {e}", flush=True)
+                if ENV == "dev":
+                    traceback.print_exc()
+            continue
+        _wake.wait(backoff)
+        _wake.clear()
+
+
+def start_job_workers() -> int:
+    """Sobe as threads de worker deste processo (idempotente)."""
+    with _threads_lock:
+        alive = [t for t in _threads if t.is_alive()]
+        _threads[:] = alive
+        _stop.clear()
+        for i in range(len(alive), JOBS_WORKER_THREADS):
+            t = threading.Thread(target=_worker_loop, name=f"jobs-{i}", daemon=True)
+            t.start()
+            _threads.append(t)
+        return len(_threads)
+
+
+def stop_job_workers() -> None:
+    _stop.set()
+    _wake.set()
@@ -6,28 +6,32 @@ import traceback
 import datetime
 import jwt
 from functools import wraps
-from typing import Any, Dict, Optional
 
 from dotenv import load_dotenv
 from flask import Flask, jsonify, request, send_from_directory
 from flask_cors import CORS
 from werkzeug.security import generate_password_hash, check_password_hash
-from sqlalchemy import create_engine, text
-from app.security import hash_password
+from app.dto import SYSTEM_DTO, TENANT_PUBLIC_DTO, Bool, Dto, Field, Iso, Opt
+from app.streaming import json_list_response
+from app.catalog import systems_catalog
+from app.tenant_directory import tenant_directory
+from app.migrations import check_migrations_on_boot
+from app.jobs import enqueue_job, get_batch, get_job, start_job_workers
+from app.placement import invalidate as invalidate_placement, placement_snapshot
+from app.relocation import enqueue_relocate_tenant
+from app.warm_pool import start_warm_pool
+from app.tenant_jobs import TenantSpecError, enqueue_create_tenant, enqueue_drop_tenant, enqueue_tenant_batch
+from app.tenant_migrations import TENANT_MIGRATIONS_DIR, load_migrations
 
 from app.db import (
     init_db,
     execute_sql,
     fetch_one,
     fetch_all,
+    fetch_iter,
+    fetch_rows,
     safe_db_error,
-    validate_slug,
-    build_db_name_from_slug,
-    create_physical_database,
-    drop_physical_database,
-    build_tenant_database_url,
-    apply_sql_template,
-    TEMPLATES_DIR,
+    unit_of_work,
     TENANT_DB_HOST,
 )
 
@@ -61,6 +65,27 @@ try:
 except Exception as e:
     print(f"🚨 ERRO AO INICIAR BANCO MASTER: {e}", flush=True)
 
+# Migrations do MASTER: só confere pendência (1 query); aplica se MIGRATE_ON_BOOT=1
+try:
+    pending, migrated = check_migrations_on_boot()
+    if migrated and migrated.get("failed"):
+        print(f"🚨 Migration falhou no boot: {migrated['failed']['migration']}", flush=True)
+    if pending:
+        print(
+            f"⚠️ {pending} migration(s) pendente(s) no MASTER "
+            "(python -m app.migrations ou MIGRATE_ON_BOOT=1)",
+            flush=True,
+        )
+except Exception as e:
+    print(f"🚨 ERRO AO VERIFICAR MIGRATIONS: {e}", flush=True)
+
+# Reservas de tenant pré-provisionadas (WARM_POOL_SIZE > 0)
+if start_warm_pool():
+    print("--> Warm pool de tenants ativo", flush=True)
+
+# Workers dos jobs de provisionamento (provisioning_jobs)
+print(f"--> {start_job_workers()} worker(s) de jobs ativos", flush=True)
+
 
 # ------------------------------------------------------------
 # Decorators
@@ -93,29 +118,18 @@ def token_required(f):
 # ------------------------------------------------------------
 # DTO Helpers
 # ------------------------------------------------------------
-def _system_row_to_dto(row: Dict[str, Any]) -> Dict[str, Any]:
-    return {
-        "id": int(row["id"]),
-        "slug": row["slug"],
-        "displayName": row.get("display_name") or "",
-        "description": row.get("description") or "",
-        "icon": row.get("icon") or "trophy",
-        "color": row.get("color") or "#ef4444",
-        "baseUrl": row.get("base_route") or "/",
-        "isActive": bool(row.get("is_active", True)),
-    }
-
-
-def _tenant_row_to_dto(row: Dict[str, Any]) -> Dict[str, Any]:
-    return {
-        "id": int(row["id"]),
-        "slug": row["slug"],
-        "displayName": row.get("display_name") or "",
-        "logoUrl": row.get("logo_url"),
-        "primaryColor": row.get("primary_color") or "#ef4444",
-        "welcomeMessage": row.get("welcome_message"),
-        "maintenanceMode": bool(row.get("maintenance_mode", False)),
-    }
+# Listagem do super admin (inclui ordem de exibição)
+_SYSTEM_ADMIN_DTO = SYSTEM_DTO.extend("system_admin", [Opt("displayOrder", "display_order", 0)])
+
+_ADMIN_MEMBER_DTO = Dto("admin_tenant_member", [
+    Field("id", "id"),
+    Field("name", "name"),
+    Field("email", "email"),
+    Opt("phone", "phone"),
+    Field("role", "role"),
+    Bool("isActive", "is_active", True),
+    Iso("joinedAt", "joined_at"),
+])
 
 
 # ------------------------------------------------------------
@@ -173,15 +187,7 @@ def list_downloads():
 @app.get("/api/systems")
 def list_systems():
     try:
-        rows = fetch_all(
-            """
-            SELECT id, slug, display_name, description, icon, color, base_route, is_active
-            FROM systems
-            WHERE is_active = 1
-            ORDER BY display_order ASC, id ASC
-            """
-        )
-        return jsonify([_system_row_to_dto(r) for r in rows])
+        return jsonify(systems_catalog.active())
     except Exception as e:
         if ENV == "dev":
             traceback.print_exc()
@@ -191,14 +197,11 @@ def list_systems():
 @app.get("/api/systems/<system_slug>/tenants")
 def list_tenants_by_system(system_slug: str):
     try:
-        sys_row = fetch_one(
-            "SELECT id, display_name FROM systems WHERE slug = :slug AND is_active = 1",
-            {"slug": system_slug},
-        )
-        if not sys_row:
+        sys_row = systems_catalog.by_slug(system_slug)
+        if not sys_row or not sys_row["is_active"]:
             return jsonify({"error": "Sistema não encontrado"}), 404
 
-        tenants = fetch_all(
+        columns, tenants = fetch_rows(
             """
             SELECT id, slug, display_name, logo_url, primary_color, welcome_message, maintenance_mode
             FROM tenants
@@ -211,7 +214,7 @@ def list_tenants_by_system(system_slug: str):
         return jsonify(
             {
                 "systemName": sys_row.get("display_name") or system_slug,
-                "tenants": [_tenant_row_to_dto(t) for t in tenants],
+                "tenants": TENANT_PUBLIC_DTO.many(columns, tenants),
             }
         )
     except Exception as e:
@@ -234,18 +237,7 @@ def select_tenant():
 
         header_system_slug = (request.headers.get("X-System-Slug") or "").strip()
 
-        row = fetch_one(
-            """
-            SELECT 
-              t.id, t.slug, t.display_name, t.database_name, t.database_host,
-              t.primary_color, t.maintenance_mode, t.is_active,
-              s.slug as system_slug, s.display_name as system_name
-            FROM tenants t
-            INNER JOIN systems s ON s.id = t.system_id
-            WHERE t.slug = :tenant_slug
-            """,
-            {"tenant_slug": tenant_slug},
-        )
+        row = tenant_directory.by_slug(tenant_slug)
 
         if not row:
             return jsonify({"error": "Tenant não encontrado"}), 404
@@ -312,226 +304,238 @@ def super_admin_login():
 
 def create_tenant():
     """
-    Cria:
-    1) registro em tenants (MASTER DB do Seletor)
-    2) database físico no MySQL do Varzea (TENANT_DB_HOST)
-    3) aplica template SQL (backend/app/templates_sql/model_<systemSlug>.sql)
-    4) cria usuário admin no DB do tenant
-
-    Importante:
-    - Se qualquer etapa falhar, faz rollback compensatório (remove registro do MASTER e dropa o DB físico se já tiver sido criado).
+    Registra o tenant no MASTER (inativo) e enfileira o job `create_tenant`,
+    que roda em background (app.tenant_jobs):
+    1) database físico no MySQL do Varzea (TENANT_DB_HOST)
+    2) schema: reserva do warm pool, clone do DB golden ou template SQL
+       (backend/app/templates_sql/model_<systemSlug>.sql), nessa ordem
+    3) usuário admin no DB do tenant + membership no HUB
+    4) ativa o tenant
+
+    Responde 202 com jobId; progresso em GET /api/super-admin/provisioning-jobs/<id>.
+    Se alguma etapa falhar, o job faz o rollback compensatório (dropa o DB
+    físico e remove o registro do MASTER).
     """
     data = request.get_json(silent=True) or {}
 
-    inserted_master = False
-    created_db = False
-    slug = None
-    db_name = None
-    target_host = None
+    try:
+        queued = enqueue_create_tenant(data)
+        return (
+            jsonify(
+                {
+                    "message": "Tenant em provisionamento no Varzea DB!",
+                    "status": "pending",
+                    **queued,
+                }
+            ),
+            202,
+        )
+    except TenantSpecError as e:
+        return jsonify({"error": str(e)}), e.status
+    except Exception as e:
+        if ENV == "dev":
+            traceback.print_exc()
+            return jsonify({"error": str(e)}), 500
+        return jsonify({"error": "Erro ao criar tenant"}), 500
+
+
+@app.post("/api/super-admin/tenants/bulk")
+@token_required
+def create_tenants_bulk():
+    """
+    Cria vários tenants de uma vez: body {"tenants": [<spec do create-tenant>, ...]}.
+    Cada spec vira um job create_tenant (mesmo batchId); os workers executam
+    em paralelo, até PROVISION_HOST_CONCURRENCY por host somando todos os
+    workers. Specs inválidas/slug em uso voltam como "rejected" sem barrar o
+    resto.
+    Progresso em GET /api/super-admin/provisioning-batches/<batchId>.
+    """
+    data = request.get_json(silent=True) or {}
+    specs = data.get("tenants")
+    if not isinstance(specs, list) or not specs:
+        return jsonify({"error": "Envie a lista 'tenants'"}), 400
 
     try:
-        if not data.get("slug") or not data.get("systemSlug"):
-            return jsonify({"error": "Slug e systemSlug são obrigatórios"}), 400
+        batch = enqueue_tenant_batch(specs)
+        queued = sum(1 for item in batch["items"] if item["status"] == "pending")
+        return (
+            jsonify(
+                {
+                    "message": f"{queued} de {len(specs)} tenant(s) em provisionamento",
+                    **batch,
+                }
+            ),
+            202,
+        )
+    except TenantSpecError as e:
+        return jsonify({"error": str(e)}), e.status
+    except Exception as e:
+        if ENV == "dev":
+            traceback.print_exc()
+        return jsonify({"error": safe_db_error(e)}), 500
 
-        slug = validate_slug(data["slug"])
-        system_slug = (data["systemSlug"] or "").strip().lower()
 
-        # Valida system
-        system = fetch_one("SELECT id FROM systems WHERE slug = :slug", {"slug": system_slug})
-        if not system:
-            return jsonify({"error": "Sistema inválido"}), 400
+@app.get("/api/super-admin/provisioning-batches/<batch_id>")
+@token_required
+def get_provisioning_batch(batch_id: str):
+    """Resultado e tempo de cada tenant de um lote, mais o tempo total do lote."""
+    try:
+        batch = get_batch(batch_id)
+        if not batch:
+            return jsonify({"error": "Lote não encontrado"}), 404
+        return jsonify(batch)
+    except Exception as e:
+        if ENV == "dev":
+            traceback.print_exc()
+        return jsonify({"error": safe_db_error(e)}), 500
 
-        # Evita duplicidade de slug
-        exists = fetch_one("SELECT id FROM tenants WHERE slug = :slug", {"slug": slug})
-        if exists:
-            return jsonify({"error": "Este slug já está em uso."}), 409
 
-        # Nome físico do novo DB
-        db_name = build_db_name_from_slug(slug)
+@app.get("/api/super-admin/provisioning-jobs/<int:job_id>")
+@token_required
+def get_provisioning_job(job_id: int):
+    """Status, etapas concluídas (com duração) e resultado de um job."""
+    try:
+        job = get_job(job_id)
+        if not job:
+            return jsonify({"error": "Job não encontrado"}), 404
+        return jsonify(job)
+    except Exception as e:
+        if ENV == "dev":
+            traceback.print_exc()
+        return jsonify({"error": safe_db_error(e)}), 500
 
-        # Host destino onde o DB vai nascer (MySQL do Varzea)
-        target_host = os.getenv("TENANT_DB_HOST", TENANT_DB_HOST)
 
-        # 1) insere no MASTER do seletor
-        execute_sql(
+@app.get("/api/super-admin/tenant-migrations")
+@token_required
+def list_tenant_migrations():
+    """Migrations de tenant disponíveis por sistema (nome + checksum)."""
+    try:
+        systems = sorted(p.name for p in TENANT_MIGRATIONS_DIR.iterdir() if p.is_dir()) if TENANT_MIGRATIONS_DIR.is_dir() else []
+        return jsonify({
+            s: [{"name": m.name, "checksum": m.checksum, "statements": len(m.statements)} for m in load_migrations(s)]
+            for s in systems
+        })
+    except Exception as e:
+        if ENV == "dev":
+            traceback.print_exc()
+        return jsonify({"error": str(e) if ENV == "dev" else "Erro ao listar migrations"}), 500
+
+
+@app.post("/api/super-admin/tenant-migrations")
+@token_required
+def run_tenant_migrations():
+    """
+    Aplica migrations pendentes na frota (job em background).
+    Body opcional: {"system": "jogador", "tenants": [slug, ...], "concurrency": 4, "dryRun": false}.
+    Progresso/resultado (throughput, falhas) em GET /api/super-admin/provisioning-jobs/<jobId>.
+    409 (com o jobId) se já houver uma migração da frota pendente ou rodando.
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        running = fetch_one(
             """
-            INSERT INTO tenants (
-                system_id, slug, display_name, database_name, database_host,
-                primary_color, is_active, allow_registration
-            ) VALUES (
-                :system_id, :slug, :display_name, :db_name, :db_host,
-                :color, 1, 1
-            )
+            SELECT id FROM provisioning_jobs
+            WHERE kind = 'tenant_migrations' AND status IN ('pending', 'running')
+            ORDER BY id LIMIT 1
             """,
-            {
-                "system_id": system["id"],
-                "slug": slug,
-                "display_name": data.get("displayName", slug),
-                "db_name": db_name,
-                "db_host": target_host,
-                "color": data.get("primaryColor", "#ef4444"),
-            },
-        )
-        inserted_master = True
-
-        # 2) cria DB físico no Varzea MySQL
-        print(f"--> Criando DB `{db_name}` em {target_host}...", flush=True)
-        create_physical_database(target_host, db_name)
-        created_db = True
-
-        # 3) conecta no DB do tenant e aplica template
-        tenant_url = build_tenant_database_url(target_host, db_name)
-        tenant_engine = create_engine(tenant_url, pool_pre_ping=True, future=True)
-
-        template_path = TEMPLATES_DIR / f"model_{system_slug}.sql"
-
-        with tenant_engine.begin() as conn:
-            if template_path.exists():
-                print(f"--> Aplicando template: {template_path}", flush=True)
-                apply_sql_template(conn, template_path)
-            else:
-                # fallback mínimo
-                print("--> Template não encontrado. Criando tabela genérica users.", flush=True)
-                conn.execute(
-                    text(
-                        """
-                        CREATE TABLE IF NOT EXISTS users (
-                            id INT AUTO_INCREMENT PRIMARY KEY,
-                            name VARCHAR(100),
-                            email VARCHAR(100) UNIQUE,
-                            password_hash VARCHAR(255),
-                            role VARCHAR(20) DEFAULT 'admin',
-                            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                        )
-                        """
-                    )
-                )
-
-            # 4) cria admin no DB do tenant
-            admin_email = data.get("adminEmail", f"admin@{slug}.com")
-            admin_pass = data.get("adminPassword", "123")
-            admin_name = data.get("adminName", "Super Admin")
-            admin_nickname = data.get("adminNickname", "Super Admin")
-
-            pass_hash = hash_password(admin_pass)
-
-            if system_slug == "jogador":
-                # User direto (sem Player separado - pos-merge v2)
-                conn.exec_driver_sql(
-                    """
-                    INSERT INTO users (
-                        email, password_hash,
-                        is_admin, is_approved, is_blocked, is_monthly,
-                        name, nickname, phone, photo,
-                        skill_rating
-                    )
-                    VALUES (
-                        %s, %s,
-                        1, 1, 0, 0,
-                        %s, %s, NULL, NULL,
-                        0.0
-                    )
-                    """,
-                    (admin_email, pass_hash, admin_name, admin_nickname),
-                )
-            else:
-                # generico (outros sistemas: quadra, arbitro, etc)
-                conn.exec_driver_sql(
-                    """
-                    INSERT INTO users (name, email, password_hash, role)
-                    VALUES (%s, %s, %s, 'admin')
-                    """,
-                    (admin_name, admin_email, pass_hash),
-                )
-        # 5) Cria/encontra user no HUB e vincula membership com role='admin'
-        hub_user = fetch_one(
-            "SELECT id FROM users WHERE email = :email",
-            {"email": admin_email},
+            primary=True,
         )
+        if running:
+            return jsonify({"error": "Migração dos tenants já em andamento", "jobId": running["id"]}), 409
+        payload = {
+            "system": (data.get("system") or "").strip().lower() or None,
+            "tenants": data.get("tenants") or None,
+            "concurrency": data.get("concurrency"),
+            "dryRun": bool(data.get("dryRun")),
+        }
+        job_id = enqueue_job("tenant_migrations", payload)
+        return jsonify({"message": "Migração dos tenants iniciada", "jobId": job_id, "status": "pending"}), 202
+    except Exception as e:
+        if ENV == "dev":
+            traceback.print_exc()
+        return jsonify({"error": safe_db_error(e)}), 500
 
-        if hub_user:
-            hub_user_id = hub_user["id"]
-        else:
-            execute_sql(
-                """
-                INSERT INTO users (name, nickname, email, password_hash, is_active)
-                VALUES (:name, :nickname, :email, :pass_hash, TRUE)
-                """,
-                {
-                    "name": admin_name,
-                    "nickname": admin_nickname,
-                    "email": admin_email,
-                    "pass_hash": pass_hash,
-                },
-            )
-            hub_user = fetch_one(
-                "SELECT id FROM users WHERE email = :email",
-                {"email": admin_email},
-            )
-            hub_user_id = hub_user["id"]
 
-        # Busca o tenant_id recém-criado no master
-        tenant_row = fetch_one(
-            "SELECT id FROM tenants WHERE slug = :slug",
-            {"slug": slug},
-        )
-        tenant_id = tenant_row["id"]
+@app.get("/api/super-admin/tenant-hosts")
+@token_required
+def list_tenant_hosts():
+    """Hosts de tenant com a carga usada no placement (?refresh=1 ignora o cache)."""
+    try:
+        return jsonify(placement_snapshot(refresh=request.args.get("refresh") == "1"))
+    except Exception as e:
+        if ENV == "dev":
+            traceback.print_exc()
+        return jsonify({"error": safe_db_error(e)}), 500
+
+
+@app.post("/api/super-admin/tenant-hosts")
+@token_required
+def create_tenant_host():
+    """Registra um host MySQL para novos tenants: {host, weight?, maxTenants?}."""
+    try:
+        data = request.get_json(silent=True) or {}
+        host = (data.get("host") or "").strip()
+        if not host:
+            return jsonify({"error": "Campo 'host' obrigatorio"}), 400
+
+        existing = fetch_one("SELECT id FROM tenant_hosts WHERE host = :host", {"host": host}, primary=True)
+        if existing:
+            return jsonify({"error": f"Host '{host}' ja registrado"}), 409
 
-        # Cria membership: admin deste tenant
         execute_sql(
             """
-            INSERT INTO user_tenants (user_id, tenant_id, role, is_active)
-            VALUES (:user_id, :tenant_id, 'admin', TRUE)
-            ON DUPLICATE KEY UPDATE role = 'admin', is_active = TRUE
+            INSERT INTO tenant_hosts (host, weight, max_tenants, is_active)
+            VALUES (:host, :weight, :max_tenants, :is_active)
             """,
-            {"user_id": hub_user_id, "tenant_id": tenant_id},
+            {
+                "host": host,
+                "weight": data.get("weight", 1),
+                "max_tenants": data.get("maxTenants"),
+                "is_active": data.get("isActive", True),
+            },
         )
+        invalidate_placement()
+        return jsonify({"message": f"Host '{host}' registrado"})
 
-        # 6) Atualiza fk_id_user_hub no user local do tenant
-        try:
-            with tenant_engine.begin() as conn2:
-                conn2.exec_driver_sql(
-                    "UPDATE users SET fk_id_user_hub = %s WHERE email = %s",
-                    (hub_user_id, admin_email),
-                )
-        except Exception as hub_link_err:
-            print(f"⚠️  fk_id_user_hub não atualizado (coluna pode não existir): {hub_link_err}", flush=True)
+    except Exception as e:
+        if ENV == "dev":
+            traceback.print_exc()
+        return jsonify({"error": safe_db_error(e)}), 500
 
-        return (
-            jsonify(
-                {
-                    "message": "Tenant criado com sucesso no Varzea DB!",
-                    "tenant": {"slug": slug, "database": db_name, "admin": admin_email, "host": target_host},
-                }
-            ),
-            201,
+
+@app.patch("/api/super-admin/tenant-hosts/<int:host_id>")
+@token_required
+def update_tenant_host(host_id: int):
+    """Edita weight, maxTenants e isActive (inativo = não recebe tenants novos)."""
+    try:
+        row = fetch_one("SELECT id FROM tenant_hosts WHERE id = :id", {"id": host_id}, primary=True)
+        if not row:
+            return jsonify({"error": "Host nao encontrado"}), 404
+
+        data = request.get_json(silent=True) or {}
+        field_map = {"weight": "weight", "maxTenants": "max_tenants", "isActive": "is_active"}
+
+        sets = []
+        params: dict = {"id": host_id}
+        for camel, db_field in field_map.items():
+            if camel in data:
+                sets.append(f"{db_field} = :{db_field}")
+                params[db_field] = data[camel]
+
+        if not sets:
+            return jsonify({"error": "Nenhum campo para atualizar"}), 400
+
+        execute_sql(
+            f"UPDATE tenant_hosts SET {', '.join(sets)} WHERE id = :id",
+            params,
         )
+        invalidate_placement()
+        return jsonify({"message": "Host atualizado"})
 
     except Exception as e:
-        # rollback compensatório (sem depender de transação entre bancos)
         if ENV == "dev":
             traceback.print_exc()
-
-        # 1) drop DB físico se já foi criado
-        if created_db and target_host and db_name:
-            try:
-                print(f"!! ROLLBACK: drop database `{db_name}` em {target_host}", flush=True)
-                drop_physical_database(target_host, db_name)
-            except Exception as drop_err:
-                print(f"!! ROLLBACK falhou ao dropar DB `{db_name}`: {drop_err}", flush=True)
-
-        # 2) remove registro do MASTER se já inseriu
-        if inserted_master and slug:
-            try:
-                print(f"!! ROLLBACK: removendo tenant `{slug}` do MASTER", flush=True)
-                execute_sql("DELETE FROM tenants WHERE slug = :slug", {"slug": slug})
-            except Exception as del_err:
-                print(f"!! ROLLBACK falhou ao deletar tenant `{slug}` do MASTER: {del_err}", flush=True)
-
-        # resposta
-        if ENV == "dev":
-            return jsonify({"error": str(e)}), 500
-        return jsonify({"error": "Erro ao criar tenant"}), 500
+        return jsonify({"error": safe_db_error(e)}), 500
 
 
 @app.get("/api/super-admin/tenants")
@@ -544,6 +548,7 @@ def list_all_tenants_admin():
                s.display_name as system_name
         FROM tenants t
         JOIN systems s ON t.system_id = s.id
+        WHERE t.deleted_at IS NULL
         ORDER BY t.id DESC
         """
         rows = fetch_all(sql)
@@ -575,29 +580,25 @@ def list_all_tenants_admin():
 @token_required
 def delete_tenant(tenant_id: int):
     """
-    Remove:
-    1) DB físico no MySQL do Varzea (host do tenant)
-    2) registro do tenant no MASTER DB do Seletor
+    Exclusão assíncrona: o tenant sai do ar na hora (is_active = 0,
+    deleted_at) e o job drop_tenant dropa o DB físico no host do tenant e
+    depois remove o registro do MASTER. Status em
+    GET /api/super-admin/provisioning-jobs/<jobId>.
     """
     try:
-        tenant = fetch_one(
-            "SELECT id, database_name, database_host, display_name FROM tenants WHERE id = :id",
-            {"id": tenant_id},
-        )
-        if not tenant:
+        queued = enqueue_drop_tenant(tenant_id)
+        if not queued:
             return jsonify({"error": "Tenant não encontrado"}), 404
 
-        db_name = tenant["database_name"]
-        db_host = tenant.get("database_host") or TENANT_DB_HOST
-
-        # 1) drop no host CERTO (MySQL do Varzea)
-        print(f"--> Drop database `{db_name}` em {db_host}...", flush=True)
-        drop_physical_database(db_host, db_name)
-
-        # 2) remove registro
-        execute_sql("DELETE FROM tenants WHERE id = :id", {"id": tenant_id})
-
-        return jsonify({"message": f"Sistema '{tenant.get('display_name')}' e banco foram excluídos."})
+        tenant = queued["tenant"]
+        print(f"--> Exclusão de `{tenant['database_name']}` enfileirada (job #{queued['jobId']})", flush=True)
+        return jsonify({
+            "message": f"Sistema '{tenant.get('display_name')}' desativado; banco em exclusão.",
+            "status": "pending",
+            "jobId": queued["jobId"],
+        }), 202
+    except TenantSpecError as e:
+        return jsonify({"error": str(e)}), e.status
     except Exception as e:
         if ENV == "dev":
             traceback.print_exc()
@@ -605,12 +606,35 @@ def delete_tenant(tenant_id: int):
         return jsonify({"error": "Erro ao deletar tenant"}), 500
 
 
+@app.post("/api/super-admin/tenants/<int:tenant_id>/relocate")
+@token_required
+def relocate_tenant(tenant_id: int):
+    """
+    Move o DB do tenant para outro host com o tenant no ar (job em background).
+    Body opcional: {"targetHost": "..."}; sem ele, vai para o host de menor carga.
+    Progresso (linhas/s, fase) em GET /api/super-admin/provisioning-jobs/<jobId>.
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        queued = enqueue_relocate_tenant(tenant_id, data.get("targetHost"))
+        if not queued:
+            return jsonify({"error": "Tenant não encontrado"}), 404
+        return jsonify({"message": "Relocação iniciada", "status": "pending", **queued}), 202
+    except TenantSpecError as e:
+        return jsonify({"error": str(e)}), e.status
+    except Exception as e:
+        if ENV == "dev":
+            traceback.print_exc()
+        return jsonify({"error": safe_db_error(e)}), 500
+
+
 @app.patch("/api/super-admin/tenants/<int:tenant_id>")
 @token_required
 def update_tenant(tenant_id: int):
     """Edita campos do tenant: display_name, primary_color, allow_registration, is_active."""
     try:
-        tenant = fetch_one("SELECT id FROM tenants WHERE id = :id", {"id": tenant_id})
+        # Tenant em exclusão não volta a ficar ativo
+        tenant = fetch_one("SELECT id FROM tenants WHERE id = :id AND deleted_at IS NULL", {"id": tenant_id})
         if not tenant:
             return jsonify({"error": "Tenant não encontrado"}), 404
 
@@ -633,6 +657,7 @@ def update_tenant(tenant_id: int):
             f"UPDATE tenants SET {', '.join(sets)} WHERE id = :id",
             params,
         )
+        tenant_directory.invalidate(tenant_id)
         return jsonify({"message": "Tenant atualizado"})
 
     except Exception as e:
@@ -722,7 +747,7 @@ def list_tenant_members(tenant_id: int):
         if not tenant:
             return jsonify({"error": "Tenant não encontrado"}), 404
 
-        members = fetch_all(
+        members = fetch_iter(
             """
             SELECT u.id, u.name, u.email, u.phone, ut.role, ut.is_active,
                    ut.joined_at
@@ -732,20 +757,10 @@ def list_tenant_members(tenant_id: int):
             ORDER BY FIELD(ut.role, 'admin', 'manager', 'staff', 'player'), u.name
             """,
             {"tenant_id": tenant_id},
+            dto=_ADMIN_MEMBER_DTO,
         )
 
-        return jsonify([
-            {
-                "id": m["id"],
-                "name": m["name"],
-                "email": m["email"],
-                "phone": m.get("phone"),
-                "role": m["role"],
-                "isActive": bool(m.get("is_active", True)),
-                "joinedAt": m["joined_at"].isoformat() if m.get("joined_at") else None,
-            }
-            for m in members
-        ])
+        return json_list_response(members)
 
     except Exception as e:
         if ENV == "dev":
@@ -761,20 +776,14 @@ def list_tenant_members(tenant_id: int):
 def list_all_systems():
     """Lista todos os sistemas (ativos e inativos) para o super admin."""
     try:
-        rows = fetch_all(
+        columns, rows = fetch_rows(
             """
             SELECT id, slug, display_name, description, icon, color, base_route, is_active, display_order
             FROM systems
             ORDER BY display_order ASC, id ASC
             """
         )
-        return jsonify([
-            {
-                **_system_row_to_dto(r),
-                "displayOrder": r.get("display_order", 0),
-            }
-            for r in rows
-        ])
+        return jsonify(_SYSTEM_ADMIN_DTO.many(columns, rows))
     except Exception as e:
         if ENV == "dev":
             traceback.print_exc()
@@ -812,6 +821,7 @@ def create_system():
                 "display_order": data.get("displayOrder", 0),
             },
         )
+        systems_catalog.invalidate()
         return jsonify({"message": f"Sistema '{data['displayName']}' criado"})
 
     except Exception as e:
@@ -854,6 +864,7 @@ def update_system(system_id: int):
             f"UPDATE systems SET {', '.join(sets)} WHERE id = :id",
             params,
         )
+        systems_catalog.invalidate()
         return jsonify({"message": "Sistema atualizado"})
 
     except Exception as e:
@@ -879,6 +890,7 @@ def delete_system(system_id: int):
             return jsonify({"error": f"Sistema tem {tenant_count['cnt']} tenant(s) ativo(s). Desative-os primeiro."}), 409
 
         execute_sql("UPDATE systems SET is_active = 0 WHERE id = :id", {"id": system_id})
+        systems_catalog.invalidate()
         return jsonify({"message": f"Sistema '{sys_row['display_name']}' desativado"})
 
     except Exception as e:
@@ -947,24 +959,26 @@ def approve_request_admin(tenant_id: int, request_id: int):
         if not req:
             return jsonify({"error": "Solicitação não encontrada ou já processada"}), 404
 
-        execute_sql(
-            """
-            UPDATE user_tenant_requests
-            SET status = 'approved', responded_at = NOW()
-            WHERE id = :id
-            """,
-            {"id": request_id},
-        )
+        # Aprovar + criar membership na mesma transação
+        with unit_of_work():
+            execute_sql(
+                """
+                UPDATE user_tenant_requests
+                SET status = 'approved', responded_at = NOW()
+                WHERE id = :id
+                """,
+                {"id": request_id},
+            )
 
-        execute_sql(
-            """
-            INSERT INTO user_tenants (user_id, tenant_id, role, approved_at)
-            VALUES (:user_id, :tenant_id, 'player', NOW())
-            ON DUPLICATE KEY UPDATE
-                is_active = TRUE, left_at = NULL, approved_at = NOW()
-            """,
-            {"user_id": req["user_id"], "tenant_id": tenant_id},
-        )
+            execute_sql(
+                """
+                INSERT INTO user_tenants (user_id, tenant_id, role, approved_at)
+                VALUES (:user_id, :tenant_id, 'player', NOW())
+                ON DUPLICATE KEY UPDATE
+                    is_active = TRUE, left_at = NULL, approved_at = NOW()
+                """,
+                {"user_id": req["user_id"], "tenant_id": tenant_id},
+            )
 
         return jsonify({"message": f"{req['user_name']} foi aprovado!"})
 
@@ -1013,8 +1027,10 @@ from app.routes.auth_routes import auth_bp
 from app.routes.membership_routes import membership_bp
 from app.routes.user_routes import user_bp
 from app.routes.admin_user_routes import admin_user_bp
+from app.routes.internal_routes import internal_bp
 
 app.register_blueprint(auth_bp)
 app.register_blueprint(membership_bp)
 app.register_blueprint(user_bp)
 app.register_blueprint(admin_user_bp)
+app.register_blueprint(internal_bp)
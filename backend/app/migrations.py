@@ -0,0 +1,316 @@
+"""
+Runner das migrations do MASTER (migrations/*.sql na raiz do repo).
+
+Ledger em `schema_migrations` (a mesma tabela do migrate.sh), com checksum
+sha256 de cada arquivo. Seeds e dumps (SKIP_PATTERN) ficam de fora, como no
+migrate.sh. Cada arquivo é splitado pelo tokenizer dos templates
+(_split_sql_statements) e vai em um lote multi-statement: um round trip por
+migration.
+
+    cd backend && python -m app.migrations [--dry-run] [--baseline]
+
+DDL no MySQL faz commit implícito, então um arquivo que quebra no meio fica
+aplicado em parte. Os statements que já rodaram ficam em
+`schema_migrations_progress` (fora do ledger, que o migrate.sh lê como
+"aplicada") e a próxima execução retoma do seguinte. Se o arquivo mudar
+nesse meio-tempo, o runner se recusa a retomar.
+
+No boot do worker, check_migrations_on_boot() só confere se há pendência
+com uma query no PK do ledger (WHERE migration IN (...)). Com
+MIGRATE_ON_BOOT=1, aplica as pendentes sob GET_LOCK: o primeiro worker
+migra, os outros esperam e encontram nada pendente.
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import os
+import re
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from pymysql.constants import CLIENT
+from sqlalchemy import bindparam, create_engine, text
+from sqlalchemy.engine import Connection, make_url
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.pool import NullPool
+
+from app.db import (
+    APP_DIR,
+    MASTER_DATABASE_URL,
+    BatchStatementError,
+    _split_sql_statements,
+    checkout,
+    execute_multi,
+    get_master_engine,
+)
+
+# Em container: monte ./migrations em /migrations (APP_DIR = /app/app)
+MIGRATIONS_DIR = Path(os.getenv("MIGRATIONS_DIR", str(APP_DIR.parent.parent / "migrations")))
+MIGRATE_ON_BOOT = os.getenv("MIGRATE_ON_BOOT", "0") == "1"
+MIGRATE_LOCK_TIMEOUT = int(os.getenv("MIGRATE_LOCK_TIMEOUT", "300"))
+
+# Arquivos que NÃO são migrations de schema (seeds, dumps, etc.)
+SKIP_PATTERN = re.compile(r"seed|dump", re.I)
+
+_LEDGER_DDL = """
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        migration VARCHAR(255) PRIMARY KEY,
+        applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+# Migration aplicada em parte: quantos statements do arquivo já rodaram
+_PROGRESS_DDL = """
+    CREATE TABLE IF NOT EXISTS schema_migrations_progress (
+        migration VARCHAR(255) PRIMARY KEY,
+        checksum CHAR(64) NOT NULL,
+        statements_done INT NOT NULL,
+        error TEXT NULL,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+    )
+"""
+
+# ER_NO_SUCH_TABLE
+_MYSQL_NO_SUCH_TABLE = 1146
+
+
+class Migration:
+    __slots__ = ("name", "path", "checksum")
+
+    def __init__(self, name: str, path: Path, checksum: str) -> None:
+        self.name = name
+        self.path = path
+        self.checksum = checksum
+
+    def statements(self) -> List[str]:
+        return _split_sql_statements(self.path.read_text(encoding="utf-8"))
+
+
+def local_migrations(folder: Path = MIGRATIONS_DIR) -> List[Migration]:
+    """Migrations de schema em ordem numérica (nome do arquivo)."""
+    out = []
+    for path in sorted(folder.glob("*.sql")):
+        if SKIP_PATTERN.search(path.name):
+            continue
+        out.append(Migration(path.name, path, hashlib.sha256(path.read_bytes()).hexdigest()))
+    return out
+
+
+def _ensure_ledger(conn: Connection) -> None:
+    conn.execute(text(_LEDGER_DDL))
+    conn.execute(text(_PROGRESS_DDL))
+    # Ledger criado pelo migrate.sh não tem checksum
+    has_checksum = conn.execute(
+        text(
+            """
+            SELECT COUNT(*) FROM information_schema.COLUMNS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'schema_migrations' AND COLUMN_NAME = 'checksum'
+            """
+        )
+    ).scalar()
+    if not has_checksum:
+        conn.execute(text("ALTER TABLE schema_migrations ADD COLUMN checksum CHAR(64) NULL"))
+
+
+def pending_count(migrations: Sequence[Migration]) -> int:
+    """
+    Quantas migrations locais ainda não estão no ledger: uma query só, no PK.
+    Ledger inexistente = tudo pendente.
+    """
+    if not migrations:
+        return 0
+    stmt = text(
+        "SELECT COUNT(*) FROM schema_migrations WHERE migration IN :names"
+    ).bindparams(bindparam("names", expanding=True))
+    with checkout(get_master_engine()) as conn:
+        try:
+            applied = conn.execute(stmt, {"names": [m.name for m in migrations]}).scalar()
+        except DBAPIError as e:
+            # Só "ledger não existe" conta como tudo pendente; auth/rede sobem
+            if getattr(e.orig, "args", (None,))[0] != _MYSQL_NO_SUCH_TABLE:
+                raise
+            return len(migrations)
+    return len(migrations) - int(applied or 0)
+
+
+def _migration_engine():
+    """Engine descartável com MULTI_STATEMENTS para aplicar arquivos em lote."""
+    url = make_url(MASTER_DATABASE_URL)
+    if url.get_backend_name() == "mysql":
+        url = url.update_query_dict({"client_flag": str(CLIENT.MULTI_STATEMENTS)})
+    return create_engine(url, future=True, poolclass=NullPool, isolation_level="AUTOCOMMIT")
+
+
+def migrate(dry_run: bool = False, baseline: bool = False, verbose: bool = True) -> Dict[str, Any]:
+    """
+    Aplica as pendentes em ordem. Para na primeira que falhar (as seguintes
+    podem depender dela). baseline=True só registra no ledger, sem executar
+    (banco já migrado à mão). Avisa se um arquivo aplicado mudou de checksum.
+    """
+    migrations = local_migrations()
+    log = print if verbose else (lambda *a, **k: None)
+    result: Dict[str, Any] = {"applied": [], "skipped": 0, "changed": [], "failed": None, "dryRun": dry_run}
+
+    eng = _migration_engine()
+    try:
+        with eng.connect() as conn:
+            _ensure_ledger(conn)
+            ledger: Dict[str, Optional[str]] = {
+                r[0]: r[1] for r in conn.execute(text("SELECT migration, checksum FROM schema_migrations"))
+            }
+            progress: Dict[str, Tuple[str, int]] = {
+                r[0]: (r[1], int(r[2]))
+                for r in conn.execute(
+                    text("SELECT migration, checksum, statements_done FROM schema_migrations_progress")
+                )
+            }
+            for m in migrations:
+                if m.name in ledger:
+                    result["skipped"] += 1
+                    if ledger[m.name] is None:
+                        # Aplicada pelo migrate.sh: grava o checksum atual
+                        conn.execute(
+                            text("UPDATE schema_migrations SET checksum = :c WHERE migration = :m"),
+                            {"c": m.checksum, "m": m.name},
+                        )
+                    elif ledger[m.name] != m.checksum:
+                        result["changed"].append(m.name)
+                        log(f"  ⚠️  {m.name} mudou depois de aplicada (checksum diferente)", flush=True)
+                    continue
+
+                if dry_run:
+                    partial = f" (parcial: {progress[m.name][1]} stmt)" if m.name in progress else ""
+                    log(f"  [pendente] {m.name}{partial}", flush=True)
+                    result["applied"].append(m.name)
+                    continue
+
+                t0 = time.perf_counter()
+                if not baseline:
+                    stmts = m.statements()
+                    done = 0
+                    if m.name in progress:
+                        checksum, done = progress[m.name]
+                        if checksum != m.checksum:
+                            raise _MigrationError(
+                                m.name,
+                                f"aplicada em parte ({done} statement(s)) e o arquivo mudou depois; "
+                                "confira o banco e ajuste schema_migrations_progress à mão",
+                            )
+                        log(f"  [RETOMANDO] {m.name} a partir do stmt#{done + 1}", flush=True)
+                    try:
+                        if stmts[done:]:
+                            _run_file(conn, stmts[done:], m.name, offset=done)
+                    except _MigrationError as e:
+                        _save_progress(conn, m, e.done, str(e))
+                        raise
+                conn.execute(
+                    text("INSERT INTO schema_migrations (migration, checksum) VALUES (:m, :c)"),
+                    {"m": m.name, "c": m.checksum},
+                )
+                conn.execute(text("DELETE FROM schema_migrations_progress WHERE migration = :m"), {"m": m.name})
+                ms = (time.perf_counter() - t0) * 1000
+                result["applied"].append(m.name)
+                log(f"  [{'BASELINE' if baseline else 'OK'}] {m.name} ({ms:.0f} ms)", flush=True)
+    except _MigrationError as e:
+        result["failed"] = {"migration": e.name, "error": str(e)}
+        log(f"  [ERRO] {e.name}: {e}", flush=True)
+    finally:
+        eng.dispose()
+    return result
+
+
+class _MigrationError(RuntimeError):
+    def __init__(self, name: str, message: str, done: int = 0) -> None:
+        super().__init__(message)
+        self.name = name
+        # Statements do arquivo que já rodaram antes da falha
+        self.done = done
+
+
+def _save_progress(conn: Connection, m: Migration, done: int, error: str) -> None:
+    conn.execute(
+        text(
+            """
+            INSERT INTO schema_migrations_progress (migration, checksum, statements_done, error)
+            VALUES (:m, :c, :d, :e)
+            ON DUPLICATE KEY UPDATE checksum = VALUES(checksum), statements_done = VALUES(statements_done),
+                                    error = VALUES(error)
+            """
+        ),
+        {"m": m.name, "c": m.checksum, "d": done, "e": error[:2000]},
+    )
+
+
+def _run_file(conn: Connection, stmts: List[str], name: str, offset: int = 0) -> None:
+    """Roda stmts (a partir do statement `offset` do arquivo); _MigrationError diz quantos já rodaram."""
+    dbapi_conn = conn.connection.dbapi_connection
+    if getattr(dbapi_conn, "client_flag", 0) & CLIENT.MULTI_STATEMENTS:
+        cursor = dbapi_conn.cursor()
+        try:
+            execute_multi(cursor, stmts)
+        except BatchStatementError as e:
+            n = offset + e.index
+            raise _MigrationError(name, f"stmt#{n + 1}: {e.__cause__}\n{e.stmt[:600]}", done=n) from e
+        finally:
+            cursor.close()
+        return
+    for i, stmt in enumerate(stmts, start=offset):
+        try:
+            conn.exec_driver_sql(stmt)
+        except Exception as e:
+            raise _MigrationError(name, f"stmt#{i + 1}: {e}\n{stmt[:600]}", done=i) from e
+
+
+def check_migrations_on_boot() -> Tuple[int, Optional[Dict[str, Any]]]:
+    """
+    Checagem barata no boot: (pendentes, resultado do migrate ou None).
+    Só migra com MIGRATE_ON_BOOT=1, serializado entre workers por GET_LOCK.
+    """
+    migrations = local_migrations()
+    pending = pending_count(migrations)
+    if not pending or not MIGRATE_ON_BOOT:
+        return pending, None
+
+    with checkout(get_master_engine()) as lock_conn:
+        got = lock_conn.execute(
+            text("SELECT GET_LOCK('seletor:migrations', :t)"), {"t": MIGRATE_LOCK_TIMEOUT}
+        ).scalar()
+        if got != 1:
+            raise RuntimeError("Timeout esperando outro worker aplicar as migrations")
+        try:
+            # Outro worker pode ter migrado enquanto esperávamos o lock
+            if not pending_count(migrations):
+                return 0, None
+            result = migrate(verbose=True)
+            return pending_count(migrations), result
+        finally:
+            lock_conn.execute(text("SELECT RELEASE_LOCK('seletor:migrations')"))
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Aplica as migrations pendentes no MASTER.")
+    parser.add_argument("--dry-run", action="store_true", help="só mostra o que seria aplicado")
+    parser.add_argument("--baseline", action="store_true",
+                        help="registra as pendentes no ledger sem executar (banco já migrado à mão)")
+    args = parser.parse_args(argv)
+
+    print("==========================================")
+    print(f"  MIGRATIONS — {MIGRATIONS_DIR}")
+    if args.dry_run:
+        print("  (DRY RUN — nada será aplicado)")
+    print("==========================================")
+    result = migrate(dry_run=args.dry_run, baseline=args.baseline)
+    print("==========================================")
+    print(
+        f"  {len(result['applied'])} {'pendente(s)' if args.dry_run else 'aplicada(s)'} | "
+        f"{result['skipped']} já existiam | {1 if result['failed'] else 0} erro(s)"
+    )
+    print("==========================================")
+    return 1 if result["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,223 @@
+"""
+Placement de databases de tenant entre hosts MySQL (tabela tenant_hosts, migration 013).
+
+Para cada tenant novo, choose_host() pega o host ativo de menor score:
+
+    score = (PESO_TENANTS * tenants/total_tenants
+             + PESO_DADOS * bytes/total_bytes
+             + PESO_CONEXOES * threads_connected/max_connections) / weight
+
+O número de tenants vem do MASTER (tenants.database_host); tamanho e conexões
+vêm de cada host via get_target_admin_engine (information_schema + SHOW
+GLOBAL STATUS). As cargas ficam em cache por PLACEMENT_CACHE_SECONDS e cada
+placement soma +1 tenant no cache, então um lote grande se espalha entre os
+hosts sem sondar todos a cada tenant. As sondas rodam em paralelo
+(PLACEMENT_PROBE_CONCURRENCY), então um host lento custa um timeout e não um
+por host. Host fora do ar é ignorado; sem registro (ou sem migration), o
+único candidato é o TENANT_DB_HOST. Sem host elegível, choose_host devolve
+None e quem chamou recusa o tenant.
+"""
+from __future__ import annotations
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence
+
+from app.db import TENANT_DB_HOST, checkout, fetch_all, get_target_admin_engine
+
+PLACEMENT_CACHE_SECONDS = float(os.getenv("PLACEMENT_CACHE_SECONDS", "30"))
+PLACEMENT_WEIGHT_TENANTS = float(os.getenv("PLACEMENT_WEIGHT_TENANTS", "0.4"))
+PLACEMENT_WEIGHT_DATA = float(os.getenv("PLACEMENT_WEIGHT_DATA", "0.4"))
+PLACEMENT_WEIGHT_CONNECTIONS = float(os.getenv("PLACEMENT_WEIGHT_CONNECTIONS", "0.2"))
+PLACEMENT_PROBE_CONCURRENCY = int(os.getenv("PLACEMENT_PROBE_CONCURRENCY", "8"))
+
+
+class PlacementError(ValueError):
+    """`databaseHost` explícito que não pode receber tenant (status HTTP em `status`)."""
+
+    def __init__(self, message: str, status: int = 400) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+class HostLoad:
+    __slots__ = ("host", "weight", "max_tenants", "is_active", "tenants", "data_bytes",
+                 "threads_connected", "max_connections", "reachable", "error")
+
+    def __init__(self, host: str, weight: float = 1.0, max_tenants: Optional[int] = None, is_active: bool = True) -> None:
+        self.host = host
+        self.weight = max(float(weight or 1.0), 0.01)
+        self.max_tenants = max_tenants
+        self.is_active = is_active
+        self.tenants = 0
+        self.data_bytes = 0
+        self.threads_connected = 0
+        self.max_connections = 0
+        self.reachable = False
+        self.error: Optional[str] = None
+
+    @property
+    def connection_ratio(self) -> float:
+        return self.threads_connected / self.max_connections if self.max_connections else 0.0
+
+    @property
+    def full(self) -> bool:
+        return self.max_tenants is not None and self.tenants >= self.max_tenants
+
+    def score(self, total_tenants: int, total_bytes: int) -> float:
+        t = self.tenants / total_tenants if total_tenants else 0.0
+        d = self.data_bytes / total_bytes if total_bytes else 0.0
+        return (
+            PLACEMENT_WEIGHT_TENANTS * t
+            + PLACEMENT_WEIGHT_DATA * d
+            + PLACEMENT_WEIGHT_CONNECTIONS * self.connection_ratio
+        ) / self.weight
+
+    def to_dict(self, total_tenants: int, total_bytes: int) -> Dict[str, Any]:
+        return {
+            "host": self.host,
+            "weight": self.weight,
+            "maxTenants": self.max_tenants,
+            "isActive": self.is_active,
+            "reachable": self.reachable,
+            "tenants": self.tenants,
+            "dataBytes": self.data_bytes,
+            "threadsConnected": self.threads_connected,
+            "maxConnections": self.max_connections,
+            "score": round(self.score(total_tenants, total_bytes), 4) if self.reachable else None,
+            "error": self.error,
+        }
+
+
+_lock = threading.Lock()
+_cache: Optional[List[HostLoad]] = None
+_cache_at = 0.0
+_warned = False
+
+
+def _registry() -> List[HostLoad]:
+    try:
+        rows = fetch_all(
+            "SELECT host, weight, max_tenants, is_active FROM tenant_hosts ORDER BY id",
+            primary=True,
+        )
+    except Exception as e:
+        # Migration 013 ainda não aplicada (avisa uma vez por processo)
+        global _warned
+        if not _warned:
+            _warned = True
+            print(f"⚠️  Placement sem tenant_hosts ({type(e).__name__}); usando TENANT_DB_HOST", flush=True)
+        rows = []
+    loads = [HostLoad(r["host"], r["weight"], r["max_tenants"], bool(r["is_active"])) for r in rows]
+    if not loads:
+        loads = [HostLoad(TENANT_DB_HOST)]
+    return loads
+
+
+def _probe(load: HostLoad) -> None:
+    try:
+        with checkout(get_target_admin_engine(load.host)) as conn:
+            load.data_bytes = int(
+                conn.exec_driver_sql(
+                    """
+                    SELECT COALESCE(SUM(data_length + index_length), 0)
+                    FROM information_schema.TABLES
+                    WHERE table_schema NOT IN ('mysql', 'information_schema', 'performance_schema', 'sys')
+                    """
+                ).scalar()
+                or 0
+            )
+            status = conn.exec_driver_sql("SHOW GLOBAL STATUS LIKE 'Threads_connected'").first()
+            load.threads_connected = int(status[1]) if status else 0
+            load.max_connections = int(conn.exec_driver_sql("SELECT @@max_connections").scalar() or 0)
+        load.reachable = True
+    except Exception as e:
+        load.reachable = False
+        load.error = f"{type(e).__name__}: {e}"[:300]
+
+
+def host_loads(refresh: bool = False) -> List[HostLoad]:
+    """Cargas de todos os hosts registrados (cache de PLACEMENT_CACHE_SECONDS)."""
+    global _cache, _cache_at
+    with _lock:
+        if not refresh and _cache is not None and time.monotonic() - _cache_at < PLACEMENT_CACHE_SECONDS:
+            return _cache
+
+    loads = _registry()
+    counts = {
+        r["database_host"]: int(r["n"])
+        for r in fetch_all(
+            "SELECT database_host, COUNT(*) AS n FROM tenants GROUP BY database_host",
+            primary=True,
+        )
+    }
+    for load in loads:
+        load.tenants = counts.get(load.host, 0)
+    # Sondas em paralelo: não segura o request somando o tempo de cada host
+    workers = max(1, min(len(loads), PLACEMENT_PROBE_CONCURRENCY))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="placement") as pool:
+        list(pool.map(_probe, loads))
+
+    with _lock:
+        _cache, _cache_at = loads, time.monotonic()
+    return loads
+
+
+def invalidate() -> None:
+    global _cache
+    with _lock:
+        _cache = None
+
+
+def active_hosts() -> List[str]:
+    """Hosts ativos do registro (sem sondar carga)."""
+    return [load.host for load in _registry() if load.is_active]
+
+
+def choose_host(preferred: Optional[str] = None, exclude: Sequence[str] = ()) -> Optional[str]:
+    """
+    Host para um tenant novo: `preferred` ou o de menor score fora de
+    `exclude`. Conta o placement no cache. `preferred` não registrado,
+    inativo, cheio ou fora do ar levanta PlacementError (não troca de host
+    calado). Sem nenhum host elegível devolve None.
+    """
+    loads = host_loads()
+    if preferred:
+        load = next((h for h in loads if h.host == preferred), None)
+        if load is None or not load.is_active:
+            raise PlacementError(f"Host '{preferred}' não registrado ou inativo")
+        if load.full:
+            raise PlacementError(f"Host '{preferred}' atingiu max_tenants ({load.max_tenants})", 409)
+        if not load.reachable:
+            raise PlacementError(f"Host '{preferred}' fora do ar", 503)
+        with _lock:
+            load.tenants += 1
+        return load.host
+
+    candidates = [h for h in loads if h.is_active and h.reachable and not h.full and h.host not in exclude]
+    if not candidates:
+        return None
+
+    with _lock:
+        total_t = sum(h.tenants for h in loads)
+        total_b = sum(h.data_bytes for h in loads)
+        chosen = min(candidates, key=lambda h: (h.score(total_t, total_b), h.host))
+        chosen.tenants += 1
+    return chosen.host
+
+
+def placement_snapshot(refresh: bool = False) -> Dict[str, Any]:
+    loads = host_loads(refresh=refresh)
+    total_t = sum(h.tenants for h in loads)
+    total_b = sum(h.data_bytes for h in loads)
+    return {
+        "weights": {
+            "tenants": PLACEMENT_WEIGHT_TENANTS,
+            "data": PLACEMENT_WEIGHT_DATA,
+            "connections": PLACEMENT_WEIGHT_CONNECTIONS,
+        },
+        "cacheSeconds": PLACEMENT_CACHE_SECONDS,
+        "hosts": [h.to_dict(total_t, total_b) for h in loads],
+    }
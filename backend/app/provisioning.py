@@ -0,0 +1,361 @@
+"""
+Provisionamento do schema de tenants por clonagem de um DB "golden".
+
+Para cada (host, sistema, versão do template) existe um database pronto,
+`golden_<system>_<version>`, montado uma única vez a partir de
+templates_sql/model_<system>.sql (version = prefixo do sha256 do template).
+Um tenant novo recebe o schema clonando o golden no próprio servidor:
+
+    SET FOREIGN_KEY_CHECKS = 0;
+    CREATE TABLE `t` (...);              -- SHOW CREATE TABLE do golden
+    INSERT INTO `t` SELECT * FROM `golden_...`.`t`;   -- só tabelas com seed
+    SET FOREIGN_KEY_CHECKS = 1;
+
+tudo em um lote na conexão MULTI_STATEMENTS (get_template_engine). O DDL do
+golden fica em cache no processo, então clonar não relê nem re-parseia o
+template. Se o golden não puder ser usado, provision_tenant_schema aplica o
+template direto (apply_sql_template_parallel).
+
+Goldens de outras versões do mesmo sistema (nome exato
+golden_<system>_<12 hex>) são removidos depois de um build ou da primeira
+leitura no processo, mas só com mais de TENANT_GOLDEN_STALE_SECONDS (no
+rolling deploy as duas versões convivem e cada uma remontaria o golden que
+a outra dropou) e só com todos os locks dele: o de build e os
+TENANT_GOLDEN_USE_SLOTS de uso, um dos quais fica com cada clone.
+"""
+from __future__ import annotations
+
+import os
+import random
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from app.db import (
+    QUERY_METRICS_ENABLED,
+    TENANT_DB_HOST,
+    TemplatePlan,
+    apply_sql_template_parallel,
+    checkout,
+    create_physical_database,
+    drop_physical_database,
+    execute_multi,
+    get_template_engine,
+    query_metrics,
+    sql_templates,
+)
+
+GOLDEN_ENABLED = os.getenv("TENANT_GOLDEN_CLONE", "1") != "0"
+# Espera máxima pelo lock de build do golden (outro worker montando)
+GOLDEN_LOCK_TIMEOUT = int(os.getenv("TENANT_GOLDEN_LOCK_TIMEOUT", "120"))
+
+# Golden de outra versão só é removido com esta idade (marcador)
+GOLDEN_STALE_SECONDS = int(os.getenv("TENANT_GOLDEN_STALE_SECONDS", "86400"))
+# Locks de uso por golden: cada clone pega um; dropar exige todos livres
+GOLDEN_USE_SLOTS = max(1, int(os.getenv("TENANT_GOLDEN_USE_SLOTS", "8")))
+
+# Tabela marcadora: só existe no golden depois do build completo
+GOLDEN_MARKER_TABLE = "_golden_ready"
+
+_AUTO_INCREMENT_RE = re.compile(r"\s+AUTO_INCREMENT=\d+", re.I)
+_GOLDEN_SLUG_RE = re.compile(r"^[a-z0-9_]+$")
+
+
+class GoldenSchema:
+    """DDL (na ordem do template) e tabelas com seed de um golden pronto."""
+
+    __slots__ = ("host", "name", "version", "tables", "seeded")
+
+    def __init__(
+        self,
+        host: str,
+        name: str,
+        version: str,
+        tables: Tuple[Tuple[str, str], ...],
+        seeded: Tuple[str, ...],
+    ) -> None:
+        self.host = host
+        self.name = name
+        self.version = version
+        self.tables = tables
+        self.seeded = seeded
+
+    def clone_statements(self) -> List[str]:
+        stmts = ["SET FOREIGN_KEY_CHECKS = 0"]
+        stmts.extend(ddl for _, ddl in self.tables)
+        stmts.extend(f"INSERT INTO `{t}` SELECT * FROM `{self.name}`.`{t}`" for t in self.seeded)
+        stmts.append("SET FOREIGN_KEY_CHECKS = 1")
+        return stmts
+
+
+_lock = threading.Lock()
+_goldens: Dict[Tuple[str, str], GoldenSchema] = {}
+_stats = {"builds": 0, "clones": 0, "fallbacks": 0}
+
+
+def _golden_slug(system_slug: str) -> str:
+    return system_slug.replace("-", "_")
+
+
+def _golden_name_re(system_slug: str) -> "re.Pattern[str]":
+    """Goldens do sistema, de qualquer versão (não pega "jogador_pro" para "jogador")."""
+    return re.compile(rf"^golden_{re.escape(_golden_slug(system_slug))}_[0-9a-f]{{12}}$")
+
+
+def _use_lock(name: str, slot: int) -> str:
+    return f"golden:{name}:use:{slot}"
+
+
+def golden_db_name(system_slug: str, plan: TemplatePlan) -> str:
+    """golden_<system>_<version>; nunca termina em _db, então não colide com tenants."""
+    name = f"golden_{_golden_slug(system_slug)}_{plan.version}"
+    if not _GOLDEN_SLUG_RE.match(name) or len(name) > 64:
+        raise ValueError("nome de golden inválido")
+    return name
+
+
+def _load_golden(conn, host: str, name: str, version: str) -> Optional[GoldenSchema]:
+    """Lê o golden se o marcador existir com a versão esperada; senão None."""
+    ready = conn.exec_driver_sql(
+        "SELECT 1 FROM information_schema.TABLES WHERE TABLE_SCHEMA = %s AND TABLE_NAME = %s",
+        (name, GOLDEN_MARKER_TABLE),
+    ).first()
+    if not ready:
+        return None
+    row = conn.exec_driver_sql(f"SELECT version FROM `{name}`.`{GOLDEN_MARKER_TABLE}`").first()
+    if not row or row[0] != version:
+        return None
+
+    # Ordem de criação = ordem do marcador (a mesma do template)
+    names = [
+        r[0]
+        for r in conn.exec_driver_sql(
+            f"SELECT table_name FROM `{name}`.`{GOLDEN_MARKER_TABLE}_tables` ORDER BY position"
+        )
+    ]
+    tables = []
+    seeded = []
+    for t in names:
+        ddl = conn.exec_driver_sql(f"SHOW CREATE TABLE `{name}`.`{t}`").first()[1]
+        tables.append((t, _AUTO_INCREMENT_RE.sub("", ddl)))
+        if conn.exec_driver_sql(f"SELECT 1 FROM `{name}`.`{t}` LIMIT 1").first():
+            seeded.append(t)
+    return GoldenSchema(host, name, version, tuple(tables), tuple(seeded))
+
+
+def _build_golden(conn, host: str, name: str, system_slug: str, template_path: Path) -> None:
+    """Monta o golden do zero (chamado com o GET_LOCK do golden em mãos)."""
+    print(f"--> Montando golden `{name}` em {host}...", flush=True)
+    conn.exec_driver_sql(f"DROP DATABASE IF EXISTS `{name}`")
+    conn.exec_driver_sql(
+        f"CREATE DATABASE `{name}` CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci"
+    )
+    plan = apply_sql_template_parallel(get_template_engine(host), template_path, name)
+    conn.exec_driver_sql(f"USE `{name}`")
+
+    # Tabelas que sobraram no golden (inclui eventuais CREATE TABLE fora do plano)
+    existing = {r[0] for r in conn.exec_driver_sql("SHOW TABLES")}
+    order = [t for t in plan.tables if t in existing]
+    order += sorted(existing.difference(order))
+
+    conn.exec_driver_sql(
+        f"CREATE TABLE `{GOLDEN_MARKER_TABLE}_tables` ("
+        "position INT PRIMARY KEY, table_name VARCHAR(64) NOT NULL)"
+    )
+    if order:
+        conn.exec_driver_sql(
+            f"INSERT INTO `{GOLDEN_MARKER_TABLE}_tables` (position, table_name) VALUES "
+            + ", ".join(["(%s, %s)"] * len(order)),
+            tuple(v for i, t in enumerate(order) for v in (i, t)),
+        )
+    # Marcador por último: golden pela metade nunca é considerado pronto
+    conn.exec_driver_sql(
+        f"CREATE TABLE `{GOLDEN_MARKER_TABLE}` ("
+        "version VARCHAR(64) PRIMARY KEY, system_slug VARCHAR(64) NOT NULL, "
+        "created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)"
+    )
+    conn.exec_driver_sql(
+        f"INSERT INTO `{GOLDEN_MARKER_TABLE}` (version, system_slug) VALUES (%s, %s)",
+        (plan.version, system_slug),
+    )
+
+    with _lock:
+        _stats["builds"] += 1
+
+
+def _lock_all(conn, name: str) -> List[str]:
+    """Lock de build + todos os de uso, sem esperar; [] (nada preso) se algum está ocupado."""
+    held: List[str] = []
+    for lock in [f"golden:{name}"] + [_use_lock(name, i) for i in range(GOLDEN_USE_SLOTS)]:
+        if conn.exec_driver_sql("SELECT GET_LOCK(%s, 0)", (lock,)).scalar() != 1:
+            _release_all(conn, held)
+            return []
+        held.append(lock)
+    return held
+
+
+def _release_all(conn, locks: List[str]) -> None:
+    for lock in locks:
+        conn.exec_driver_sql("SELECT RELEASE_LOCK(%s)", (lock,))
+
+
+def _drop_stale_goldens(conn, system_slug: str, keep: str) -> List[str]:
+    """Remove goldens de outras versões do sistema que ninguém está usando/montando."""
+    name_re = _golden_name_re(system_slug)
+    dropped = []
+    for (stale,) in conn.exec_driver_sql(
+        "SELECT SCHEMA_NAME FROM information_schema.SCHEMATA WHERE SCHEMA_NAME LIKE %s",
+        (f"golden_{_golden_slug(system_slug)}_".replace("_", r"\_") + "%",),
+    ).fetchall():
+        if stale == keep or not name_re.match(stale):
+            continue
+        held = _lock_all(conn, stale)
+        if not held:
+            continue  # em build ou em clone; fica para a próxima
+        try:
+            # Sem marcador = build abandonado (quem monta segura o lock de build)
+            marker = conn.exec_driver_sql(
+                "SELECT 1 FROM information_schema.TABLES WHERE TABLE_SCHEMA = %s AND TABLE_NAME = %s",
+                (stale, GOLDEN_MARKER_TABLE),
+            ).first()
+            if marker:
+                age = conn.exec_driver_sql(
+                    f"SELECT TIMESTAMPDIFF(SECOND, MIN(created_at), NOW()) FROM `{stale}`.`{GOLDEN_MARKER_TABLE}`"
+                ).scalar()
+                if age is not None and age < GOLDEN_STALE_SECONDS:
+                    continue
+            print(f"--> Removendo golden antigo `{stale}`", flush=True)
+            conn.exec_driver_sql(f"DROP DATABASE IF EXISTS `{stale}`")
+            dropped.append(stale)
+        finally:
+            _release_all(conn, held)
+    return dropped
+
+
+def ensure_golden(
+    target_host: Optional[str], system_slug: str, template_path: Union[str, Path]
+) -> GoldenSchema:
+    """
+    Golden pronto para (host, sistema, versão atual do template).
+    Cache no processo; entre workers/pods o build é serializado por GET_LOCK
+    e quem chegar depois só lê o golden montado pelo outro.
+    """
+    host = (target_host or "").strip() or TENANT_DB_HOST
+    plan = sql_templates.get(template_path)
+    name = golden_db_name(system_slug, plan)
+
+    with _lock:
+        golden = _goldens.get((host, name))
+    if golden is not None:
+        return golden
+
+    with checkout(get_template_engine(host)) as conn:
+        golden = _load_golden(conn, host, name, plan.version)
+        if golden is None:
+            got = conn.exec_driver_sql(
+                "SELECT GET_LOCK(%s, %s)", (f"golden:{name}", GOLDEN_LOCK_TIMEOUT)
+            ).scalar()
+            if got != 1:
+                raise RuntimeError(f"Timeout esperando build do golden `{name}`")
+            try:
+                golden = _load_golden(conn, host, name, plan.version)
+                if golden is None:
+                    _build_golden(conn, host, name, system_slug, Path(template_path))
+                    golden = _load_golden(conn, host, name, plan.version)
+                    if golden is None:
+                        raise RuntimeError(f"Golden `{name}` montado mas sem marcador")
+            finally:
+                conn.exec_driver_sql("SELECT RELEASE_LOCK(%s)", (f"golden:{name}",))
+        # Uma vez por golden e processo (depois fica no cache)
+        try:
+            _drop_stale_goldens(conn, system_slug, name)
+        except Exception as e:
+            print(f"⚠️  Limpeza de goldens antigos de {system_slug} em {host} falhou: {e}", flush=True)
+
+    with _lock:
+        _goldens[(host, name)] = golden
+    return golden
+
+
+def clone_golden(golden: GoldenSchema, db_name: str) -> None:
+    """Clona estrutura + seed do golden para `db_name` (já criado e vazio)."""
+    if not _GOLDEN_SLUG_RE.match(db_name):
+        raise ValueError("database_name inválido")
+    t0 = time.perf_counter()
+    # Um lock de uso: o golden não é dropado (versão antiga) no meio do clone
+    lock = _use_lock(golden.name, random.randrange(GOLDEN_USE_SLOTS))
+    with checkout(get_template_engine(golden.host)) as conn:
+        if conn.exec_driver_sql("SELECT GET_LOCK(%s, %s)", (lock, GOLDEN_LOCK_TIMEOUT)).scalar() != 1:
+            raise RuntimeError(f"Timeout esperando lock de uso do golden `{golden.name}`")
+        try:
+            conn.exec_driver_sql(f"USE `{db_name}`")
+            cursor = conn.connection.dbapi_connection.cursor()
+            try:
+                execute_multi(cursor, golden.clone_statements())
+            except Exception:
+                # Sessão pode ter ficado com FOREIGN_KEY_CHECKS = 0: não volta pro pool
+                # (fechar a conexão também solta o lock)
+                conn.invalidate()
+                raise
+            finally:
+                cursor.close()
+            if not conn.exec_driver_sql("SHOW TABLES LIKE 'users'").first():
+                raise RuntimeError(f"Clone do golden `{golden.name}` sem tabela 'users' em {db_name}.")
+        finally:
+            if not conn.invalidated:
+                conn.exec_driver_sql("SELECT RELEASE_LOCK(%s)", (lock,))
+    if QUERY_METRICS_ENABLED:
+        query_metrics.record(
+            "admin", "", "tenant_golden.clone", (time.perf_counter() - t0) * 1000, len(golden.tables)
+        )
+    with _lock:
+        _stats["clones"] += 1
+
+
+def provision_tenant_schema(
+    target_host: Optional[str],
+    db_name: str,
+    system_slug: str,
+    template_path: Union[str, Path],
+) -> str:
+    """
+    Cria o schema do tenant em `db_name` (database já criado).
+    Tenta o golden; se falhar, recria o database vazio e aplica o template.
+    Devolve o método usado ("golden" ou "template").
+    """
+    host = (target_host or "").strip() or TENANT_DB_HOST
+    if GOLDEN_ENABLED:
+        try:
+            golden = ensure_golden(host, system_slug, template_path)
+            print(f"--> Clonando golden `{golden.name}` -> `{db_name}`", flush=True)
+            clone_golden(golden, db_name)
+            return "golden"
+        except Exception as e:
+            print(f"⚠️  Golden indisponível para {system_slug} ({e}); aplicando template.", flush=True)
+            name_re = _golden_name_re(system_slug)
+            with _lock:
+                _stats["fallbacks"] += 1
+                # Golden pode ter sumido (DROP manual): relê na próxima
+                for key in [k for k in _goldens if k[0] == host and name_re.match(k[1])]:
+                    _goldens.pop(key, None)
+            # Clone pela metade: começa de um database vazio
+            drop_physical_database(host, db_name)
+            create_physical_database(host, db_name)
+
+    print(f"--> Aplicando template: {template_path}", flush=True)
+    apply_sql_template_parallel(get_template_engine(host), template_path, db_name)
+    return "template"
+
+
+def golden_stats() -> Dict[str, Any]:
+    with _lock:
+        return {
+            **_stats,
+            "enabled": GOLDEN_ENABLED,
+            "goldens": [
+                {"host": g.host, "name": g.name, "version": g.version, "tables": len(g.tables), "seeded": len(g.seeded)}
+                for g in _goldens.values()
+            ],
+        }
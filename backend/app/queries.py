@@ -0,0 +1,135 @@
+"""
+Queries nomeadas compartilhadas entre os módulos de rotas.
+
+Cada statement é registrado uma vez em app.db.QUERIES (text() pré-compilado,
+texto estável, nome usado nas métricas). Queries usadas em um único lugar
+podem continuar inline.
+"""
+from __future__ import annotations
+
+from app.db import named_query
+
+# ------------------------------------------------------------
+# Sessão / usuário (login_required)
+# ------------------------------------------------------------
+SESSION_BY_TOKEN = named_query(
+    "sessions.by_token",
+    """
+    SELECT id, user_id, current_tenant_id, expires_at
+    FROM user_sessions
+    WHERE token_hash = :token_hash
+      AND revoked_at IS NULL
+      AND expires_at > NOW()
+    """,
+)
+
+ACTIVE_USER_BY_ID = named_query(
+    "users.active_by_id",
+    "SELECT * FROM users WHERE id = :id AND is_active = TRUE",
+)
+
+# Principal compacto que o login_required guarda no session_cache
+USER_PRINCIPAL_BY_ID = named_query(
+    "users.principal_by_id",
+    "SELECT id, email, name, is_blocked, blocked_reason FROM users WHERE id = :id AND is_active = TRUE",
+)
+
+TOUCH_SESSION = named_query(
+    "sessions.touch",
+    "UPDATE user_sessions SET last_activity_at = NOW() WHERE id = :id",
+)
+
+IS_SUPER_ADMIN = named_query(
+    "super_admins.is_active_email",
+    "SELECT 1 FROM super_admins WHERE email = :email AND is_active = TRUE",
+)
+
+# ------------------------------------------------------------
+# Memberships
+# ------------------------------------------------------------
+# Usada por login, /me e /api/user/tenants (cada rota usa as colunas que precisa)
+USER_TENANTS_BY_USER = named_query(
+    "user_tenants.by_user",
+    """
+    SELECT
+        t.id, t.slug, t.display_name, t.logo_url, t.primary_color,
+        t.welcome_message,
+        s.slug AS system_slug, s.display_name AS system_name,
+        s.icon AS system_icon, s.color AS system_color,
+        ut.role, ut.joined_at
+    FROM user_tenants ut
+    INNER JOIN tenants t ON ut.tenant_id = t.id
+    INNER JOIN systems s ON t.system_id = s.id
+    WHERE ut.user_id = :user_id
+      AND ut.is_active = TRUE
+      AND t.is_active = TRUE
+    ORDER BY s.display_order, t.display_name
+    """,
+)
+
+USER_TENANTS_BY_USERS = named_query(
+    "user_tenants.by_users",
+    """
+    SELECT ut.user_id, t.id, t.slug, t.display_name,
+           s.slug AS system_slug, s.display_name AS system_name,
+           ut.role
+    FROM user_tenants ut
+    INNER JOIN tenants t ON ut.tenant_id = t.id
+    INNER JOIN systems s ON t.system_id = s.id
+    WHERE ut.user_id IN :user_ids AND ut.is_active = TRUE
+    ORDER BY s.display_order, t.display_name
+    """,
+    expanding=("user_ids",),
+)
+
+MEMBERSHIP_ROLE = named_query(
+    "user_tenants.role",
+    """
+    SELECT role FROM user_tenants
+    WHERE user_id = :user_id AND tenant_id = :tenant_id AND is_active = TRUE
+    """,
+)
+
+TENANT_ADMIN_USER_IDS = named_query(
+    "user_tenants.admin_ids",
+    """
+    SELECT user_id FROM user_tenants
+    WHERE tenant_id = :tenant_id AND role = 'admin' AND is_active = TRUE
+    """,
+)
+
+# ------------------------------------------------------------
+# Interesses / auto-join (cadastro)
+# ------------------------------------------------------------
+ACTIVE_TENANT_IDS_BY_SYSTEMS = named_query(
+    "tenants.active_ids_by_systems",
+    "SELECT id FROM tenants WHERE system_id IN :system_ids AND is_active = TRUE",
+    expanding=("system_ids",),
+)
+
+# ------------------------------------------------------------
+# DB do tenant (executadas em conexões do get_tenant_engine)
+# ------------------------------------------------------------
+TENANT_DB_TABLES = named_query(
+    "tenant_db.tables",
+    "SELECT TABLE_NAME FROM INFORMATION_SCHEMA.TABLES "
+    "WHERE TABLE_SCHEMA = :db AND TABLE_NAME IN :tables",
+    expanding=("tables",),
+)
+
+TENANT_DB_USERS_BY_HUB_IDS = named_query(
+    "tenant_db.users_by_hub_ids",
+    "SELECT id FROM users WHERE fk_id_user_hub IN :hub_ids",
+    expanding=("hub_ids",),
+)
+
+TENANT_DB_ADMIN_IDS = named_query(
+    "tenant_db.admin_ids",
+    "SELECT id FROM users WHERE is_admin = 1",
+)
+
+TENANT_DB_PUSH_TOKENS = named_query(
+    "tenant_db.push_tokens_by_users",
+    "SELECT token FROM push_tokens WHERE user_id IN :user_ids",
+    expanding=("user_ids",),
+)
@@ -0,0 +1,583 @@
+"""
+Relocação online do database de um tenant para outro host MySQL (job
+relocate_tenant), para tirar tenants de um host quente sem downtime longo:
+
+    prepare -> copy -> sync_online -> cutover -> source_grace -> drop_source
+
+prepare      recria o database no destino com o DDL do origem (SHOW CREATE TABLE)
+copy         copia as linhas em chunks pela PK (keyset), com o tenant no ar;
+             retomar continua do MAX(pk) já copiado no destino
+sync_online  compara checksum por faixa de PK (COUNT + BIT_XOR(CRC32)) nos
+             dois hosts e recopia só as faixas que mudaram durante o copy
+cutover      maintenance_mode = 1, espera o dreno (RELOCATION_DRAIN_SECONDS, no
+             mínimo TENANT_CACHE_SECONDS: todo worker já vê a manutenção
+             mesmo sem o cache_bus), congela a origem (KILL nas conexões do
+             database + ALTER DATABASE ... READ ONLY = 1, MySQL 8.0.22+),
+             sync final (guarda o checksum de cada tabela da origem), troca
+             tenants.database_host e devolve o maintenance_mode de antes;
+             descarta engines/caches do host antigo. maintenance_mode só
+             barra select-tenant/join: app do tenant que já tinha o host
+             continuaria escrevendo na origem sem o congelamento
+source_grace espera RELOCATION_SOURCE_GRACE_SECONDS (no mínimo o TTL do
+             diretório de tenants) contados da troca: request que resolveu
+             o host antigo antes da troca ainda termina com o database lá
+drop_source  confere que os checksums da origem não mudaram desde o sync
+             final (senão falha e mantém a origem), tira o READ ONLY e dropa
+             tabela a tabela com pausa (o mesmo do drop_tenant);
+             RELOCATION_KEEP_SOURCE=1 mantém a origem (congelada)
+
+Tabelas sem PK são copiadas inteiras e comparadas pelo checksum da tabela.
+Progresso (fase, tabela, linhas, linhas/s) vai no result do job via heartbeat.
+"""
+from __future__ import annotations
+
+import os
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy.exc import DBAPIError
+
+from app.db import (
+    TENANT_DB_HOST,
+    checkout,
+    create_physical_database,
+    drop_physical_database,
+    execute_sql,
+    fetch_one,
+    get_target_admin_engine,
+    tenant_engines,
+    unit_of_work,
+)
+from app.jobs import JobContext, enqueue_job, register_job
+from app.placement import active_hosts, choose_host, invalidate as invalidate_placement
+from app.tenant_jobs import TenantSpecError, drop_tenant_tables
+from app.tenant_directory import TENANT_CACHE_SECONDS, tenant_directory
+
+RELOCATION_CHUNK_ROWS = int(os.getenv("RELOCATION_CHUNK_ROWS", "2000"))
+# Tempo com maintenance_mode ligado antes do sync final (requests em voo terminam).
+# Nunca menos que o TTL do diretório: worker com a linha antiga em cache ainda
+# escreveria no host de origem
+RELOCATION_DRAIN_SECONDS = max(float(os.getenv("RELOCATION_DRAIN_SECONDS", "5")), TENANT_CACHE_SECONDS)
+RELOCATION_KEEP_SOURCE = os.getenv("RELOCATION_KEEP_SOURCE", "0") == "1"
+# Espera entre a troca de host e o drop da origem
+RELOCATION_SOURCE_GRACE_SECONDS = max(float(os.getenv("RELOCATION_SOURCE_GRACE_SECONDS", "60")), TENANT_CACHE_SECONDS)
+# Intervalo mínimo entre heartbeats de progresso (cada um é um UPDATE no MASTER)
+RELOCATION_PROGRESS_SECONDS = float(os.getenv("RELOCATION_PROGRESS_SECONDS", "2"))
+# lock_wait_timeout do ALTER DATABASE ... READ ONLY (espera transações abertas no database)
+RELOCATION_FREEZE_WAIT_SECONDS = int(os.getenv("RELOCATION_FREEZE_WAIT_SECONDS", "30"))
+
+# ER_PARSE_ERROR: servidor sem READ ONLY por database (< 8.0.22)
+_MYSQL_PARSE_ERROR = 1064
+
+
+class TableInfo:
+    __slots__ = ("name", "columns", "pk")
+
+    def __init__(self, name: str, columns: List[str], pk: List[str]) -> None:
+        self.name = name
+        self.columns = columns
+        self.pk = pk
+
+    def pk_index(self) -> List[int]:
+        return [self.columns.index(c) for c in self.pk]
+
+
+def _q(name: str) -> str:
+    return f"`{name}`"
+
+
+def _tables(conn, db_name: str) -> List[TableInfo]:
+    """Tabelas base com colunas copiáveis (sem GENERATED) e PK, em ordem."""
+    cols: Dict[str, List[str]] = {}
+    for table, column in conn.exec_driver_sql(
+        """
+        SELECT c.table_name, c.column_name
+        FROM information_schema.COLUMNS c
+        JOIN information_schema.TABLES t
+          ON t.table_schema = c.table_schema AND t.table_name = c.table_name
+        WHERE c.table_schema = %s AND t.table_type = 'BASE TABLE'
+          AND c.extra NOT LIKE '%%GENERATED%%'
+        ORDER BY c.table_name, c.ordinal_position
+        """,
+        (db_name,),
+    ):
+        cols.setdefault(table, []).append(column)
+
+    pks: Dict[str, List[str]] = {}
+    for table, column in conn.exec_driver_sql(
+        """
+        SELECT table_name, column_name
+        FROM information_schema.KEY_COLUMN_USAGE
+        WHERE table_schema = %s AND constraint_name = 'PRIMARY'
+        ORDER BY table_name, ordinal_position
+        """,
+        (db_name,),
+    ):
+        pks.setdefault(table, []).append(column)
+
+    return [TableInfo(t, c, pks.get(t, [])) for t, c in cols.items()]
+
+
+class _Progress:
+    """Contadores do job; heartbeat no máximo a cada RELOCATION_PROGRESS_SECONDS."""
+
+    def __init__(self, ctx: JobContext, phase: str, tables: int) -> None:
+        self.ctx = ctx
+        self.phase = phase
+        self.tables = tables
+        self.tables_done = 0
+        self.table: Optional[str] = None
+        self.rows = 0
+        self.resynced = 0
+        self.started = time.perf_counter()
+        self._beat = 0.0
+
+    def summary(self) -> Dict[str, Any]:
+        secs = time.perf_counter() - self.started
+        return {
+            "phase": self.phase,
+            "table": self.table,
+            "tablesDone": self.tables_done,
+            "tables": self.tables,
+            "rows": self.rows,
+            "resyncedChunks": self.resynced,
+            "seconds": round(secs, 1),
+            "rowsPerSec": round(self.rows / secs, 1) if secs > 0 else None,
+        }
+
+    def tick(self, force: bool = False) -> None:
+        now = time.monotonic()
+        if force or now - self._beat >= RELOCATION_PROGRESS_SECONDS:
+            self._beat = now
+            self.ctx.heartbeat(self.summary())
+
+
+class _Range:
+    """Faixa de PK (lo, hi]; None = sem limite daquele lado."""
+
+    __slots__ = ("lo", "hi")
+
+    def __init__(self, lo: Optional[Sequence[Any]], hi: Optional[Sequence[Any]]) -> None:
+        self.lo = lo
+        self.hi = hi
+
+    def where(self, t: TableInfo) -> Tuple[str, Tuple[Any, ...]]:
+        pk = "(" + ", ".join(_q(c) for c in t.pk) + ")"
+        marks = "(" + ", ".join(["%s"] * len(t.pk)) + ")"
+        conds, params = [], []
+        if self.lo is not None:
+            conds.append(f"{pk} > {marks}")
+            params.extend(self.lo)
+        if self.hi is not None:
+            conds.append(f"{pk} <= {marks}")
+            params.extend(self.hi)
+        return (" WHERE " + " AND ".join(conds)) if conds else "", tuple(params)
+
+
+class _Copier:
+    """Conexões de admin nos dois hosts; nomes sempre qualificados por database."""
+
+    def __init__(self, src, dst, db_name: str, progress: _Progress) -> None:
+        self.src = src
+        self.dst = dst
+        self.db = db_name
+        self.progress = progress
+        # tabela -> [linhas, BIT_XOR] da origem, somado das faixas do sync
+        self.sums: Dict[str, List[int]] = {}
+
+    def _table(self, t: TableInfo) -> str:
+        return f"{_q(self.db)}.{_q(t.name)}"
+
+    def _insert(self, t: TableInfo, rows: Sequence[Sequence[Any]]) -> None:
+        if not rows:
+            return
+        cols = ", ".join(_q(c) for c in t.columns)
+        marks = ", ".join(["%s"] * len(t.columns))
+        self.dst.exec_driver_sql(
+            f"INSERT INTO {self._table(t)} ({cols}) VALUES ({marks})", [tuple(r) for r in rows]
+        )
+        self.progress.rows += len(rows)
+        self.progress.tick()
+
+    def _select(self, t: TableInfo) -> str:
+        return f"SELECT {', '.join(_q(c) for c in t.columns)} FROM {self._table(t)}"
+
+    def _order(self, t: TableInfo) -> str:
+        return " ORDER BY " + ", ".join(_q(c) for c in t.pk)
+
+    def copy_table(self, t: TableInfo) -> None:
+        if not t.pk:
+            self.dst.exec_driver_sql(f"DELETE FROM {self._table(t)}")
+            result = self.src.exec_driver_sql(self._select(t), execution_options={"stream_results": True})
+            for chunk in result.partitions(RELOCATION_CHUNK_ROWS):
+                self._insert(t, chunk)
+            return
+
+        # Keyset a partir do que já está no destino (retomada)
+        pk_cols = ", ".join(_q(c) for c in t.pk)
+        desc = ", ".join(f"{_q(c)} DESC" for c in t.pk)
+        last = self.dst.exec_driver_sql(
+            f"SELECT {pk_cols} FROM {self._table(t)} ORDER BY {desc} LIMIT 1"
+        ).first()
+        idx = t.pk_index()
+        while True:
+            where, params = _Range(tuple(last) if last else None, None).where(t)
+            rows = self.src.exec_driver_sql(
+                f"{self._select(t)}{where}{self._order(t)} LIMIT {RELOCATION_CHUNK_ROWS}", params
+            ).fetchall()
+            self._insert(t, rows)
+            if len(rows) < RELOCATION_CHUNK_ROWS:
+                return
+            last = tuple(rows[-1][i] for i in idx)
+
+    def _checksum(self, conn, t: TableInfo, where: str, params: Tuple[Any, ...]) -> Tuple[int, int]:
+        return _checksum(conn, self.db, t, where, params)
+
+    def _source_checksum(self, t: TableInfo, where: str, params: Tuple[Any, ...]) -> Tuple[int, int]:
+        """Checksum da faixa na origem, acumulado por tabela (BIT_XOR das faixas = o da tabela)."""
+        count, crc = self._checksum(self.src, t, where, params)
+        total = self.sums.setdefault(t.name, [0, 0])
+        total[0] += count
+        total[1] ^= crc
+        return count, crc
+
+    def _resync(self, t: TableInfo, where: str, params: Tuple[Any, ...]) -> None:
+        self.dst.exec_driver_sql(f"DELETE FROM {self._table(t)}{where}", params)
+        order = self._order(t) if t.pk else ""
+        result = self.src.exec_driver_sql(
+            f"{self._select(t)}{where}{order}", params, execution_options={"stream_results": True}
+        )
+        for chunk in result.partitions(RELOCATION_CHUNK_ROWS):
+            self._insert(t, chunk)
+        self.progress.resynced += 1
+
+    def sync_table(self, t: TableInfo) -> None:
+        """Recopia as faixas de PK cujo checksum difere entre origem e destino."""
+        if not t.pk:
+            if self._source_checksum(t, "", ()) != self._checksum(self.dst, t, "", ()):
+                self._resync(t, "", ())
+            return
+
+        pk_cols = ", ".join(_q(c) for c in t.pk)
+        lo: Optional[Tuple[Any, ...]] = None
+        while True:
+            where, params = _Range(lo, None).where(t)
+            bound = self.src.exec_driver_sql(
+                f"SELECT {pk_cols} FROM {self._table(t)}{where}{self._order(t)}"
+                f" LIMIT 1 OFFSET {RELOCATION_CHUNK_ROWS - 1}",
+                params,
+            ).first()
+            # Última faixa vai até o fim (pega linhas novas e sobras no destino)
+            rng = _Range(lo, tuple(bound) if bound else None)
+            where, params = rng.where(t)
+            if self._source_checksum(t, where, params) != self._checksum(self.dst, t, where, params):
+                self._resync(t, where, params)
+            self.progress.tick()
+            if bound is None:
+                return
+            lo = tuple(bound)
+
+
+def _checksum(conn, db_name: str, t: TableInfo, where: str, params: Tuple[Any, ...]) -> Tuple[int, int]:
+    cols = [_q(c) for c in t.columns]
+    # CONCAT_WS ignora NULL: ISNULL() diferencia NULL de ''
+    row_crc = f"CRC32(CONCAT_WS('#', {', '.join(cols)}, {', '.join(f'ISNULL({c})' for c in cols)}))"
+    row = conn.exec_driver_sql(
+        f"SELECT COUNT(*), COALESCE(BIT_XOR({row_crc}), 0) FROM {_q(db_name)}.{_q(t.name)}{where}", params
+    ).first()
+    return int(row[0]), int(row[1])
+
+
+def _source_checksums(p: Dict[str, Any]) -> Dict[str, List[int]]:
+    """[linhas, BIT_XOR] de cada tabela da origem, lidas agora."""
+    with checkout(get_target_admin_engine(p["source"])) as src:
+        return {t.name: list(_checksum(src, p["dbName"], t, "", ())) for t in _tables(src, p["dbName"])}
+
+
+def _freeze_source(p: Dict[str, Any]) -> bool:
+    """
+    Derruba as conexões abertas no database da origem e deixa o schema
+    READ ONLY. False se o servidor não tem READ ONLY (< 8.0.22): aí só as
+    conexões caem e o drop_source depende da conferência de checksums.
+    """
+    source, db_name = p["source"], p["dbName"]
+    tenant_engines.evict(source, db_name)
+    with checkout(get_target_admin_engine(source)) as conn:
+        ids = [
+            r[0]
+            for r in conn.exec_driver_sql(
+                "SELECT id FROM information_schema.PROCESSLIST WHERE db = %s AND id <> CONNECTION_ID()",
+                (db_name,),
+            )
+        ]
+        for thread_id in ids:
+            try:
+                conn.exec_driver_sql(f"KILL {int(thread_id)}")
+            except DBAPIError:
+                pass  # conexão já tinha terminado
+        conn.exec_driver_sql(f"SET SESSION lock_wait_timeout = {RELOCATION_FREEZE_WAIT_SECONDS}")
+        try:
+            conn.exec_driver_sql(f"ALTER DATABASE {_q(db_name)} READ ONLY = 1")
+        except DBAPIError as e:
+            if getattr(e.orig, "args", (None,))[0] != _MYSQL_PARSE_ERROR:
+                raise
+            print(f"⚠️  {source} sem READ ONLY por database; origem `{db_name}` só teve as conexões derrubadas", flush=True)
+            return False
+    return True
+
+
+def _unfreeze_source(p: Dict[str, Any]) -> None:
+    with checkout(get_target_admin_engine(p["source"])) as conn:
+        try:
+            conn.exec_driver_sql(f"ALTER DATABASE {_q(p['dbName'])} READ ONLY = 0")
+        except DBAPIError as e:
+            if getattr(e.orig, "args", (None,))[0] != _MYSQL_PARSE_ERROR:
+                raise
+
+
+def _tenant(tenant_id: int) -> Optional[Dict[str, Any]]:
+    return fetch_one(
+        "SELECT id, database_host, maintenance_mode, deleted_at FROM tenants WHERE id = :id",
+        {"id": tenant_id},
+        primary=True,
+    )
+
+
+def _prepare(p: Dict[str, Any]) -> Dict[str, Any]:
+    """Database novo e vazio no destino, com o DDL atual do origem."""
+    source, target, db_name = p["source"], p["target"], p["dbName"]
+    drop_physical_database(target, db_name)
+    create_physical_database(target, db_name)
+    with checkout(get_target_admin_engine(source)) as src, checkout(get_target_admin_engine(target)) as dst:
+        tables = _tables(src, db_name)
+        dst.exec_driver_sql(f"USE {_q(db_name)}")
+        dst.exec_driver_sql("SET FOREIGN_KEY_CHECKS = 0")
+        try:
+            for t in tables:
+                ddl = src.exec_driver_sql(f"SHOW CREATE TABLE {_q(db_name)}.{_q(t.name)}").first()[1]
+                dst.exec_driver_sql(ddl)
+        finally:
+            dst.exec_driver_sql("SET FOREIGN_KEY_CHECKS = 1")
+    return {"tables": len(tables)}
+
+
+def _copy_phase(ctx: JobContext, phase: str) -> Dict[str, Any]:
+    p = ctx.payload
+    with checkout(get_target_admin_engine(p["source"])) as src, checkout(get_target_admin_engine(p["target"])) as dst:
+        tables = _tables(src, p["dbName"])
+        progress = _Progress(ctx, phase, len(tables))
+        copier = _Copier(src, dst, p["dbName"], progress)
+        # Destino sem FK checks: tabelas são copiadas em qualquer ordem
+        dst.exec_driver_sql("SET FOREIGN_KEY_CHECKS = 0")
+        try:
+            for t in tables:
+                progress.table = t.name
+                if phase == "copy":
+                    copier.copy_table(t)
+                else:
+                    copier.sync_table(t)
+                progress.tables_done += 1
+        finally:
+            dst.exec_driver_sql("SET FOREIGN_KEY_CHECKS = 1")
+        progress.table = None
+        progress.tick(force=True)
+        summary = progress.summary()
+        if phase == "final_sync":
+            summary["sourceChecksums"] = copier.sums
+        return summary
+
+
+def _cutover(ctx: JobContext) -> Dict[str, Any]:
+    p = ctx.payload
+    tenant_id = ctx.tenant_id
+    row = _tenant(tenant_id)
+    if row is None or row["deleted_at"] is not None:
+        raise RuntimeError("Tenant removido durante a relocação")
+    if row["database_host"] == p["target"]:
+        # Troca já feita numa tentativa anterior (sem o horário: carência inteira).
+        # A origem já estava congelada antes da troca: o checksum de agora vale
+        return {
+            "downtimeMs": None,
+            "alreadySwitched": True,
+            "switchedAt": time.time(),
+            "sourceChecksums": _source_checksums(p),
+        }
+
+    execute_sql("UPDATE tenants SET maintenance_mode = 1 WHERE id = :id", {"id": tenant_id})
+    tenant_directory.invalidate(tenant_id)
+    t0 = time.perf_counter()
+    try:
+        time.sleep(RELOCATION_DRAIN_SECONDS)
+        read_only = _freeze_source(p)
+        final = _copy_phase(ctx, "final_sync")
+        checksums = final.pop("sourceChecksums")
+        # deleted_at: DELETE do tenant durante o dreno ganha (o drop_tenant usa a origem)
+        switched = execute_sql(
+            """
+            UPDATE tenants SET database_host = :target, maintenance_mode = :maintenance
+            WHERE id = :id AND database_host = :source AND deleted_at IS NULL
+            """,
+            {"id": tenant_id, "target": p["target"], "source": p["source"], "maintenance": p["maintenance"]},
+        )
+        if switched != 1:
+            raise RuntimeError("Tenant removido ou database_host alterado durante a relocação")
+    except Exception:
+        _unfreeze_source(p)
+        execute_sql(
+            "UPDATE tenants SET maintenance_mode = :maintenance WHERE id = :id AND database_host = :source",
+            {"id": tenant_id, "maintenance": p["maintenance"], "source": p["source"]},
+        )
+        tenant_directory.invalidate(tenant_id)
+        raise
+
+    tenant_engines.evict(p["source"], p["dbName"])
+    invalidate_placement()
+    tenant_directory.invalidate(tenant_id)
+    downtime_ms = round((time.perf_counter() - t0) * 1000, 1)
+    print(f"--> Tenant `{p['slug']}` agora em {p['target']} (manutenção por {downtime_ms:.0f} ms)", flush=True)
+    return {
+        "downtimeMs": downtime_ms,
+        "finalSync": final,
+        "switchedAt": time.time(),
+        "sourceReadOnly": read_only,
+        "sourceChecksums": checksums,
+    }
+
+
+def _source_grace(ctx: JobContext, switched_at: float) -> Dict[str, Any]:
+    """Espera a carência a partir da troca (relógio de parede: vale também ao retomar)."""
+    if RELOCATION_KEEP_SOURCE:
+        return {"waitedSeconds": 0}
+    t0 = time.perf_counter()
+    while True:
+        remaining = switched_at + RELOCATION_SOURCE_GRACE_SECONDS - time.time()
+        if remaining <= 0:
+            break
+        ctx.heartbeat({"phase": "source_grace", "remainingSeconds": round(remaining)})
+        time.sleep(min(remaining, max(RELOCATION_PROGRESS_SECONDS, 1.0)))
+    return {"waitedSeconds": round(time.perf_counter() - t0, 1)}
+
+
+def _drop_source(ctx: JobContext, expected: Optional[Dict[str, List[int]]]) -> Dict[str, Any]:
+    p = ctx.payload
+    if RELOCATION_KEEP_SOURCE:
+        return {"kept": True}
+    if expected is None:
+        raise RuntimeError("Sem checksums da origem no cutover; origem mantida")
+    current = _source_checksums(p)
+    changed = sorted(t for t in set(current) | set(expected) if current.get(t) != expected.get(t))
+    if changed:
+        raise RuntimeError(
+            f"Origem `{p['dbName']}` em {p['source']} mudou depois do sync final "
+            f"({', '.join(changed[:5])}); drop cancelado, origem mantida"
+        )
+    _unfreeze_source(p)
+    dropped = drop_tenant_tables(ctx, p["source"], p["dbName"])
+    drop_physical_database(p["source"], p["dbName"])
+    return dropped
+
+
+def run_relocate_tenant(ctx: JobContext) -> Dict[str, Any]:
+    p = ctx.payload
+    print(f"--> Job #{ctx.id}: relocando `{p['dbName']}` {p['source']} -> {p['target']}", flush=True)
+    # Retomado no meio do copy: continua pelo MAX(pk) do destino e os syncs acertam o resto
+    ctx.step("prepare", lambda: _prepare(p))
+    copied = ctx.step("copy", lambda: _copy_phase(ctx, "copy"))
+    synced = ctx.step("sync_online", lambda: _copy_phase(ctx, "sync_online"))
+    cutover = ctx.step("cutover", lambda: _cutover(ctx))
+    ctx.step("source_grace", lambda: _source_grace(ctx, cutover.get("switchedAt") or time.time()))
+    source = ctx.step("drop_source", lambda: _drop_source(ctx, cutover.get("sourceChecksums")))
+
+    return {
+        "tenantId": ctx.tenant_id,
+        "slug": p["slug"],
+        "database": p["dbName"],
+        "source": p["source"],
+        "target": p["target"],
+        "rows": copied.get("rows"),
+        "rowsPerSec": copied.get("rowsPerSec"),
+        "resyncedChunks": (synced.get("resyncedChunks") or 0)
+        + ((cutover.get("finalSync") or {}).get("resyncedChunks") or 0),
+        "downtimeMs": cutover.get("downtimeMs"),
+        "sourceDropped": not (source or {}).get("kept", False),
+    }
+
+
+def compensate_relocate_tenant(ctx: JobContext) -> None:
+    """Antes da troca: descarta a cópia no destino. Depois: nada a desfazer."""
+    p = ctx.payload
+    row = _tenant(ctx.tenant_id) if ctx.tenant_id else None
+    if row is not None and row["database_host"] == p["target"]:
+        print(f"!! Relocação de `{p['slug']}`: tenant já em {p['target']}; origem fica em {p['source']}", flush=True)
+        return
+    # Falhou entre o congelamento e a troca: a origem volta a aceitar escrita
+    try:
+        _unfreeze_source(p)
+    except Exception as e:
+        print(f"🚨 Origem `{p['dbName']}` em {p['source']} pode ter ficado READ ONLY: {e}", flush=True)
+    execute_sql(
+        "UPDATE tenants SET maintenance_mode = :maintenance WHERE id = :id AND database_host = :source",
+        {"id": ctx.tenant_id, "maintenance": p["maintenance"], "source": p["source"]},
+    )
+    tenant_directory.invalidate(ctx.tenant_id)
+    print(f"!! ROLLBACK: drop da cópia `{p['dbName']}` em {p['target']}", flush=True)
+    drop_physical_database(p["target"], p["dbName"])
+
+
+register_job("relocate_tenant", run_relocate_tenant, compensate_relocate_tenant)
+
+
+def enqueue_relocate_tenant(tenant_id: int, target_host: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """
+    Enfileira a relocação. Sem `target_host`, usa o host de menor carga
+    (fora o atual). None se o tenant não existe; TenantSpecError para
+    destino inválido ou tenant com outro job em andamento.
+    """
+    with unit_of_work():
+        tenant = fetch_one(
+            """
+            SELECT id, slug, database_name, database_host, maintenance_mode
+            FROM tenants WHERE id = :id AND deleted_at IS NULL FOR UPDATE
+            """,
+            {"id": tenant_id},
+        )
+        if not tenant:
+            return None
+
+        busy = fetch_one(
+            """
+            SELECT id, kind FROM provisioning_jobs
+            WHERE tenant_id = :id AND status IN ('pending', 'running')
+            LIMIT 1
+            """,
+            {"id": tenant_id},
+        )
+        if busy:
+            raise TenantSpecError(f"Tenant com job {busy['kind']} em andamento (#{busy['id']})", 409)
+
+        source = tenant.get("database_host") or TENANT_DB_HOST
+        target = (target_host or "").strip()
+        if target:
+            if target not in active_hosts():
+                raise TenantSpecError(f"Host '{target}' não registrado ou inativo")
+        else:
+            target = choose_host(exclude=[source]) or ""
+        if not target:
+            raise TenantSpecError("Nenhum host destino disponível", 409)
+        if target == source:
+            raise TenantSpecError("Tenant já está nesse host")
+
+        job_id = enqueue_job(
+            "relocate_tenant",
+            {
+                "slug": tenant["slug"],
+                "dbName": tenant["database_name"],
+                "source": source,
+                "target": target,
+                "maintenance": bool(tenant.get("maintenance_mode")),
+            },
+            tenant_id=tenant_id,
+            # Cópia e DDL no destino; a origem só é lida
+            host=target,
+        )
+    return {"jobId": job_id, "tenant": {"id": tenant_id, "slug": tenant["slug"], "source": source, "target": target}}
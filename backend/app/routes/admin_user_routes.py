@@ -21,8 +21,12 @@ from functools import wraps
 
 from flask import Blueprint, g, jsonify, request
 
-from app.db import execute_sql, fetch_all, fetch_one, safe_db_error, ENV
+from app.db import execute_sql, fetch_all, fetch_all_in, fetch_one, fetch_rows, safe_db_error, ENV
+from app.dto import USER_ADMIN_ITEM_DTO
+from app.queries import IS_SUPER_ADMIN, USER_TENANTS_BY_USERS
 from app.routes.auth_routes import login_required
+from app.session_cache import session_cache
+from app.tenant_directory import tenant_directory
 
 admin_user_bp = Blueprint("admin_users", __name__, url_prefix="/api/admin")
 
@@ -32,38 +36,13 @@ def _super_admin_required(f):
     @wraps(f)
     @login_required
     def decorated(*args, **kwargs):
-        sa = fetch_one(
-            "SELECT 1 FROM super_admins WHERE email = :email AND is_active = TRUE",
-            {"email": g.current_user["email"]},
-        )
+        sa = fetch_one(IS_SUPER_ADMIN, {"email": g.current_user["email"]})
         if not sa:
             return jsonify({"error": "Acesso restrito a super administradores"}), 403
         return f(*args, **kwargs)
     return decorated
 
 
-def _user_to_item(row):
-    """Converte row do hub para item compatível com o frontend admin."""
-    return {
-        "id": row["id"],
-        "name": row["name"],
-        "nickname": row.get("nickname"),
-        "email": row["email"],
-        "phone": row.get("phone"),
-        "cpf": row.get("cpf"),
-        "cnpj": row.get("cnpj"),
-        "city": row.get("city"),
-        "state": row.get("state"),
-        "timezone": row.get("timezone"),
-        "avatar_url": row.get("avatar_url"),
-        "is_active": bool(row.get("is_active", True)),
-        "is_blocked": bool(row.get("is_blocked", False)),
-        "last_login_at": row["last_login_at"].isoformat() if row.get("last_login_at") else None,
-        "created_at": row["created_at"].isoformat() if row.get("created_at") else None,
-        "tenants": [],
-    }
-
-
 @admin_user_bp.get("/users")
 @_super_admin_required
 def list_users():
@@ -126,7 +105,7 @@ def list_users():
         params["limit_val"] = per_page
         params["offset_val"] = offset
 
-        users = fetch_all(
+        columns, rows = fetch_rows(
             f"""
             SELECT u.*
             FROM users u
@@ -137,23 +116,13 @@ def list_users():
             params,
         )
 
+        items = USER_ADMIN_ITEM_DTO.many(columns, rows)
+
         # Batch fetch tenants for all users on this page
         tenant_map: dict = {}
-        if users:
-            user_ids = [u["id"] for u in users]
-            placeholders = ",".join(str(uid) for uid in user_ids)
-            memberships = fetch_all(
-                f"""
-                SELECT ut.user_id, t.id, t.slug, t.display_name,
-                       s.slug AS system_slug, s.display_name AS system_name,
-                       ut.role
-                FROM user_tenants ut
-                INNER JOIN tenants t ON ut.tenant_id = t.id
-                INNER JOIN systems s ON t.system_id = s.id
-                WHERE ut.user_id IN ({placeholders}) AND ut.is_active = TRUE
-                ORDER BY s.display_order, t.display_name
-                """
-            )
+        if items:
+            user_ids = [item["id"] for item in items]
+            memberships = fetch_all_in(USER_TENANTS_BY_USERS, "user_ids", user_ids)
             for m in memberships:
                 uid = m["user_id"]
                 if uid not in tenant_map:
@@ -167,12 +136,8 @@ def list_users():
                     "role": m["role"],
                 })
 
-        # Build response items
-        items = []
-        for u in users:
-            item = _user_to_item(u)
-            item["tenants"] = tenant_map.get(u["id"], [])
-            items.append(item)
+        for item in items:
+            item["tenants"] = tenant_map.get(item["id"], [])
 
         pages = max(1, (total + per_page - 1) // per_page) if total > 0 else 0
 
@@ -218,8 +183,9 @@ def update_user(user_id: int):
             f"UPDATE users SET {', '.join(sets)} WHERE id = :id",
             params,
         )
+        session_cache.invalidate_user(user_id)
         updated = fetch_one("SELECT * FROM users WHERE id = :id", {"id": user_id})
-        return jsonify(_user_to_item(updated))
+        return jsonify(USER_ADMIN_ITEM_DTO(updated))
 
     except Exception as e:
         if ENV == "dev":
@@ -236,6 +202,7 @@ def activate_user(user_id: int):
             "UPDATE users SET is_active = TRUE, is_blocked = FALSE WHERE id = :id",
             {"id": user_id},
         )
+        session_cache.invalidate_user(user_id)
         return jsonify({"message": "Usuário ativado", "id": user_id})
     except Exception as e:
         if ENV == "dev":
@@ -252,6 +219,7 @@ def deactivate_user(user_id: int):
             "UPDATE users SET is_active = FALSE WHERE id = :id",
             {"id": user_id},
         )
+        session_cache.invalidate_user(user_id)
         return jsonify({"message": "Usuário desativado", "id": user_id})
     except Exception as e:
         if ENV == "dev":
@@ -268,6 +236,7 @@ def delete_user(user_id: int):
             "UPDATE users SET is_active = FALSE, is_blocked = TRUE, blocked_reason = 'deleted_by_admin' WHERE id = :id",
             {"id": user_id},
         )
+        session_cache.invalidate_user(user_id)
         return jsonify({"message": "Usuário removido", "id": user_id})
     except Exception as e:
         if ENV == "dev":
@@ -326,11 +295,8 @@ def add_user_to_tenant(user_id: int, tenant_id: int):
         if not user:
             return jsonify({"error": "Usuário não encontrado"}), 404
 
-        tenant = fetch_one(
-            "SELECT id, display_name FROM tenants WHERE id = :id AND is_active = TRUE",
-            {"id": tenant_id},
-        )
-        if not tenant:
+        tenant = tenant_directory.by_id(tenant_id)
+        if not tenant or not tenant["is_active"]:
             return jsonify({"error": "Tenant não encontrado"}), 404
 
         data = request.get_json(silent=True) or {}
@@ -18,14 +18,29 @@ import re
 import secrets
 import traceback
 from functools import wraps
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional
 
 import jwt
 from flask import Blueprint, current_app, g, jsonify, request
 from werkzeug.security import check_password_hash, generate_password_hash
 
-from app.db import execute_sql, fetch_all, fetch_one, safe_db_error
+from app.db import (
+    bulk_upsert, execute_sql, fetch_all, fetch_all_in, fetch_one, safe_db_error, unit_of_work,
+)
+from app.catalog import systems_catalog
+from app.dto import USER_DTO
 from app.email_service import is_smtp_configured, send_verification_email
+from app.queries import (
+    ACTIVE_TENANT_IDS_BY_SYSTEMS,
+    ACTIVE_USER_BY_ID,
+    IS_SUPER_ADMIN,
+    SESSION_BY_TOKEN,
+    TOUCH_SESSION,
+    USER_PRINCIPAL_BY_ID,
+    USER_TENANTS_BY_USER,
+)
+from app.session_cache import session_cache
+from app.tenant_directory import tenant_directory
 
 _SHA256_RE = re.compile(r"^[a-f0-9]{64}$")
 
@@ -134,34 +149,22 @@ def _revoke_session(token_hash: str, reason: str = None) -> None:
         """,
         {"token_hash": token_hash, "reason": reason},
     )
+    session_cache.invalidate(token_hash)
 
 
-def _user_to_dto(row: Dict[str, Any]) -> Dict[str, Any]:
-    """Converte row do banco para DTO."""
-    return {
-        "id": row["id"],
-        "name": row["name"],
-        "nickname": row.get("nickname"),
-        "email": row["email"],
-        "phone": row.get("phone"),
-        "cpf": row.get("cpf"),
-        "cnpj": row.get("cnpj"),
-        "avatarUrl": row.get("avatar_url"),
-        "bio": row.get("bio"),
-        "cep": row.get("cep"),
-        "logradouro": row.get("logradouro"),
-        "numero": row.get("numero"),
-        "bairro": row.get("bairro"),
-        "complemento": row.get("complemento"),
-        "city": row.get("city"),
-        "state": row.get("state"),
-        "timezone": row.get("timezone"),
-        "isActive": bool(row.get("is_active", True)),
-        "createdAt": row.get("created_at").isoformat() if row.get("created_at") else None,
-        "lastLoginAt": row.get("last_login_at").isoformat() if row.get("last_login_at") else None,
-        "onboardingCompletedAt": row.get("onboarding_completed_at").isoformat() if row.get("onboarding_completed_at") else None,
-        "emailVerifiedAt": row.get("email_verified_at").isoformat() if row.get("email_verified_at") else None,
-    }
+# Sistemas cujo cadastro entra direto em todos os tenants ativos
+_AUTO_APPROVE_SYSTEMS = {"quadra"}
+
+
+def _valid_systems(system_ids: List[Any]) -> Dict[int, str]:
+    """Filtra ids enviados pelo cliente: {system_id: slug} só dos que existem."""
+    valid: Dict[int, str] = {}
+    for sys_id in system_ids or []:
+        # id inválido ou inexistente é ignorado (catálogo em memória)
+        system = systems_catalog.by_id(sys_id)
+        if system:
+            valid[system["id"]] = system["slug"]
+    return valid
 
 
 # ------------------------------------------------------------
@@ -187,45 +190,37 @@ def login_required(f):
         except jwt.InvalidTokenError:
             return jsonify({"error": "Token inválido"}), 401
 
-        # Verificar se sessão ainda é válida
         token_hash = _hash_token(token)
-        session = fetch_one(
-            """
-            SELECT id, user_id, current_tenant_id
-            FROM user_sessions
-            WHERE token_hash = :token_hash
-              AND revoked_at IS NULL
-              AND expires_at > NOW()
-            """,
-            {"token_hash": token_hash},
-        )
+        cached = session_cache.get(token_hash)
+        if cached is None:
+            generation = session_cache.generation()
 
-        if not session:
-            return jsonify({"error": "Sessão inválida ou expirada"}), 401
+            # Verificar se sessão ainda é válida (MASTER: réplica atrasada traria
+            # sessão revogada ou usuário desativado de volta para o cache)
+            session = fetch_one(SESSION_BY_TOKEN, {"token_hash": token_hash}, primary=True)
+            if not session:
+                return jsonify({"error": "Sessão inválida ou expirada"}), 401
 
-        # Buscar usuário
-        user = fetch_one(
-            "SELECT * FROM users WHERE id = :id AND is_active = TRUE",
-            {"id": payload["user_id"]},
-        )
+            # Buscar usuário (só o principal; handlers que precisam da linha usam _current_user_row)
+            user = fetch_one(USER_PRINCIPAL_BY_ID, {"id": payload["user_id"]}, primary=True)
 
-        if not user:
-            return jsonify({"error": "Usuário não encontrado ou inativo"}), 401
+            if not user:
+                return jsonify({"error": "Usuário não encontrado ou inativo"}), 401
 
-        if user.get("is_blocked"):
-            return jsonify({"error": "Conta bloqueada", "reason": user.get("blocked_reason")}), 403
+            cached = session_cache.put(token_hash, session, user, generation)
 
-        # Atualizar última atividade
-        execute_sql(
-            "UPDATE user_sessions SET last_activity_at = NOW() WHERE id = :id",
-            {"id": session["id"]},
-        )
+        if cached.user.get("is_blocked"):
+            return jsonify({"error": "Conta bloqueada", "reason": cached.user.get("blocked_reason")}), 403
+
+        # Atualizar última atividade (no máximo a cada SESSION_TOUCH_SECONDS)
+        if session_cache.touch_due(cached):
+            execute_sql(TOUCH_SESSION, {"id": cached.session_id})
 
         # Disponibilizar no contexto
-        g.current_user = user
-        g.current_user_id = user["id"]
-        g.current_session_id = session["id"]
-        g.current_tenant_id = session.get("current_tenant_id")
+        g.current_user = cached.user
+        g.current_user_id = cached.user_id
+        g.current_session_id = cached.session_id
+        g.current_tenant_id = cached.current_tenant_id
         g.token_hash = token_hash
 
         return f(*args, **kwargs)
@@ -233,6 +228,11 @@ def login_required(f):
     return decorated
 
 
+def _current_user_row(primary: bool = False) -> Optional[Dict[str, Any]]:
+    """Linha completa do usuário logado (g.current_user tem só o principal)."""
+    return fetch_one(ACTIVE_USER_BY_ID, {"id": g.current_user_id}, primary=primary)
+
+
 # ------------------------------------------------------------
 # Rotas Públicas
 # ------------------------------------------------------------
@@ -291,107 +291,95 @@ def register():
         # Criar usuário
         password_hash = generate_password_hash(password)
 
-        execute_sql(
-            """
-            INSERT INTO users (
-                name, nickname, email, phone, cpf, cnpj,
-                cep, logradouro, numero, bairro, complemento,
-                city, state, timezone, password_hash
-            ) VALUES (
-                :name, :nickname, :email, :phone, :cpf, :cnpj,
-                :cep, :logradouro, :numero, :bairro, :complemento,
-                :city, :state, :timezone, :password_hash
+        # Uma conexão/transação para todo o cadastro (usuário, interesses,
+        # auto-join e sessão): um checkout e um commit
+        with unit_of_work():
+            execute_sql(
+                """
+                INSERT INTO users (
+                    name, nickname, email, phone, cpf, cnpj,
+                    cep, logradouro, numero, bairro, complemento,
+                    city, state, timezone, password_hash
+                ) VALUES (
+                    :name, :nickname, :email, :phone, :cpf, :cnpj,
+                    :cep, :logradouro, :numero, :bairro, :complemento,
+                    :city, :state, :timezone, :password_hash
+                )
+                """,
+                {
+                    "name": name,
+                    "nickname": nickname,
+                    "email": email,
+                    "phone": phone,
+                    "cpf": cpf,
+                    "cnpj": cnpj,
+                    "cep": cep,
+                    "logradouro": logradouro,
+                    "numero": numero,
+                    "bairro": bairro,
+                    "complemento": complemento,
+                    "city": city,
+                    "state": state,
+                    "timezone": tz,
+                    "password_hash": password_hash,
+                },
             )
-            """,
-            {
-                "name": name,
-                "nickname": nickname,
-                "email": email,
-                "phone": phone,
-                "cpf": cpf,
-                "cnpj": cnpj,
-                "cep": cep,
-                "logradouro": logradouro,
-                "numero": numero,
-                "bairro": bairro,
-                "complemento": complemento,
-                "city": city,
-                "state": state,
-                "timezone": tz,
-                "password_hash": password_hash,
-            },
-        )
 
-        # Buscar usuário criado
-        user = fetch_one("SELECT * FROM users WHERE email = :email", {"email": email})
+            # Buscar usuário criado
+            user = fetch_one("SELECT * FROM users WHERE email = :email", {"email": email})
 
-        # Gerar token de verificação de email e enviar
-        verification_token = secrets.token_urlsafe(32)
-        execute_sql(
-            """UPDATE users
-               SET email_verification_token = :token, email_verification_sent_at = NOW()
-               WHERE id = :id""",
-            {"token": verification_token, "id": user["id"]},
-        )
-        if is_smtp_configured():
+            # Gerar token de verificação de email
+            verification_token = secrets.token_urlsafe(32)
+            execute_sql(
+                """UPDATE users
+                   SET email_verification_token = :token, email_verification_sent_at = NOW()
+                   WHERE id = :id""",
+                {"token": verification_token, "id": user["id"]},
+            )
+
+            # Interesses e auto-join nunca derrubam o cadastro
             try:
-                send_verification_email(email, name, verification_token)
-            except Exception:
-                pass  # Não falha o registro se o email não for enviado
+                # Salvar interesses (lead capture): só system_ids que existem,
+                # em um único INSERT multi-row
+                systems = _valid_systems(interests)
+                bulk_upsert(
+                    "user_interests",
+                    ("user_id", "system_id"),
+                    ((user["id"], sid) for sid in systems),
+                )
 
-        # Salvar interesses (lead capture)
-        if interests:
-            for sys_id in interests:
-                try:
-                    execute_sql(
-                        """
-                        INSERT INTO user_interests (user_id, system_id)
-                        VALUES (:user_id, :system_id)
-                        ON DUPLICATE KEY UPDATE created_at = created_at
-                        """,
-                        {"user_id": user["id"], "system_id": int(sys_id)},
+                # Auto-join: sistemas auto-approve (ex: quadra) adicionam user direto
+                auto_system_ids = [sid for sid, slug in systems.items() if slug in _AUTO_APPROVE_SYSTEMS]
+                if auto_system_ids:
+                    auto_tenants = fetch_all_in(
+                        ACTIVE_TENANT_IDS_BY_SYSTEMS, "system_ids", auto_system_ids,
                     )
-                except Exception:
-                    pass  # ignora system_id inválido
-
-        # Auto-join: sistemas auto-approve (ex: quadra) adicionam user direto
-        _AUTO_APPROVE_SYSTEMS = {"quadra"}
-        if interests:
-            for sys_id in interests:
-                try:
-                    system = fetch_one(
-                        "SELECT slug FROM systems WHERE id = :id",
-                        {"id": int(sys_id)},
+                    bulk_upsert(
+                        "user_tenants",
+                        ("user_id", "tenant_id", "role"),
+                        ((user["id"], t["id"], "client") for t in auto_tenants),
+                        update={"is_active": "TRUE", "left_at": "NULL"},
                     )
-                    if not system or system["slug"] not in _AUTO_APPROVE_SYSTEMS:
-                        continue
+            except Exception:
+                pass  # ignora erro silenciosamente
 
-                    auto_tenants = fetch_all(
-                        "SELECT id FROM tenants WHERE system_id = :sys_id AND is_active = TRUE",
-                        {"sys_id": int(sys_id)},
-                    )
-                    for t in auto_tenants:
-                        execute_sql(
-                            """
-                            INSERT INTO user_tenants (user_id, tenant_id, role)
-                            VALUES (:user_id, :tenant_id, 'client')
-                            ON DUPLICATE KEY UPDATE is_active = TRUE, left_at = NULL
-                            """,
-                            {"user_id": user["id"], "tenant_id": t["id"]},
-                        )
-                except Exception:
-                    pass  # ignora erro silenciosamente
+            # Gerar token
+            token = _create_token(user["id"], email)
 
-        # Gerar token
-        token = _create_token(user["id"], email)
+            # Criar sessão
+            _create_session(user["id"], token)
 
-        # Criar sessão
-        _create_session(user["id"], token)
+        # Email só depois do commit (token já gravado)
+        if is_smtp_configured():
+            try:
+                send_verification_email(email, name, verification_token)
+            except Exception:
+                pass  # Não falha o registro se o email não for enviado
 
         return jsonify({
             "message": "Conta criada com sucesso!",
             "token": token,
-            "user": _user_to_dto(user),
+            "user": USER_DTO(user),
         }), 201
 
     except Exception as e:
@@ -447,35 +435,16 @@ def login():
         _create_session(user["id"], token)
 
         # Buscar tenants do usuário
-        tenants = fetch_all(
-            """
-            SELECT
-                t.id, t.slug, t.display_name, t.logo_url, t.primary_color,
-                s.slug AS system_slug, s.display_name AS system_name,
-                s.icon AS system_icon, s.color AS system_color,
-                ut.role
-            FROM user_tenants ut
-            INNER JOIN tenants t ON ut.tenant_id = t.id
-            INNER JOIN systems s ON t.system_id = s.id
-            WHERE ut.user_id = :user_id
-              AND ut.is_active = TRUE
-              AND t.is_active = TRUE
-            ORDER BY s.display_order, t.display_name
-            """,
-            {"user_id": user["id"]},
-        )
+        tenants = fetch_all(USER_TENANTS_BY_USER, {"user_id": user["id"]})
 
         # Verificar se é super admin
-        sa_row = fetch_one(
-            "SELECT 1 FROM super_admins WHERE email = :email AND is_active = TRUE",
-            {"email": email},
-        )
+        sa_row = fetch_one(IS_SUPER_ADMIN, {"email": email})
         is_super_admin = bool(sa_row)
 
         return jsonify({
             "message": "Login realizado com sucesso!",
             "token": token,
-            "user": _user_to_dto(user),
+            "user": USER_DTO(user),
             "isSuperAdmin": is_super_admin,
             "tenants": [
                 {
@@ -531,6 +500,7 @@ def logout_all():
             """,
             {"user_id": g.current_user_id},
         )
+        session_cache.invalidate_user(g.current_user_id)
         return jsonify({"message": "Todas as sessões foram encerradas"})
     except Exception as e:
         if ENV == "dev":
@@ -543,34 +513,19 @@ def logout_all():
 def get_me():
     """Retorna dados do usuário logado."""
     try:
+        user = _current_user_row()
+        if not user:
+            return jsonify({"error": "Usuário não encontrado ou inativo"}), 401
+
         # Buscar tenants
-        tenants = fetch_all(
-            """
-            SELECT
-                t.id, t.slug, t.display_name, t.logo_url, t.primary_color,
-                s.slug AS system_slug, s.display_name AS system_name,
-                s.icon AS system_icon, s.color AS system_color,
-                ut.role
-            FROM user_tenants ut
-            INNER JOIN tenants t ON ut.tenant_id = t.id
-            INNER JOIN systems s ON t.system_id = s.id
-            WHERE ut.user_id = :user_id
-              AND ut.is_active = TRUE
-              AND t.is_active = TRUE
-            ORDER BY s.display_order, t.display_name
-            """,
-            {"user_id": g.current_user_id},
-        )
+        tenants = fetch_all(USER_TENANTS_BY_USER, {"user_id": g.current_user_id})
 
         # Verificar se é super admin
-        sa_row = fetch_one(
-            "SELECT 1 FROM super_admins WHERE email = :email AND is_active = TRUE",
-            {"email": g.current_user["email"]},
-        )
+        sa_row = fetch_one(IS_SUPER_ADMIN, {"email": g.current_user["email"]})
         is_super_admin = bool(sa_row)
 
         return jsonify({
-            "user": _user_to_dto(g.current_user),
+            "user": USER_DTO(user),
             "isSuperAdmin": is_super_admin,
             "currentTenantId": g.current_tenant_id,
             "tenants": [
@@ -690,13 +645,14 @@ def update_me():
             f"UPDATE users SET {', '.join(updates)} WHERE id = :id",
             params,
         )
+        session_cache.invalidate_user(g.current_user_id)
 
         # Retornar usuário atualizado
         user = fetch_one("SELECT * FROM users WHERE id = :id", {"id": g.current_user_id})
 
         return jsonify({
             "message": "Perfil atualizado com sucesso",
-            "user": _user_to_dto(user),
+            "user": USER_DTO(user),
         })
 
     except Exception as e:
@@ -723,7 +679,8 @@ def change_password():
             return jsonify({"error": "Nova senha deve ter no mínimo 6 caracteres"}), 400
 
         # Verificar senha atual (suporta SHA256 legado e werkzeug)
-        if not _verify_stored_password(g.current_user["password_hash"], current_password):
+        user = _current_user_row(primary=True)
+        if not user or not _verify_stored_password(user["password_hash"], current_password):
             return jsonify({"error": "Senha atual incorreta"}), 401
 
         # Atualizar senha
@@ -744,6 +701,7 @@ def change_password():
             """,
             {"user_id": g.current_user_id, "current_session": g.current_session_id},
         )
+        session_cache.invalidate_user(g.current_user_id)
 
         return jsonify({"message": "Senha alterada com sucesso"})
 
@@ -792,24 +750,19 @@ def update_my_interests():
         data = request.get_json(silent=True) or {}
         system_ids = data.get("systemIds") or []
 
-        # Limpar interesses antigos
-        execute_sql(
-            "DELETE FROM user_interests WHERE user_id = :user_id",
-            {"user_id": g.current_user_id},
-        )
+        systems = _valid_systems(system_ids)
 
-        # Inserir novos
-        for sys_id in system_ids:
-            try:
-                execute_sql(
-                    """
-                    INSERT INTO user_interests (user_id, system_id)
-                    VALUES (:user_id, :system_id)
-                    """,
-                    {"user_id": g.current_user_id, "system_id": int(sys_id)},
-                )
-            except Exception:
-                pass  # ignora system_id inválido
+        # Troca os interesses em uma transação: DELETE + INSERT multi-row
+        with unit_of_work():
+            execute_sql(
+                "DELETE FROM user_interests WHERE user_id = :user_id",
+                {"user_id": g.current_user_id},
+            )
+            bulk_upsert(
+                "user_interests",
+                ("user_id", "system_id"),
+                ((g.current_user_id, sid) for sid in systems),
+            )
 
         return jsonify({"message": "Interesses atualizados com sucesso"})
     except Exception as e:
@@ -879,7 +832,9 @@ def verify_email():
 def resend_verification():
     """Reenviar email de verificação (autenticado)."""
     try:
-        user = g.current_user
+        user = _current_user_row(primary=True)
+        if not user:
+            return jsonify({"error": "Usuário não encontrado ou inativo"}), 401
         if user.get("email_verified_at"):
             return jsonify({"message": "Email já verificado"}), 200
 
@@ -924,17 +879,11 @@ def switch_tenant():
 
         # Buscar tenant
         if tenant_id:
-            tenant = fetch_one(
-                "SELECT id, slug, display_name FROM tenants WHERE id = :id AND is_active = TRUE",
-                {"id": tenant_id},
-            )
+            tenant = tenant_directory.by_id(tenant_id)
         else:
-            tenant = fetch_one(
-                "SELECT id, slug, display_name FROM tenants WHERE slug = :slug AND is_active = TRUE",
-                {"slug": tenant_slug},
-            )
+            tenant = tenant_directory.by_slug(tenant_slug)
 
-        if not tenant:
+        if not tenant or not tenant["is_active"]:
             return jsonify({"error": "Sistema não encontrado"}), 404
 
         # Verificar se usuário tem acesso
@@ -954,6 +903,7 @@ def switch_tenant():
             "UPDATE user_sessions SET current_tenant_id = :tenant_id WHERE id = :session_id",
             {"tenant_id": tenant["id"], "session_id": g.current_session_id},
         )
+        session_cache.invalidate(g.token_hash)
 
         return jsonify({
             "message": f"Contexto alterado para {tenant['display_name']}",
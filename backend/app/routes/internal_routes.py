@@ -0,0 +1,88 @@
+"""
+Rotas internas de observabilidade (inter-service / operação).
+
+Os números são por worker do gunicorn (cada processo tem seus pools);
+o campo "pid" identifica qual worker respondeu.
+
+Endpoints:
+- GET    /api/internal/db/pools   - Telemetria dos pools (master, admin, tenant)
+- GET    /api/internal/db/queries - Tempo por rota/query (histograma + top queries)
+- DELETE /api/internal/db/queries - Zera as métricas de query deste worker
+- GET    /api/internal/db/provisioning - Goldens, warm pool e clones/fallbacks deste worker
+- GET    /api/internal/cache - Caches em memória deste worker (sistemas, tenants, sessões, bus)
+"""
+from __future__ import annotations
+
+import os
+import traceback
+
+from flask import Blueprint, jsonify, request
+
+from app.cache_bus import cache_bus
+from app.catalog import systems_catalog
+from app.db import pool_stats, query_metrics, safe_db_error, sql_templates
+from app.provisioning import golden_stats
+from app.session_cache import session_cache
+from app.tenant_directory import tenant_directory
+from app.warm_pool import warm_pool_stats
+from app.routes.user_routes import _service_auth_required
+
+internal_bp = Blueprint("internal", __name__, url_prefix="/api/internal")
+
+ENV = os.getenv("ENV", "dev")
+
+
+@internal_bp.get("/db/pools")
+@_service_auth_required
+def get_pool_stats():
+    """Checked-out, overflow e tempo de espera dos pools deste worker."""
+    try:
+        return jsonify(pool_stats())
+    except Exception as e:
+        if ENV == "dev":
+            traceback.print_exc()
+        return jsonify({"error": safe_db_error(e)}), 500
+
+
+@internal_bp.get("/db/queries")
+@_service_auth_required
+def get_query_stats():
+    """Duração por rota e top queries por rota (query param `top`, default 20)."""
+    try:
+        top = min(200, max(1, int(request.args.get("top", 20))))
+        return jsonify(query_metrics.snapshot(top=top))
+    except Exception as e:
+        if ENV == "dev":
+            traceback.print_exc()
+        return jsonify({"error": safe_db_error(e)}), 500
+
+
+@internal_bp.delete("/db/queries")
+@_service_auth_required
+def reset_query_stats():
+    """Zera as métricas de query deste worker."""
+    query_metrics.reset()
+    return jsonify({"message": "Métricas zeradas"})
+
+
+@internal_bp.get("/db/provisioning")
+@_service_auth_required
+def get_provisioning_stats():
+    """Goldens e cache de templates deste worker; reservas do warm pool lidas dos hosts."""
+    return jsonify({
+        "golden": golden_stats(),
+        "warmPool": warm_pool_stats(),
+        "templates": sql_templates.stats(),
+    })
+
+
+@internal_bp.get("/cache")
+@_service_auth_required
+def get_cache_stats():
+    """Idade, hits e reloads dos caches em memória deste worker."""
+    return jsonify({
+        "systems": systems_catalog.stats(),
+        "tenants": tenant_directory.stats(),
+        "sessions": session_cache.stats(),
+        "bus": cache_bus.stats(),
+    })
@@ -17,13 +17,24 @@ from typing import Any, Dict
 from urllib.request import Request, urlopen
 
 from flask import Blueprint, g, jsonify, request
-from sqlalchemy import create_engine, text
-
 from app.db import (
-    execute_sql, fetch_all, fetch_one, safe_db_error,
-    build_tenant_database_url, TENANT_DB_HOST,
+    execute_sql, fetch_all, fetch_iter, fetch_one, safe_db_error, unit_of_work,
+    checkout, get_tenant_engine, TENANT_DB_HOST,
+)
+from app.dto import TENANT_DTO, TENANT_SYSTEM_DTO, Dto, Field, Iso, Opt
+from app.queries import (
+    MEMBERSHIP_ROLE,
+    TENANT_ADMIN_USER_IDS,
+    TENANT_DB_ADMIN_IDS,
+    TENANT_DB_PUSH_TOKENS,
+    TENANT_DB_TABLES,
+    TENANT_DB_USERS_BY_HUB_IDS,
+    USER_TENANTS_BY_USER,
 )
 from app.routes.auth_routes import login_required
+from app.session_cache import session_cache
+from app.streaming import json_list_response
+from app.tenant_directory import tenant_directory
 
 membership_bp = Blueprint("membership", __name__)
 
@@ -48,13 +59,7 @@ def _notify_tenant_admins_push(tenant, user_name: str, message: str):
             return
 
         # 1) Buscar user_ids dos admins deste tenant no hub
-        admins = fetch_all(
-            """
-            SELECT user_id FROM user_tenants
-            WHERE tenant_id = :tenant_id AND role = 'admin' AND is_active = TRUE
-            """,
-            {"tenant_id": tenant_id},
-        )
+        admins = fetch_all(TENANT_ADMIN_USER_IDS, {"tenant_id": tenant_id})
         if not admins:
             print(f"[push-join] Nenhum admin ativo no tenant {tenant_id}")
             return
@@ -64,49 +69,40 @@ def _notify_tenant_admins_push(tenant, user_name: str, message: str):
 
         # 2) Para cada admin do hub, buscar fk_id_user_hub no banco do tenant
         #    e pegar push_tokens
-        url = build_tenant_database_url(db_host, db_name)
-        engine = create_engine(url, pool_pre_ping=True, future=True)
+        engine = get_tenant_engine(db_host, db_name)
 
         all_tokens = []
-        with engine.connect() as conn:
+        with checkout(engine) as conn:
             # Verifica se tabelas existem
-            tables = [r[0] for r in conn.execute(text(
-                "SELECT TABLE_NAME FROM INFORMATION_SCHEMA.TABLES "
-                "WHERE TABLE_SCHEMA = :db AND TABLE_NAME IN ('users', 'push_tokens')"
-            ), {"db": db_name}).fetchall()]
+            tables = [r[0] for r in conn.execute(
+                TENANT_DB_TABLES.statement,
+                {"db": db_name, "tables": ["users", "push_tokens"]},
+            ).fetchall()]
 
             if "push_tokens" not in tables or "users" not in tables:
                 print(f"[push-join] Tabelas users/push_tokens não existem em {db_name}")
-                engine.dispose()
                 return
 
             # Buscar user_ids locais dos admins via fk_id_user_hub
-            placeholders = ",".join(str(uid) for uid in admin_hub_ids)
-            local_admins = conn.execute(text(
-                f"SELECT id FROM users WHERE fk_id_user_hub IN ({placeholders})"
-            )).fetchall()
+            local_admins = conn.execute(
+                TENANT_DB_USERS_BY_HUB_IDS.statement, {"hub_ids": admin_hub_ids}
+            ).fetchall()
 
             if not local_admins:
                 # Fallback: buscar por is_admin = 1
-                local_admins = conn.execute(text(
-                    "SELECT id FROM users WHERE is_admin = 1"
-                )).fetchall()
+                local_admins = conn.execute(TENANT_DB_ADMIN_IDS.statement).fetchall()
 
             local_admin_ids = [r[0] for r in local_admins]
             if not local_admin_ids:
                 print(f"[push-join] Nenhum admin local encontrado em {db_name}")
-                engine.dispose()
                 return
 
             # Buscar push tokens
-            id_list = ",".join(str(uid) for uid in local_admin_ids)
-            tokens = conn.execute(text(
-                f"SELECT token FROM push_tokens WHERE user_id IN ({id_list})"
-            )).fetchall()
+            tokens = conn.execute(
+                TENANT_DB_PUSH_TOKENS.statement, {"user_ids": local_admin_ids}
+            ).fetchall()
             all_tokens = [r[0] for r in tokens if r[0]]
 
-        engine.dispose()
-
         if not all_tokens:
             print(f"[push-join] Nenhum push token encontrado para admins de {db_name}")
             return
@@ -161,28 +157,23 @@ def _notify_tenant_admins_push(tenant, user_name: str, message: str):
 # ------------------------------------------------------------
 def _tenant_to_dto(row: Dict[str, Any], include_system: bool = True) -> Dict[str, Any]:
     """Converte row para DTO de tenant."""
-    dto = {
-        "id": row["id"],
-        "slug": row["slug"],
-        "displayName": row.get("display_name") or row["slug"],
-        "logoUrl": row.get("logo_url"),
-        "primaryColor": row.get("primary_color") or "#ef4444",
-        "welcomeMessage": row.get("welcome_message"),
-        "allowRegistration": bool(row.get("allow_registration", True)),
-        "memberCount": row.get("member_count", 0),
-    }
-
+    dto = TENANT_DTO(row)
     if include_system and row.get("system_slug"):
-        dto["system"] = {
-            "slug": row["system_slug"],
-            "displayName": row.get("system_name"),
-            "icon": row.get("system_icon"),
-            "color": row.get("system_color"),
-        }
-
+        dto["system"] = TENANT_SYSTEM_DTO(row)
     return dto
 
 
+_MEMBER_DTO = Dto("tenant_member", [
+    Field("id", "id"),
+    Field("name", "name"),
+    Opt("nickname", "nickname"),
+    Field("email", "email"),
+    Opt("avatarUrl", "avatar_url"),
+    Field("role", "role"),
+    Iso("joinedAt", "joined_at"),
+])
+
+
 # ------------------------------------------------------------
 # Rotas do Usuário (/api/user/*)
 # ------------------------------------------------------------
@@ -191,24 +182,7 @@ def _tenant_to_dto(row: Dict[str, Any], include_system: bool = True) -> Dict[str
 def list_my_tenants():
     """Lista todos os sistemas do usuário logado."""
     try:
-        tenants = fetch_all(
-            """
-            SELECT
-                t.id, t.slug, t.display_name, t.logo_url, t.primary_color,
-                t.welcome_message,
-                s.slug AS system_slug, s.display_name AS system_name,
-                s.icon AS system_icon, s.color AS system_color,
-                ut.role, ut.joined_at
-            FROM user_tenants ut
-            INNER JOIN tenants t ON ut.tenant_id = t.id
-            INNER JOIN systems s ON t.system_id = s.id
-            WHERE ut.user_id = :user_id
-              AND ut.is_active = TRUE
-              AND t.is_active = TRUE
-            ORDER BY s.display_order, t.display_name
-            """,
-            {"user_id": g.current_user_id},
-        )
+        tenants = fetch_all(USER_TENANTS_BY_USER, {"user_id": g.current_user_id})
 
         # Agrupar por sistema
         by_system = {}
@@ -260,27 +234,11 @@ def join_tenant():
 
         # Buscar tenant
         if tenant_id:
-            tenant = fetch_one(
-                """
-                SELECT t.*, s.slug AS system_slug, s.display_name AS system_name
-                FROM tenants t
-                INNER JOIN systems s ON t.system_id = s.id
-                WHERE t.id = :id AND t.is_active = TRUE
-                """,
-                {"id": tenant_id},
-            )
+            tenant = tenant_directory.by_id(tenant_id)
         else:
-            tenant = fetch_one(
-                """
-                SELECT t.*, s.slug AS system_slug, s.display_name AS system_name
-                FROM tenants t
-                INNER JOIN systems s ON t.system_id = s.id
-                WHERE t.slug = :slug AND t.is_active = TRUE
-                """,
-                {"slug": tenant_slug},
-            )
+            tenant = tenant_directory.by_slug(tenant_slug)
 
-        if not tenant:
+        if not tenant or not tenant["is_active"]:
             return jsonify({"error": "Sistema não encontrado"}), 404
 
         if tenant.get("maintenance_mode"):
@@ -438,6 +396,7 @@ def leave_tenant(tenant_id: int):
             """,
             {"user_id": g.current_user_id, "tenant_id": tenant_id},
         )
+        session_cache.invalidate_user(g.current_user_id)
 
         return jsonify({
             "message": f"Você saiu do {membership['display_name']}",
@@ -512,24 +471,16 @@ def list_available_tenants():
 def get_tenant_details(slug: str):
     """Detalhes de um tenant específico (público)."""
     try:
-        tenant = fetch_one(
-            """
-            SELECT
-                t.*,
-                s.slug AS system_slug, s.display_name AS system_name,
-                s.icon AS system_icon, s.color AS system_color,
-                (SELECT COUNT(*) FROM user_tenants ut
-                 WHERE ut.tenant_id = t.id AND ut.is_active = TRUE) AS member_count
-            FROM tenants t
-            INNER JOIN systems s ON t.system_id = s.id
-            WHERE t.slug = :slug AND t.is_active = TRUE
-            """,
-            {"slug": slug},
-        )
-
-        if not tenant:
+        tenant = tenant_directory.by_slug(slug)
+        if not tenant or not tenant["is_active"]:
             return jsonify({"error": "Sistema não encontrado"}), 404
 
+        # member_count muda a cada join/leave: fora do cache
+        tenant["member_count"] = fetch_one(
+            "SELECT COUNT(*) AS n FROM user_tenants WHERE tenant_id = :tenant_id AND is_active = TRUE",
+            {"tenant_id": tenant["id"]},
+        )["n"]
+
         dto = _tenant_to_dto(tenant)
         dto["description"] = tenant.get("welcome_message")
         dto["address"] = tenant.get("address")
@@ -574,17 +525,14 @@ def list_tenant_members(tenant_id: int):
     try:
         # Verificar permissão
         membership = fetch_one(
-            """
-            SELECT role FROM user_tenants
-            WHERE user_id = :user_id AND tenant_id = :tenant_id AND is_active = TRUE
-            """,
+            MEMBERSHIP_ROLE,
             {"user_id": g.current_user_id, "tenant_id": tenant_id},
         )
 
         if not membership or membership["role"] not in ("admin", "manager"):
             return jsonify({"error": "Sem permissão para ver membros"}), 403
 
-        members = fetch_all(
+        members = fetch_iter(
             """
             SELECT
                 u.id, u.name, u.nickname, u.email, u.avatar_url,
@@ -595,23 +543,10 @@ def list_tenant_members(tenant_id: int):
             ORDER BY ut.role DESC, u.name
             """,
             {"tenant_id": tenant_id},
+            dto=_MEMBER_DTO,
         )
 
-        return jsonify({
-            "members": [
-                {
-                    "id": m["id"],
-                    "name": m["name"],
-                    "nickname": m.get("nickname"),
-                    "email": m["email"],
-                    "avatarUrl": m.get("avatar_url"),
-                    "role": m["role"],
-                    "joinedAt": m["joined_at"].isoformat() if m.get("joined_at") else None,
-                }
-                for m in members
-            ],
-            "total": len(members),
-        })
+        return json_list_response(members, key="members", extra=lambda n: {"total": n})
 
     except Exception as e:
         if ENV == "dev":
@@ -626,10 +561,7 @@ def list_tenant_requests(tenant_id: int):
     try:
         # Verificar permissão
         membership = fetch_one(
-            """
-            SELECT role FROM user_tenants
-            WHERE user_id = :user_id AND tenant_id = :tenant_id AND is_active = TRUE
-            """,
+            MEMBERSHIP_ROLE,
             {"user_id": g.current_user_id, "tenant_id": tenant_id},
         )
 
@@ -681,10 +613,7 @@ def approve_request(tenant_id: int, request_id: int):
     try:
         # Verificar permissão
         membership = fetch_one(
-            """
-            SELECT role FROM user_tenants
-            WHERE user_id = :user_id AND tenant_id = :tenant_id AND is_active = TRUE
-            """,
+            MEMBERSHIP_ROLE,
             {"user_id": g.current_user_id, "tenant_id": tenant_id},
         )
 
@@ -705,30 +634,30 @@ def approve_request(tenant_id: int, request_id: int):
         if not req:
             return jsonify({"error": "Solicitação não encontrada"}), 404
 
-        # Aprovar
-        execute_sql(
-            """
-            UPDATE user_tenant_requests
-            SET status = 'approved', responded_by = :admin_id, responded_at = NOW()
-            WHERE id = :id
-            """,
-            {"id": request_id, "admin_id": g.current_user_id},
-        )
+        # Aprovar + criar membership na mesma transação
+        with unit_of_work():
+            execute_sql(
+                """
+                UPDATE user_tenant_requests
+                SET status = 'approved', responded_by = :admin_id, responded_at = NOW()
+                WHERE id = :id
+                """,
+                {"id": request_id, "admin_id": g.current_user_id},
+            )
 
-        # Criar membership
-        execute_sql(
-            """
-            INSERT INTO user_tenants (user_id, tenant_id, role, approved_by, approved_at)
-            VALUES (:user_id, :tenant_id, 'player', :admin_id, NOW())
-            ON DUPLICATE KEY UPDATE
-                is_active = TRUE, left_at = NULL, approved_by = :admin_id, approved_at = NOW()
-            """,
-            {
-                "user_id": req["user_id"],
-                "tenant_id": tenant_id,
-                "admin_id": g.current_user_id,
-            },
-        )
+            execute_sql(
+                """
+                INSERT INTO user_tenants (user_id, tenant_id, role, approved_by, approved_at)
+                VALUES (:user_id, :tenant_id, 'player', :admin_id, NOW())
+                ON DUPLICATE KEY UPDATE
+                    is_active = TRUE, left_at = NULL, approved_by = :admin_id, approved_at = NOW()
+                """,
+                {
+                    "user_id": req["user_id"],
+                    "tenant_id": tenant_id,
+                    "admin_id": g.current_user_id,
+                },
+            )
 
         return jsonify({
             "message": f"{req['user_name']} foi aprovado!",
@@ -750,10 +679,7 @@ def reject_request(tenant_id: int, request_id: int):
 
         # Verificar permissão
         membership = fetch_one(
-            """
-            SELECT role FROM user_tenants
-            WHERE user_id = :user_id AND tenant_id = :tenant_id AND is_active = TRUE
-            """,
+            MEMBERSHIP_ROLE,
             {"user_id": g.current_user_id, "tenant_id": tenant_id},
         )
 
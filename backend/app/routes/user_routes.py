@@ -19,11 +19,13 @@ from __future__ import annotations
 import os
 import traceback
 from functools import wraps
-from typing import Any, Dict
 
 from flask import Blueprint, jsonify, request
 
-from app.db import execute_sql, fetch_all, fetch_one, safe_db_error
+from app.db import execute_sql, fetch_all, fetch_iter, fetch_one, fetch_rows, safe_db_error, unit_of_work
+from app.dto import USER_PROFILE_DTO, Const, Iso, Opt
+from app.streaming import json_list_response
+from app.tenant_directory import tenant_directory
 
 user_bp = Blueprint("users", __name__, url_prefix="/api/users")
 
@@ -42,29 +44,12 @@ def _service_auth_required(f):
     return decorated
 
 
-def _user_profile_dto(row: Dict[str, Any]) -> Dict[str, Any]:
-    """Converte row do banco para DTO de perfil inter-service."""
-    return {
-        "id": row["id"],
-        "name": row["name"],
-        "nickname": row.get("nickname"),
-        "email": row["email"],
-        "phone": row.get("phone"),
-        "cpf": row.get("cpf"),
-        "cnpj": row.get("cnpj"),
-        "avatarUrl": row.get("avatar_url"),
-        "bio": row.get("bio"),
-        "cep": row.get("cep"),
-        "logradouro": row.get("logradouro"),
-        "numero": row.get("numero"),
-        "bairro": row.get("bairro"),
-        "complemento": row.get("complemento"),
-        "city": row.get("city"),
-        "state": row.get("state"),
-        "timezone": row.get("timezone"),
-        "isActive": bool(row.get("is_active", True)),
-        "createdAt": row.get("created_at").isoformat() if row.get("created_at") else None,
-    }
+# Membros de um tenant (by-tenant) e clientes de sistemas 'quadra' (all-active)
+_TENANT_USER_DTO = USER_PROFILE_DTO.extend("tenant_user", [
+    Opt("role", "role", "player"),
+    Iso("joinedAt", "joined_at"),
+])
+_CLIENT_USER_DTO = USER_PROFILE_DTO.extend("client_user", [Const("role", "client")])
 
 
 @user_bp.get("/<int:user_id>/profile")
@@ -91,7 +76,7 @@ def get_user_profile(user_id: int):
             {"user_id": user_id},
         )
 
-        dto = _user_profile_dto(user)
+        dto = USER_PROFILE_DTO(user)
         dto["interests"] = [
             {"id": i["id"], "slug": i["slug"], "displayName": i["display_name"]}
             for i in interests
@@ -113,14 +98,11 @@ def get_users_by_tenant(slug: str):
     Usado pelo SGQ e outros sistemas para listar membros/clientes.
     """
     try:
-        tenant = fetch_one(
-            "SELECT id FROM tenants WHERE slug = :slug AND is_active = TRUE",
-            {"slug": slug},
-        )
-        if not tenant:
+        tenant = tenant_directory.by_slug(slug)
+        if not tenant or not tenant["is_active"]:
             return jsonify({"error": "Tenant não encontrado"}), 404
 
-        rows = fetch_all(
+        rows = fetch_iter(
             """
             SELECT u.*, ut.role, ut.joined_at
             FROM user_tenants ut
@@ -129,16 +111,10 @@ def get_users_by_tenant(slug: str):
             ORDER BY u.name
             """,
             {"tid": tenant["id"]},
+            dto=_TENANT_USER_DTO,
         )
 
-        users = []
-        for r in rows:
-            dto = _user_profile_dto(r)
-            dto["role"] = r.get("role", "player")
-            dto["joinedAt"] = r["joined_at"].isoformat() if r.get("joined_at") else None
-            users.append(dto)
-
-        return jsonify({"users": users, "total": len(users)})
+        return json_list_response(rows, key="users", extra=lambda n: {"total": n})
 
     except Exception as e:
         if ENV == "dev":
@@ -162,7 +138,9 @@ def get_all_active_users():
         limit = min(2000, max(1, int(request.args.get("limit", 500))))
         offset = max(0, int(request.args.get("offset", 0)))
 
-        rows = fetch_all(
+        total_row = fetch_one("SELECT COUNT(*) AS cnt FROM users WHERE is_active = TRUE")
+
+        rows = fetch_iter(
             """
             SELECT * FROM users
             WHERE is_active = TRUE
@@ -170,18 +148,12 @@ def get_all_active_users():
             LIMIT :lim OFFSET :off
             """,
             {"lim": limit, "off": offset},
+            dto=_CLIENT_USER_DTO,
         )
 
-        total_row = fetch_one("SELECT COUNT(*) AS cnt FROM users WHERE is_active = TRUE")
-        total = total_row["cnt"] if total_row else len(rows)
-
-        users = []
-        for r in rows:
-            dto = _user_profile_dto(r)
-            dto["role"] = "client"
-            users.append(dto)
-
-        return jsonify({"users": users, "total": total})
+        return json_list_response(
+            rows, key="users", extra=lambda n: {"total": total_row["cnt"] if total_row else n},
+        )
 
     except Exception as e:
         if ENV == "dev":
@@ -205,7 +177,7 @@ def search_users():
 
         limit = min(100, max(1, int(request.args.get("limit", 20))))
 
-        rows = fetch_all(
+        columns, rows = fetch_rows(
             """
             SELECT * FROM users
             WHERE is_active = TRUE
@@ -221,7 +193,7 @@ def search_users():
         )
 
         return jsonify({
-            "users": [_user_profile_dto(r) for r in rows],
+            "users": USER_PROFILE_DTO.many(columns, rows),
             "total": len(rows),
         })
 
@@ -239,11 +211,8 @@ def link_user_to_tenant(slug: str, user_id: int):
     Body (opcional): { "role": "client" }
     """
     try:
-        tenant = fetch_one(
-            "SELECT id, display_name FROM tenants WHERE slug = :slug AND is_active = TRUE",
-            {"slug": slug},
-        )
-        if not tenant:
+        tenant = tenant_directory.by_slug(slug)
+        if not tenant or not tenant["is_active"]:
             return jsonify({"error": "Tenant não encontrado"}), 404
 
         user = fetch_one("SELECT id FROM users WHERE id = :id", {"id": user_id})
@@ -283,10 +252,7 @@ def link_user_to_tenant(slug: str, user_id: int):
 def unlink_user_from_tenant(slug: str, user_id: int):
     """Remove user de um tenant (inter-service)."""
     try:
-        tenant = fetch_one(
-            "SELECT id FROM tenants WHERE slug = :slug",
-            {"slug": slug},
-        )
+        tenant = tenant_directory.by_slug(slug)
         if not tenant:
             return jsonify({"error": "Tenant não encontrado"}), 404
 
@@ -314,11 +280,8 @@ def unlink_user_from_tenant(slug: str, user_id: int):
 def list_tenant_requests(slug: str):
     """Lista pedidos pendentes de acesso a um tenant (inter-service)."""
     try:
-        tenant = fetch_one(
-            "SELECT id FROM tenants WHERE slug = :slug AND is_active = TRUE",
-            {"slug": slug},
-        )
-        if not tenant:
+        tenant = tenant_directory.by_slug(slug)
+        if not tenant or not tenant["is_active"]:
             return jsonify({"error": "Tenant não encontrado"}), 404
 
         rows = fetch_all(
@@ -365,11 +328,8 @@ def list_tenant_requests(slug: str):
 def approve_tenant_request(slug: str, request_id: int):
     """Aprova um pedido de acesso (inter-service)."""
     try:
-        tenant = fetch_one(
-            "SELECT id FROM tenants WHERE slug = :slug AND is_active = TRUE",
-            {"slug": slug},
-        )
-        if not tenant:
+        tenant = tenant_directory.by_slug(slug)
+        if not tenant or not tenant["is_active"]:
             return jsonify({"error": "Tenant não encontrado"}), 404
 
         req_row = fetch_one(
@@ -386,24 +346,26 @@ def approve_tenant_request(slug: str, request_id: int):
         if req_row["status"] != "pending":
             return jsonify({"error": "Solicitação já foi processada"}), 409
 
-        execute_sql(
-            """
-            UPDATE user_tenant_requests
-            SET status = 'approved', responded_at = NOW()
-            WHERE id = :id
-            """,
-            {"id": request_id},
-        )
-
-        execute_sql(
-            """
-            INSERT INTO user_tenants (user_id, tenant_id, role, approved_at)
-            VALUES (:user_id, :tenant_id, 'player', NOW())
-            ON DUPLICATE KEY UPDATE
-                is_active = TRUE, left_at = NULL, approved_at = NOW()
-            """,
-            {"user_id": req_row["user_id"], "tenant_id": tenant["id"]},
-        )
+        # Aprovar + criar membership na mesma transação
+        with unit_of_work():
+            execute_sql(
+                """
+                UPDATE user_tenant_requests
+                SET status = 'approved', responded_at = NOW()
+                WHERE id = :id
+                """,
+                {"id": request_id},
+            )
+
+            execute_sql(
+                """
+                INSERT INTO user_tenants (user_id, tenant_id, role, approved_at)
+                VALUES (:user_id, :tenant_id, 'player', NOW())
+                ON DUPLICATE KEY UPDATE
+                    is_active = TRUE, left_at = NULL, approved_at = NOW()
+                """,
+                {"user_id": req_row["user_id"], "tenant_id": tenant["id"]},
+            )
 
         return jsonify({
             "message": f"{req_row['name']} foi aprovado!",
@@ -421,11 +383,8 @@ def approve_tenant_request(slug: str, request_id: int):
 def reject_tenant_request(slug: str, request_id: int):
     """Rejeita um pedido de acesso (inter-service)."""
     try:
-        tenant = fetch_one(
-            "SELECT id FROM tenants WHERE slug = :slug AND is_active = TRUE",
-            {"slug": slug},
-        )
-        if not tenant:
+        tenant = tenant_directory.by_slug(slug)
+        if not tenant or not tenant["is_active"]:
             return jsonify({"error": "Tenant não encontrado"}), 404
 
         req_row = fetch_one(
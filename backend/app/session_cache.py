@@ -0,0 +1,151 @@
+"""
+Cache de sessões validadas pelo login_required.
+
+Sem cache, cada request autenticada faz SELECT em user_sessions, SELECT em
+users e UPDATE de last_activity_at antes do handler. Aqui fica, por hash do
+token, o que o decorator precisa: id da sessão, tenant atual e um principal
+compacto do usuário (id, email, name, is_blocked, blocked_reason). Com a
+entrada válida, a request não faz nenhuma query de autenticação; o
+last_activity_at é gravado no máximo a cada SESSION_TOUCH_SECONDS.
+
+A entrada vive SESSION_CACHE_SECONDS (curto, e nunca além do expires_at da
+sessão) e é preenchida do MASTER. Logout, logout-all, troca de senha,
+switch-tenant, edição de perfil e ativar/desativar/remover usuário chamam
+invalidate()/invalidate_user() depois do commit: descarta aqui e publica no
+cache_bus, e os outros workers descartam em ~CACHE_SYNC_SECONDS (sem o bus,
+em até SESSION_CACHE_SECONDS).
+"""
+from __future__ import annotations
+
+import datetime
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Set
+
+from app.cache_bus import cache_bus
+
+SESSION_CACHE_SECONDS = float(os.getenv("SESSION_CACHE_SECONDS", "10"))
+SESSION_CACHE_MAX = int(os.getenv("SESSION_CACHE_MAX", "20000"))
+SESSION_TOUCH_SECONDS = float(os.getenv("SESSION_TOUCH_SECONDS", "60"))
+
+
+class CachedSession:
+    __slots__ = ("token_hash", "session_id", "user_id", "current_tenant_id", "user", "expires_at", "touched_at")
+
+    def __init__(self, token_hash: str, session: Dict[str, Any], user: Dict[str, Any], expires_at: float) -> None:
+        self.token_hash = token_hash
+        self.session_id = session["id"]
+        self.user_id = int(user["id"])
+        self.current_tenant_id = session.get("current_tenant_id")
+        self.user = user
+        self.expires_at = expires_at
+        self.touched_at = 0.0
+
+
+class SessionCache:
+    def __init__(self, ttl: float, max_entries: int, touch_interval: float) -> None:
+        self.ttl = ttl
+        self.max_entries = max(max_entries, 1)
+        self.touch_interval = touch_interval
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, CachedSession]" = OrderedDict()
+        self._by_user: Dict[int, Set[str]] = {}
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.touches = 0
+
+    def generation(self) -> int:
+        """Capturar antes das queries e passar para put() (invalidação no meio descarta)."""
+        return self._generation
+
+    def get(self, token_hash: str) -> Optional[CachedSession]:
+        cache_bus.sync()
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(token_hash)
+            if entry is not None and entry.expires_at > now:
+                self._entries.move_to_end(token_hash)
+                self.hits += 1
+                return entry
+            # Entrada vencida fica até o put(): ele herda o touched_at dela
+            self.misses += 1
+            return None
+
+    def put(self, token_hash: str, session: Dict[str, Any], user: Dict[str, Any], generation: int) -> CachedSession:
+        expires = time.monotonic() + self.ttl
+        session_expires = session.get("expires_at")
+        if isinstance(session_expires, datetime.datetime):
+            remaining = (session_expires - datetime.datetime.now()).total_seconds()
+            expires = min(expires, time.monotonic() + remaining)
+        entry = CachedSession(token_hash, session, user, expires)
+        with self._lock:
+            if generation == self._generation:
+                previous = self._entries.get(token_hash)
+                if previous is not None and previous.session_id == entry.session_id:
+                    entry.touched_at = previous.touched_at
+                self._drop(token_hash)
+                self._entries[token_hash] = entry
+                self._by_user.setdefault(entry.user_id, set()).add(token_hash)
+                while len(self._entries) > self.max_entries:
+                    self._drop(next(iter(self._entries)))
+        return entry
+
+    def touch_due(self, entry: CachedSession) -> bool:
+        """True (uma thread só) quando é hora de gravar last_activity_at de novo."""
+        now = time.monotonic()
+        with self._lock:
+            if now - entry.touched_at < self.touch_interval:
+                return False
+            entry.touched_at = now
+            self.touches += 1
+            return True
+
+    def _drop(self, token_hash: str) -> None:
+        entry = self._entries.pop(token_hash, None)
+        if entry is None:
+            return
+        hashes = self._by_user.get(entry.user_id)
+        if hashes is not None:
+            hashes.discard(token_hash)
+            if not hashes:
+                del self._by_user[entry.user_id]
+
+    def invalidate(self, token_hash: str) -> None:
+        """Uma sessão, em todos os processos."""
+        cache_bus.publish("session", token_hash)
+
+    def invalidate_user(self, user_id: int) -> None:
+        """Todas as sessões do usuário, em todos os processos."""
+        cache_bus.publish("user", int(user_id))
+
+    def _drop_session(self, token_hash: str) -> None:
+        with self._lock:
+            self._generation += 1
+            self._drop(token_hash)
+
+    def _drop_user(self, user_id: int) -> None:
+        with self._lock:
+            self._generation += 1
+            for token_hash in list(self._by_user.get(int(user_id), ())):
+                self._drop(token_hash)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "users": len(self._by_user),
+                "maxEntries": self.max_entries,
+                "ttlSeconds": self.ttl,
+                "touchSeconds": self.touch_interval,
+                "hits": self.hits,
+                "misses": self.misses,
+                "touches": self.touches,
+            }
+
+
+session_cache = SessionCache(SESSION_CACHE_SECONDS, SESSION_CACHE_MAX, SESSION_TOUCH_SECONDS)
+cache_bus.subscribe("session", session_cache._drop_session)
+cache_bus.subscribe("user", lambda ref: session_cache._drop_user(int(ref)))
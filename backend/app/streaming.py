@@ -0,0 +1,61 @@
+"""
+Respostas JSON em streaming para listas grandes.
+
+Monta o JSON aos pedaços a partir de um iterador (ex.: db.fetch_iter), sem
+materializar a lista inteira. O primeiro item é lido antes de devolver a
+Response, então erros na query ainda caem no try/except da rota e viram 500.
+"""
+from __future__ import annotations
+
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional
+
+from flask import Response, current_app, stream_with_context
+
+# Itens serializados por pedaço enviado ao cliente
+STREAM_FLUSH_ITEMS = 200
+
+_END = object()
+
+
+def json_list_response(
+    items: Iterable[Any],
+    key: Optional[str] = None,
+    extra: Optional[Callable[[int], Dict[str, Any]]] = None,
+) -> Response:
+    """
+    Streama `items` como lista JSON.
+
+    - key=None: corpo é a lista pura (`[...]`).
+    - key="users": corpo é `{"users": [...], **extra(total)}`; `extra` recebe
+      quantos itens foram enviados (útil para "total").
+    """
+    dumps = current_app.json.dumps
+    it: Iterator[Any] = iter(items)
+    first = next(it, _END)
+
+    def generate() -> Iterator[str]:
+        count = 0
+        buf = ["{" + dumps(key) + ":[" if key is not None else "["]
+        try:
+            if first is not _END:
+                buf.append(dumps(first))
+                count = 1
+                for item in it:
+                    buf.append("," + dumps(item))
+                    count += 1
+                    if len(buf) >= STREAM_FLUSH_ITEMS:
+                        yield "".join(buf)
+                        buf = []
+        finally:
+            # Cliente desconectou no meio: devolve a conexão do fetch_iter ao pool
+            close = getattr(it, "close", None)
+            if close is not None:
+                close()
+        buf.append("]")
+        if key is not None:
+            for k, v in (extra(count) if extra else {}).items():
+                buf.append("," + dumps(k) + ":" + dumps(v))
+            buf.append("}")
+        yield "".join(buf)
+
+    return Response(stream_with_context(generate()), mimetype="application/json")
@@ -0,0 +1,153 @@
+"""
+Resolução de tenants (por slug e por id) em memória.
+
+select-tenant, switch-tenant, join, detalhes públicos e as rotas inter-service
+começam todas com um SELECT em tenants por slug/id. O diretório guarda a linha
+de tenants (todas as colunas, ativo ou não) por TENANT_CACHE_SECONDS e junta
+os campos do sistema na leitura, a partir do catálogo (app.catalog):
+
+    tenant_directory.by_slug(slug)  -> dict com t.* + system_slug/name/icon/color, ou None
+    tenant_directory.by_id(id)      -> idem
+
+Quem lê confere is_active/maintenance_mode como antes. Slug/id inexistente
+também fica em cache, por no máximo _MISS_SECONDS.
+
+Toda escrita em tenants chama invalidate(tenant_id, slug) depois do commit:
+descarta aqui e publica no cache_bus, e os outros workers do gunicorn
+descartam em ~CACHE_SYNC_SECONDS. O TTL fica só como rede de segurança
+(bus fora do ar).
+"""
+from __future__ import annotations
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from app.cache_bus import cache_bus
+from app.catalog import systems_catalog
+from app.db import fetch_one, named_query
+
+TENANT_CACHE_SECONDS = float(os.getenv("TENANT_CACHE_SECONDS", "5"))
+TENANT_CACHE_MAX = int(os.getenv("TENANT_CACHE_MAX", "5000"))
+# Não encontrado: cache curto (tenant recém-criado aparece logo nos outros workers)
+_MISS_SECONDS = 5.0
+
+TENANT_BY_SLUG = named_query("tenants.directory_by_slug", "SELECT * FROM tenants WHERE slug = :slug")
+TENANT_BY_ID = named_query("tenants.directory_by_id", "SELECT * FROM tenants WHERE id = :id")
+
+_Key = Tuple[str, Any]
+
+
+class TenantDirectory:
+    def __init__(self, ttl: float, max_entries: int) -> None:
+        self.ttl = ttl
+        self.max_entries = max(max_entries, 1)
+        self._lock = threading.Lock()
+        # chave ("slug", slug) | ("id", id) -> (linha ou None, expira_em)
+        self._entries: "OrderedDict[_Key, Tuple[Optional[Dict[str, Any]], float]]" = OrderedDict()
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _get(self, key: _Key) -> Optional[Dict[str, Any]]:
+        cache_bus.sync()
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+            generation = self._generation
+
+        if key[0] == "slug":
+            row = fetch_one(TENANT_BY_SLUG, {"slug": key[1]}, primary=True)
+        else:
+            row = fetch_one(TENANT_BY_ID, {"id": key[1]}, primary=True)
+
+        expires = time.monotonic() + (self.ttl if row else min(self.ttl, _MISS_SECONDS))
+        with self._lock:
+            # invalidate() durante o SELECT: usa a linha, mas não guarda
+            if generation == self._generation:
+                if row:
+                    self._entries[("slug", row["slug"])] = (row, expires)
+                    self._entries[("id", int(row["id"]))] = (row, expires)
+                else:
+                    self._entries[key] = (None, expires)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return row
+
+    @staticmethod
+    def _with_system(row: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        if row is None:
+            return None
+        # Mesmo resultado do INNER JOIN systems: sem sistema, sem tenant
+        system = systems_catalog.by_id(row["system_id"])
+        if system is None:
+            return None
+        return {
+            **row,
+            "system_slug": system["slug"],
+            "system_name": system["display_name"],
+            "system_icon": system["icon"],
+            "system_color": system["color"],
+        }
+
+    def by_slug(self, slug: str) -> Optional[Dict[str, Any]]:
+        slug = (slug or "").strip()
+        if not slug:
+            return None
+        return self._with_system(self._get(("slug", slug)))
+
+    def by_id(self, tenant_id: Any) -> Optional[Dict[str, Any]]:
+        try:
+            key = ("id", int(tenant_id))
+        except (TypeError, ValueError):
+            return None
+        return self._with_system(self._get(key))
+
+    def invalidate(self, tenant_id: Optional[int] = None, slug: Optional[str] = None) -> None:
+        """Descarta um tenant (por id e/ou slug) em todos os processos; sem argumentos, tudo aqui."""
+        if tenant_id is None and slug is None:
+            with self._lock:
+                self._generation += 1
+                self._entries.clear()
+            return
+        if tenant_id is not None:
+            cache_bus.publish("tenant", int(tenant_id))
+        if slug is not None:
+            cache_bus.publish("tenant_slug", slug)
+
+    def _drop(self, tenant_id: Optional[int] = None, slug: Optional[str] = None) -> None:
+        with self._lock:
+            self._generation += 1
+            keys = []
+            if tenant_id is not None:
+                keys.append(("id", int(tenant_id)))
+            if slug is not None:
+                keys.append(("slug", slug))
+            for key in list(keys):
+                entry = self._entries.get(key)
+                if entry is not None and entry[0] is not None:
+                    keys += [("id", int(entry[0]["id"])), ("slug", entry[0]["slug"])]
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "maxEntries": self.max_entries,
+                "ttlSeconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+tenant_directory = TenantDirectory(TENANT_CACHE_SECONDS, TENANT_CACHE_MAX)
+cache_bus.subscribe("tenant", lambda ref: tenant_directory._drop(tenant_id=int(ref)))
+cache_bus.subscribe("tenant_slug", lambda ref: tenant_directory._drop(slug=ref))
@@ -0,0 +1,467 @@
+"""
+Handlers de jobs de tenant (app.jobs).
+
+create_tenant: o POST /api/super-admin/create-tenant já gravou o tenant no
+MASTER (inativo) e o job; aqui rodam as etapas pesadas, cada uma idempotente
+para poder ser retomada:
+
+    create_database -> schema -> migrations_baseline -> tenant_admin
+    -> hub_membership -> hub_link -> activate
+
+Se falhar, o rollback compensatório dropa o DB físico e remove o tenant do
+MASTER (pelo id gravado no job, nunca pelo slug).
+
+drop_tenant: o DELETE só marca o tenant (is_active = 0, deleted_at); aqui as
+tabelas são dropadas uma a uma, da menor para a maior, com pausa proporcional
+ao tamanho da que acabou de sair (o host respira entre DROPs grandes). Depois
+vem o DROP DATABASE (já vazio) e a remoção do registro:
+
+    drop_tables -> drop_database -> delete_record
+"""
+from __future__ import annotations
+
+import os
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+from app.db import (
+    TEMPLATES_DIR,
+    TENANT_DB_HOST,
+    build_db_name_from_slug,
+    checkout,
+    create_physical_database,
+    drop_physical_database,
+    execute_sql,
+    fetch_one,
+    get_target_admin_engine,
+    get_tenant_engine,
+    safe_db_error,
+    tenant_engines,
+    unit_of_work,
+    validate_slug,
+)
+from app.catalog import systems_catalog
+from app.jobs import JobContext, enqueue_job, register_job
+from app.placement import PlacementError, choose_host, invalidate as invalidate_placement
+from app.security import hash_password
+from app.tenant_directory import tenant_directory
+from app.tenant_migrations import baseline_tenant
+from app.provisioning import provision_tenant_schema
+from app.warm_pool import claim_spare
+
+BULK_TENANTS_MAX = int(os.getenv("BULK_TENANTS_MAX", "100"))
+# Pausa entre DROP TABLEs do drop_tenant: fixa + proporcional ao tamanho dropado
+TENANT_DROP_PAUSE_SECONDS = float(os.getenv("TENANT_DROP_PAUSE_SECONDS", "0.2"))
+TENANT_DROP_PAUSE_PER_GB = float(os.getenv("TENANT_DROP_PAUSE_PER_GB", "5"))
+
+class TenantSpecError(ValueError):
+    """Spec de tenant inválida (vira 4xx na rota)."""
+
+    def __init__(self, message: str, status: int = 400) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+_FALLBACK_USERS_DDL = """
+    CREATE TABLE IF NOT EXISTS users (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        name VARCHAR(100),
+        email VARCHAR(100) UNIQUE,
+        password_hash VARCHAR(255),
+        role VARCHAR(20) DEFAULT 'admin',
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+
+def _schema(p: Dict[str, Any], resumed: bool) -> str:
+    host, db_name, system_slug = p["host"], p["dbName"], p["systemSlug"]
+    if resumed:
+        # Etapa interrompida no meio: recomeça de um database vazio
+        drop_physical_database(host, db_name)
+        create_physical_database(host, db_name)
+
+    template_path = TEMPLATES_DIR / f"model_{system_slug}.sql"
+    if not template_path.exists():
+        # fallback mínimo
+        print("--> Template não encontrado. Criando tabela genérica users.", flush=True)
+        with checkout(get_tenant_engine(host, db_name), begin=True) as conn:
+            conn.exec_driver_sql(_FALLBACK_USERS_DDL)
+        return "fallback"
+
+    # Reserva do warm pool (só RENAME TABLE); senão clona o golden / aplica o template
+    try:
+        spare = claim_spare(host, system_slug, db_name, template_path)
+    except Exception as spare_err:
+        print(f"⚠️  Warm pool indisponível: {spare_err}", flush=True)
+        spare = None
+    if spare:
+        print(f"--> Reserva `{spare}` assumida como `{db_name}`", flush=True)
+        return "spare"
+    return provision_tenant_schema(host, db_name, system_slug, template_path)
+
+
+def _tenant_admin(p: Dict[str, Any]) -> None:
+    admin = p["admin"]
+    with checkout(get_tenant_engine(p["host"], p["dbName"]), begin=True) as conn:
+        exists = conn.exec_driver_sql(
+            "SELECT 1 FROM users WHERE email = %s", (admin["email"],)
+        ).first()
+        if exists:
+            return
+
+        if p["systemSlug"] == "jogador":
+            # User direto (sem Player separado - pos-merge v2)
+            conn.exec_driver_sql(
+                """
+                INSERT INTO users (
+                    email, password_hash,
+                    is_admin, is_approved, is_blocked, is_monthly,
+                    name, nickname, phone, photo,
+                    skill_rating
+                )
+                VALUES (
+                    %s, %s,
+                    1, 1, 0, 0,
+                    %s, %s, NULL, NULL,
+                    0.0
+                )
+                """,
+                (admin["email"], admin["passHash"], admin["name"], admin["nickname"]),
+            )
+        else:
+            # generico (outros sistemas: quadra, arbitro, etc)
+            conn.exec_driver_sql(
+                """
+                INSERT INTO users (name, email, password_hash, role)
+                VALUES (%s, %s, %s, 'admin')
+                """,
+                (admin["name"], admin["email"], admin["passHash"]),
+            )
+
+
+def _hub_membership(p: Dict[str, Any], tenant_id: int) -> int:
+    """Cria/encontra o user no HUB e vincula membership admin (uma transação)."""
+    admin = p["admin"]
+    with unit_of_work():
+        hub_user = fetch_one("SELECT id FROM users WHERE email = :email", {"email": admin["email"]})
+        if not hub_user:
+            execute_sql(
+                """
+                INSERT INTO users (name, nickname, email, password_hash, is_active)
+                VALUES (:name, :nickname, :email, :pass_hash, TRUE)
+                """,
+                {
+                    "name": admin["name"],
+                    "nickname": admin["nickname"],
+                    "email": admin["email"],
+                    "pass_hash": admin["passHash"],
+                },
+            )
+            hub_user = fetch_one("SELECT id FROM users WHERE email = :email", {"email": admin["email"]})
+        hub_user_id = hub_user["id"]
+
+        execute_sql(
+            """
+            INSERT INTO user_tenants (user_id, tenant_id, role, is_active)
+            VALUES (:user_id, :tenant_id, 'admin', TRUE)
+            ON DUPLICATE KEY UPDATE role = 'admin', is_active = TRUE
+            """,
+            {"user_id": hub_user_id, "tenant_id": tenant_id},
+        )
+    return hub_user_id
+
+
+def _hub_link(p: Dict[str, Any], hub_user_id: int) -> Optional[str]:
+    """Atualiza fk_id_user_hub no user local do tenant (best-effort)."""
+    try:
+        with checkout(get_tenant_engine(p["host"], p["dbName"]), begin=True) as conn:
+            conn.exec_driver_sql(
+                "UPDATE users SET fk_id_user_hub = %s WHERE email = %s",
+                (hub_user_id, p["admin"]["email"]),
+            )
+        return None
+    except Exception as hub_link_err:
+        print(f"⚠️  fk_id_user_hub não atualizado (coluna pode não existir): {hub_link_err}", flush=True)
+        return "skipped"
+
+
+def _activate(tenant_id: int) -> None:
+    execute_sql("UPDATE tenants SET is_active = 1 WHERE id = :id", {"id": tenant_id})
+    tenant_directory.invalidate(tenant_id)
+
+
+def run_create_tenant(ctx: JobContext) -> Dict[str, Any]:
+    p = ctx.payload
+    tenant_id = ctx.tenant_id
+
+    # Limite por host (PROVISION_HOST_CONCURRENCY) já aplicado no claim (app.jobs)
+    print(f"--> Job #{ctx.id}: criando DB `{p['dbName']}` em {p['host']}...", flush=True)
+    ctx.step("create_database", lambda: create_physical_database(p["host"], p["dbName"]))
+    # `schema` só é "retomado" se já tinha começado em outra tentativa
+    resumed = ctx.resumed and ctx.done("schema") is None and ctx.done("create_database") is not None
+    method = ctx.step("schema", lambda: _schema(p, resumed))
+    # Template já tem o schema final: migrations atuais entram como aplicadas
+    ctx.step("migrations_baseline", lambda: baseline_tenant(p["host"], p["dbName"], p["systemSlug"]))
+    ctx.step("tenant_admin", lambda: _tenant_admin(p))
+    hub_user_id = ctx.step("hub_membership", lambda: _hub_membership(p, tenant_id))
+    ctx.step("hub_link", lambda: _hub_link(p, hub_user_id))
+    ctx.step("activate", lambda: _activate(tenant_id))
+
+    return {
+        "tenantId": tenant_id,
+        "slug": p["slug"],
+        "database": p["dbName"],
+        "admin": p["admin"]["email"],
+        "host": p["host"],
+        "schema": method,
+    }
+
+
+def compensate_create_tenant(ctx: JobContext) -> None:
+    """Rollback compensatório (sem depender de transação entre bancos)."""
+    p = ctx.payload
+    print(f"!! ROLLBACK: drop database `{p['dbName']}` em {p['host']}", flush=True)
+    drop_physical_database(p["host"], p["dbName"])
+    if ctx.tenant_id:
+        print(f"!! ROLLBACK: removendo tenant `{p['slug']}` do MASTER", flush=True)
+        execute_sql("DELETE FROM tenants WHERE id = :id", {"id": ctx.tenant_id})
+        tenant_directory.invalidate(ctx.tenant_id, p["slug"])
+
+
+register_job("create_tenant", run_create_tenant, compensate_create_tenant)
+
+
+def drop_tenant_tables(ctx: JobContext, host: str, db_name: str) -> Dict[str, Any]:
+    """
+    DROP TABLE uma a uma, menores primeiro. Relê o que sobrou a cada
+    tentativa, então retomar no meio só continua de onde parou.
+    """
+    tenant_engines.evict(host, db_name)
+    dropped = 0
+    dropped_bytes = 0
+    with checkout(get_target_admin_engine(host)) as conn:
+        tables = conn.exec_driver_sql(
+            """
+            SELECT table_name, COALESCE(data_length + index_length, 0)
+            FROM information_schema.TABLES
+            WHERE table_schema = %s
+            ORDER BY 2, 1
+            """,
+            (db_name,),
+        ).fetchall()
+        # FKs entre as tabelas do tenant não podem travar a ordem por tamanho
+        conn.exec_driver_sql("SET FOREIGN_KEY_CHECKS = 0")
+        try:
+            for table, size in tables:
+                conn.exec_driver_sql(f"DROP TABLE IF EXISTS `{db_name}`.`{table}`")
+                dropped += 1
+                dropped_bytes += int(size)
+                ctx.heartbeat({"droppedTables": dropped, "remainingTables": len(tables) - dropped})
+                pause = TENANT_DROP_PAUSE_SECONDS + TENANT_DROP_PAUSE_PER_GB * int(size) / 1024 ** 3
+                if pause > 0 and dropped < len(tables):
+                    time.sleep(pause)
+        finally:
+            conn.exec_driver_sql("SET FOREIGN_KEY_CHECKS = 1")
+    return {"tables": dropped, "bytes": dropped_bytes}
+
+
+def _delete_record(tenant_id: int) -> None:
+    # Só remove se ainda estiver marcado (ninguém "desexcluiu" no meio)
+    execute_sql("DELETE FROM tenants WHERE id = :id AND deleted_at IS NOT NULL", {"id": tenant_id})
+    invalidate_placement()
+    tenant_directory.invalidate(tenant_id)
+
+
+def run_drop_tenant(ctx: JobContext) -> Dict[str, Any]:
+    p = ctx.payload
+
+    # Mesmo limite por host do provisionamento (no claim): DROP também é DDL pesado
+    print(f"--> Job #{ctx.id}: excluindo DB `{p['dbName']}` em {p['host']}...", flush=True)
+    dropped = ctx.step("drop_tables", lambda: drop_tenant_tables(ctx, p["host"], p["dbName"]))
+    ctx.step("drop_database", lambda: drop_physical_database(p["host"], p["dbName"]))
+    ctx.step("delete_record", lambda: _delete_record(ctx.tenant_id))
+
+    return {"tenantId": ctx.tenant_id, "slug": p["slug"], "database": p["dbName"], "host": p["host"], **(dropped or {})}
+
+
+register_job("drop_tenant", run_drop_tenant)
+
+
+def enqueue_drop_tenant(tenant_id: int) -> Optional[Dict[str, Any]]:
+    """
+    Marca o tenant como excluído (sai do ar na hora) e enfileira o drop_tenant
+    na mesma transação. Repetir o DELETE devolve o job em andamento; se o
+    último falhou, enfileira outro. None se o tenant não existe; tenant ainda
+    em provisionamento levanta TenantSpecError (409).
+    """
+    with unit_of_work():
+        tenant = fetch_one(
+            """
+            SELECT id, slug, display_name, database_name, database_host, deleted_at
+            FROM tenants WHERE id = :id FOR UPDATE
+            """,
+            {"id": tenant_id},
+        )
+        if not tenant:
+            return None
+
+        # relocate_tenant: o drop usaria o host antigo enquanto a cópia/troca segue
+        busy = fetch_one(
+            """
+            SELECT id, kind FROM provisioning_jobs
+            WHERE tenant_id = :id AND kind IN ('create_tenant', 'relocate_tenant')
+              AND status IN ('pending', 'running')
+            LIMIT 1
+            """,
+            {"id": tenant_id},
+        )
+        if busy:
+            if busy["kind"] == "relocate_tenant":
+                raise TenantSpecError("Tenant em relocação", 409)
+            raise TenantSpecError("Tenant ainda em provisionamento", 409)
+
+        if tenant["deleted_at"] is not None:
+            last = fetch_one(
+                """
+                SELECT id, status FROM provisioning_jobs
+                WHERE tenant_id = :id AND kind = 'drop_tenant'
+                ORDER BY id DESC LIMIT 1
+                """,
+                {"id": tenant_id},
+            )
+            if last and last["status"] != "failed":
+                return {"jobId": last["id"], "tenant": tenant}
+        else:
+            execute_sql(
+                "UPDATE tenants SET is_active = 0, deleted_at = NOW() WHERE id = :id",
+                {"id": tenant_id},
+            )
+
+        job_id = enqueue_job(
+            "drop_tenant",
+            {
+                "slug": tenant["slug"],
+                "dbName": tenant["database_name"],
+                "host": tenant.get("database_host") or TENANT_DB_HOST,
+            },
+            tenant_id=tenant_id,
+            host=tenant.get("database_host") or TENANT_DB_HOST,
+        )
+    # Depois do commit: ninguém recarrega a linha antiga no meio da transação
+    tenant_directory.invalidate(tenant_id, tenant["slug"])
+    return {"jobId": job_id, "tenant": tenant}
+
+
+def enqueue_create_tenant(data: Dict[str, Any], batch_id: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Valida a spec, grava o tenant no MASTER (inativo) e o job create_tenant
+    na mesma transação. Devolve {"jobId", "tenant"}; spec inválida ou slug em
+    uso levantam TenantSpecError.
+    """
+    if not data.get("slug") or not data.get("systemSlug"):
+        raise TenantSpecError("Slug e systemSlug são obrigatórios")
+    try:
+        slug = validate_slug(data["slug"])
+    except ValueError as e:
+        raise TenantSpecError(str(e)) from e
+    system_slug = (data["systemSlug"] or "").strip().lower()
+
+    # Valida system
+    system = systems_catalog.by_slug(system_slug)
+    if not system:
+        raise TenantSpecError("Sistema inválido")
+
+    # Evita duplicidade de slug
+    exists = fetch_one("SELECT id FROM tenants WHERE slug = :slug", {"slug": slug}, primary=True)
+    if exists:
+        raise TenantSpecError("Este slug já está em uso.", 409)
+
+    # Nome físico do novo DB
+    db_name = build_db_name_from_slug(slug)
+
+    # Host destino onde o DB vai nascer: o menos carregado do tenant_hosts
+    # (ou `databaseHost`, que precisa estar registrado, ativo e com vaga)
+    try:
+        target_host = choose_host((data.get("databaseHost") or "").strip() or None)
+    except PlacementError as e:
+        raise TenantSpecError(str(e), e.status) from e
+    if not target_host:
+        raise TenantSpecError("Nenhum host disponível para novos tenants", 503)
+
+    admin_email = data.get("adminEmail", f"admin@{slug}.com")
+    admin = {
+        "email": admin_email,
+        "name": data.get("adminName", "Super Admin"),
+        "nickname": data.get("adminNickname", "Super Admin"),
+        # Só o hash vai para o payload do job
+        "passHash": hash_password(data.get("adminPassword", "123")),
+    }
+
+    # Tenant (inativo até o job terminar) + job na mesma transação
+    with unit_of_work():
+        execute_sql(
+            """
+            INSERT INTO tenants (
+                system_id, slug, display_name, database_name, database_host,
+                primary_color, is_active, allow_registration
+            ) VALUES (
+                :system_id, :slug, :display_name, :db_name, :db_host,
+                :color, 0, 1
+            )
+            """,
+            {
+                "system_id": system["id"],
+                "slug": slug,
+                "display_name": data.get("displayName", slug),
+                "db_name": db_name,
+                "db_host": target_host,
+                "color": data.get("primaryColor", "#ef4444"),
+            },
+        )
+        tenant_id = fetch_one("SELECT LAST_INSERT_ID() AS id")["id"]
+        job_id = enqueue_job(
+            "create_tenant",
+            {
+                "slug": slug,
+                "systemSlug": system_slug,
+                "dbName": db_name,
+                "host": target_host,
+                "admin": admin,
+            },
+            tenant_id=tenant_id,
+            batch_id=batch_id,
+            host=target_host,
+        )
+
+    # Slug pode estar em cache como "não encontrado"
+    tenant_directory.invalidate(tenant_id, slug)
+    return {
+        "jobId": job_id,
+        "tenant": {"id": tenant_id, "slug": slug, "database": db_name, "admin": admin_email, "host": target_host},
+    }
+
+
+def enqueue_tenant_batch(specs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Enfileira um job create_tenant por spec, todos com o mesmo batch_id.
+    Spec rejeitada não impede as outras: cada item volta com jobId ou error.
+    """
+    if len(specs) > BULK_TENANTS_MAX:
+        raise TenantSpecError(f"Máximo de {BULK_TENANTS_MAX} tenants por lote")
+
+    batch_id = str(uuid.uuid4())
+    items: List[Dict[str, Any]] = []
+    for i, spec in enumerate(specs):
+        slug = spec.get("slug") if isinstance(spec, dict) else None
+        try:
+            if not isinstance(spec, dict):
+                raise TenantSpecError("Spec inválida")
+            queued = enqueue_create_tenant(spec, batch_id=batch_id)
+            items.append({"index": i, "slug": slug, "status": "pending", **queued})
+        except TenantSpecError as e:
+            items.append({"index": i, "slug": slug, "status": "rejected", "error": str(e), "code": e.status})
+        except Exception as e:
+            items.append({"index": i, "slug": slug, "status": "rejected", "error": safe_db_error(e), "code": 500})
+    return {"batchId": batch_id, "items": items}
@@ -0,0 +1,420 @@
+"""
+Migrations dos databases de tenant (a pasta migrations/ da raiz é só do MASTER).
+
+Arquivos versionados por sistema, aplicados em ordem de nome:
+
+    app/templates_sql/migrations/<system>/NNN_descricao.sql
+
+Cada tenant tem o seu ledger (`_schema_migrations`) com checksum e o número
+de statements já executados; uma migration que falhou no meio é retomada a
+partir do statement seguinte na próxima execução. Ao mudar o schema, a
+migration nova entra aqui E o model_<system>.sql é atualizado junto: tenants
+novos nascem com o template atual e o ledger "baseline" (todas as migrations
+existentes marcadas como aplicadas, ver baseline_tenant).
+
+Execução na frota inteira (todos os registros de `tenants`), em paralelo com
+no máximo N tenants por host ao mesmo tempo:
+
+    cd backend && python -m app.tenant_migrations [--system jogador]
+        [--tenant copa-brahma] [--concurrency 4] [--dry-run]
+
+ou via POST /api/super-admin/tenant-migrations (job em background; 409 se
+já houver um pendente ou rodando). Cada tenant migra com GET_LOCK
+('tmig:<host>/<db>'): a CLI e o job (ou dois jobs) nunca aplicam o mesmo
+statement duas vezes no mesmo database; quem não pega o lock registra erro
+no tenant e segue.
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import os
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from app.db import (
+    ADMIN_POOL_OPTIONS,
+    TEMPLATES_DIR,
+    TENANT_DB_HOST,
+    _split_sql_statements,
+    checkout,
+    fetch_all,
+    get_template_engine,
+)
+from app.jobs import JobContext, JobLeaseLost, register_job
+
+TENANT_MIGRATIONS_DIR = Path(os.getenv("TENANT_MIGRATIONS_DIR", str(TEMPLATES_DIR / "migrations")))
+# Cada tenant migrando segura uma conexão do get_template_engine do host
+_HOST_POOL_CAPACITY = ADMIN_POOL_OPTIONS["pool_size"] + ADMIN_POOL_OPTIONS["max_overflow"]
+# Tenants migrando ao mesmo tempo por host (default = capacidade do pool)
+TENANT_MIGRATIONS_HOST_CONCURRENCY = int(
+    os.getenv("TENANT_MIGRATIONS_HOST_CONCURRENCY", str(_HOST_POOL_CAPACITY))
+)
+
+# Espera pelo lock do tenant (outra execução migrando o mesmo database)
+TENANT_MIGRATIONS_LOCK_TIMEOUT = int(os.getenv("TENANT_MIGRATIONS_LOCK_TIMEOUT", "0"))
+
+LEDGER_TABLE = "_schema_migrations"
+
+_LEDGER_DDL = f"""
+    CREATE TABLE IF NOT EXISTS `{LEDGER_TABLE}` (
+        migration VARCHAR(255) PRIMARY KEY,
+        checksum CHAR(64) NOT NULL,
+        status VARCHAR(16) NOT NULL DEFAULT 'applied',
+        statements_done INT NOT NULL DEFAULT 0,
+        duration_ms INT NULL,
+        applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+    )
+"""
+
+_DB_NAME_RE = re.compile(r"^[a-z0-9_]+$")
+
+
+class TenantMigration:
+    __slots__ = ("name", "checksum", "statements")
+
+    def __init__(self, name: str, checksum: str, statements: Sequence[str]) -> None:
+        self.name = name
+        self.checksum = checksum
+        self.statements = tuple(statements)
+
+
+def load_migrations(system_slug: str) -> List[TenantMigration]:
+    """Migrations do sistema em ordem de nome (vazio se a pasta não existe)."""
+    folder = TENANT_MIGRATIONS_DIR / system_slug
+    out: List[TenantMigration] = []
+    for path in sorted(folder.glob("*.sql")):
+        raw = path.read_bytes()
+        out.append(
+            TenantMigration(
+                path.name,
+                hashlib.sha256(raw).hexdigest(),
+                _split_sql_statements(raw.decode("utf-8")),
+            )
+        )
+    return out
+
+
+def _use(conn, db_name: str) -> None:
+    if not _DB_NAME_RE.match(db_name or ""):
+        raise ValueError("database_name inválido")
+    conn.exec_driver_sql(f"USE `{db_name}`")
+    conn.exec_driver_sql(_LEDGER_DDL)
+
+
+def _lock_name(host: str, db_name: str) -> str:
+    name = f"tmig:{host}/{db_name}"
+    # GET_LOCK aceita no máximo 64 caracteres
+    return name if len(name) <= 64 else "tmig:" + hashlib.sha256(name.encode()).hexdigest()[:40]
+
+
+def baseline_tenant(target_host: Optional[str], db_name: str, system_slug: str) -> int:
+    """
+    Marca todas as migrations atuais como aplicadas num tenant recém-criado
+    (o template já contém o schema final). Devolve quantas marcou.
+    """
+    host = (target_host or "").strip() or TENANT_DB_HOST
+    migrations = load_migrations(system_slug)
+    with checkout(get_template_engine(host)) as conn:
+        _use(conn, db_name)
+        for m in migrations:
+            conn.exec_driver_sql(
+                f"""
+                INSERT IGNORE INTO `{LEDGER_TABLE}` (migration, checksum, status, statements_done, duration_ms)
+                VALUES (%s, %s, 'baseline', %s, 0)
+                """,
+                (m.name, m.checksum, len(m.statements)),
+            )
+    return len(migrations)
+
+
+def migrate_tenant(tenant: Dict[str, Any], migrations: Sequence[TenantMigration], dry_run: bool = False) -> Dict[str, Any]:
+    """
+    Aplica as migrations pendentes em um tenant. Retoma migration parcial do
+    statement seguinte ao último executado. Não levanta: o erro vai no resultado.
+    """
+    host = (tenant.get("database_host") or "").strip() or TENANT_DB_HOST
+    db_name = tenant["database_name"]
+    out: Dict[str, Any] = {
+        "tenantId": tenant["id"],
+        "slug": tenant["slug"],
+        "host": host,
+        "applied": [],
+        "pending": [],
+        "checksumMismatch": [],
+        "error": None,
+    }
+    t0 = time.perf_counter()
+    current = None
+    lock = _lock_name(host, db_name)
+    try:
+        with checkout(get_template_engine(host)) as conn:
+            # Lock antes de ler o ledger: outra execução pode estar no meio de uma migration
+            if not dry_run:
+                got = conn.exec_driver_sql(
+                    "SELECT GET_LOCK(%s, %s)", (lock, TENANT_MIGRATIONS_LOCK_TIMEOUT)
+                ).scalar()
+                if got != 1:
+                    raise RuntimeError("tenant em migração por outra execução")
+            try:
+                _use(conn, db_name)
+                ledger = {
+                    r[0]: (r[1], r[2], r[3])
+                    for r in conn.exec_driver_sql(
+                        f"SELECT migration, checksum, status, statements_done FROM `{LEDGER_TABLE}`"
+                    )
+                }
+                for m in migrations:
+                    checksum, status, done = ledger.get(m.name, (None, None, 0))
+                    if status in ("applied", "baseline"):
+                        if checksum != m.checksum:
+                            out["checksumMismatch"].append(m.name)
+                        continue
+                    out["pending"].append(m.name)
+                    if dry_run:
+                        continue
+                    if status == "partial" and checksum != m.checksum:
+                        # Retomar pelo índice só vale para o mesmo arquivo
+                        current = m.name
+                        raise RuntimeError(
+                            f"migration parcial ({done} statement(s)) foi alterada; corrija o tenant manualmente"
+                        )
+
+                    current = m.name
+                    m0 = time.perf_counter()
+                    if status is None:
+                        conn.exec_driver_sql(
+                            f"INSERT INTO `{LEDGER_TABLE}` (migration, checksum, status, statements_done) "
+                            "VALUES (%s, %s, 'partial', 0)",
+                            (m.name, m.checksum),
+                        )
+                    # DDL no MySQL faz commit implícito: o progresso é por statement
+                    for i in range(done, len(m.statements)):
+                        conn.exec_driver_sql(m.statements[i])
+                        conn.exec_driver_sql(
+                            f"UPDATE `{LEDGER_TABLE}` SET statements_done = %s WHERE migration = %s",
+                            (i + 1, m.name),
+                        )
+                    conn.exec_driver_sql(
+                        f"UPDATE `{LEDGER_TABLE}` SET status = 'applied', checksum = %s, duration_ms = %s "
+                        "WHERE migration = %s",
+                        (m.checksum, int((time.perf_counter() - m0) * 1000), m.name),
+                    )
+                    out["applied"].append(m.name)
+                    current = None
+            finally:
+                if not dry_run:
+                    conn.exec_driver_sql("SELECT RELEASE_LOCK(%s)", (lock,))
+    except Exception as e:
+        out["error"] = f"{current or '-'}: {type(e).__name__}: {e}"[:1000]
+    out["ms"] = round((time.perf_counter() - t0) * 1000, 1)
+    return out
+
+
+def list_fleet(system_slug: Optional[str] = None, tenant_slugs: Optional[Sequence[str]] = None) -> List[Dict[str, Any]]:
+    """Tenants a migrar (exceto os em provisionamento, relocação ou exclusão)."""
+    where = [
+        "t.deleted_at IS NULL",
+        """NOT EXISTS (
+            SELECT 1 FROM provisioning_jobs j
+            WHERE j.tenant_id = t.id AND j.kind IN ('create_tenant', 'relocate_tenant')
+              AND j.status IN ('pending', 'running')
+        )"""
+    ]
+    params: Dict[str, Any] = {}
+    if system_slug:
+        where.append("s.slug = :system")
+        params["system"] = system_slug
+    rows = fetch_all(
+        f"""
+        SELECT t.id, t.slug, t.database_name, t.database_host, s.slug AS system_slug
+        FROM tenants t
+        JOIN systems s ON s.id = t.system_id
+        WHERE {' AND '.join(where)}
+        ORDER BY t.id
+        """,
+        params,
+        primary=True,
+    )
+    if tenant_slugs:
+        wanted = set(tenant_slugs)
+        rows = [r for r in rows if r["slug"] in wanted]
+    return rows
+
+
+def run_fleet(
+    system_slug: Optional[str] = None,
+    tenant_slugs: Optional[Sequence[str]] = None,
+    host_concurrency: int = TENANT_MIGRATIONS_HOST_CONCURRENCY,
+    dry_run: bool = False,
+    on_result: Optional[Callable[[Dict[str, Any], Dict[str, Any]], None]] = None,
+    cancel: Optional[threading.Event] = None,
+) -> Dict[str, Any]:
+    """
+    Migra a frota: um ThreadPoolExecutor por host (host_concurrency threads),
+    todos os hosts em paralelo. `on_result(resultado, resumo_parcial)` é
+    chamado a cada tenant concluído; com `cancel` setado, os tenants que
+    ainda não começaram são pulados.
+    """
+    # Acima da capacidade do pool, as threads só ficariam esperando conexão
+    host_concurrency = max(1, min(host_concurrency, _HOST_POOL_CAPACITY))
+    tenants = list_fleet(system_slug, tenant_slugs)
+    migrations = {s: load_migrations(s) for s in {t["system_slug"] for t in tenants}}
+
+    by_host: Dict[str, List[Dict[str, Any]]] = {}
+    for t in tenants:
+        by_host.setdefault((t.get("database_host") or "").strip() or TENANT_DB_HOST, []).append(t)
+
+    lock = threading.Lock()
+    summary: Dict[str, Any] = {
+        "tenants": len(tenants),
+        "done": 0,
+        "failed": 0,
+        "migrationsApplied": 0,
+        "dryRun": dry_run,
+        "hosts": {h: len(ts) for h, ts in by_host.items()},
+        "hostConcurrency": host_concurrency,
+        "failures": [],
+        "checksumMismatch": [],
+    }
+    t0 = time.perf_counter()
+
+    def run_one(t: Dict[str, Any]) -> None:
+        if cancel is not None and cancel.is_set():
+            return
+        res = migrate_tenant(t, migrations[t["system_slug"]], dry_run=dry_run)
+        with lock:
+            summary["done"] += 1
+            summary["migrationsApplied"] += len(res["applied"])
+            if res["error"]:
+                summary["failed"] += 1
+                summary["failures"].append({"slug": res["slug"], "error": res["error"]})
+            if res["checksumMismatch"]:
+                summary["checksumMismatch"].append({"slug": res["slug"], "migrations": res["checksumMismatch"]})
+            if on_result is not None:
+                on_result(res, summary)
+
+    pools = [
+        ThreadPoolExecutor(max_workers=host_concurrency, thread_name_prefix=f"tmig-{host}")
+        for host in by_host
+    ]
+    try:
+        futures = [
+            pool.submit(run_one, t)
+            for pool, ts in zip(pools, by_host.values())
+            for t in ts
+        ]
+        for f in futures:
+            f.result()
+    finally:
+        for pool in pools:
+            pool.shutdown(wait=True)
+
+    elapsed = time.perf_counter() - t0
+    summary["seconds"] = round(elapsed, 2)
+    summary["tenantsPerSecond"] = round(summary["done"] / elapsed, 2) if elapsed > 0 else None
+    summary["migrationsPerSecond"] = round(summary["migrationsApplied"] / elapsed, 2) if elapsed > 0 else None
+    return summary
+
+
+# ------------------------------------------------------------
+# Job (POST /api/super-admin/tenant-migrations)
+# ------------------------------------------------------------
+_HEARTBEAT_SECONDS = 15.0
+
+
+def run_tenant_migrations_job(ctx: JobContext) -> Dict[str, Any]:
+    p = ctx.payload
+    progress: Dict[str, Any] = {}
+    stop = threading.Event()
+    lost = threading.Event()
+
+    def on_result(_res: Dict[str, Any], summary: Dict[str, Any]) -> None:
+        # Só guarda o progresso (sob o lock do run_fleet); quem grava é o renew
+        progress.update({k: summary[k] for k in ("tenants", "done", "failed", "migrationsApplied")})
+
+    def renew() -> None:
+        # Lease renovado por tempo: um ALTER longo num tenant (ou todos os
+        # tenants de um host demorando) não deixa o lease expirar
+        while not stop.wait(_HEARTBEAT_SECONDS):
+            try:
+                ctx.heartbeat(dict(progress) or None)
+            except JobLeaseLost:
+                lost.set()
+                return
+            except Exception as e:
+                print(f"⚠️  Job #{ctx.id}: falha ao renovar o lease: {e}", flush=True)
+
+    timer = threading.Thread(target=renew, name=f"tmig-lease-{ctx.id}", daemon=True)
+    timer.start()
+    try:
+        # Retomada (worker morreu): o ledger de cada tenant pula o que já foi aplicado
+        summary = run_fleet(
+            system_slug=p.get("system"),
+            tenant_slugs=p.get("tenants"),
+            host_concurrency=int(p.get("concurrency") or TENANT_MIGRATIONS_HOST_CONCURRENCY),
+            dry_run=bool(p.get("dryRun")),
+            on_result=on_result,
+            cancel=lost,
+        )
+    finally:
+        stop.set()
+        timer.join()
+    if lost.is_set():
+        # Outro worker retomou: os tenants que faltaram ficam com ele
+        raise JobLeaseLost(f"Job #{ctx.id}: lease perdido para outro worker")
+    return summary
+
+
+register_job("tenant_migrations", run_tenant_migrations_job)
+
+
+# ------------------------------------------------------------
+# CLI
+# ------------------------------------------------------------
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Aplica migrations pendentes nos databases de tenant.")
+    parser.add_argument("--system", help="só tenants deste sistema (ex.: jogador)")
+    parser.add_argument("--tenant", action="append", help="só este slug (pode repetir)")
+    parser.add_argument("--concurrency", type=int, default=TENANT_MIGRATIONS_HOST_CONCURRENCY,
+                        help="tenants simultâneos por host")
+    parser.add_argument("--dry-run", action="store_true", help="só lista o que está pendente")
+    args = parser.parse_args(argv)
+
+    def on_result(res: Dict[str, Any], summary: Dict[str, Any]) -> None:
+        if res["error"]:
+            tag = "ERRO"
+        elif args.dry_run:
+            tag = f"{len(res['pending'])} pendente(s)"
+        else:
+            tag = f"{len(res['applied'])} aplicada(s)"
+        print(f"  [{summary['done']}/{summary['tenants']}] {res['slug']} @ {res['host']}: {tag} ({res['ms']} ms)", flush=True)
+        if res["error"]:
+            print(f"      {res['error']}", flush=True)
+
+    summary = run_fleet(
+        system_slug=args.system,
+        tenant_slugs=args.tenant,
+        host_concurrency=args.concurrency,
+        dry_run=args.dry_run,
+        on_result=on_result,
+    )
+    print("==========================================")
+    print(
+        f"  {summary['done']} tenant(s) em {summary['seconds']}s "
+        f"({summary['tenantsPerSecond']} tenants/s) | {summary['migrationsApplied']} migration(s) aplicada(s) "
+        f"| {summary['failed']} erro(s)"
+    )
+    for cm in summary["checksumMismatch"]:
+        print(f"  ⚠️  checksum diferente em {cm['slug']}: {', '.join(cm['migrations'])}")
+    print("==========================================")
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,334 @@
+"""
+Warm pool: databases reserva já com schema, prontos para virar tenant.
+
+Uma thread em background mantém WARM_POOL_SIZE reservas por sistema (um por
+templates_sql/model_<system>.sql) em cada host de WARM_POOL_HOSTS (default:
+hosts ativos do tenant_hosts):
+
+    spare_<system>_<version>_<rand>   (version = prefixo do sha256 do template)
+
+A reserva só conta como pronta depois que a tabela `_spare_ready` é criada,
+no fim do build. create_tenant chama claim_spare: trava uma reserva pronta
+com GET_LOCK, move todas as tabelas dela para o database do tenant com um
+único RENAME TABLE (atômico, só metadado) e dropa a reserva vazia. Sem
+reserva disponível, o chamador segue pelo provisionamento normal.
+
+Reservas de versão antiga do template e builds que morreram no meio são
+descartadas pelo próprio filler. Entre workers do gunicorn, só um enche cada
+host por vez (GET_LOCK por host).
+"""
+from __future__ import annotations
+
+import os
+import re
+import secrets
+import threading
+import time
+from collections import deque
+from contextlib import nullcontext
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Optional, Tuple, Union
+
+from sqlalchemy.engine import Connection
+
+from app.db import (
+    TEMPLATES_DIR,
+    TENANT_DB_HOST,
+    checkout,
+    create_physical_database,
+    drop_physical_database,
+    get_template_engine,
+    safe_db_error,
+    sql_templates,
+)
+from app.placement import active_hosts
+from app.provisioning import provision_tenant_schema
+
+# Reservas por (host, sistema); 0 desliga o filler
+WARM_POOL_SIZE = int(os.getenv("WARM_POOL_SIZE", "0"))
+WARM_POOL_INTERVAL_SECONDS = float(os.getenv("WARM_POOL_INTERVAL_SECONDS", "30"))
+# Limita quantas reservas o filler monta por ciclo (por host/sistema)
+WARM_POOL_MAX_BUILDS_PER_CYCLE = int(os.getenv("WARM_POOL_MAX_BUILDS_PER_CYCLE", "1"))
+# Vazio = hosts ativos do tenant_hosts (app.placement)
+WARM_POOL_HOSTS = [h.strip() for h in os.getenv("WARM_POOL_HOSTS", "").split(",") if h.strip()]
+
+SPARE_MARKER_TABLE = "_spare_ready"
+
+_SPARE_NAME_RE = re.compile(r"^spare_([a-z0-9_]+)_([0-9a-f]{12})_([0-9a-f]{8})$")
+_DB_NAME_RE = re.compile(r"^[a-z0-9_]+$")
+
+
+class _Refill:
+    """Tempos de reposição deste worker por (host, sistema)."""
+
+    __slots__ = ("last_refill_at", "build_times")
+
+    def __init__(self) -> None:
+        self.last_refill_at: Optional[float] = None
+        # Fim dos últimos builds (para a taxa de reposição)
+        self.build_times: Deque[float] = deque(maxlen=100)
+
+    def snapshot(self) -> Dict[str, Any]:
+        now = time.time()
+        recent = [t for t in self.build_times if now - t <= 600]
+        return {
+            "refillPerMinute": round(len(recent) / 10.0, 2),
+            "lastRefillAt": self.last_refill_at,
+        }
+
+
+_lock = threading.Lock()
+_refills: Dict[Tuple[str, str], _Refill] = {}
+_thread: Optional[threading.Thread] = None
+_stop = threading.Event()
+
+
+def _refill(host: str, system_slug: str) -> _Refill:
+    with _lock:
+        st = _refills.get((host, system_slug))
+        if st is None:
+            st = _refills[(host, system_slug)] = _Refill()
+        return st
+
+
+def _systems() -> Dict[str, Path]:
+    """Sistemas com template: model_<system>.sql -> system."""
+    return {p.stem[len("model_"):]: p for p in sorted(TEMPLATES_DIR.glob("model_*.sql"))}
+
+
+def _spare_prefix(system_slug: str) -> str:
+    return f"spare_{system_slug.replace('-', '_')}_"
+
+
+def _try_lock(conn, name: str, timeout: int = 0) -> bool:
+    return conn.exec_driver_sql("SELECT GET_LOCK(%s, %s)", (f"spare:{name}", timeout)).scalar() == 1
+
+
+def _release(conn, name: str) -> None:
+    conn.exec_driver_sql("SELECT RELEASE_LOCK(%s)", (f"spare:{name}",))
+
+
+def _list_spares(conn, system_slug: str) -> List[Tuple[str, str, bool]]:
+    """(database, versão, pronta?) das reservas do sistema neste host."""
+    rows = conn.exec_driver_sql(
+        """
+        SELECT s.SCHEMA_NAME, t.TABLE_NAME
+        FROM information_schema.SCHEMATA s
+        LEFT JOIN information_schema.TABLES t
+               ON t.TABLE_SCHEMA = s.SCHEMA_NAME AND t.TABLE_NAME = %s
+        WHERE s.SCHEMA_NAME LIKE %s
+        """,
+        (SPARE_MARKER_TABLE, _spare_prefix(system_slug).replace("_", r"\_") + "%"),
+    ).fetchall()
+    out = []
+    for name, marker in rows:
+        m = _SPARE_NAME_RE.match(name)
+        # Prefixo de outro sistema (ex.: "quadra" vs "quadra_pro")
+        if m and m.group(1) == system_slug.replace("-", "_"):
+            out.append((name, m.group(2), marker is not None))
+    return out
+
+
+def build_spare(
+    target_host: Optional[str],
+    system_slug: str,
+    template_path: Union[str, Path],
+    conn: Optional[Connection] = None,
+) -> str:
+    """
+    Monta uma reserva pronta (golden/template + marcador) e devolve o nome.
+    `conn` (conexão da template engine do host) evita um checkout a mais:
+    o refill_host passa a dele, já que o provisionamento pega as próprias.
+    """
+    host = (target_host or "").strip() or TENANT_DB_HOST
+    plan = sql_templates.get(template_path)
+    name = f"{_spare_prefix(system_slug)}{plan.version}_{secrets.token_hex(4)}"
+
+    with (nullcontext(conn) if conn is not None else checkout(get_template_engine(host))) as conn:
+        # Lock durante o build: o filler de outro worker não confunde com órfã
+        if not _try_lock(conn, name):
+            raise RuntimeError(f"Lock de build da reserva `{name}` não obtido")
+        try:
+            create_physical_database(host, name)
+            provision_tenant_schema(host, name, system_slug, template_path)
+            conn.exec_driver_sql(
+                f"CREATE TABLE `{name}`.`{SPARE_MARKER_TABLE}` ("
+                "version VARCHAR(64) PRIMARY KEY, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)"
+            )
+            conn.exec_driver_sql(
+                f"INSERT INTO `{name}`.`{SPARE_MARKER_TABLE}` (version) VALUES (%s)", (plan.version,)
+            )
+        except Exception:
+            try:
+                drop_physical_database(host, name)
+            except Exception as drop_err:
+                print(f"⚠️  Warm pool: falha ao dropar reserva `{name}`: {drop_err}", flush=True)
+            raise
+        finally:
+            _release(conn, name)
+
+    st = _refill(host, system_slug)
+    with _lock:
+        st.build_times.append(time.time())
+    return name
+
+
+def claim_spare(
+    target_host: Optional[str],
+    system_slug: str,
+    db_name: str,
+    template_path: Union[str, Path],
+) -> Optional[str]:
+    """
+    Move as tabelas de uma reserva pronta (versão atual do template) para
+    `db_name`, que já deve existir vazio. Devolve a reserva usada ou None.
+    """
+    if WARM_POOL_SIZE <= 0:
+        return None
+    if not _DB_NAME_RE.match(db_name):
+        raise ValueError("database_name inválido")
+    host = (target_host or "").strip() or TENANT_DB_HOST
+    version = sql_templates.get(template_path).version
+
+    with checkout(get_template_engine(host)) as conn:
+        for name, spare_version, ready in _list_spares(conn, system_slug):
+            if not ready or spare_version != version or not _try_lock(conn, name):
+                continue
+            try:
+                tables = [
+                    r[0]
+                    for r in conn.exec_driver_sql(
+                        "SELECT TABLE_NAME FROM information_schema.TABLES WHERE TABLE_SCHEMA = %s",
+                        (name,),
+                    )
+                ]
+                # Outro worker já consumiu entre o SELECT e o lock
+                if SPARE_MARKER_TABLE not in tables:
+                    continue
+                moves = ", ".join(
+                    f"`{name}`.`{t}` TO `{db_name}`.`{t}`" for t in tables if t != SPARE_MARKER_TABLE
+                )
+                conn.exec_driver_sql(f"RENAME TABLE {moves}")
+                conn.exec_driver_sql(f"DROP DATABASE IF EXISTS `{name}`")
+            finally:
+                _release(conn, name)
+            return name
+    return None
+
+
+def refill_host(target_host: Optional[str]) -> None:
+    """Um ciclo do filler em um host: descarta reservas velhas/órfãs e repõe."""
+    host = (target_host or "").strip() or TENANT_DB_HOST
+    with checkout(get_template_engine(host)) as host_conn:
+        # Um filler por host entre todos os workers
+        if host_conn.exec_driver_sql("SELECT GET_LOCK(%s, 0)", (f"warm_pool:{host}",)).scalar() != 1:
+            return
+        try:
+            for system_slug, template_path in _systems().items():
+                version = sql_templates.get(template_path).version
+                ready = 0
+                for name, spare_version, is_ready in _list_spares(host_conn, system_slug):
+                    if is_ready and spare_version == version:
+                        ready += 1
+                        continue
+                    # Versão velha ou build interrompido (sem marcador e sem lock de build)
+                    if not _try_lock(host_conn, name):
+                        continue
+                    try:
+                        print(f"--> Warm pool: descartando reserva `{name}`", flush=True)
+                        drop_physical_database(host, name)
+                    finally:
+                        _release(host_conn, name)
+
+                for _ in range(min(WARM_POOL_SIZE - ready, WARM_POOL_MAX_BUILDS_PER_CYCLE)):
+                    name = build_spare(host, system_slug, template_path, conn=host_conn)
+                    print(f"--> Warm pool: reserva `{name}` pronta em {host}", flush=True)
+                st = _refill(host, system_slug)
+                with _lock:
+                    st.last_refill_at = time.time()
+        finally:
+            host_conn.exec_driver_sql("SELECT RELEASE_LOCK(%s)", (f"warm_pool:{host}",))
+
+
+def _run() -> None:
+    while not _stop.is_set():
+        try:
+            hosts = WARM_POOL_HOSTS or active_hosts()
+        except Exception as e:
+            print(f"⚠️  Warm pool: falha ao listar hosts: {e}", flush=True)
+            hosts = [TENANT_DB_HOST]
+        for host in hosts:
+            try:
+                refill_host(host)
+            except Exception as e:
+                print(f"⚠️  Warm pool: falha ao repor reservas em {host}: {e}", flush=True)
+        _stop.wait(WARM_POOL_INTERVAL_SECONDS)
+
+
+def start_warm_pool() -> bool:
+    """Sobe a thread do filler (uma por worker). No-op se WARM_POOL_SIZE=0."""
+    global _thread
+    if WARM_POOL_SIZE <= 0:
+        return False
+    with _lock:
+        if _thread is not None and _thread.is_alive():
+            return True
+        _stop.clear()
+        _thread = threading.Thread(target=_run, name="warm-pool", daemon=True)
+        _thread.start()
+    return True
+
+
+def stop_warm_pool() -> None:
+    _stop.set()
+
+
+def _host_stats(host: str) -> Dict[str, Any]:
+    """Reservas de cada sistema lidas do próprio host (valem para todos os workers)."""
+    pools: Dict[str, Any] = {}
+    with checkout(get_template_engine(host)) as conn:
+        for system_slug, template_path in _systems().items():
+            version = sql_templates.get(template_path).version
+            spares = _list_spares(conn, system_slug)
+            with _lock:
+                st = _refills.get((host, system_slug))
+                refill = st.snapshot() if st else _Refill().snapshot()
+            pools[system_slug] = {
+                "templateVersion": version,
+                "ready": sum(1 for _, v, ok in spares if ok and v == version),
+                # Sem marcador: build em andamento ou órfã que o filler ainda vai descartar
+                "building": sum(1 for _, _, ok in spares if not ok),
+                "stale": sum(1 for _, v, ok in spares if ok and v != version),
+                "target": WARM_POOL_SIZE,
+                "spares": [
+                    {"name": name, "templateVersion": v, "ready": ok} for name, v, ok in spares
+                ],
+                **refill,
+            }
+    return pools
+
+
+def warm_pool_stats() -> Dict[str, Any]:
+    """
+    Estado do pool. As reservas vêm de _list_spares em cada host; só os
+    tempos de reposição são deste worker.
+    """
+    try:
+        hosts = WARM_POOL_HOSTS or active_hosts()
+    except Exception as e:
+        print(f"⚠️  Warm pool: falha ao listar hosts: {e}", flush=True)
+        hosts = [TENANT_DB_HOST]
+    pools: Dict[str, Any] = {}
+    for host in hosts:
+        try:
+            pools[host] = _host_stats(host)
+        except Exception as e:
+            pools[host] = {"error": safe_db_error(e)}
+    return {
+        "enabled": WARM_POOL_SIZE > 0,
+        "size": WARM_POOL_SIZE,
+        "intervalSeconds": WARM_POOL_INTERVAL_SECONDS,
+        "maxBuildsPerCycle": WARM_POOL_MAX_BUILDS_PER_CYCLE,
+        "running": _thread is not None and _thread.is_alive(),
+        "hosts": pools,
+    }
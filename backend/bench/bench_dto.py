@@ -0,0 +1,148 @@
+"""
+Benchmark: caminho antigo (dict(row) + _user_to_dto com .get()) vs DTO
+compilado (app.dto) mapeando tuplas direto para a saída.
+
+Roda sem banco: gera linhas sintéticas no formato de `SELECT * FROM users`.
+
+    cd backend && python -m bench.bench_dto [--rows 2000] [--repeat 20]
+"""
+from __future__ import annotations
+
+import argparse
+import datetime
+import gc
+import random
+import statistics
+import time
+import tracemalloc
+
+from app.dto import USER_DTO, USER_PROFILE_DTO
+
+COLUMNS = (
+    "id", "name", "nickname", "email", "phone", "cpf", "cnpj", "password_hash",
+    "avatar_url", "bio", "cep", "logradouro", "numero", "bairro", "complemento",
+    "city", "state", "timezone", "is_active", "created_at", "updated_at",
+    "last_login_at", "onboarding_completed_at", "email_verified_at",
+    "email_verification_token", "email_verification_sent_at",
+)
+
+
+# Cópia dos helpers antigos (auth_routes._user_to_dto / user_routes._user_profile_dto)
+def legacy_user_to_dto(row):
+    return {
+        "id": row["id"],
+        "name": row["name"],
+        "nickname": row.get("nickname"),
+        "email": row["email"],
+        "phone": row.get("phone"),
+        "cpf": row.get("cpf"),
+        "cnpj": row.get("cnpj"),
+        "avatarUrl": row.get("avatar_url"),
+        "bio": row.get("bio"),
+        "cep": row.get("cep"),
+        "logradouro": row.get("logradouro"),
+        "numero": row.get("numero"),
+        "bairro": row.get("bairro"),
+        "complemento": row.get("complemento"),
+        "city": row.get("city"),
+        "state": row.get("state"),
+        "timezone": row.get("timezone"),
+        "isActive": bool(row.get("is_active", True)),
+        "createdAt": row.get("created_at").isoformat() if row.get("created_at") else None,
+        "lastLoginAt": row.get("last_login_at").isoformat() if row.get("last_login_at") else None,
+        "onboardingCompletedAt": row.get("onboarding_completed_at").isoformat() if row.get("onboarding_completed_at") else None,
+        "emailVerifiedAt": row.get("email_verified_at").isoformat() if row.get("email_verified_at") else None,
+    }
+
+
+def legacy_user_profile_dto(row):
+    return {
+        "id": row["id"],
+        "name": row["name"],
+        "nickname": row.get("nickname"),
+        "email": row["email"],
+        "phone": row.get("phone"),
+        "cpf": row.get("cpf"),
+        "cnpj": row.get("cnpj"),
+        "avatarUrl": row.get("avatar_url"),
+        "bio": row.get("bio"),
+        "cep": row.get("cep"),
+        "logradouro": row.get("logradouro"),
+        "numero": row.get("numero"),
+        "bairro": row.get("bairro"),
+        "complemento": row.get("complemento"),
+        "city": row.get("city"),
+        "state": row.get("state"),
+        "timezone": row.get("timezone"),
+        "isActive": bool(row.get("is_active", True)),
+        "createdAt": row.get("created_at").isoformat() if row.get("created_at") else None,
+    }
+
+
+def make_rows(n: int):
+    rnd = random.Random(42)
+    base = datetime.datetime(2024, 1, 1)
+    rows = []
+    for i in range(n):
+        maybe_ts = lambda: base + datetime.timedelta(minutes=rnd.randint(0, 10 ** 6)) if rnd.random() < 0.7 else None
+        rows.append((
+            i + 1, f"Usuário {i}", rnd.choice([None, f"nick{i}"]), f"u{i}@example.com",
+            rnd.choice([None, "11999990000"]), None, None, "x" * 60,
+            None, None, "01000-000", "Rua A", "10", "Centro", None,
+            "São Paulo", "SP", "America/Sao_Paulo", rnd.random() < 0.95, maybe_ts(), maybe_ts(),
+            maybe_ts(), maybe_ts(), maybe_ts(), None, None,
+        ))
+    return rows
+
+
+def legacy_path(rows, build):
+    # fetch_all: dict(row) por linha; depois o helper monta o DTO
+    dict_rows = [dict(zip(COLUMNS, r)) for r in rows]
+    return [build(r) for r in dict_rows]
+
+
+def compiled_path(rows, dto):
+    # fetch_rows + dto.many: tupla -> DTO direto
+    return dto.many(COLUMNS, rows)
+
+
+def measure(fn, repeat: int):
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        t0 = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - t0) * 1000)
+    gc.collect()
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return statistics.median(times), min(times), peak / 1024
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    rows = make_rows(args.rows)
+    cases = [
+        ("user (auth)", legacy_user_to_dto, USER_DTO),
+        ("user_profile (inter-service)", legacy_user_profile_dto, USER_PROFILE_DTO),
+    ]
+    print(f"rows={args.rows} repeat={args.repeat}")
+    for label, legacy, dto in cases:
+        assert legacy_path(rows, legacy) == compiled_path(rows, dto), f"{label}: saída diferente"
+        assert [legacy(dict(zip(COLUMNS, r))) for r in rows[:50]] == [dto(dict(zip(COLUMNS, r))) for r in rows[:50]]
+        old = measure(lambda: legacy_path(rows, legacy), args.repeat)
+        new = measure(lambda: compiled_path(rows, dto), args.repeat)
+        print(f"\n{label}")
+        print(f"  legado    : mediana {old[0]:8.2f} ms  min {old[1]:8.2f} ms  pico {old[2]:9.1f} KiB")
+        print(f"  compilado : mediana {new[0]:8.2f} ms  min {new[1]:8.2f} ms  pico {new[2]:9.1f} KiB")
+        print(f"  speedup   : {old[0] / new[0]:.2f}x   memória: {new[2] / old[2]:.0%} do legado")
+
+
+if __name__ == "__main__":
+    main()
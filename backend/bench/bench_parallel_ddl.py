@@ -0,0 +1,194 @@
+"""
+Benchmark: tempo de aplicar o template de tenant x número de conexões
+(apply_sql_template_parallel, CREATE TABLE repartidos por nível do grafo de FKs).
+
+Roda sem banco: uma engine falsa simula a latência do MySQL por statement
+(round trip + custo de CREATE TABLE / ALTER), com um limite de statements
+DDL simultâneos no servidor. Os números servem para comparar formas de
+executar o mesmo plano, não como tempo absoluto de provisionamento.
+
+    cd backend && DATABASE_URL=sqlite:// python -m bench.bench_parallel_ddl [--system jogador] [--repeat 3]
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import re
+import statistics
+import threading
+import time
+
+from pymysql.constants import CLIENT
+
+os.environ.setdefault("QUERY_METRICS", "0")
+
+from app.db import TEMPLATES_DIR, apply_sql_template_parallel, sql_templates
+
+
+_INDEX_RE = re.compile(r"\b(?:key|index)\b", re.I)
+_PRIMARY_RE = re.compile(r"\bprimary\s+key\b", re.I)
+
+
+class SimulatedServer:
+    def __init__(self, rtt_ms: float, create_ms: float, index_ms: float, alter_ms: float, parallelism: int) -> None:
+        self.rtt = rtt_ms / 1000
+        self.create = create_ms / 1000
+        self.index = index_ms / 1000
+        self.alter = alter_ms / 1000
+        self.slots = threading.BoundedSemaphore(parallelism)
+
+    def cost(self, stmt: str) -> float:
+        head = stmt.lstrip()[:12].lower()
+        # Cada KEY/INDEX/FK soma ao CREATE; o ALTER ainda paga a própria passada no dicionário de dados
+        indexes = len(_INDEX_RE.findall(stmt)) - len(_PRIMARY_RE.findall(stmt))
+        if head.startswith("create"):
+            return self.create + self.index * indexes
+        if head.startswith("alter"):
+            return self.alter + self.index * max(indexes, 1)
+        return 0.0002
+
+    def run(self, statements: list[str]) -> None:
+        time.sleep(self.rtt)
+        for stmt in statements:
+            cost = self.cost(stmt)
+            if cost >= 0.001:
+                with self.slots:
+                    time.sleep(cost)
+
+
+class FakeCursor:
+    def __init__(self, server: SimulatedServer) -> None:
+        self.server = server
+        self.pending = 0
+
+    def execute(self, sql: str) -> None:
+        statements = sql.split(";\n")
+        self.server.run(statements)
+        self.pending = len(statements) - 1
+
+    def nextset(self) -> bool:
+        if self.pending:
+            self.pending -= 1
+            return True
+        return False
+
+    def close(self) -> None:
+        pass
+
+
+class FakeResult:
+    def __init__(self, value) -> None:
+        self.value = value
+
+    def scalar(self):
+        return self.value
+
+    def fetchone(self):
+        return (self.value,) if self.value else None
+
+
+class FakeDbapi:
+    client_flag = CLIENT.MULTI_STATEMENTS
+
+    def __init__(self, server: SimulatedServer) -> None:
+        self.server = server
+
+    def cursor(self) -> FakeCursor:
+        return FakeCursor(self.server)
+
+
+class FakeConnection:
+    def __init__(self, engine: "FakeEngine") -> None:
+        self.engine = engine
+        self.connection = type("Wrapper", (), {})()
+        self.connection.dbapi_connection = FakeDbapi(engine.server)
+
+    def exec_driver_sql(self, sql: str, params=None) -> FakeResult:
+        if sql.startswith("SHOW TABLES LIKE"):
+            return FakeResult("users")
+        if sql.startswith("SELECT DATABASE()"):
+            return FakeResult("bench_db")
+        self.engine.server.run([sql])
+        return FakeResult(None)
+
+    def invalidate(self) -> None:
+        pass
+
+    def __enter__(self) -> "FakeConnection":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.engine.pool.release()
+
+
+class FakePool:
+    def __init__(self, size: int) -> None:
+        self._size = size
+        self._max_overflow = 0
+        self._out = 0
+        self._lock = threading.Lock()
+
+    def size(self) -> int:
+        return self._size
+
+    def checkedout(self) -> int:
+        return self._out
+
+    def acquire(self) -> None:
+        with self._lock:
+            self._out += 1
+
+    def release(self) -> None:
+        with self._lock:
+            self._out -= 1
+
+
+class FakeEngine:
+    def __init__(self, server: SimulatedServer, pool_size: int) -> None:
+        self.server = server
+        self.pool = FakePool(pool_size)
+
+    def connect(self) -> FakeConnection:
+        self.pool.acquire()
+        return FakeConnection(self)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--system", default="jogador")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--connections", default="1,2,4,8")
+    parser.add_argument("--rtt-ms", type=float, default=0.5)
+    parser.add_argument("--create-ms", type=float, default=15.0, help="custo de um CREATE TABLE no servidor")
+    parser.add_argument("--index-ms", type=float, default=4.0, help="custo de cada KEY/INDEX/FK")
+    parser.add_argument("--alter-ms", type=float, default=6.0, help="custo fixo de um ALTER TABLE")
+    parser.add_argument("--server-parallelism", type=int, default=8,
+                        help="statements DDL que o servidor consegue tocar ao mesmo tempo")
+    args = parser.parse_args()
+
+    path = TEMPLATES_DIR / f"model_{args.system}.sql"
+    plan = sql_templates.get(path)
+    server = SimulatedServer(args.rtt_ms, args.create_ms, args.index_ms, args.alter_ms, args.server_parallelism)
+    counts = [int(c) for c in args.connections.split(",")]
+
+    print(f"{path.name}: {len(plan.tables)} tabelas, {len(plan.fks)} ALTER FK no template")
+    print(f"  latência simulada: rtt {args.rtt_ms} ms | CREATE {args.create_ms} ms | "
+          f"índice/FK {args.index_ms} ms | ALTER {args.alter_ms} ms | {args.server_parallelism} DDL simultâneos\n")
+
+    ddl = plan.ddl
+    print(f"níveis de CREATE {[len(lvl) for lvl in ddl.creates]}, níveis de ALTER FK {[len(lvl) for lvl in ddl.alters]}")
+    base = None
+    for n in counts:
+        times = []
+        for _ in range(args.repeat):
+            eng = FakeEngine(server, pool_size=max(counts))
+            t0 = time.perf_counter()
+            apply_sql_template_parallel(eng, path, "bench_db", connections=n)
+            times.append((time.perf_counter() - t0) * 1000)
+        ms = statistics.median(times)
+        base = base or ms
+        print(f"  {n:2d} conexão(ões): {ms:8.1f} ms   ({base / ms:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
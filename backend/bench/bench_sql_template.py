@@ -0,0 +1,116 @@
+"""
+Benchmark: splitter antigo (loop caractere a caractere, relido a cada
+create_tenant) vs tokenizer de uma passada vs plano em cache (TemplateStore).
+
+Roda sem banco, sobre os templates reais de app/templates_sql.
+
+    cd backend && DATABASE_URL=sqlite:// python -m bench.bench_sql_template [--repeat 200]
+"""
+from __future__ import annotations
+
+import argparse
+import re
+import statistics
+import time
+from pathlib import Path
+
+from app.db import TEMPLATES_DIR, TemplateStore, _split_sql_statements
+
+
+# Cópia do splitter antigo de app/db.py
+def legacy_split(sql_text: str) -> list[str]:
+    lines = []
+    for line in sql_text.splitlines():
+        if line.lstrip().startswith("--"):
+            continue
+        lines.append(line)
+    text_clean = "\n".join(lines).strip()
+    if not text_clean:
+        return []
+
+    stmts: list[str] = []
+    buf: list[str] = []
+    in_str = False
+    quote = None
+    prev = ""
+
+    for ch in text_clean:
+        if ch in ("'", '"'):
+            if not in_str:
+                in_str = True
+                quote = ch
+            elif quote == ch and prev != "\\":
+                in_str = False
+                quote = None
+
+        if ch == ";" and not in_str:
+            stmt = "".join(buf).strip()
+            buf = []
+            if stmt:
+                stmts.append(stmt)
+        else:
+            buf.append(ch)
+
+        prev = ch
+
+    tail = "".join(buf).strip()
+    if tail:
+        stmts.append(tail)
+    return stmts
+
+
+def legacy_apply_prep(path: Path):
+    # O que o apply_sql_template antigo fazia antes de executar: ler, splitar, classificar
+    statements = legacy_split(path.read_text(encoding="utf-8"))
+    norm = lambda s: re.sub(r"\s+", " ", s.strip()).lower()
+    creates, fks, others = [], [], []
+    for stmt in statements:
+        s = norm(stmt)
+        if s.startswith("alter table") and (" foreign key " in s or " add constraint " in s):
+            fks.append(stmt)
+        elif s.startswith("create table"):
+            creates.append(stmt)
+        else:
+            others.append(stmt)
+    return creates, others, fks
+
+
+def bench(fn, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - t0) * 1e6)
+    return statistics.median(times)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    ws = lambda s: " ".join(s.split())
+    for path in sorted(TEMPLATES_DIR.glob("model_*.sql")):
+        text = path.read_text(encoding="utf-8")
+        old, new = legacy_split(text), _split_sql_statements(text)
+        assert [ws(s) for s in old] == [ws(s) for s in new], f"{path.name}: statements diferentes"
+
+        store = TemplateStore()
+        store.get(path)  # aquece o cache
+
+        t_old_split = bench(lambda: legacy_split(text), args.repeat)
+        t_new_split = bench(lambda: _split_sql_statements(text), args.repeat)
+        t_old_prep = bench(lambda: legacy_apply_prep(path), args.repeat)
+        t_fresh = bench(lambda: TemplateStore().get(path), args.repeat)
+        t_cached = bench(lambda: store.get(path), args.repeat)
+
+        print(f"\n{path.name}: {len(text.splitlines())} linhas, {len(new)} statements")
+        print(f"  split antigo            : {t_old_split:9.1f} µs")
+        print(f"  tokenizer (1 passada)   : {t_new_split:9.1f} µs   ({t_old_split / t_new_split:.1f}x)")
+        print(f"  preparo antigo / tenant : {t_old_prep:9.1f} µs   (ler + split + classificar)")
+        print(f"  plano sem cache         : {t_fresh:9.1f} µs   (ler + sha256 + tokenizar + classificar)")
+        print(f"  plano em cache          : {t_cached:9.1f} µs   ({t_old_prep / t_cached:.0f}x; só stat())")
+
+
+if __name__ == "__main__":
+    main()
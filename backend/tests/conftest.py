@@ -0,0 +1,70 @@
+"""
+Testes sem MySQL: o MASTER vira sqlite em memória só para o import do app;
+tudo que toca o banco é trocado por fakes via monkeypatch.
+
+    cd backend && python -m pytest -q
+"""
+import os
+import sys
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("JOBS_WORKER_THREADS", "0")
+os.environ.setdefault("QUERY_METRICS", "0")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import datetime  # noqa: E402
+
+import pytest  # noqa: E402
+
+
+class FakeInvalidationLog:
+    """Tabela cache_invalidations em memória, compartilhada entre CacheBus (= processos)."""
+
+    def __init__(self) -> None:
+        self.rows = []
+        self.now = datetime.datetime(2026, 1, 1, 12, 0, 0)
+        self.fail = False
+
+    def advance(self, seconds: float) -> None:
+        self.now += datetime.timedelta(seconds=seconds)
+
+    def add(self, kind: str, ref: str, created_at=None) -> None:
+        self.rows.append({
+            "id": len(self.rows) + 1,
+            "kind": kind,
+            "ref": ref,
+            "created_at": created_at or self.now,
+        })
+
+    def execute_sql(self, sql, params=None):
+        if self.fail:
+            raise RuntimeError("Table 'cache_invalidations' doesn't exist")
+        if sql.lstrip().startswith("INSERT"):
+            self.add(params["kind"], params["ref"])
+            return 1
+        return 0
+
+    def fetch_one(self, sql, params=None, primary=False):
+        if self.fail:
+            raise RuntimeError("Table 'cache_invalidations' doesn't exist")
+        return {"now": self.now}
+
+    def fetch_all(self, sql, params=None, primary=False):
+        return [dict(r) for r in self.rows if r["created_at"] >= params["since"]]
+
+
+@pytest.fixture
+def bus_log(monkeypatch):
+    """Troca o acesso ao banco do cache_bus e zera o intervalo do bus global."""
+    import app.cache_bus as cache_bus_module
+
+    log = FakeInvalidationLog()
+    monkeypatch.setattr(cache_bus_module, "execute_sql", log.execute_sql)
+    monkeypatch.setattr(cache_bus_module, "fetch_one", log.fetch_one)
+    monkeypatch.setattr(cache_bus_module, "fetch_all", log.fetch_all)
+    monkeypatch.setattr(cache_bus_module.cache_bus, "interval", 0)
+    monkeypatch.setattr(cache_bus_module.cache_bus, "_next_sync", 0.0)
+    monkeypatch.setattr(cache_bus_module.cache_bus, "_since", None)
+    monkeypatch.setattr(cache_bus_module.cache_bus, "_seen", {})
+    return log
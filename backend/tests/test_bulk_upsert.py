@@ -0,0 +1,79 @@
+from contextlib import contextmanager
+
+import pytest
+
+import app.db as db
+from app.db import bulk_upsert
+
+
+class FakeResult:
+    def __init__(self, rowcount):
+        self.rowcount = rowcount
+
+
+class FakeConn:
+    def __init__(self):
+        self.calls = []
+
+    def execute(self, stmt, params):
+        self.calls.append((str(stmt), list(params)))
+        return FakeResult(len(params))
+
+
+@pytest.fixture
+def conn(monkeypatch):
+    fake = FakeConn()
+    opened = []
+
+    @contextmanager
+    def unit_of_work():
+        opened.append(True)
+        yield fake
+
+    monkeypatch.setattr(db, "unit_of_work", unit_of_work)
+    fake.opened = opened
+    return fake
+
+
+def test_rows_go_in_chunks_inside_one_transaction(conn):
+    rows = [(1, i) for i in range(7)]
+    affected = bulk_upsert("user_interests", ("user_id", "system_id"), rows, chunk_size=3)
+    assert affected == 7
+    assert len(conn.opened) == 1
+    assert [len(params) for _, params in conn.calls] == [3, 3, 1]
+    assert conn.calls[0][1][0] == {"user_id": 1, "system_id": 0}
+
+
+def test_update_modes(conn):
+    bulk_upsert("t", ("a", "b"), [(1, 2)])
+    bulk_upsert("t", ("a", "b"), [(1, 2)], update=["b"])
+    bulk_upsert("t", ("a", "b"), [(1, 2)], update={"left_at": "NULL", "b": "b + 1"})
+    stmts = [sql for sql, _ in conn.calls]
+    assert stmts[0] == "INSERT INTO `t` (`a`, `b`) VALUES (:a, :b) ON DUPLICATE KEY UPDATE `a` = `a`"
+    assert stmts[1].endswith("ON DUPLICATE KEY UPDATE `b` = VALUES(`b`)")
+    assert stmts[2].endswith("ON DUPLICATE KEY UPDATE `left_at` = NULL, `b` = b + 1")
+
+
+def test_empty_rows_do_not_open_transaction(conn):
+    assert bulk_upsert("t", ("a",), iter(())) == 0
+    assert conn.opened == []
+
+
+def test_rows_can_be_a_generator(conn):
+    assert bulk_upsert("t", ("a",), ((i,) for i in range(5)), chunk_size=2) == 5
+    assert [len(params) for _, params in conn.calls] == [2, 2, 1]
+
+
+@pytest.mark.parametrize(
+    "table, columns, update",
+    [
+        ("t; DROP TABLE x", ("a",), None),
+        ("t", ("a b",), None),
+        ("t", ("a",), ["b`"]),
+        ("t", (), None),
+    ],
+)
+def test_invalid_identifiers_are_rejected(conn, table, columns, update):
+    with pytest.raises(ValueError):
+        bulk_upsert(table, columns, [(1,)], update=update)
+    assert conn.calls == []
@@ -0,0 +1,89 @@
+import datetime
+
+from app.cache_bus import CacheBus
+
+
+def _bus(received):
+    bus = CacheBus(0)
+    bus.subscribe("tenant", received.append)
+    return bus
+
+
+def test_publish_applies_locally_and_reaches_other_process(bus_log):
+    here, there = [], []
+    a, b = _bus(here), _bus(there)
+    b.sync()
+
+    a.publish("tenant", 42)
+    assert here == ["42"]
+    assert there == []
+
+    b.sync()
+    assert there == ["42"]
+
+
+def test_rows_are_applied_once(bus_log):
+    there = []
+    b = _bus(there)
+    b.sync()
+    bus_log.add("tenant", "1")
+    b.sync()
+    b.sync()
+    bus_log.advance(1)
+    b.sync()
+    assert there == ["1"]
+    assert b.applied == 1
+
+
+def test_late_commit_inside_slack_is_not_lost(bus_log):
+    there = []
+    b = _bus(there)
+    b.sync()
+    bus_log.advance(2)
+    b.sync()
+    # INSERT com created_at antes da última leitura, visível só agora (commit atrasado)
+    bus_log.add("tenant", "7", created_at=bus_log.now - datetime.timedelta(seconds=1))
+    bus_log.advance(1)
+    b.sync()
+    assert there == ["7"]
+
+
+def test_seen_ids_are_pruned_outside_window(bus_log):
+    b = _bus([])
+    b.sync()
+    bus_log.add("tenant", "1")
+    b.sync()
+    assert b._seen
+    bus_log.advance(60)
+    b.sync()
+    assert b._seen == {}
+
+
+def test_sync_is_throttled(bus_log):
+    there = []
+    b = CacheBus(3600)
+    b.subscribe("tenant", there.append)
+    b.sync()
+    bus_log.add("tenant", "1")
+    b.sync()
+    assert there == []
+
+
+def test_publish_without_table_still_invalidates_here(bus_log, capsys):
+    here = []
+    a = _bus(here)
+    bus_log.fail = True
+    a.publish("tenant", 5)
+    a.sync()
+    assert here == ["5"]
+    assert a.errors == 2
+    assert capsys.readouterr().out.count("Cache bus indisponível") == 1
+
+
+def test_handlers_by_kind(bus_log):
+    tenants, users = [], []
+    a = CacheBus(0)
+    a.subscribe("tenant", tenants.append)
+    a.subscribe("user", users.append)
+    a.publish("user", 3)
+    assert tenants == [] and users == ["3"]
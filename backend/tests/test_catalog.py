@@ -0,0 +1,116 @@
+import pytest
+
+import app.catalog as catalog_module
+from app.cache_bus import cache_bus
+from app.catalog import SystemsCatalog
+
+
+class FakeSystems:
+    COLUMNS = ("id", "slug", "display_name", "description", "icon", "color", "base_route", "is_active", "display_order")
+
+    def __init__(self):
+        self.rows = [(1, "jogador", "Jogador", None, None, None, None, 1, 0), (2, "quadra", "Quadra", "", "", "", "/q", 0, 1)]
+        self.loads = 0
+        self.fail = False
+        self.during_load = None
+
+    def fetch_rows(self, sql, params=None, primary=False):
+        assert primary
+        self.loads += 1
+        if self.fail:
+            raise RuntimeError("MASTER fora")
+        if self.during_load:
+            self.during_load()
+        return self.COLUMNS, list(self.rows)
+
+
+@pytest.fixture
+def systems(monkeypatch, bus_log):
+    fake = FakeSystems()
+    monkeypatch.setattr(catalog_module, "fetch_rows", fake.fetch_rows)
+    monkeypatch.setattr(catalog_module, "_MISS_RELOAD_SECONDS", 3600)
+    fake.bus_log = bus_log
+    return fake
+
+
+def test_catalog_serves_from_memory_until_invalidate(systems):
+    cat = SystemsCatalog(ttl=3600)
+    assert [s["slug"] for s in cat.active()] == ["jogador"]
+    assert cat.by_slug("quadra")["id"] == 2
+    assert cat.by_id("1")["slug"] == "jogador"
+    assert cat.by_id("x") is None
+    assert systems.loads == 1
+
+    systems.rows.append((3, "arbitro", "Árbitro", None, None, None, None, 1, 2))
+    assert cat.by_slug("arbitro") is None
+    cat.invalidate()
+    assert cat.by_slug("arbitro")["id"] == 3
+    assert systems.loads == 2
+
+
+def test_catalog_active_payload_matches_system_dto(systems):
+    cat = SystemsCatalog(ttl=3600)
+    assert cat.active() == [{
+        "id": 1, "slug": "jogador", "displayName": "Jogador", "description": "",
+        "icon": "trophy", "color": "#ef4444", "baseUrl": "/", "isActive": True,
+    }]
+
+
+def test_catalog_invalidate_during_load_discards_result(systems):
+    cat = SystemsCatalog(ttl=3600)
+    systems.during_load = cat.invalidate
+    cat.active()
+    systems.during_load = None
+    cat.active()
+    assert systems.loads == 2
+
+
+def test_catalog_keeps_previous_snapshot_on_error(systems):
+    cat = SystemsCatalog(ttl=0)
+    assert cat.by_id(1) is not None
+    systems.fail = True
+    assert cat.by_id(1)["slug"] == "jogador"
+    assert cat.errors == 1
+    # Dentro do _RETRY_SECONDS não tenta de novo
+    cat.by_id(1)
+    assert systems.loads == 2
+
+
+def test_catalog_first_load_error_propagates(systems):
+    systems.fail = True
+    with pytest.raises(RuntimeError):
+        SystemsCatalog(ttl=60).active()
+
+
+def test_catalog_invalidate_reaches_other_workers(systems, monkeypatch):
+    here, there = SystemsCatalog(ttl=3600), SystemsCatalog(ttl=3600)
+    here.active()
+    there.active()
+    systems.rows.append((3, "arbitro", "Árbitro", None, None, None, None, 1, 2))
+
+    monkeypatch.setitem(cache_bus._handlers, "system", [])
+    here.invalidate()
+    assert [(r["kind"], r["ref"]) for r in systems.bus_log.rows] == [("system", "all")]
+    assert here._snapshot is None
+
+    # Outro processo: a linha chega pelo sync() da próxima leitura
+    monkeypatch.setitem(cache_bus._handlers, "system", [lambda ref: there._drop()])
+    assert [s["slug"] for s in there.active()] == ["jogador", "arbitro"]
+
+
+def test_catalog_miss_reloads_from_primary(systems, monkeypatch):
+    monkeypatch.setattr(catalog_module, "_MISS_RELOAD_SECONDS", 0)
+    cat = SystemsCatalog(ttl=3600)
+    cat.active()
+    systems.rows.append((3, "arbitro", "Árbitro", None, None, None, None, 1, 2))
+    assert cat.by_slug("arbitro")["id"] == 3
+    assert cat.by_id(3)["slug"] == "arbitro"
+    assert systems.loads == 2 and cat.misses == 1
+
+
+def test_catalog_miss_reload_is_throttled(systems):
+    cat = SystemsCatalog(ttl=3600)
+    cat.active()
+    for _ in range(3):
+        assert cat.by_slug("nao-existe") is None
+    assert systems.loads == 1 and cat.misses == 3
@@ -0,0 +1,152 @@
+"""enqueue_drop_tenant (soft delete + job) e drop_tenant_tables contra fakes."""
+import re
+from contextlib import contextmanager, nullcontext
+
+import pytest
+
+import app.tenant_jobs as tenant_jobs
+from app.tenant_jobs import TenantSpecError, drop_tenant_tables, enqueue_drop_tenant
+
+
+class FakeMaster:
+    def __init__(self):
+        self.tenants = {7: {"id": 7, "slug": "acme", "display_name": "Acme", "database_name": "acme_db",
+                            "database_host": "db-2", "deleted_at": None}}
+        self.jobs = []
+        self.updates = []
+
+    def fetch_one(self, sql, params=None, primary=False):
+        if "FROM tenants" in sql:
+            row = self.tenants.get(params["id"])
+            return dict(row) if row else None
+        kinds = re.findall(r"'(\w+_tenant)'", sql)
+        jobs = [j for j in self.jobs if j["tenant_id"] == params["id"] and j["kind"] in kinds]
+        if "status IN" in sql:
+            jobs = [j for j in jobs if j["status"] in ("pending", "running")]
+        return dict(jobs[-1]) if jobs else None
+
+    def execute_sql(self, sql, params=None):
+        self.updates.append(sql)
+        if "deleted_at = NOW()" in sql:
+            self.tenants[params["id"]]["deleted_at"] = "now"
+        return 1
+
+    def enqueue_job(self, kind, payload, tenant_id=None, batch_id=None, host=None):
+        self.jobs.append({"id": len(self.jobs) + 1, "kind": kind, "status": "pending",
+                          "tenant_id": tenant_id, "host": host, "payload": payload})
+        return len(self.jobs)
+
+
+@pytest.fixture
+def master(monkeypatch):
+    fake = FakeMaster()
+    monkeypatch.setattr(tenant_jobs, "unit_of_work", nullcontext)
+    monkeypatch.setattr(tenant_jobs, "fetch_one", fake.fetch_one)
+    monkeypatch.setattr(tenant_jobs, "execute_sql", fake.execute_sql)
+    monkeypatch.setattr(tenant_jobs, "enqueue_job", fake.enqueue_job)
+    invalidated = []
+    monkeypatch.setattr(tenant_jobs.tenant_directory, "invalidate", lambda *a: invalidated.append(a))
+    fake.invalidated = invalidated
+    return fake
+
+
+def test_delete_marks_tenant_and_enqueues_drop(master):
+    result = enqueue_drop_tenant(7)
+    assert result["jobId"] == 1
+    assert master.tenants[7]["deleted_at"] is not None
+    assert master.jobs[0]["kind"] == "drop_tenant"
+    assert master.jobs[0]["payload"] == {"slug": "acme", "dbName": "acme_db", "host": "db-2"}
+    assert master.jobs[0]["host"] == "db-2"
+    assert master.invalidated == [(7, "acme")]
+
+
+def test_repeated_delete_returns_job_in_flight(master):
+    first = enqueue_drop_tenant(7)["jobId"]
+    assert enqueue_drop_tenant(7)["jobId"] == first
+    assert len(master.jobs) == 1
+
+
+def test_delete_after_failed_drop_enqueues_again(master):
+    enqueue_drop_tenant(7)
+    master.jobs[0]["status"] = "failed"
+    assert enqueue_drop_tenant(7)["jobId"] == 2
+    assert sum("deleted_at = NOW()" in u for u in master.updates) == 1
+
+
+def test_delete_unknown_tenant(master):
+    assert enqueue_drop_tenant(99) is None
+    assert master.jobs == []
+
+
+def test_delete_refused_while_provisioning(master):
+    master.jobs.append({"id": 1, "kind": "create_tenant", "status": "running", "tenant_id": 7})
+    with pytest.raises(TenantSpecError) as err:
+        enqueue_drop_tenant(7)
+    assert err.value.status == 409
+    assert master.tenants[7]["deleted_at"] is None
+
+
+def test_delete_refused_while_relocating(master):
+    master.jobs.append({"id": 1, "kind": "relocate_tenant", "status": "pending", "tenant_id": 7})
+    with pytest.raises(TenantSpecError) as err:
+        enqueue_drop_tenant(7)
+    assert err.value.status == 409 and "relocação" in str(err.value)
+    assert master.tenants[7]["deleted_at"] is None
+
+
+def test_delete_without_host_uses_default(master):
+    master.tenants[7]["database_host"] = None
+    enqueue_drop_tenant(7)
+    assert master.jobs[0]["payload"]["host"] == tenant_jobs.TENANT_DB_HOST
+
+
+class FakeAdminConn:
+    def __init__(self, tables):
+        self.tables = tables
+        self.statements = []
+
+    def exec_driver_sql(self, sql, params=None):
+        self.statements.append(sql.strip())
+        conn = self
+
+        class Result:
+            def fetchall(self):
+                return list(conn.tables)
+
+        return Result()
+
+
+class FakeCtx:
+    def __init__(self):
+        self.beats = []
+
+    def heartbeat(self, progress=None):
+        self.beats.append(progress)
+
+
+def test_drop_tables_smallest_first_with_pauses(monkeypatch):
+    # information_schema já vem ordenado por tamanho (ORDER BY 2, 1)
+    conn = FakeAdminConn([("logs", 10), ("users", 2 * 1024 ** 3)])
+    sleeps = []
+
+    @contextmanager
+    def checkout(engine):
+        yield conn
+
+    monkeypatch.setattr(tenant_jobs, "checkout", checkout)
+    monkeypatch.setattr(tenant_jobs, "get_target_admin_engine", lambda host: host)
+    monkeypatch.setattr(tenant_jobs.tenant_engines, "evict", lambda host, db: None)
+    monkeypatch.setattr(tenant_jobs.time, "sleep", sleeps.append)
+    monkeypatch.setattr(tenant_jobs, "TENANT_DROP_PAUSE_SECONDS", 0.5)
+    monkeypatch.setattr(tenant_jobs, "TENANT_DROP_PAUSE_PER_GB", 1.0)
+
+    ctx = FakeCtx()
+    result = drop_tenant_tables(ctx, "db-2", "acme_db")
+
+    drops = [s for s in conn.statements if s.startswith("DROP")]
+    assert drops == ["DROP TABLE IF EXISTS `acme_db`.`logs`", "DROP TABLE IF EXISTS `acme_db`.`users`"]
+    assert conn.statements[-1] == "SET FOREIGN_KEY_CHECKS = 1"
+    assert result == {"tables": 2, "bytes": 10 + 2 * 1024 ** 3}
+    assert ctx.beats[-1] == {"droppedTables": 2, "remainingTables": 0}
+    # Pausa só entre DROPs (nenhuma depois do último)
+    assert len(sleeps) == 1 and sleeps[0] == pytest.approx(0.5 + 10 / 1024 ** 3)
@@ -0,0 +1,189 @@
+"""DTOs compilados (app.dto) contra cópias dos helpers antigos que eles substituíram."""
+import datetime
+
+import pytest
+
+from app.dto import (
+    SYSTEM_DTO,
+    TENANT_DTO,
+    TENANT_PUBLIC_DTO,
+    TENANT_SYSTEM_DTO,
+    USER_ADMIN_ITEM_DTO,
+    USER_DTO,
+    USER_PROFILE_DTO,
+    Bool,
+    Col,
+    Const,
+    Dto,
+    Field,
+    Or,
+)
+from bench.bench_dto import COLUMNS as USER_COLUMNS
+from bench.bench_dto import legacy_user_profile_dto, legacy_user_to_dto, make_rows
+
+
+def legacy_user_to_item(row):
+    return {
+        "id": row["id"],
+        "name": row["name"],
+        "nickname": row.get("nickname"),
+        "email": row["email"],
+        "phone": row.get("phone"),
+        "cpf": row.get("cpf"),
+        "cnpj": row.get("cnpj"),
+        "city": row.get("city"),
+        "state": row.get("state"),
+        "timezone": row.get("timezone"),
+        "avatar_url": row.get("avatar_url"),
+        "is_active": bool(row.get("is_active", True)),
+        "is_blocked": bool(row.get("is_blocked", False)),
+        "last_login_at": row["last_login_at"].isoformat() if row.get("last_login_at") else None,
+        "created_at": row["created_at"].isoformat() if row.get("created_at") else None,
+        "tenants": [],
+    }
+
+
+def legacy_tenant_to_dto(row):
+    dto = {
+        "id": row["id"],
+        "slug": row["slug"],
+        "displayName": row.get("display_name") or row["slug"],
+        "logoUrl": row.get("logo_url"),
+        "primaryColor": row.get("primary_color") or "#ef4444",
+        "welcomeMessage": row.get("welcome_message"),
+        "allowRegistration": bool(row.get("allow_registration", True)),
+        "memberCount": row.get("member_count", 0),
+    }
+    if row.get("system_slug"):
+        dto["system"] = {
+            "slug": row["system_slug"],
+            "displayName": row.get("system_name"),
+            "icon": row.get("system_icon"),
+            "color": row.get("system_color"),
+        }
+    return dto
+
+
+def legacy_system_row_to_dto(row):
+    return {
+        "id": int(row["id"]),
+        "slug": row["slug"],
+        "displayName": row.get("display_name") or "",
+        "description": row.get("description") or "",
+        "icon": row.get("icon") or "trophy",
+        "color": row.get("color") or "#ef4444",
+        "baseUrl": row.get("base_route") or "/",
+        "isActive": bool(row.get("is_active", True)),
+    }
+
+
+def legacy_tenant_row_to_dto(row):
+    return {
+        "id": int(row["id"]),
+        "slug": row["slug"],
+        "displayName": row.get("display_name") or "",
+        "logoUrl": row.get("logo_url"),
+        "primaryColor": row.get("primary_color") or "#ef4444",
+        "welcomeMessage": row.get("welcome_message"),
+        "maintenanceMode": bool(row.get("maintenance_mode", False)),
+    }
+
+
+def _compiled_tenant(row):
+    dto = TENANT_DTO(row)
+    if row.get("system_slug"):
+        dto["system"] = TENANT_SYSTEM_DTO(row)
+    return dto
+
+
+USER_ROWS = [dict(zip(USER_COLUMNS, r)) for r in make_rows(200)]
+# Projeções menores (colunas ausentes caem nos defaults dos helpers antigos)
+USER_SUBSETS = [
+    USER_COLUMNS,
+    ("id", "name", "email"),
+    ("id", "name", "email", "is_active", "created_at", "last_login_at"),
+]
+
+TS = datetime.datetime(2025, 3, 1, 10, 30)
+TENANT_ROWS = [
+    {"id": 1, "slug": "acme", "display_name": "Acme", "logo_url": "/l.png", "primary_color": "#111",
+     "welcome_message": "oi", "allow_registration": 0, "member_count": 3, "maintenance_mode": 1,
+     "system_slug": "jogador", "system_name": "Jogador", "system_icon": "ball", "system_color": "#222"},
+    {"id": "2", "slug": "beta", "display_name": None, "primary_color": "", "allow_registration": None},
+    {"id": 3, "slug": "gama", "system_slug": None},
+]
+SYSTEM_ROWS = [
+    {"id": "1", "slug": "jogador", "display_name": "Jogador", "description": "d", "icon": "ball",
+     "color": "#000", "base_route": "/j", "is_active": 1},
+    {"id": 2, "slug": "quadra", "display_name": None, "description": None, "icon": "", "color": None,
+     "base_route": None, "is_active": 0},
+    {"id": 3, "slug": "min"},
+]
+
+
+def _project(row, columns):
+    return {c: row[c] for c in columns if c in row}
+
+
+@pytest.mark.parametrize("columns", USER_SUBSETS)
+@pytest.mark.parametrize(
+    "dto, legacy",
+    [(USER_DTO, legacy_user_to_dto), (USER_PROFILE_DTO, legacy_user_profile_dto), (USER_ADMIN_ITEM_DTO, legacy_user_to_item)],
+)
+def test_user_dtos_match_legacy(dto, legacy, columns):
+    rows = [_project(r, columns) for r in USER_ROWS]
+    expected = [legacy(r) for r in rows]
+    assert [dto(r) for r in rows] == expected
+    assert dto.many(columns, [tuple(r[c] for c in columns) for r in rows]) == expected
+
+
+@pytest.mark.parametrize("row", TENANT_ROWS)
+def test_tenant_dtos_match_legacy(row):
+    assert _compiled_tenant(row) == legacy_tenant_to_dto(row)
+    assert TENANT_PUBLIC_DTO(row) == legacy_tenant_row_to_dto(row)
+
+
+@pytest.mark.parametrize("row", SYSTEM_ROWS)
+def test_system_dto_matches_legacy(row):
+    assert SYSTEM_DTO(row) == legacy_system_row_to_dto(row)
+    columns = tuple(row)
+    assert SYSTEM_DTO.many(columns, [tuple(row.values())]) == [legacy_system_row_to_dto(row)]
+
+
+def test_missing_required_column_raises_key_error():
+    with pytest.raises(KeyError):
+        USER_DTO({"id": 1, "name": "x"})
+    with pytest.raises(KeyError):
+        TENANT_DTO.compile(("id", "display_name"))
+
+
+def test_or_with_column_fallback_and_duplicate_columns():
+    dto = Dto("t", [Field("id", "id"), Or("label", "label", Col("slug"))])
+    assert dto({"id": 1, "label": None, "slug": "s"}) == {"id": 1, "label": "s"}
+    assert dto({"id": 1, "slug": "s"}) == {"id": 1, "label": "s"}
+    # Coluna repetida: vale a última, como dict(zip(keys, row))
+    assert dto.many(("id", "slug", "id"), [(1, "s", 2)]) == [{"id": 2, "label": "s"}]
+
+
+def test_const_lists_are_fresh_per_row():
+    a, b = USER_ADMIN_ITEM_DTO.many(("id", "name", "email"), [(1, "a", "a@x"), (2, "b", "b@x")])
+    a["tenants"].append("x")
+    assert b["tenants"] == []
+
+
+def test_builders_are_cached_per_projection():
+    dto = Dto("t", [Field("id", "id"), Bool("ok", "ok", True), Const("k", 1)])
+    assert dto.compile(("id", "ok")) is dto.compile(["id", "ok"])
+    assert dto.compile(("id",)) is not dto.compile(("id", "ok"))
+    assert dto.compile(("id",))((5,)) == {"id": 5, "ok": True, "k": 1}
+
+
+def test_extend_overrides_same_key():
+    dto = SYSTEM_DTO.extend("s2", [Const("isActive", False)])
+    assert dto(SYSTEM_ROWS[0])["isActive"] is False
+    assert list(dto(SYSTEM_ROWS[0])) == list(SYSTEM_DTO(SYSTEM_ROWS[0]))
+
+
+def test_non_literal_default_is_rejected():
+    with pytest.raises(ValueError):
+        Dto("t", [Or("x", "x", object())]).compile(("id",))
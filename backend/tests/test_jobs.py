@@ -0,0 +1,441 @@
+"""
+Claim, lease, retomada e compensação do app.jobs (e dos handlers de
+app.tenant_jobs) contra uma tabela provisioning_jobs em memória.
+"""
+import datetime
+import json
+
+import pytest
+
+import app.jobs as jobs
+import app.tenant_jobs as tenant_jobs
+
+
+class FakeJobsTable:
+    """O suficiente de provisioning_jobs para os statements de app.jobs."""
+
+    def __init__(self):
+        self.rows = {}
+        self.now = datetime.datetime(2026, 1, 1, 12, 0, 0)
+        self.lost_claims = set()
+
+    def insert(self, kind, payload, tenant_id=None, host=None):
+        job_id = len(self.rows) + 1
+        self.rows[job_id] = {
+            "id": job_id, "kind": kind, "status": "pending", "tenant_id": tenant_id, "batch_id": None, "host": host,
+            "payload": json.dumps(payload), "steps": None, "result": None, "error": None,
+            "current_step": None, "attempts": 0, "locked_by": None, "locked_until": None,
+            "created_at": self.now, "started_at": None, "finished_at": None,
+        }
+        return job_id
+
+    def expire_leases(self):
+        self.now += datetime.timedelta(seconds=jobs.JOBS_LEASE_SECONDS + 1)
+
+    def _lease(self):
+        return self.now + datetime.timedelta(seconds=jobs.JOBS_LEASE_SECONDS)
+
+    def _claimable(self, row):
+        return row["status"] == "pending" or (row["status"] == "running" and row["locked_until"] < self.now)
+
+    def _running_on(self, host):
+        return sum(1 for r in self.rows.values()
+                   if r["host"] == host and r["status"] == "running" and r["locked_until"] >= self.now)
+
+    def _host_free(self, row, limit):
+        return row["host"] is None or self._running_on(row["host"]) < limit
+
+    def fetch_all(self, sql, params=None, primary=False):
+        assert "FROM provisioning_jobs" in sql
+        return [
+            {"id": i, "host": r["host"]}
+            for i, r in sorted(self.rows.items())
+            if self._claimable(r) and self._host_free(r, params["limit"])
+        ][:5]
+
+    def fetch_one(self, sql, params=None, primary=False):
+        row = self.rows.get(params["id"])
+        return dict(row) if row else None
+
+    def execute_sql(self, sql, params=None):
+        row = self.rows[params["id"]]
+        if "SET status = 'running'" in sql:
+            if row["id"] in self.lost_claims or not self._claimable(row) or not self._host_free(row, params["limit"]):
+                self.lost_claims.discard(row["id"])
+                return 0
+            row.update(status="running", locked_by=params["worker"], locked_until=self._lease(),
+                       attempts=row["attempts"] + 1, started_at=row["started_at"] or self.now)
+            return 1
+        assert "locked_by = :worker" in sql, f"UPDATE sem cerca de worker: {sql}"
+        if row["locked_by"] != params["worker"]:
+            return 0
+        if "SET current_step" in sql:
+            row.update(current_step=params["step"], locked_until=self._lease())
+        elif "SET steps" in sql:
+            row.update(steps=params["steps"], locked_until=self._lease())
+        elif "result = COALESCE" in sql:
+            row["locked_until"] = self._lease()
+            if params["progress"] is not None:
+                row["result"] = params["progress"]
+        elif "SET status = :status" in sql:
+            row.update(status=params["status"], result=params["result"], error=params["error"],
+                       locked_by=None, locked_until=None, finished_at=self.now)
+        else:
+            raise AssertionError(f"statement inesperado: {sql}")
+        return 1
+
+
+@pytest.fixture
+def table(monkeypatch):
+    fake = FakeJobsTable()
+    monkeypatch.setattr(jobs, "fetch_all", fake.fetch_all)
+    monkeypatch.setattr(jobs, "fetch_one", fake.fetch_one)
+    monkeypatch.setattr(jobs, "execute_sql", fake.execute_sql)
+    return fake
+
+
+class Crash(BaseException):
+    """Processo morto no meio do job (não passa pelo except Exception do run_job)."""
+
+
+def _register(monkeypatch, kind, run, compensate=None):
+    monkeypatch.setitem(jobs._handlers, kind, jobs._Handler(run, compensate))
+
+
+def _steps(row):
+    return [s["name"] for s in json.loads(row["steps"] or "[]")]
+
+
+def test_claim_takes_oldest_claimable_once(table):
+    first = table.insert("k", {})
+    table.insert("k", {})
+    row = jobs._claim_next()
+    assert row["id"] == first and row["status"] == "running" and row["attempts"] == 1
+    assert jobs._claim_next()["id"] == first + 1
+    assert jobs._claim_next() is None
+
+
+def test_claim_skips_job_taken_by_another_worker(table):
+    a = table.insert("k", {})
+    b = table.insert("k", {})
+    table.lost_claims.add(a)
+    assert jobs._claim_next()["id"] == b
+
+
+def test_running_job_is_reclaimed_only_after_lease_expires(table):
+    job_id = table.insert("k", {})
+    jobs._claim_next()
+    assert jobs._claim_next() is None
+    table.expire_leases()
+    row = jobs._claim_next()
+    assert row["id"] == job_id and row["attempts"] == 2
+
+
+def test_claim_skips_hosts_at_the_global_limit(table, monkeypatch):
+    monkeypatch.setattr(jobs, "JOBS_HOST_CONCURRENCY", 2)
+    a1 = table.insert("k", {}, host="db-1")
+    a2 = table.insert("k", {}, host="db-1")
+    a3 = table.insert("k", {}, host="db-1")
+    b1 = table.insert("k", {}, host="db-2")
+    free = table.insert("k", {})
+    claimed = [jobs._claim_next()["id"] for _ in range(4)]
+    # db-1 cheio (2 rodando, de qualquer worker): o terceiro espera
+    assert claimed == [a1, a2, b1, free]
+    assert jobs._claim_next() is None
+
+    table.rows[a1].update(status="succeeded", locked_by=None, locked_until=None)
+    assert jobs._claim_next()["id"] == a3
+
+
+def test_expired_lease_does_not_hold_a_host_slot(table, monkeypatch):
+    monkeypatch.setattr(jobs, "JOBS_HOST_CONCURRENCY", 1)
+    first = table.insert("k", {}, host="db-1")
+    table.insert("k", {}, host="db-1")
+    jobs._claim_next()
+    assert jobs._claim_next() is None
+    table.expire_leases()
+    # O órfão é retomado primeiro (id menor) e volta a ocupar o host
+    assert jobs._claim_next()["id"] == first
+    assert jobs._claim_next() is None
+
+
+def test_claim_rechecks_host_limit_in_update(table, monkeypatch):
+    monkeypatch.setattr(jobs, "JOBS_HOST_CONCURRENCY", 1)
+    job_id = table.insert("k", {}, host="db-1")
+    rival = table.insert("k", {}, host="db-1")
+    candidates = table.fetch_all("FROM provisioning_jobs", {"limit": 1})
+    # Outro worker pegou um job do db-1 entre o SELECT e o UPDATE
+    table.rows[rival].update(status="running", locked_by="outro", locked_until=table._lease())
+    monkeypatch.setattr(table, "fetch_all", lambda *a, **k: candidates)
+    assert jobs._claim_next() is None
+    assert table.rows[job_id]["status"] == "pending"
+
+
+def test_run_job_records_steps_and_result(table, monkeypatch):
+    def run(ctx):
+        a = ctx.step("a", lambda: {"x": 1})
+        ctx.heartbeat({"progress": 50})
+        b = ctx.step("b", lambda: a["x"] + 1)
+        return {"b": b, "payload": ctx.payload}
+
+    _register(monkeypatch, "k", run)
+    job_id = table.insert("k", {"p": 1})
+    jobs.run_job(jobs._claim_next())
+
+    row = table.rows[job_id]
+    assert row["status"] == "succeeded" and row["locked_until"] is None
+    assert json.loads(row["result"]) == {"b": 2, "payload": {"p": 1}}
+    assert _steps(row) == ["a", "b"]
+    dto = jobs.job_to_dto(row)
+    assert [s["name"] for s in dto["steps"]] == ["a", "b"] and dto["attempts"] == 1
+
+
+def test_resume_replays_finished_steps(table, monkeypatch):
+    calls = []
+    crash = {"on": True}
+
+    def run(ctx):
+        first = ctx.step("first", lambda: calls.append("first") or {"id": 10})
+        if crash["on"]:
+            raise Crash()
+        second = ctx.step("second", lambda: calls.append("second") or first["id"] * 2)
+        return {"resumed": ctx.resumed, "second": second}
+
+    _register(monkeypatch, "k", run)
+    job_id = table.insert("k", {})
+    with pytest.raises(Crash):
+        jobs.run_job(jobs._claim_next())
+    assert table.rows[job_id]["status"] == "running"
+
+    crash["on"] = False
+    assert jobs._claim_next() is None
+    table.expire_leases()
+    jobs.run_job(jobs._claim_next())
+
+    row = table.rows[job_id]
+    assert calls == ["first", "second"]
+    assert json.loads(row["result"]) == {"resumed": True, "second": 20}
+    assert _steps(row) == ["first", "second"]
+
+
+def test_failure_runs_compensate_and_marks_failed(table, monkeypatch):
+    compensated = []
+
+    def run(ctx):
+        ctx.step("a", lambda: None)
+        raise RuntimeError("boom")
+
+    _register(monkeypatch, "k", run, lambda ctx: compensated.append([s["name"] for s in ctx.steps]))
+    job_id = table.insert("k", {})
+    jobs.run_job(jobs._claim_next())
+    assert compensated == [["a"]]
+    assert table.rows[job_id]["status"] == "failed"
+    assert table.rows[job_id]["error"] == "boom"
+
+
+def test_compensate_failure_still_finishes_job(table, monkeypatch):
+    def compensate(ctx):
+        raise RuntimeError("rollback quebrado")
+
+    _register(monkeypatch, "k", lambda ctx: 1 / 0, compensate)
+    job_id = table.insert("k", {})
+    jobs.run_job(jobs._claim_next())
+    assert table.rows[job_id]["status"] == "failed"
+
+
+def test_job_is_abandoned_after_max_attempts(table, monkeypatch):
+    ran = []
+    _register(monkeypatch, "k", lambda ctx: ran.append(1))
+    job_id = table.insert("k", {})
+    for _ in range(jobs.JOBS_MAX_ATTEMPTS):
+        jobs._claim_next()
+        table.expire_leases()
+    jobs.run_job(jobs._claim_next())
+    assert ran == []
+    assert table.rows[job_id]["status"] == "failed"
+    assert "tentativas" in table.rows[job_id]["error"]
+
+
+def test_unknown_kind_fails(table):
+    job_id = table.insert("nao-existe", {})
+    jobs.run_job(jobs._claim_next())
+    assert table.rows[job_id]["status"] == "failed"
+
+
+def test_lost_lease_abandons_job_without_compensate(table, monkeypatch):
+    compensated = []
+
+    def run(ctx):
+        ctx.step("a", lambda: None)
+        # Lease expirou no meio da etapa e outro worker retomou o job
+        table.expire_leases()
+        jobs._claim_next()
+        ctx.step("b", lambda: None)
+
+    _register(monkeypatch, "k", run, lambda ctx: compensated.append(True))
+    job_id = table.insert("k", {})
+    jobs.run_job(jobs._claim_next())
+
+    row = table.rows[job_id]
+    assert compensated == []
+    assert row["status"] == "running" and row["attempts"] == 2
+    assert row["current_step"] == "a"
+
+
+def test_lost_lease_on_heartbeat_raises(table):
+    job_id = table.insert("k", {})
+    ctx = jobs.JobContext(jobs._claim_next())
+    ctx.heartbeat({"progress": 1})
+    table.rows[job_id]["locked_by"] = "outro-worker"
+    with pytest.raises(jobs.JobLeaseLost):
+        ctx.heartbeat({"progress": 2})
+
+
+def test_each_claim_gets_its_own_token(table):
+    job_id = table.insert("k", {})
+    first = jobs._claim_next()["locked_by"]
+    table.expire_leases()
+    second = jobs._claim_next()["locked_by"]
+    assert first != second and first.startswith(jobs._WORKER_ID)
+    assert table.rows[job_id]["locked_by"] == second
+
+
+def test_unreadable_job_is_failed(table):
+    job_id = table.insert("k", {})
+    table.rows[job_id]["payload"] = "{quebrado"
+    jobs.run_job(jobs._claim_next())
+    assert table.rows[job_id]["status"] == "failed"
+    assert "ilegível" in table.rows[job_id]["error"]
+
+
+def test_worker_loop_survives_run_job_errors(monkeypatch):
+    rows = [{"id": 1}, {"id": 2}]
+    ran = []
+
+    def claim():
+        if not rows:
+            jobs._stop.set()
+            return None
+        return rows.pop(0)
+
+    def run(row):
+        ran.append(row["id"])
+        raise RuntimeError("MASTER fora")
+
+    monkeypatch.setattr(jobs, "_claim_next", claim)
+    monkeypatch.setattr(jobs, "run_job", run)
+    monkeypatch.setattr(jobs, "JOBS_POLL_SECONDS", 0)
+    try:
+        jobs._worker_loop()
+    finally:
+        jobs._stop.clear()
+    assert ran == [1, 2]
+
+
+def test_enqueue_rejects_unknown_kind():
+    with pytest.raises(ValueError):
+        jobs.enqueue_job("nao-existe", {})
+
+
+# ------------------------------------------------------------
+# create_tenant / drop_tenant
+# ------------------------------------------------------------
+PAYLOAD = {
+    "host": "db-1", "dbName": "acme_db", "slug": "acme", "systemSlug": "jogador",
+    "admin": {"email": "a@x", "name": "A", "nickname": "a", "passHash": "h"},
+}
+
+
+class Calls(list):
+    """Chamadas em ordem + `invalidated` (argumentos de tenant_directory.invalidate)."""
+
+
+@pytest.fixture
+def tenant_ops(monkeypatch, table):
+    calls = Calls()
+
+    def record(name, result=None):
+        def fn(*args, **kwargs):
+            calls.append(name)
+            return result
+        return fn
+
+    monkeypatch.setattr(tenant_jobs, "create_physical_database", record("create_database"))
+    monkeypatch.setattr(tenant_jobs, "drop_physical_database", record("drop_database"))
+    monkeypatch.setattr(tenant_jobs, "baseline_tenant", record("baseline"))
+    monkeypatch.setattr(tenant_jobs, "_tenant_admin", record("tenant_admin"))
+    monkeypatch.setattr(tenant_jobs, "_hub_membership", record("hub_membership", 99))
+    monkeypatch.setattr(tenant_jobs, "_hub_link", record("hub_link"))
+    monkeypatch.setattr(tenant_jobs, "execute_sql", lambda sql, params=None: calls.append(sql.split()[0]) or 1)
+    monkeypatch.setattr(tenant_jobs, "invalidate_placement", record("invalidate_placement"))
+    invalidated = []
+    monkeypatch.setattr(tenant_jobs.tenant_directory, "invalidate", lambda *a: invalidated.append(a))
+    calls.invalidated = invalidated
+    return calls
+
+
+def test_create_tenant_resume_restarts_interrupted_schema(table, tenant_ops, monkeypatch):
+    schema_calls = []
+    crash = {"on": True}
+
+    def schema(p, resumed):
+        schema_calls.append(resumed)
+        if crash["on"]:
+            raise Crash()
+        return "template"
+
+    monkeypatch.setattr(tenant_jobs, "_schema", schema)
+    job_id = table.insert("create_tenant", PAYLOAD, tenant_id=7)
+    with pytest.raises(Crash):
+        jobs.run_job(jobs._claim_next())
+
+    crash["on"] = False
+    table.expire_leases()
+    jobs.run_job(jobs._claim_next())
+
+    row = table.rows[job_id]
+    assert row["status"] == "succeeded"
+    assert schema_calls == [False, True]
+    assert tenant_ops.count("create_database") == 1
+    assert json.loads(row["result"])["schema"] == "template"
+    assert (7,) in tenant_ops.invalidated
+
+
+def test_create_tenant_failure_compensates(table, tenant_ops, monkeypatch):
+    monkeypatch.setattr(tenant_jobs, "_schema", lambda p, resumed: "template")
+    monkeypatch.setattr(tenant_jobs, "_hub_membership", lambda p, tenant_id: 1 / 0)
+    job_id = table.insert("create_tenant", PAYLOAD, tenant_id=7)
+    jobs.run_job(jobs._claim_next())
+
+    assert table.rows[job_id]["status"] == "failed"
+    assert tenant_ops[-2:] == ["drop_database", "DELETE"]
+    assert (7, "acme") in tenant_ops.invalidated
+
+
+def test_drop_tenant_resume_skips_dropped_tables(table, tenant_ops, monkeypatch):
+    drops = []
+    crash = {"on": True}
+
+    def drop_tables(ctx, host, db_name):
+        drops.append(db_name)
+        return {"tables": 3, "bytes": 10}
+
+    def drop_database(host, db_name):
+        if crash["on"]:
+            raise Crash()
+
+    monkeypatch.setattr(tenant_jobs, "drop_tenant_tables", drop_tables)
+    monkeypatch.setattr(tenant_jobs, "drop_physical_database", drop_database)
+    job_id = table.insert("drop_tenant", PAYLOAD, tenant_id=7)
+    with pytest.raises(Crash):
+        jobs.run_job(jobs._claim_next())
+
+    crash["on"] = False
+    table.expire_leases()
+    jobs.run_job(jobs._claim_next())
+
+    row = table.rows[job_id]
+    assert drops == ["acme_db"]
+    assert row["status"] == "succeeded"
+    assert json.loads(row["result"])["tables"] == 3
+    assert _steps(row) == ["drop_tables", "drop_database", "delete_record"]
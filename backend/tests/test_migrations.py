@@ -0,0 +1,217 @@
+"""Ledger, retomada de arquivo aplicado em parte e checagem de boot de app.migrations."""
+from contextlib import contextmanager
+
+import pytest
+from pymysql.constants import CLIENT
+from sqlalchemy.exc import DBAPIError
+
+import app.migrations as mig
+from app.db import BatchStatementError
+
+
+class Result:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def scalar(self):
+        return self.rows[0][0]
+
+
+class FakeMaster:
+    """schema_migrations + schema_migrations_progress + statements executados."""
+
+    def __init__(self, ledger=None, progress=None, fail_on=(), multi=False):
+        self.ledger = dict(ledger or {})
+        self.progress = dict(progress or {})
+        self.fail_on = set(fail_on)
+        self.executed = []
+        self.client_flag = CLIENT.MULTI_STATEMENTS if multi else 0
+
+    # Engine / Connection
+    def connect(self):
+        return self
+
+    def dispose(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    @property
+    def connection(self):
+        return self
+
+    @property
+    def dbapi_connection(self):
+        return self
+
+    def cursor(self):
+        return self
+
+    def close(self):
+        pass
+
+    def execute(self, stmt, params=None):
+        sql = " ".join(str(stmt).split())
+        if sql.startswith("CREATE TABLE IF NOT EXISTS") or sql.startswith("ALTER TABLE schema_migrations"):
+            return Result([])
+        if "information_schema.COLUMNS" in sql:
+            return Result([(1,)])
+        if sql == "SELECT migration, checksum FROM schema_migrations":
+            return Result(list(self.ledger.items()))
+        if sql.startswith("SELECT migration, checksum, statements_done"):
+            return Result([(k, *v) for k, v in self.progress.items()])
+        if sql.startswith("UPDATE schema_migrations SET checksum"):
+            self.ledger[params["m"]] = params["c"]
+            return Result([])
+        if sql.startswith("INSERT INTO schema_migrations ("):
+            self.ledger[params["m"]] = params["c"]
+            return Result([])
+        if sql.startswith("INSERT INTO schema_migrations_progress"):
+            self.progress[params["m"]] = (params["c"], params["d"])
+            return Result([])
+        if sql.startswith("DELETE FROM schema_migrations_progress"):
+            self.progress.pop(params["m"], None)
+            return Result([])
+        raise AssertionError(sql)
+
+    def exec_driver_sql(self, sql, params=None):
+        if sql in self.fail_on:
+            raise RuntimeError("Duplicate column name")
+        self.executed.append(sql)
+
+
+@pytest.fixture
+def files(tmp_path, monkeypatch):
+    (tmp_path / "001_users.sql").write_text("CREATE TABLE users (id INT);\nCREATE TABLE roles (id INT);\n")
+    (tmp_path / "002_cols.sql").write_text(
+        "ALTER TABLE users ADD a INT;\nALTER TABLE users ADD b INT;\nALTER TABLE users ADD c INT;\n"
+    )
+    (tmp_path / "003_seed_systems.sql").write_text("INSERT INTO systems VALUES (1);\n")
+    local = mig.local_migrations
+    monkeypatch.setattr(mig, "local_migrations", lambda: local(tmp_path))
+    return {m.name: m for m in local(tmp_path)}
+
+
+@pytest.fixture
+def master(monkeypatch):
+    def use(fake):
+        monkeypatch.setattr(mig, "_migration_engine", lambda: fake)
+        return fake
+
+    return use
+
+
+def test_applies_pending_in_order_and_skips_seeds(files, master):
+    fake = master(FakeMaster())
+    out = mig.migrate(verbose=False)
+    assert out["applied"] == ["001_users.sql", "002_cols.sql"] and out["failed"] is None
+    assert len(fake.executed) == 5
+    assert fake.ledger == {n: m.checksum for n, m in files.items()}
+
+
+def test_failure_saves_progress_and_next_run_resumes(files, master):
+    stmts = files["002_cols.sql"].statements()
+    fake = master(FakeMaster(ledger={"001_users.sql": files["001_users.sql"].checksum}, fail_on={stmts[1]}))
+    out = mig.migrate(verbose=False)
+    assert out["failed"]["migration"] == "002_cols.sql" and "stmt#2" in out["failed"]["error"]
+    assert fake.progress == {"002_cols.sql": (files["002_cols.sql"].checksum, 1)}
+    assert "002_cols.sql" not in fake.ledger
+
+    fake.fail_on.clear()
+    fake.executed.clear()
+    out = mig.migrate(verbose=False)
+    assert out["applied"] == ["002_cols.sql"]
+    assert fake.executed == stmts[1:]
+    assert fake.progress == {} and "002_cols.sql" in fake.ledger
+
+
+def test_multi_statement_failure_counts_from_offset(files, master, monkeypatch):
+    stmts = files["002_cols.sql"].statements()
+    fake = master(FakeMaster(
+        ledger={"001_users.sql": files["001_users.sql"].checksum},
+        progress={"002_cols.sql": (files["002_cols.sql"].checksum, 1)},
+        multi=True,
+    ))
+    batches = []
+
+    def multi(cursor, batch):
+        batches.append(list(batch))
+        raise BatchStatementError(1, batch[1])
+
+    monkeypatch.setattr(mig, "execute_multi", multi)
+    out = mig.migrate(verbose=False)
+    assert batches == [stmts[1:]]
+    assert "stmt#3" in out["failed"]["error"]
+    assert fake.progress["002_cols.sql"][1] == 2
+
+
+def test_changed_partial_file_is_not_resumed(files, master):
+    fake = master(FakeMaster(
+        ledger={"001_users.sql": files["001_users.sql"].checksum},
+        progress={"002_cols.sql": ("outro", 1)},
+    ))
+    out = mig.migrate(verbose=False)
+    assert "arquivo mudou" in out["failed"]["error"] and fake.executed == []
+
+
+def test_ledger_from_migrate_sh_gets_checksum_and_changes_are_reported(files, master):
+    fake = master(FakeMaster(ledger={"001_users.sql": None, "002_cols.sql": "outro"}))
+    out = mig.migrate(verbose=False)
+    assert out["applied"] == [] and out["skipped"] == 2 and out["changed"] == ["002_cols.sql"]
+    assert fake.ledger["001_users.sql"] == files["001_users.sql"].checksum
+
+
+def test_dry_run_and_baseline_do_not_execute(files, master):
+    fake = master(FakeMaster(progress={"002_cols.sql": (files["002_cols.sql"].checksum, 1)}))
+    assert mig.migrate(dry_run=True, verbose=False)["applied"] == ["001_users.sql", "002_cols.sql"]
+    assert fake.ledger == {}
+    assert mig.migrate(baseline=True, verbose=False)["applied"] == ["001_users.sql", "002_cols.sql"]
+    assert fake.executed == [] and set(fake.ledger) == {"001_users.sql", "002_cols.sql"}
+
+
+class CountConn:
+    def __init__(self, result):
+        self.result = result
+
+    def execute(self, stmt, params=None):
+        if isinstance(self.result, Exception):
+            raise self.result
+        return Result([(self.result,)])
+
+
+@pytest.fixture
+def count_conn(monkeypatch):
+    holder = {}
+
+    @contextmanager
+    def checkout(engine):
+        yield holder["conn"]
+
+    monkeypatch.setattr(mig, "checkout", checkout)
+    monkeypatch.setattr(mig, "get_master_engine", lambda: None)
+
+    def use(result):
+        holder["conn"] = CountConn(result)
+
+    return use
+
+
+def test_pending_count_missing_ledger_means_all_pending(files, count_conn):
+    count_conn(DBAPIError("SELECT", {}, Exception(mig._MYSQL_NO_SUCH_TABLE, "doesn't exist")))
+    assert mig.pending_count(list(files.values())[:2]) == 2
+    count_conn(1)
+    assert mig.pending_count(list(files.values())[:2]) == 1
+    assert mig.pending_count([]) == 0
+
+
+def test_pending_count_other_errors_propagate(files, count_conn):
+    count_conn(DBAPIError("SELECT", {}, Exception(1045, "Access denied")))
+    with pytest.raises(DBAPIError):
+        mig.pending_count(list(files.values()))
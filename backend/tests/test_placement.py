@@ -0,0 +1,96 @@
+"""Score, escolha de host e sondas de app.placement contra fakes."""
+import threading
+import time
+
+import pytest
+
+import app.placement as placement
+from app.placement import HostLoad, PlacementError, choose_host
+
+
+def _load(host, tenants=0, data_bytes=0, threads=0, max_conn=100, weight=1.0, max_tenants=None,
+          is_active=True, reachable=True):
+    load = HostLoad(host, weight, max_tenants, is_active)
+    load.tenants, load.data_bytes = tenants, data_bytes
+    load.threads_connected, load.max_connections = threads, max_conn
+    load.reachable = reachable
+    return load
+
+
+@pytest.fixture
+def loads(monkeypatch):
+    current = []
+    monkeypatch.setattr(placement, "host_loads", lambda refresh=False: current)
+    return current
+
+
+def test_score_weighs_tenants_data_and_connections():
+    load = _load("db-1", tenants=5, data_bytes=50, threads=20, max_conn=100)
+    assert load.score(10, 100) == pytest.approx(0.4 * 0.5 + 0.4 * 0.5 + 0.2 * 0.2)
+    assert _load("db-2", tenants=5, weight=2).score(10, 0) == pytest.approx(0.1)
+    assert _load("db-3", max_conn=0).connection_ratio == 0.0
+
+
+def test_choose_lowest_score_and_count_placement(loads):
+    loads += [_load("db-1", tenants=4), _load("db-2", tenants=1), _load("db-3", tenants=0, is_active=False)]
+    assert choose_host() == "db-2"
+    assert loads[1].tenants == 2
+    # O +1 no cache espalha um lote entre os hosts
+    assert [choose_host() for _ in range(3)] == ["db-2", "db-2", "db-1"]
+
+
+def test_choose_skips_full_unreachable_and_excluded(loads):
+    loads += [
+        _load("db-1", tenants=2, max_tenants=2),
+        _load("db-2", reachable=False),
+        _load("db-3", tenants=9),
+        _load("db-4"),
+    ]
+    assert choose_host(exclude=["db-4"]) == "db-3"
+
+
+def test_choose_without_eligible_host_returns_none(loads):
+    loads += [_load(placement.TENANT_DB_HOST, reachable=False), _load("db-2", is_active=False)]
+    assert choose_host() is None
+
+
+@pytest.mark.parametrize(
+    "preferred, status",
+    [("db-x", 400), ("db-off", 400), ("db-full", 409), ("db-down", 503)],
+)
+def test_explicit_host_that_cannot_take_tenants_is_rejected(loads, preferred, status):
+    loads += [
+        _load("db-1"),
+        _load("db-off", is_active=False),
+        _load("db-full", tenants=3, max_tenants=3),
+        _load("db-down", reachable=False),
+    ]
+    with pytest.raises(PlacementError) as exc:
+        choose_host(preferred)
+    assert exc.value.status == status
+    assert loads[0].tenants == 0
+
+
+def test_explicit_host_wins_over_score(loads):
+    loads += [_load("db-1"), _load("db-2", tenants=50)]
+    assert choose_host("db-2") == "db-2" and loads[1].tenants == 51
+
+
+def test_host_loads_probes_in_parallel(monkeypatch):
+    monkeypatch.setattr(placement, "_cache", None)
+    monkeypatch.setattr(placement, "_registry", lambda: [HostLoad(f"db-{i}") for i in range(4)])
+    monkeypatch.setattr(placement, "fetch_all", lambda sql, params=None, primary=False: [
+        {"database_host": "db-1", "n": 3},
+    ])
+    barrier = threading.Barrier(4, timeout=2)
+
+    def probe(load):
+        barrier.wait()  # só passa se as 4 sondas estiverem rodando juntas
+        load.reachable = True
+
+    monkeypatch.setattr(placement, "_probe", probe)
+    started = time.monotonic()
+    loads = placement.host_loads(refresh=True)
+    assert time.monotonic() - started < 2
+    assert all(h.reachable for h in loads) and loads[1].tenants == 3
+    placement.invalidate()
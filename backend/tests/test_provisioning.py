@@ -0,0 +1,195 @@
+"""Nomes de golden, limpeza de versões antigas e locks de uso de app.provisioning."""
+from contextlib import contextmanager
+from pathlib import Path
+
+import pytest
+
+import app.provisioning as provisioning
+from app.db import TemplatePlan
+from app.provisioning import GoldenSchema, golden_db_name
+
+OLD = "golden_jogador_" + "a" * 12
+NEW = "golden_jogador_" + "b" * 12
+
+
+def _plan(sha="0123456789abcdef"):
+    return TemplatePlan(Path("model_x.sql"), 0, 0, sha, [])
+
+
+def test_golden_db_name():
+    assert golden_db_name("beach-tennis", _plan()) == "golden_beach_tennis_0123456789ab"
+    with pytest.raises(ValueError):
+        golden_db_name("Jogador;", _plan())
+    with pytest.raises(ValueError):
+        golden_db_name("x" * 60, _plan())
+
+
+@pytest.mark.parametrize(
+    "name, match",
+    [
+        (OLD, True),
+        ("golden_jogador_pro_" + "a" * 12, False),
+        ("golden_jogador_" + "a" * 11, False),
+        ("golden_jogador_" + "A" * 12, False),
+        ("golden_jogador_" + "a" * 12 + "_db", False),
+    ],
+)
+def test_golden_name_re_is_exact(name, match):
+    assert bool(provisioning._golden_name_re("jogador").match(name)) is match
+
+
+class Result:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def fetchall(self):
+        return list(self.rows)
+
+    def first(self):
+        return self.rows[0] if self.rows else None
+
+    def scalar(self):
+        return self.rows[0][0] if self.rows else None
+
+
+class FakeServer:
+    """SCHEMATA, idade do marcador e GET_LOCK de um host (locks de outras sessões em `busy`)."""
+
+    def __init__(self, schemas, ages=None, busy=()):
+        self.schemas = list(schemas)
+        self.ages = dict(ages or {})
+        self.busy = set(busy)
+        self.held = set()
+        self.statements = []
+
+    def exec_driver_sql(self, sql, params=None):
+        self.statements.append(sql)
+        if "FROM information_schema.SCHEMATA" in sql:
+            return Result([(s,) for s in self.schemas])
+        if sql.startswith("SELECT GET_LOCK"):
+            if params[0] in self.busy:
+                return Result([(0,)])
+            self.held.add(params[0])
+            return Result([(1,)])
+        if sql.startswith("SELECT RELEASE_LOCK"):
+            self.held.discard(params[0])
+            return Result([(1,)])
+        if "information_schema.TABLES" in sql:
+            return Result([(1,)] if params[0] in self.ages else [])
+        if "TIMESTAMPDIFF" in sql:
+            return Result([(next(self.ages[s] for s in self.ages if f"`{s}`" in sql),)])
+        if sql.startswith("DROP DATABASE"):
+            self.schemas.remove(sql.split("`")[1])
+            return Result([])
+        raise AssertionError(sql)
+
+
+@pytest.fixture
+def old_enough(monkeypatch):
+    monkeypatch.setattr(provisioning, "GOLDEN_STALE_SECONDS", 3600)
+    monkeypatch.setattr(provisioning, "GOLDEN_USE_SLOTS", 2)
+
+
+def test_drop_stale_goldens_only_same_system_and_old(old_enough):
+    pro = "golden_jogador_pro_" + "c" * 12
+    young = "golden_jogador_" + "d" * 12
+    half = "golden_jogador_" + "e" * 12
+    server = FakeServer([NEW, OLD, pro, young, half], ages={NEW: 0, OLD: 7200, pro: 7200, young: 60})
+
+    assert provisioning._drop_stale_goldens(server, "jogador", NEW) == [OLD, half]
+    assert server.schemas == [NEW, pro, young]
+    assert server.held == set()
+
+
+@pytest.mark.parametrize("lock", [f"golden:{OLD}", f"golden:{OLD}:use:1"])
+def test_drop_stale_golden_skips_golden_in_use(old_enough, lock):
+    server = FakeServer([NEW, OLD], ages={NEW: 0, OLD: 7200}, busy={lock})
+    assert provisioning._drop_stale_goldens(server, "jogador", NEW) == []
+    assert OLD in server.schemas
+    assert server.held == set()
+
+
+class FakeCursor:
+    def close(self):
+        pass
+
+
+class FakeDBAPIConn:
+    def cursor(self):
+        return FakeCursor()
+
+
+class FakePoolConn:
+    dbapi_connection = FakeDBAPIConn()
+
+
+class FakeCloneConn(FakeServer):
+    def __init__(self):
+        super().__init__([])
+        self.invalidated = False
+        self.connection = FakePoolConn()
+
+    def invalidate(self):
+        # Conexão fechada: o MySQL solta os locks da sessão
+        self.invalidated = True
+        self.held.clear()
+
+    def exec_driver_sql(self, sql, params=None):
+        if sql.startswith("USE") or sql.startswith("SHOW TABLES"):
+            self.statements.append(sql)
+            return Result([("users",)])
+        return super().exec_driver_sql(sql, params)
+
+
+@pytest.fixture
+def clone_conn(monkeypatch):
+    conn = FakeCloneConn()
+
+    @contextmanager
+    def checkout(engine):
+        yield conn
+
+    monkeypatch.setattr(provisioning, "checkout", checkout)
+    monkeypatch.setattr(provisioning, "get_template_engine", lambda host: host)
+    monkeypatch.setattr(provisioning, "QUERY_METRICS_ENABLED", False)
+    return conn
+
+
+GOLDEN = GoldenSchema("db-1", NEW, "b" * 12, (("users", "CREATE TABLE `users` (id INT)"),), ())
+
+
+def test_clone_holds_a_use_lock(clone_conn, monkeypatch):
+    locked = []
+    monkeypatch.setattr(provisioning, "execute_multi", lambda cursor, stmts: locked.append(set(clone_conn.held)))
+    provisioning.clone_golden(GOLDEN, "acme_db")
+    assert len(locked[0]) == 1 and next(iter(locked[0])).startswith(f"golden:{NEW}:use:")
+    assert clone_conn.held == set()
+
+
+def test_clone_failure_invalidates_connection(clone_conn, monkeypatch):
+    def boom(cursor, stmts):
+        raise RuntimeError("tabela sumiu")
+
+    monkeypatch.setattr(provisioning, "execute_multi", boom)
+    with pytest.raises(RuntimeError):
+        provisioning.clone_golden(GOLDEN, "acme_db")
+    assert clone_conn.invalidated
+    assert not any(s.startswith("SELECT RELEASE_LOCK") for s in clone_conn.statements)
+
+
+def test_fallback_evicts_only_goldens_of_the_system(monkeypatch):
+    pro = "golden_jogador_pro_" + "c" * 12
+    monkeypatch.setattr(provisioning, "GOLDEN_ENABLED", True)
+    monkeypatch.setattr(provisioning, "_goldens", {("db-1", OLD): GOLDEN, ("db-1", pro): GOLDEN, ("db-2", OLD): GOLDEN})
+
+    def missing(*args):
+        raise RuntimeError("golden sumiu")
+
+    monkeypatch.setattr(provisioning, "ensure_golden", missing)
+    monkeypatch.setattr(provisioning, "drop_physical_database", lambda host, db: None)
+    monkeypatch.setattr(provisioning, "create_physical_database", lambda host, db: None)
+    monkeypatch.setattr(provisioning, "apply_sql_template_parallel", lambda *a: None)
+    monkeypatch.setattr(provisioning, "get_template_engine", lambda host: host)
+
+    assert provisioning.provision_tenant_schema("db-1", "acme_db", "jogador", "model_jogador.sql") == "template"
+    assert set(provisioning._goldens) == {("db-1", pro), ("db-2", OLD)}
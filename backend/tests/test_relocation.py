@@ -0,0 +1,246 @@
+"""Faixas de PK, checksums, congelamento da origem e cutover de app.relocation contra fakes."""
+import zlib
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy.exc import DBAPIError
+
+import app.relocation as relocation
+from app.relocation import TableInfo, _Copier, _Range
+
+USERS = TableInfo("users", ["id", "name"], ["id"])
+PAYLOAD = {"slug": "acme", "dbName": "acme_db", "source": "db-1", "target": "db-2", "maintenance": 0}
+
+
+def test_range_where():
+    t = TableInfo("m", ["a", "b", "x"], ["a", "b"])
+    assert _Range(None, None).where(t) == ("", ())
+    assert _Range((1, 2), None).where(t) == (" WHERE (`a`, `b`) > (%s, %s)", (1, 2))
+    assert _Range((1, 2), (3, 4)).where(t) == (
+        " WHERE (`a`, `b`) > (%s, %s) AND (`a`, `b`) <= (%s, %s)",
+        (1, 2, 3, 4),
+    )
+
+
+class FakeTableConn:
+    """Uma tabela `users` (id, name) com o SQL que o _Copier manda."""
+
+    def __init__(self, rows):
+        self.rows = dict(rows)
+        self.statements = []
+
+    def _in_range(self, sql, params):
+        params = list(params or ())
+        lo = params.pop(0) if "> (" in sql else None
+        hi = params.pop(0) if "<= (" in sql else None
+        return sorted(
+            (k, v) for k, v in self.rows.items() if (lo is None or k > lo) and (hi is None or k <= hi)
+        )
+
+    def exec_driver_sql(self, sql, params=None, execution_options=None):
+        self.statements.append(sql)
+        rows = self._in_range(sql, params)
+        if "OFFSET" in sql:
+            offset = int(sql.rsplit("OFFSET", 1)[1])
+            return Result([(rows[offset][0],)] if len(rows) > offset else [])
+        if "COUNT(*)" in sql:
+            crc = 0
+            for k, v in rows:
+                crc ^= zlib.crc32(f"{k}#{v}".encode())
+            return Result([(len(rows), crc)])
+        if sql.startswith("DELETE"):
+            for k, _ in rows:
+                del self.rows[k]
+            return Result([])
+        if sql.startswith("INSERT"):
+            self.rows.update(dict(params))
+            return Result([])
+        return Result(rows)
+
+
+class Result:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def first(self):
+        return self.rows[0] if self.rows else None
+
+    def fetchall(self):
+        return list(self.rows)
+
+    def partitions(self, size):
+        for i in range(0, len(self.rows), size):
+            yield self.rows[i:i + size]
+
+
+class FakeProgress:
+    rows = 0
+    resynced = 0
+
+    def tick(self, force=False):
+        pass
+
+
+@pytest.fixture
+def chunk(monkeypatch):
+    monkeypatch.setattr(relocation, "RELOCATION_CHUNK_ROWS", 3)
+
+
+def test_sync_resyncs_only_divergent_ranges(chunk):
+    src = FakeTableConn({i: f"u{i}" for i in range(1, 9)})
+    dst = FakeTableConn({i: f"u{i}" for i in range(1, 9)})
+    dst.rows[5] = "velho"
+    del dst.rows[8]
+    dst.rows[20] = "sobra"
+    copier = _Copier(src, dst, "acme_db", FakeProgress())
+    copier.sync_table(USERS)
+
+    assert dst.rows == src.rows
+    # faixas (,3] (3,6] (6,]: só as duas últimas divergiam
+    assert copier.progress.resynced == 2
+
+
+def test_sync_sums_match_full_table_checksum(chunk):
+    src = FakeTableConn({i: f"u{i}" for i in range(1, 11)})
+    copier = _Copier(src, FakeTableConn(src.rows), "acme_db", FakeProgress())
+    copier.sync_table(USERS)
+    assert copier.sums["users"] == list(relocation._checksum(src, "acme_db", USERS, "", ()))
+
+
+class FakeCtx:
+    def __init__(self, payload=PAYLOAD, tenant_id=7):
+        self.payload = dict(payload)
+        self.tenant_id = tenant_id
+        self.id = 1
+
+    def heartbeat(self, progress=None):
+        pass
+
+
+@pytest.fixture
+def source(monkeypatch):
+    calls = []
+    monkeypatch.setattr(relocation, "RELOCATION_KEEP_SOURCE", False)
+    monkeypatch.setattr(relocation, "_unfreeze_source", lambda p: calls.append("unfreeze"))
+    monkeypatch.setattr(relocation, "drop_tenant_tables", lambda ctx, host, db: calls.append("drop_tables") or {"tables": 1})
+    monkeypatch.setattr(relocation, "drop_physical_database", lambda host, db: calls.append("drop_database"))
+    return calls
+
+
+def test_drop_source_after_unchanged_checksums(source, monkeypatch):
+    monkeypatch.setattr(relocation, "_source_checksums", lambda p: {"users": [3, 99]})
+    assert relocation._drop_source(FakeCtx(), {"users": [3, 99]}) == {"tables": 1}
+    assert source == ["unfreeze", "drop_tables", "drop_database"]
+
+
+@pytest.mark.parametrize("current", [{"users": [4, 12]}, {"users": [3, 99], "logs": [1, 5]}, {}])
+def test_drop_source_refuses_changed_source(source, monkeypatch, current):
+    monkeypatch.setattr(relocation, "_source_checksums", lambda p: current)
+    with pytest.raises(RuntimeError, match="mudou"):
+        relocation._drop_source(FakeCtx(), {"users": [3, 99]})
+    assert source == []
+
+
+def test_drop_source_without_baseline_keeps_source(source):
+    with pytest.raises(RuntimeError):
+        relocation._drop_source(FakeCtx(), None)
+    assert source == []
+
+
+class FakeAdminConn:
+    def __init__(self, threads, read_only_error=None):
+        self.threads = threads
+        self.read_only_error = read_only_error
+        self.statements = []
+
+    def exec_driver_sql(self, sql, params=None):
+        self.statements.append(sql)
+        if sql.startswith("KILL 12"):
+            raise DBAPIError(sql, None, Exception(1094, "Unknown thread id"))
+        if "READ ONLY" in sql and self.read_only_error:
+            raise DBAPIError(sql, None, Exception(self.read_only_error, "erro"))
+        return [(t,) for t in self.threads] if "PROCESSLIST" in sql else None
+
+
+def _admin(monkeypatch, conn):
+    @contextmanager
+    def checkout(engine):
+        yield conn
+
+    monkeypatch.setattr(relocation, "checkout", checkout)
+    monkeypatch.setattr(relocation, "get_target_admin_engine", lambda host: host)
+    monkeypatch.setattr(relocation.tenant_engines, "evict", lambda host, db: None)
+
+
+def test_freeze_kills_connections_and_sets_read_only(monkeypatch):
+    conn = FakeAdminConn([11, 12])
+    _admin(monkeypatch, conn)
+    assert relocation._freeze_source(PAYLOAD) is True
+    assert [s for s in conn.statements if s.startswith("KILL")] == ["KILL 11", "KILL 12"]
+    assert conn.statements[-1] == "ALTER DATABASE `acme_db` READ ONLY = 1"
+
+
+def test_freeze_without_read_only_support_falls_back_to_kill(monkeypatch):
+    conn = FakeAdminConn([11], read_only_error=1064)
+    _admin(monkeypatch, conn)
+    assert relocation._freeze_source(PAYLOAD) is False
+
+
+def test_freeze_other_errors_propagate(monkeypatch):
+    _admin(monkeypatch, FakeAdminConn([], read_only_error=1205))
+    with pytest.raises(DBAPIError):
+        relocation._freeze_source(PAYLOAD)
+
+
+class Calls(list):
+    """Statements/fases em ordem + `state` (tenant lido e rowcount da troca)."""
+
+
+@pytest.fixture
+def cutover(monkeypatch):
+    calls = Calls()
+    state = {"tenant": {"id": 7, "database_host": "db-1", "maintenance_mode": 0, "deleted_at": None}, "switched": 1}
+
+    def execute_sql(sql, params=None):
+        calls.append(" ".join(sql.split()))
+        return state["switched"] if "database_host = :target" in sql else 1
+
+    monkeypatch.setattr(relocation, "_tenant", lambda tenant_id: state["tenant"])
+    monkeypatch.setattr(relocation, "execute_sql", execute_sql)
+    monkeypatch.setattr(relocation.time, "sleep", lambda s: None)
+    monkeypatch.setattr(relocation.tenant_directory, "invalidate", lambda *a: None)
+    monkeypatch.setattr(relocation.tenant_engines, "evict", lambda host, db: None)
+    monkeypatch.setattr(relocation, "invalidate_placement", lambda: None)
+    monkeypatch.setattr(relocation, "_freeze_source", lambda p: calls.append("freeze") or True)
+    monkeypatch.setattr(relocation, "_unfreeze_source", lambda p: calls.append("unfreeze"))
+    monkeypatch.setattr(
+        relocation, "_copy_phase",
+        lambda ctx, phase: calls.append(phase) or {"rows": 1, "sourceChecksums": {"users": [1, 2]}},
+    )
+    calls.state = state
+    return calls
+
+
+def test_cutover_freezes_before_final_sync(cutover):
+    result = relocation._cutover(FakeCtx())
+    assert cutover[1:3] == ["freeze", "final_sync"]
+    switch = cutover[3]
+    assert "deleted_at IS NULL" in switch
+    assert result["sourceChecksums"] == {"users": [1, 2]} and result["sourceReadOnly"] is True
+    assert "sourceChecksums" not in result["finalSync"]
+    assert "unfreeze" not in cutover
+
+
+def test_cutover_lost_switch_unfreezes_source(cutover):
+    cutover.state["switched"] = 0
+    with pytest.raises(RuntimeError):
+        relocation._cutover(FakeCtx())
+    assert "unfreeze" in cutover
+    assert cutover[-1].startswith("UPDATE tenants SET maintenance_mode = :maintenance")
+
+
+def test_cutover_refuses_deleted_tenant(cutover):
+    cutover.state["tenant"]["deleted_at"] = "now"
+    with pytest.raises(RuntimeError):
+        relocation._cutover(FakeCtx())
+    assert cutover == []
@@ -0,0 +1,53 @@
+import datetime
+
+from app.cache_bus import CacheBus
+from app.session_cache import SessionCache, session_cache
+
+
+def _session(session_id=1, expires_in=3600):
+    return {"id": session_id, "current_tenant_id": 7, "expires_at": datetime.datetime.now() + datetime.timedelta(seconds=expires_in)}
+
+
+def test_session_put_is_discarded_after_invalidation(bus_log):
+    cache = SessionCache(ttl=60, max_entries=100, touch_interval=60)
+    generation = cache.generation()
+    cache._drop_user(9)
+    cache.put("h", _session(), {"id": 9}, generation)
+    assert cache.get("h") is None
+
+
+def test_session_entry_never_outlives_session(bus_log):
+    cache = SessionCache(ttl=60, max_entries=100, touch_interval=60)
+    cache.put("h", _session(expires_in=-1), {"id": 9}, cache.generation())
+    assert cache.get("h") is None
+
+
+def test_session_refill_keeps_touch_throttle(bus_log):
+    cache = SessionCache(ttl=0, max_entries=100, touch_interval=3600)
+    entry = cache.put("h", _session(), {"id": 9}, cache.generation())
+    assert cache.touch_due(entry)
+    assert cache.get("h") is None
+    entry = cache.put("h", _session(), {"id": 9}, cache.generation())
+    assert not cache.touch_due(entry)
+
+
+def test_session_revocation_reaches_other_process(bus_log):
+    there = SessionCache(ttl=3600, max_entries=100, touch_interval=60)
+    there_bus = CacheBus(0)
+    there_bus.subscribe("session", there._drop_session)
+    there_bus.subscribe("user", lambda ref: there._drop_user(int(ref)))
+    there_bus.sync()
+    for h, sid in (("a", 1), ("b", 2), ("c", 3)):
+        there.put(h, _session(sid), {"id": 9 if h != "c" else 10}, there.generation())
+
+    session_cache.invalidate("a")
+    assert there.get("a") is not None
+    there_bus.sync()
+    assert there.get("a") is None
+    assert there.get("b") is not None
+
+    session_cache.invalidate_user(9)
+    there_bus.sync()
+    assert there.get("b") is None
+    assert there.get("c") is not None
+    assert there.stats()["users"] == 1
@@ -0,0 +1,140 @@
+from pathlib import Path
+
+import pytest
+
+from app.db import TemplatePlan, TemplateStore, _chunk_items, _split_sql_statements, _sql_head
+
+DUMP = """
+/*!40101 SET @OLD_CHARACTER_SET_CLIENT=@@CHARACTER_SET_CLIENT */;
+SET FOREIGN_KEY_CHECKS = 0;
+-- comentário; com ponto e vírgula
+CREATE TABLE `users` (id INT PRIMARY KEY, name VARCHAR(50) DEFAULT 'a;b');
+CREATE TABLE IF NOT EXISTS teams (
+    id INT PRIMARY KEY,
+    owner_id INT,
+    FOREIGN KEY (owner_id) REFERENCES users(id)
+);
+# outro comentário
+CREATE TABLE matches (id INT PRIMARY KEY, home_id INT, away_id INT);
+CREATE TABLE settings (k VARCHAR(20), v TEXT);
+INSERT INTO settings VALUES ('msg', "it's; fine"), ('x', 'a\\'b;');
+CREATE INDEX idx_matches_home ON matches (home_id);
+ALTER TABLE matches ADD CONSTRAINT fk_home FOREIGN KEY (home_id) REFERENCES teams(id);
+ALTER TABLE matches ADD COLUMN note TEXT;
+/* bloco
+   de comentário; */
+SET FOREIGN_KEY_CHECKS = 1;
+/*!40101 SET CHARACTER_SET_CLIENT=@OLD_CHARACTER_SET_CLIENT */
+"""
+
+
+def _plan(sql):
+    return TemplatePlan(Path("model_test.sql"), 0, len(sql), "0" * 64, _split_sql_statements(sql))
+
+
+def test_split_respects_strings_and_comments():
+    stmts = _split_sql_statements(DUMP)
+    assert len(stmts) == 12
+    assert stmts[0].startswith("/*!40101 SET")
+    assert "'a;b'" in stmts[2]
+    assert stmts[6] == "INSERT INTO settings VALUES ('msg', \"it's; fine\"), ('x', 'a\\'b;')"
+    assert not any("comentário" in s for s in stmts)
+
+
+def test_split_doubled_quotes_and_backticks():
+    assert _split_sql_statements("SELECT 'it''s;'; SELECT `a;b` FROM t") == ["SELECT 'it''s;'", "SELECT `a;b` FROM t"]
+
+
+def test_split_keeps_double_dash_without_space():
+    assert _split_sql_statements("SELECT 1--1; SELECT 2") == ["SELECT 1--1", "SELECT 2"]
+
+
+@pytest.mark.parametrize("sql", ["SELECT 'aberta;", "SELECT 1 /* sem fim", 'SELECT "x'])
+def test_split_unterminated_raises(sql):
+    with pytest.raises(ValueError):
+        _split_sql_statements(sql)
+
+
+@pytest.mark.parametrize(
+    "stmt, head",
+    [
+        ("CREATE TABLE x (id INT)", ("create", "table")),
+        ("  alter   TABLE x ADD y INT", ("alter", "table")),
+        ("/*!40101 SET NAMES utf8 */", ("set", "names")),
+        ("/*!SET x = 1 */", ("set", "x")),
+        ("(SELECT 1)", ("", "")),
+        ("", ("", "")),
+    ],
+)
+def test_sql_head(stmt, head):
+    assert _sql_head(stmt) == head
+
+
+def test_template_plan_phases():
+    plan = _plan(DUMP)
+    assert len(plan.prelude) == 2 and len(plan.epilogue) == 2
+    assert plan.tables == ("users", "teams", "matches", "settings")
+    assert [s.split()[0] for s in plan.others] == ["INSERT", "CREATE", "ALTER"]
+    assert len(plan.fks) == 1 and "fk_home" in plan.fks[0]
+    assert [name for name, _ in plan.phases()] == ["SET", "CREATE TABLE", "template", "FK/CONSTRAINT", "SET"]
+    assert sum(len(stmts) for _, stmts in plan.phases()) == len(_split_sql_statements(DUMP))
+
+
+def test_template_plan_only_sets():
+    plan = _plan("SET a = 1; SET b = 2")
+    assert plan.prelude == ("SET a = 1", "SET b = 2")
+    assert plan.epilogue == () and plan.creates == ()
+
+
+def test_template_store_reparses_only_on_content_change(tmp_path):
+    path = tmp_path / "model_x.sql"
+    path.write_text("CREATE TABLE a (id INT);")
+    store = TemplateStore()
+    first = store.get(path)
+    assert store.get(str(path)) is first
+    assert (store.parses, store.hits) == (1, 1)
+
+    path.write_text("CREATE TABLE a (id INT); CREATE TABLE b (id INT);")
+    second = store.get(path)
+    assert second is not first and second.tables == ("a", "b")
+    assert store.parses == 2
+    assert store.stats()["templates"]["model_x.sql"] == {"version": second.version, "tables": 2}
+
+
+def test_ddl_plan_levels_follow_foreign_keys():
+    ddl = _plan(DUMP).ddl
+    assert ddl.deps["teams"] == frozenset({"users"})
+    assert ddl.deps["matches"] == frozenset({"teams"})
+    levels = [[n for _, n, _ in lvl] for lvl in ddl.creates]
+    # users(1) e settings(4) juntos; teams(2) depois de users; matches(3) depois de teams
+    assert levels == [[1, 4], [2], [3]]
+    assert ddl.width() == 2
+    assert [[item[1] for item in lvl] for lvl in ddl.alters] == [[1]]
+    assert ddl.alters[0][0][0] == "FK/CONSTRAINT"
+
+
+def test_ddl_plan_cycle_goes_to_last_level():
+    ddl = _plan(
+        """
+        CREATE TABLE a (id INT, b_id INT, FOREIGN KEY (b_id) REFERENCES b(id));
+        CREATE TABLE b (id INT, a_id INT, FOREIGN KEY (a_id) REFERENCES a(id));
+        CREATE TABLE c (id INT);
+        CREATE TABLE d (id INT, c_id INT REFERENCES `c` (id));
+        """
+    ).ddl
+    assert [[n for _, n, _ in lvl] for lvl in ddl.creates] == [[3], [4], [1, 2]]
+
+
+def test_ddl_plan_ignores_references_outside_template():
+    ddl = _plan("CREATE TABLE a (id INT, u INT, FOREIGN KEY (u) REFERENCES hub.users(id))").ddl
+    assert ddl.deps["a"] == frozenset({"users"})
+    assert len(ddl.creates) == 1
+
+
+def test_chunk_items_measures_utf8_bytes():
+    # 45 caracteres, 65 bytes em UTF-8: por len() dois caberiam em 100 bytes
+    stmt = "INSERT INTO t VALUES ('" + "é" * 20 + "')"
+    items = [("others", i, stmt) for i in range(3)]
+    batches = list(_chunk_items(items, 100))
+    assert [len(b) for b in batches] == [1, 1, 1]
+    assert [len(b) for b in _chunk_items(items, 150)] == [2, 1]
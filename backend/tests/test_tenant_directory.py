@@ -0,0 +1,111 @@
+import pytest
+
+import app.tenant_directory as directory_module
+from app.cache_bus import CacheBus
+from app.tenant_directory import TenantDirectory
+
+SYSTEM = {"id": 1, "slug": "jogador", "display_name": "Jogador", "icon": "ball", "color": "#000"}
+
+
+class FakeTenants:
+    def __init__(self):
+        self.rows = {7: {"id": 7, "slug": "acme", "system_id": 1, "is_active": 1, "maintenance_mode": 0}}
+        self.reads = 0
+        self.during_read = None
+
+    def fetch_one(self, sql, params=None, primary=False):
+        assert primary
+        self.reads += 1
+        if self.during_read:
+            self.during_read()
+        if "id" in params:
+            row = self.rows.get(params["id"])
+        else:
+            row = next((r for r in self.rows.values() if r["slug"] == params["slug"]), None)
+        return dict(row) if row else None
+
+
+@pytest.fixture
+def tenants(monkeypatch, bus_log):
+    fake = FakeTenants()
+    monkeypatch.setattr(directory_module, "fetch_one", fake.fetch_one)
+    monkeypatch.setattr(directory_module.systems_catalog, "by_id", lambda i: SYSTEM if int(i) == 1 else None)
+    return fake
+
+
+def _directory():
+    directory = TenantDirectory(ttl=3600, max_entries=100)
+    bus = CacheBus(0)
+    bus.subscribe("tenant", lambda ref: directory._drop(tenant_id=int(ref)))
+    bus.subscribe("tenant_slug", lambda ref: directory._drop(slug=ref))
+    return directory, bus
+
+
+def test_directory_caches_by_slug_and_id(tenants):
+    directory, _ = _directory()
+    row = directory.by_slug("acme")
+    assert row["system_slug"] == "jogador" and row["system_name"] == "Jogador"
+    assert directory.by_id(7)["slug"] == "acme"
+    assert directory.by_id("7")["id"] == 7
+    assert tenants.reads == 1
+    assert directory.by_id("abc") is None
+    assert directory.by_slug("  ") is None
+
+
+def test_directory_without_system_behaves_like_inner_join(tenants):
+    tenants.rows[7]["system_id"] = 99
+    directory, _ = _directory()
+    assert directory.by_id(7) is None
+
+
+def test_directory_negative_entries_are_short(tenants, monkeypatch):
+    monkeypatch.setattr(directory_module, "_MISS_SECONDS", 0)
+    directory, _ = _directory()
+    assert directory.by_slug("nova") is None
+    tenants.rows[8] = {"id": 8, "slug": "nova", "system_id": 1}
+    assert directory.by_slug("nova")["id"] == 8
+
+
+def test_directory_invalidation_reaches_other_process(tenants, bus_log):
+    here = directory_module.tenant_directory
+    there, there_bus = _directory()
+    there_bus.sync()
+    assert there.by_id(7)["maintenance_mode"] == 0
+    here.by_id(7)
+
+    tenants.rows[7]["maintenance_mode"] = 1
+    here.invalidate(7)
+    assert here.by_id(7)["maintenance_mode"] == 1
+    # Sem sync o outro processo ainda tem a linha antiga
+    assert there.by_id(7)["maintenance_mode"] == 0
+
+    there_bus.sync()
+    assert there.by_id(7)["maintenance_mode"] == 1
+
+
+def test_directory_slug_invalidation_drops_negative_entry(tenants, bus_log):
+    there, there_bus = _directory()
+    there_bus.sync()
+    assert there.by_slug("nova") is None
+    tenants.rows[8] = {"id": 8, "slug": "nova", "system_id": 1}
+    directory_module.tenant_directory.invalidate(8, "nova")
+    there_bus.sync()
+    assert there.by_slug("nova")["id"] == 8
+
+
+def test_directory_invalidate_during_select_is_not_cached(tenants):
+    directory, _ = _directory()
+    tenants.during_read = lambda: directory._drop(tenant_id=7)
+    directory.by_id(7)
+    tenants.during_read = None
+    directory.by_id(7)
+    assert tenants.reads == 2
+
+
+def test_directory_is_bounded(tenants):
+    for i in range(10, 20):
+        tenants.rows[i] = {"id": i, "slug": f"t{i}", "system_id": 1}
+    directory = TenantDirectory(ttl=3600, max_entries=6)
+    for i in range(10, 20):
+        directory.by_id(i)
+    assert directory.stats()["entries"] <= 6
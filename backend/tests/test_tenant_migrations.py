@@ -0,0 +1,191 @@
+"""Ledger, retomada, lock por tenant e lease do job de app.tenant_migrations contra fakes."""
+import threading
+import time
+from contextlib import contextmanager
+
+import pytest
+
+import app.tenant_migrations as tm
+from app.jobs import JobLeaseLost
+from app.tenant_migrations import TenantMigration, migrate_tenant
+
+TENANT = {"id": 7, "slug": "acme", "database_name": "acme_db", "database_host": "db-1"}
+M1 = TenantMigration("001_a.sql", "c1", ["ALTER TABLE users ADD a INT", "ALTER TABLE users ADD b INT"])
+M2 = TenantMigration("002_b.sql", "c2", ["CREATE TABLE x (id INT)"])
+
+
+class Result:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def scalar(self):
+        return self.rows[0][0]
+
+
+class FakeTenantDB:
+    """Ledger `_schema_migrations` + statements executados + GET_LOCK (ocupado em `busy`)."""
+
+    def __init__(self, ledger=None, fail_on=None, busy=False):
+        self.ledger = {k: list(v) for k, v in (ledger or {}).items()}
+        self.fail_on = fail_on
+        self.busy = busy
+        self.executed = []
+        self.locks = []
+
+    def exec_driver_sql(self, sql, params=None):
+        if sql.startswith("SELECT GET_LOCK"):
+            self.locks.append(("get", params[0]))
+            return Result([(0 if self.busy else 1,)])
+        if sql.startswith("SELECT RELEASE_LOCK"):
+            self.locks.append(("release", params[0]))
+            return Result([(1,)])
+        if sql.startswith("USE") or "CREATE TABLE IF NOT EXISTS `_schema_migrations`" in sql:
+            return Result([])
+        if sql.startswith("SELECT migration"):
+            return Result([(k, *v) for k, v in self.ledger.items()])
+        if sql.startswith("INSERT INTO `_schema_migrations`"):
+            self.ledger[params[0]] = [params[1], "partial", 0]
+            return Result([])
+        if "SET statements_done" in sql:
+            self.ledger[params[1]][2] = params[0]
+            return Result([])
+        if "SET status = 'applied'" in sql:
+            self.ledger[params[2]][:2] = [params[0], "applied"]
+            return Result([])
+        if sql == self.fail_on:
+            raise RuntimeError("Lock wait timeout")
+        self.executed.append(sql)
+        return Result([])
+
+
+@pytest.fixture
+def db(monkeypatch):
+    holder = {"db": FakeTenantDB()}
+
+    @contextmanager
+    def checkout(engine):
+        yield holder["db"]
+
+    monkeypatch.setattr(tm, "checkout", checkout)
+    monkeypatch.setattr(tm, "get_template_engine", lambda host: host)
+
+    def use(fake):
+        holder["db"] = fake
+        return fake
+
+    return use
+
+
+def test_applies_pending_in_order(db):
+    fake = db(FakeTenantDB())
+    out = migrate_tenant(TENANT, [M1, M2])
+    assert out["error"] is None and out["applied"] == ["001_a.sql", "002_b.sql"]
+    assert fake.executed == list(M1.statements + M2.statements)
+    assert fake.ledger["001_a.sql"] == ["c1", "applied", 2]
+    assert fake.locks == [("get", "tmig:db-1/acme_db"), ("release", "tmig:db-1/acme_db")]
+
+
+def test_resumes_partial_after_last_statement(db):
+    fake = db(FakeTenantDB({"001_a.sql": ["c1", "partial", 1]}))
+    out = migrate_tenant(TENANT, [M1])
+    assert out["applied"] == ["001_a.sql"]
+    assert fake.executed == [M1.statements[1]]
+
+
+def test_failure_keeps_progress_and_releases_lock(db):
+    fake = db(FakeTenantDB(fail_on=M1.statements[1]))
+    out = migrate_tenant(TENANT, [M1, M2])
+    assert out["error"].startswith("001_a.sql: RuntimeError")
+    assert fake.ledger["001_a.sql"] == ["c1", "partial", 1]
+    assert fake.locks[-1][0] == "release"
+
+
+def test_changed_partial_migration_is_refused(db):
+    fake = db(FakeTenantDB({"001_a.sql": ["outro", "partial", 1]}))
+    out = migrate_tenant(TENANT, [M1])
+    assert "alterada" in out["error"] and fake.executed == []
+
+
+def test_applied_with_other_checksum_is_reported(db):
+    db(FakeTenantDB({"001_a.sql": ["outro", "applied", 2]}))
+    out = migrate_tenant(TENANT, [M1])
+    assert out["checksumMismatch"] == ["001_a.sql"] and out["applied"] == []
+
+
+def test_tenant_locked_by_another_run_is_skipped(db):
+    fake = db(FakeTenantDB(busy=True))
+    out = migrate_tenant(TENANT, [M1])
+    assert "outra execução" in out["error"]
+    assert fake.executed == [] and fake.ledger == {}
+
+
+def test_dry_run_does_not_lock(db):
+    fake = db(FakeTenantDB())
+    out = migrate_tenant(TENANT, [M1], dry_run=True)
+    assert out["pending"] == ["001_a.sql"] and fake.executed == [] and fake.locks == []
+
+
+def test_lock_name_fits_get_lock_limit():
+    assert tm._lock_name("db-1", "acme_db") == "tmig:db-1/acme_db"
+    long_name = tm._lock_name("mysql-" + "x" * 60 + ".internal", "acme_db")
+    assert len(long_name) <= 64 and long_name.startswith("tmig:")
+
+
+def test_run_fleet_cancel_skips_remaining(monkeypatch):
+    tenants = [dict(TENANT, id=i, slug=f"t{i}", system_slug="jogador") for i in range(3)]
+    monkeypatch.setattr(tm, "list_fleet", lambda *a: tenants)
+    monkeypatch.setattr(tm, "load_migrations", lambda s: [M1])
+    cancel = threading.Event()
+    ran = []
+
+    def migrate(t, migrations, dry_run=False):
+        ran.append(t["slug"])
+        cancel.set()
+        return {"slug": t["slug"], "applied": [], "error": None, "checksumMismatch": []}
+
+    monkeypatch.setattr(tm, "migrate_tenant", migrate)
+    summary = tm.run_fleet(host_concurrency=1, cancel=cancel)
+    assert ran == ["t0"] and summary["done"] == 1
+
+
+class FakeCtx:
+    def __init__(self, lose_after=None):
+        self.id = 1
+        self.payload = {}
+        self.beats = []
+        self.lose_after = lose_after
+
+    def heartbeat(self, progress=None):
+        if self.lose_after is not None and len(self.beats) >= self.lose_after:
+            raise JobLeaseLost("perdido")
+        self.beats.append(progress)
+
+
+def test_job_renews_lease_while_a_tenant_is_slow(monkeypatch):
+    monkeypatch.setattr(tm, "_HEARTBEAT_SECONDS", 0.01)
+
+    def slow_fleet(on_result=None, **kwargs):
+        time.sleep(0.1)  # um único tenant demorando: nenhum on_result no meio
+        return {"done": 1}
+
+    monkeypatch.setattr(tm, "run_fleet", slow_fleet)
+    ctx = FakeCtx()
+    assert tm.run_tenant_migrations_job(ctx) == {"done": 1}
+    assert len(ctx.beats) >= 3
+
+
+def test_job_lost_lease_cancels_fleet(monkeypatch):
+    monkeypatch.setattr(tm, "_HEARTBEAT_SECONDS", 0.01)
+    seen = {}
+
+    def fleet(cancel=None, **kwargs):
+        seen["cancelled"] = cancel.wait(1)
+        return {"done": 0}
+
+    monkeypatch.setattr(tm, "run_fleet", fleet)
+    with pytest.raises(JobLeaseLost):
+        tm.run_tenant_migrations_job(FakeCtx(lose_after=1))
+    assert seen["cancelled"] is True
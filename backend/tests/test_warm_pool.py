@@ -0,0 +1,81 @@
+"""Estatísticas do warm pool lidas dos hosts (app.warm_pool) contra fakes."""
+from contextlib import contextmanager
+from pathlib import Path
+
+import pytest
+
+import app.warm_pool as warm_pool
+from app.db import TemplatePlan
+
+CUR = "a" * 12
+OLD = "b" * 12
+
+
+class Result:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def fetchall(self):
+        return list(self.rows)
+
+
+class FakeHost:
+    """SCHEMATA + marcador `_spare_ready` de um host."""
+
+    def __init__(self, spares):
+        self.spares = spares  # nome -> pronta?
+
+    def exec_driver_sql(self, sql, params=None):
+        assert "information_schema.SCHEMATA" in sql
+        return Result([(n, warm_pool.SPARE_MARKER_TABLE if ok else None) for n, ok in self.spares.items()])
+
+
+@pytest.fixture
+def hosts(monkeypatch):
+    servers = {}
+
+    @contextmanager
+    def checkout(engine):
+        if isinstance(servers[engine], Exception):
+            raise servers[engine]
+        yield servers[engine]
+
+    monkeypatch.setattr(warm_pool, "checkout", checkout)
+    monkeypatch.setattr(warm_pool, "get_template_engine", lambda host: host)
+    monkeypatch.setattr(warm_pool, "active_hosts", lambda: list(servers))
+    monkeypatch.setattr(warm_pool, "WARM_POOL_HOSTS", [])
+    monkeypatch.setattr(warm_pool, "_systems", lambda: {"jogador": Path("model_jogador.sql")})
+    monkeypatch.setattr(warm_pool.sql_templates, "get", lambda path: TemplatePlan(Path(path), 0, 0, CUR, []))
+    monkeypatch.setattr(warm_pool, "_refills", {})
+    return servers
+
+
+def test_stats_come_from_the_hosts(hosts):
+    hosts["db-1"] = FakeHost({
+        f"spare_jogador_{CUR}_00000001": True,
+        f"spare_jogador_{CUR}_00000002": False,
+        f"spare_jogador_{OLD}_00000003": True,
+        f"spare_jogador_pro_{CUR}_00000004": True,
+    })
+    pool = warm_pool.warm_pool_stats()["hosts"]["db-1"]["jogador"]
+    assert (pool["templateVersion"], pool["ready"], pool["building"], pool["stale"]) == (CUR, 1, 1, 1)
+    assert pool["spares"][0] == {"name": f"spare_jogador_{CUR}_00000001", "templateVersion": CUR, "ready": True}
+    assert [s["templateVersion"] for s in pool["spares"]] == [CUR, CUR, OLD]
+    assert pool["lastRefillAt"] is None and pool["refillPerMinute"] == 0
+
+
+def test_stats_include_refill_timing_of_this_worker(hosts):
+    hosts["db-1"] = FakeHost({})
+    warm_pool._refill("db-1", "jogador").last_refill_at = 123.0
+    warm_pool._refill("db-1", "jogador").build_times.append(warm_pool.time.time())
+    pool = warm_pool.warm_pool_stats()["hosts"]["db-1"]["jogador"]
+    assert pool["lastRefillAt"] == 123.0 and pool["refillPerMinute"] == 0.1
+    assert pool["ready"] == 0 and pool["spares"] == []
+
+
+def test_unreachable_host_reports_error(hosts):
+    hosts["db-1"] = RuntimeError("Can't connect")
+    hosts["db-2"] = FakeHost({f"spare_jogador_{CUR}_00000001": True})
+    stats = warm_pool.warm_pool_stats()["hosts"]
+    assert "error" in stats["db-1"]
+    assert stats["db-2"]["jogador"]["ready"] == 1
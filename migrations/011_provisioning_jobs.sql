@@ -0,0 +1,29 @@
+-- Migration 011: Jobs de provisionamento (create-tenant assíncrono)
+-- O POST grava o job e responde 202; um worker em background executa as etapas.
+-- steps guarda, na ordem, as etapas concluídas (nome, ms, resultado) para
+-- retomar de onde parou se o worker morrer no meio (lease em locked_until).
+
+CREATE TABLE IF NOT EXISTS provisioning_jobs (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    kind VARCHAR(32) NOT NULL COMMENT 'create_tenant, ...',
+    status VARCHAR(16) NOT NULL DEFAULT 'pending' COMMENT 'pending, running, succeeded, failed',
+    tenant_id INT NULL,
+
+    payload JSON NOT NULL,
+    steps JSON NULL,
+    current_step VARCHAR(64) NULL,
+    result JSON NULL,
+    error TEXT NULL,
+
+    attempts INT NOT NULL DEFAULT 0,
+    locked_by VARCHAR(128) NULL,
+    locked_until TIMESTAMP NULL DEFAULT NULL,
+
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    started_at TIMESTAMP NULL DEFAULT NULL,
+    finished_at TIMESTAMP NULL DEFAULT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+
+    INDEX idx_jobs_status (status, locked_until),
+    INDEX idx_jobs_tenant (tenant_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
@@ -0,0 +1,6 @@
+-- Migration 012: Lotes de provisionamento (POST /api/super-admin/tenants/bulk)
+-- Cada tenant do lote vira um job create_tenant com o mesmo batch_id.
+
+ALTER TABLE provisioning_jobs ADD COLUMN batch_id VARCHAR(36) NULL DEFAULT NULL AFTER tenant_id;
+
+CREATE INDEX idx_jobs_batch ON provisioning_jobs(batch_id);
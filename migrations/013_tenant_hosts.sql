@@ -0,0 +1,17 @@
+-- Migration 013: Registro dos hosts MySQL que recebem databases de tenant
+-- A placement (app/placement.py) escolhe o host menos carregado entre os ativos,
+-- ponderando nº de tenants, tamanho dos dados e uso de conexões pelo weight.
+
+CREATE TABLE IF NOT EXISTS tenant_hosts (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    host VARCHAR(255) NOT NULL UNIQUE COMMENT 'Host do MySQL (mesmo valor de tenants.database_host)',
+    weight DECIMAL(6,2) NOT NULL DEFAULT 1.00 COMMENT 'Capacidade relativa (2.0 = aguenta o dobro)',
+    max_tenants INT NULL COMMENT 'Limite de tenants (NULL = sem limite)',
+    is_active BOOLEAN NOT NULL DEFAULT TRUE COMMENT 'Recebe tenants novos',
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- Hosts que já têm tenants entram no registro com peso 1
+INSERT IGNORE INTO tenant_hosts (host)
+SELECT DISTINCT database_host FROM tenants WHERE database_host IS NOT NULL AND database_host <> '';
@@ -0,0 +1,7 @@
+-- Migration 014: Exclusão assíncrona de tenants
+-- DELETE /api/super-admin/tenants/<id> só marca deleted_at (e desativa); o job
+-- drop_tenant dropa as tabelas aos poucos, o database e por fim o registro.
+
+ALTER TABLE tenants ADD COLUMN deleted_at TIMESTAMP NULL DEFAULT NULL AFTER is_active;
+
+CREATE INDEX idx_tenants_deleted ON tenants(deleted_at);
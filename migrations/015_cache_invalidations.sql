@@ -0,0 +1,13 @@
+-- Migration 015: Log de invalidação dos caches em memória
+-- Cada escrita que invalida um cache (tenant_directory, session_cache) grava uma
+-- linha aqui; todo worker lê as linhas novas a cada CACHE_SYNC_SECONDS
+-- (app/cache_bus.py) e descarta as entradas correspondentes. Linhas com mais de
+-- uma hora são apagadas pelos próprios workers.
+
+CREATE TABLE IF NOT EXISTS cache_invalidations (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    kind VARCHAR(16) NOT NULL COMMENT 'tenant | tenant_slug | session | user',
+    ref VARCHAR(128) NOT NULL COMMENT 'id/slug do tenant, hash do token ou id do usuário',
+    created_at TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP(3),
+    INDEX idx_cache_invalidations_created (created_at)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
@@ -0,0 +1,8 @@
+-- Migration 016: Host de tenant de cada job (limite global por host)
+-- Jobs com host (create_tenant, drop_tenant, relocate_tenant) só são pegos por
+-- um worker se o host tiver menos de PROVISION_HOST_CONCURRENCY jobs rodando,
+-- somando todos os processos (app/jobs.py _claim_next).
+
+ALTER TABLE provisioning_jobs ADD COLUMN host VARCHAR(255) NULL DEFAULT NULL AFTER batch_id;
+
+CREATE INDEX idx_jobs_host_status ON provisioning_jobs(host, status);